@@ -1,8 +1,27 @@
 """Orchestration helpers for the Imel agent.
 
-This module exposes both:
-- `build_imel_langgraph(...)`: compiled LangGraph object wiring nodes/edges.
+This module exposes:
+- `build_imel_langgraph()`: compiled LangGraph object wiring nodes/edges.
 - `run_imel(...)`: thin runtime entrypoint that invokes the compiled graph.
+- `stream_imel(...)`: the same run, yielding node events and draft deltas.
+
+and their asyncio twins, `build_imel_async_langgraph()` / `arun_imel(...)` /
+`astream_imel(...)`, which wire the `a*` node variants (awaiting
+`AsyncImelTools` and `llm.ainvoke`) into the same topology and run it with
+`graph.ainvoke`.
+
+Optional variants of the same workflow: `build_imel_speculative_langgraph()`
+prefetches KB chunks in parallel with classification, and
+`build_imel_fast_path_langgraph()` classifies and drafts inquiries with one
+model call.
+
+The graph is compiled once per process and reused: runtime dependencies
+(`tools`, `llm`) travel with each invocation as LangGraph runtime context
+(`ImelContext`) instead of being bound into the nodes at build time.
+
+When the runtime attaches a checkpointer, every super-step is persisted before
+the next one starts (`durability="sync"`), and `resume=True` continues the
+thread (`run_id`) from its last checkpoint instead of starting over.
 
 Current issues to check later:
  - run_id or email_id is used as thread_id in config
@@ -14,10 +33,13 @@ import functools
 import typing
 
 from langgraph.graph import START, StateGraph
+from langgraph.runtime import Runtime
+from langgraph.types import Command
 
 from agents.general.imel import nodes as imel_nodes
 from agents.general.imel import state as imel_state
 from agents.general.imel import tools as imel_tools
+from agents.shared import utils
 from agents.shared.schemas import TenantProfile
 
 
@@ -31,59 +53,447 @@ def run_imel(
     tools: imel_tools.ImelTools,
     run_id: str | None = None,
     llm=None,
+    graph=None,
+    resume: bool = False,
+    classification: imel_state.EmailClassification | None = None,
 ):
-    """Run Imel by invoking the compiled LangGraph workflow and return the final Imel state dict for this run."""
-
-    # The orchestrator typically loads tenant context and injects it; we keep
-    # this convenience fallback so demo runners can omit `tenant_profile`.
-    if tenant_profile is None and tenant_id:
-        tenant_profile = tools.load_tenant_profile(tenant_id=tenant_id)
-
-    initial_state = imel_nodes.init_imel_state(
-        email_id=email_id,
-        sender_email=sender_email,
-        email_content=email_content,
-        tenant_id=tenant_id,
-        tenant_profile=tenant_profile,
-    )
+    """Run Imel by invoking the compiled LangGraph workflow and return the final Imel state dict for this run.
+
+    `graph` lets the runtime pass its own cached compiled graph; by default the
+    graph compiled once per process is used. With `resume=True` the graph must
+    carry a checkpointer: the run continues from the last checkpoint of
+    `run_id` and the email arguments are not used to build a new state.
+    A `classification` computed ahead of the run (see
+    `imel_nodes.classify_emails_batch`) replaces the per-run model call.
+    """
+
+    initial_state = None
+    if not resume:
+        # The orchestrator typically loads tenant context and injects it; we keep
+        # this convenience fallback so demo runners can omit `tenant_profile`.
+        if tenant_profile is None and tenant_id:
+            tenant_profile = tools.load_tenant_profile(tenant_id=tenant_id)
+
+        initial_state = imel_nodes.init_imel_state(
+            email_id=email_id,
+            sender_email=sender_email,
+            email_content=email_content,
+            tenant_id=tenant_id,
+            tenant_profile=tenant_profile,
+            classification=classification,
+        )
 
-    graph = build_imel_langgraph(tools=tools, llm=llm)
+    graph = graph or _default_graph()
     # Use run_id as thread_id so runtime and LangGraph traces share the same correlation key.
     config = {"configurable": {"thread_id": run_id or email_id}}
-    final_state = graph.invoke(initial_state, config=config)
+    final_state = graph.invoke(
+        initial_state,
+        config=config,
+        context=imel_state.ImelContext(tools=tools, llm=llm),
+        durability=utils.checkpoint_durability(graph),
+    )
     return typing.cast(imel_state.ImelState, final_state)
 
 
-def build_imel_langgraph(*, tools: imel_tools.ImelTools, llm=None):
+async def arun_imel(
+    *,
+    email_id: str,
+    sender_email: str,
+    email_content: str,
+    tenant_id: str | None = None,
+    tenant_profile: TenantProfile | None = None,
+    tools: imel_tools.AsyncImelTools,
+    run_id: str | None = None,
+    llm=None,
+    graph=None,
+    resume: bool = False,
+    classification: imel_state.EmailClassification | None = None,
+):
+    """Async `run_imel`: awaits tools and the model, so many runs can share one event loop."""
+
+    initial_state = None
+    if not resume:
+        if tenant_profile is None and tenant_id:
+            tenant_profile = await tools.load_tenant_profile(tenant_id=tenant_id)
+
+        initial_state = imel_nodes.init_imel_state(
+            email_id=email_id,
+            sender_email=sender_email,
+            email_content=email_content,
+            tenant_id=tenant_id,
+            tenant_profile=tenant_profile,
+            classification=classification,
+        )
+
+    graph = graph or _default_async_graph()
+    config = {"configurable": {"thread_id": run_id or email_id}}
+    final_state = await graph.ainvoke(
+        initial_state,
+        config=config,
+        context=imel_state.ImelContext(tools=tools, llm=llm),
+        durability=utils.checkpoint_durability(graph),
+    )
+    return typing.cast(imel_state.ImelState, final_state)
+
+
+def stream_imel(
+    *,
+    email_id: str,
+    sender_email: str,
+    email_content: str,
+    tenant_id: str | None = None,
+    tenant_profile: TenantProfile | None = None,
+    tools: imel_tools.ImelTools,
+    run_id: str | None = None,
+    llm=None,
+    graph=None,
+    resume: bool = False,
+    classification: imel_state.EmailClassification | None = None,
+) -> typing.Iterator[dict[str, typing.Any]]:
+    """Run Imel like `run_imel`, yielding progress events while the graph runs.
+
+    Every event is a dict with an "event" key:
+    - `{"event": "node", "node": name, "update": {...}}` when a node finishes,
+    - `{"event": "draft_delta", "delta": text}` for each piece of a streamed draft,
+    - `{"event": "final", "state": final_state}` last; the state `run_imel` returns.
+    """
+
+    initial_state = None
+    if not resume:
+        if tenant_profile is None and tenant_id:
+            tenant_profile = tools.load_tenant_profile(tenant_id=tenant_id)
+
+        initial_state = imel_nodes.init_imel_state(
+            email_id=email_id,
+            sender_email=sender_email,
+            email_content=email_content,
+            tenant_id=tenant_id,
+            tenant_profile=tenant_profile,
+            classification=classification,
+        )
+
+    graph = graph or _default_graph()
+    config = {"configurable": {"thread_id": run_id or email_id}}
+    final_state = None
+    for mode, chunk in graph.stream(
+        initial_state,
+        config=config,
+        context=imel_state.ImelContext(tools=tools, llm=llm, stream_draft=True),
+        durability=utils.checkpoint_durability(graph),
+        stream_mode=_STREAM_MODES,
+    ):
+        if mode == "values":
+            final_state = chunk
+        else:
+            yield from _stream_events(mode, chunk)
+    yield {"event": "final", "state": typing.cast(imel_state.ImelState, final_state)}
+
+
+async def astream_imel(
+    *,
+    email_id: str,
+    sender_email: str,
+    email_content: str,
+    tenant_id: str | None = None,
+    tenant_profile: TenantProfile | None = None,
+    tools: imel_tools.AsyncImelTools,
+    run_id: str | None = None,
+    llm=None,
+    graph=None,
+    resume: bool = False,
+    classification: imel_state.EmailClassification | None = None,
+) -> typing.AsyncIterator[dict[str, typing.Any]]:
+    """Async `stream_imel`: the same events from the coroutine-node graph."""
+
+    initial_state = None
+    if not resume:
+        if tenant_profile is None and tenant_id:
+            tenant_profile = await tools.load_tenant_profile(tenant_id=tenant_id)
+
+        initial_state = imel_nodes.init_imel_state(
+            email_id=email_id,
+            sender_email=sender_email,
+            email_content=email_content,
+            tenant_id=tenant_id,
+            tenant_profile=tenant_profile,
+            classification=classification,
+        )
+
+    graph = graph or _default_async_graph()
+    config = {"configurable": {"thread_id": run_id or email_id}}
+    final_state = None
+    async for mode, chunk in graph.astream(
+        initial_state,
+        config=config,
+        context=imel_state.ImelContext(tools=tools, llm=llm, stream_draft=True),
+        durability=utils.checkpoint_durability(graph),
+        stream_mode=_STREAM_MODES,
+    ):
+        if mode == "values":
+            final_state = chunk
+        else:
+            for event in _stream_events(mode, chunk):
+                yield event
+    yield {"event": "final", "state": typing.cast(imel_state.ImelState, final_state)}
+
+
+def _draft_stream_writer(runtime: Runtime[imel_state.ImelContext]) -> typing.Any:
+    """The writer for draft deltas when a streaming entrypoint consumes them, else None (draft with `invoke`)."""
+
+    return runtime.stream_writer if runtime.context.stream_draft else None
+
+
+# "updates" for node events, "custom" for draft deltas, "values" for the final state.
+_STREAM_MODES = ["updates", "custom", "values"]
+
+
+def _stream_events(mode: str, chunk: typing.Any) -> typing.Iterator[dict[str, typing.Any]]:
+    if mode == "custom":
+        yield chunk
+        return
+    for node, update in chunk.items():
+        yield {"event": "node", "node": node, "update": update}
+
+
+def build_imel_langgraph():
     """Build and compile the Imel LangGraph workflow.
 
     Library API note:
     LangGraph nodes accept `state` and may return either state updates or
-    `Command(goto=...)`. We bind runtime dependencies (`tools`, `llm`) via
-    `functools.partial` so node signatures stay LangGraph-compatible.
+    `Command(goto=...)`. Nodes that need runtime dependencies also accept
+    `runtime: Runtime[ImelContext]`; the thin wrappers below unpack it so the
+    node functions in `nodes.py` keep their plain keyword signatures.
+    The compiled graph holds no per-run state, so concurrent runs can share it.
     """
 
-    graph = StateGraph(imel_state.ImelState)
+    return _compile(
+        classify_intent=_classify_intent,
+        route_by_intent=_route_by_intent,
+        company_kb_lookup=_company_kb_lookup,
+        draft_inquiry_response=_draft_inquiry_response,
+        process_order=_process_order,
+        create_ticket_and_handoff_to_kall=_create_ticket_and_handoff_to_kall,
+        archive=imel_nodes.archive_node,
+    )
 
-    # Register nodes with runtime dependencies bound at graph-build time.
-    graph.add_node("classify_intent", functools.partial(imel_nodes.classify_intent_node, llm=llm))
-    graph.add_node("route_by_intent", functools.partial(imel_nodes.route_by_intent_node, llm=llm))
-    graph.add_node(
-        "company_kb_lookup",
-        functools.partial(imel_nodes.company_kb_lookup_node, tools=tools),
+
+def build_imel_async_langgraph():
+    """Build and compile the Imel workflow with coroutine nodes (for `ainvoke`).
+
+    Pure routing nodes get async wrappers too, so `ainvoke` never hops to a
+    thread pool for them.
+    """
+
+    return _compile(
+        classify_intent=_aclassify_intent,
+        route_by_intent=_aroute_by_intent,
+        company_kb_lookup=_acompany_kb_lookup,
+        draft_inquiry_response=_adraft_inquiry_response,
+        process_order=_aprocess_order,
+        create_ticket_and_handoff_to_kall=_acreate_ticket_and_handoff_to_kall,
+        archive=_aarchive,
     )
-    graph.add_node("draft_inquiry_response", functools.partial(imel_nodes.draft_inquiry_response_node, llm=llm))
-    graph.add_node(
-        "process_order",
-        functools.partial(imel_nodes.process_order_node, tools=tools),
+
+
+def build_imel_speculative_langgraph():
+    """Build the Imel workflow with a speculative KB prefetch.
+
+    `prefetch_company_kb` starts at the same time as `classify_intent` and
+    `route_by_intent` waits for both. On the inquiry path `company_kb_lookup`
+    reuses the prefetched chunks, so retrieval is off the critical path; any
+    other route discards them. The cost is one retrieval per non-inquiry email.
+    """
+
+    return _compile(
+        prefetch_company_kb=_prefetch_company_kb,
+        classify_intent=_classify_intent,
+        route_by_intent=_route_by_intent,
+        company_kb_lookup=_company_kb_lookup,
+        draft_inquiry_response=_draft_inquiry_response,
+        process_order=_process_order,
+        create_ticket_and_handoff_to_kall=_create_ticket_and_handoff_to_kall,
+        archive=imel_nodes.archive_node,
     )
-    graph.add_node(
-        "create_ticket_and_handoff_to_kall",
-        functools.partial(imel_nodes.create_ticket_and_handoff_to_kall_node, tools=tools),
+
+
+def build_imel_speculative_async_langgraph():
+    """Coroutine-node twin of `build_imel_speculative_langgraph` (for `ainvoke`)."""
+
+    return _compile(
+        prefetch_company_kb=_aprefetch_company_kb,
+        classify_intent=_aclassify_intent,
+        route_by_intent=_aroute_by_intent,
+        company_kb_lookup=_acompany_kb_lookup,
+        draft_inquiry_response=_adraft_inquiry_response,
+        process_order=_aprocess_order,
+        create_ticket_and_handoff_to_kall=_acreate_ticket_and_handoff_to_kall,
+        archive=_aarchive,
     )
-    graph.add_node("archive", imel_nodes.archive_node)
+
+
+def build_imel_fast_path_langgraph():
+    """Build the Imel workflow with the fused classify-and-draft fast path.
+
+    `classify_and_draft` is the entry node: for inquiries and feedback one
+    model call classifies and drafts the reply. Other intents continue at
+    `route_by_intent` with that classification, and an unusable response
+    falls back to `classify_intent` (the regular two-step flow).
+    """
+
+    return _compile(
+        classify_and_draft=_classify_and_draft,
+        classify_intent=_classify_intent,
+        route_by_intent=_route_by_intent,
+        company_kb_lookup=_company_kb_lookup,
+        draft_inquiry_response=_draft_inquiry_response,
+        process_order=_process_order,
+        create_ticket_and_handoff_to_kall=_create_ticket_and_handoff_to_kall,
+        archive=imel_nodes.archive_node,
+    )
+
+
+def build_imel_fast_path_async_langgraph():
+    """Coroutine-node twin of `build_imel_fast_path_langgraph` (for `ainvoke`)."""
+
+    return _compile(
+        classify_and_draft=_aclassify_and_draft,
+        classify_intent=_aclassify_intent,
+        route_by_intent=_aroute_by_intent,
+        company_kb_lookup=_acompany_kb_lookup,
+        draft_inquiry_response=_adraft_inquiry_response,
+        process_order=_aprocess_order,
+        create_ticket_and_handoff_to_kall=_acreate_ticket_and_handoff_to_kall,
+        archive=_aarchive,
+    )
+
+
+def _compile(**nodes: typing.Any):
+    """Wire the Imel topology; shared by the sync and async builders."""
+
+    graph = StateGraph(imel_state.ImelState, context_schema=imel_state.ImelContext)
+    for name, node in nodes.items():
+        graph.add_node(name, node)
 
     # Define fixed edges. Dynamic routing is handled by Command(...) returns.
-    graph.add_edge(START, "classify_intent")
-    graph.add_edge("classify_intent", "route_by_intent")
+    graph.add_edge(START, "classify_and_draft" if "classify_and_draft" in nodes else "classify_intent")
+    if "prefetch_company_kb" in nodes:
+        # Fan out from START; routing waits for both branches.
+        graph.add_edge(START, "prefetch_company_kb")
+        graph.add_edge(["classify_intent", "prefetch_company_kb"], "route_by_intent")
+    else:
+        graph.add_edge("classify_intent", "route_by_intent")
     return graph.compile()
+
+
+# Compiled once per process for direct callers; the runtime passes its own registry-cached graph.
+_default_graph = functools.cache(build_imel_langgraph)
+_default_async_graph = functools.cache(build_imel_async_langgraph)
+
+
+# --- node wrappers: unpack runtime context into node keyword arguments --------
+# Return annotations are repeated here because LangGraph reads them to learn the
+# `Command(goto=...)` destinations of each node.
+
+
+def _classify_and_draft(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["classify_intent", "route_by_intent", "__end__"]]:
+    return imel_nodes.classify_and_draft_node(state, llm=runtime.context.llm, tools=runtime.context.tools)
+
+
+def _classify_intent(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> imel_state.ImelState:
+    return imel_nodes.classify_intent_node(state, llm=runtime.context.llm, tools=runtime.context.tools)
+
+
+def _prefetch_company_kb(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> dict[str, typing.Any]:
+    return imel_nodes.prefetch_company_kb_node(state, tools=runtime.context.tools)
+
+
+def _route_by_intent(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["process_order", "create_ticket_and_handoff_to_kall", "archive", "company_kb_lookup"]]:
+    return imel_nodes.route_by_intent_node(state, llm=runtime.context.llm)
+
+
+def _company_kb_lookup(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["draft_inquiry_response"]]:
+    return imel_nodes.company_kb_lookup_node(state, tools=runtime.context.tools)
+
+
+def _draft_inquiry_response(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["__end__"]]:
+    return imel_nodes.draft_inquiry_response_node(
+        state, llm=runtime.context.llm, stream_writer=_draft_stream_writer(runtime)
+    )
+
+
+def _process_order(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["draft_inquiry_response"]]:
+    return imel_nodes.process_order_node(state, tools=runtime.context.tools)
+
+
+def _create_ticket_and_handoff_to_kall(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["__end__"]]:
+    return imel_nodes.create_ticket_and_handoff_to_kall_node(state, tools=runtime.context.tools)
+
+
+async def _aclassify_and_draft(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["classify_intent", "route_by_intent", "__end__"]]:
+    return await imel_nodes.aclassify_and_draft_node(state, llm=runtime.context.llm, tools=runtime.context.tools)
+
+
+async def _aclassify_intent(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> imel_state.ImelState:
+    return await imel_nodes.aclassify_intent_node(state, llm=runtime.context.llm, tools=runtime.context.tools)
+
+
+async def _aprefetch_company_kb(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> dict[str, typing.Any]:
+    return await imel_nodes.aprefetch_company_kb_node(state, tools=runtime.context.tools)
+
+
+async def _aroute_by_intent(
+    state: imel_state.ImelState,
+) -> Command[typing.Literal["process_order", "create_ticket_and_handoff_to_kall", "archive", "company_kb_lookup"]]:
+    return imel_nodes.route_by_intent_node(state)
+
+
+async def _acompany_kb_lookup(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["draft_inquiry_response"]]:
+    return await imel_nodes.acompany_kb_lookup_node(state, tools=runtime.context.tools)
+
+
+async def _adraft_inquiry_response(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["__end__"]]:
+    return await imel_nodes.adraft_inquiry_response_node(
+        state, llm=runtime.context.llm, stream_writer=_draft_stream_writer(runtime)
+    )
+
+
+async def _aprocess_order(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["draft_inquiry_response"]]:
+    return await imel_nodes.aprocess_order_node(state, tools=runtime.context.tools)
+
+
+async def _acreate_ticket_and_handoff_to_kall(
+    state: imel_state.ImelState, runtime: Runtime[imel_state.ImelContext]
+) -> Command[typing.Literal["__end__"]]:
+    return await imel_nodes.acreate_ticket_and_handoff_to_kall_node(state, tools=runtime.context.tools)
+
+
+async def _aarchive(state: imel_state.ImelState) -> Command[typing.Literal["__end__"]]:
+    return imel_nodes.archive_node(state)
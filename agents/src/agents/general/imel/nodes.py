@@ -8,6 +8,7 @@ Even if you never use LangGraph, writing your agent logic in this style is usefu
 because it forces you to keep inputs/outputs explicit and easy to test.
 """
 
+import hashlib
 import json
 import logging
 import re
@@ -18,12 +19,20 @@ from agents.general.imel import policy as imel_policy
 from agents.general.imel import prompts as imel_prompts
 from agents.general.imel import state as imel_state
 from agents.general.imel import tools as imel_tools
+from agents.shared import kb_packing
+from agents.shared import model_routing
 
 from typing import Literal
-from langgraph.types import Command
+from langgraph.types import Command, StreamWriter
 
 logger = logging.getLogger(__name__)
 
+# Intents the fused classify-and-draft call may answer directly; the rest need tools.
+FAST_PATH_INTENTS = frozenset({"inquiry", "feedback"})
+
+# Reply headers after which the rest of an email is quoted history.
+_QUOTED_REPLY_RE = re.compile(r"^\s*(on\b.+\bwrote:|-{2,}\s*original message\s*-{2,})\s*$", re.IGNORECASE)
+
 
 # --- Public Nodes ---
 
@@ -34,55 +43,517 @@ def init_imel_state(
     email_content: str,
     tenant_id: str | None = None,
     tenant_profile: imel_state.TenantProfile | None = None,
+    classification: imel_state.EmailClassification | None = None,
 ) -> imel_state.ImelState:
-    """Create the initial Imel state for an email run."""
+    """Create the initial Imel state for an email run.
+
+    `classification` pre-seeds the result of an earlier classification (for
+    example from `classify_emails_batch`); `classify_intent_node` then skips
+    the model.
+    """
     return {
         "email_id": email_id,
         "sender_email": sender_email,
         "email_content": email_content,
         "tenant_id": tenant_id,
         "tenant_profile": tenant_profile,
-        "classification": None,
+        "classification": classification,
         "kb_snippets": None,
         "ticket": None,
         "handoff": None,
         "draft_response": None,
         "action": None,
         "messages": [], # No system prompt here, it should be added during runtime per run
+        "run_metadata": {},
     }
 
 
-def classify_intent_node(state: imel_state.ImelState, *, llm=None) -> imel_state.ImelState:
-    """Classify the email into a small set of intents."""
-    system_prompt = imel_policy.build_imel_system_prompt(tenant_profile=state.get("tenant_profile"))
-    email_prompt = imel_prompts.CLASSIFY_EMAIL_PROMPT.format(
+def classify_intent_node(
+    state: imel_state.ImelState, *, llm=None, tools: imel_tools.ImelTools | None = None
+) -> imel_state.ImelState:
+    """Classify the email into a small set of intents.
+
+    With a model and `tools`, content the tenant has already had classified
+    (same `classification_cache_key`) reuses the cached result and skips the
+    model call; fresh model results are cached for the next repeat. A
+    classification pre-seeded into the state is kept without any lookup.
+    """
+    if state.get("classification"):
+        precomputed = _cached_classification(state, state["classification"])
+        return _apply_classification(state, precomputed, prompt=None, source="precomputed")
+
+    content_key = _classification_content_key(state, llm=llm, tools=tools)
+    if content_key is not None:
+        cached = tools.get_cached_classification(tenant_id=state.get("tenant_id"), content_key=content_key)
+        if cached:
+            return _apply_classification(state, _cached_classification(state, cached), prompt=None, source="cache")
+
+    system_prompt, email_prompt = _classification_prompts(state)
+    classification, from_model = _classify_email(
+        system_prompt=system_prompt,
+        email_prompt=email_prompt,
         email_content=state["email_content"],
         sender_email=state["sender_email"],
+        llm=llm,
     )
-    
-    classification = _classify_email(
+    if content_key is not None and from_model:
+        tools.cache_classification(
+            tenant_id=state.get("tenant_id"), content_key=content_key, classification=classification
+        )
+    return _apply_classification(state, classification, prompt=f"{system_prompt}\n\n{email_prompt}")
+
+
+async def aclassify_intent_node(
+    state: imel_state.ImelState, *, llm=None, tools: imel_tools.AsyncImelTools | None = None
+) -> imel_state.ImelState:
+    """Async `classify_intent_node`: awaits the cache and the model (`ainvoke`)."""
+    if state.get("classification"):
+        precomputed = _cached_classification(state, state["classification"])
+        return _apply_classification(state, precomputed, prompt=None, source="precomputed")
+
+    content_key = _classification_content_key(state, llm=llm, tools=tools)
+    if content_key is not None:
+        cached = await tools.get_cached_classification(tenant_id=state.get("tenant_id"), content_key=content_key)
+        if cached:
+            return _apply_classification(state, _cached_classification(state, cached), prompt=None, source="cache")
+
+    system_prompt, email_prompt = _classification_prompts(state)
+    classification, from_model = await _aclassify_email(
         system_prompt=system_prompt,
         email_prompt=email_prompt,
         email_content=state["email_content"],
         sender_email=state["sender_email"],
         llm=llm,
     )
+    if content_key is not None and from_model:
+        await tools.cache_classification(
+            tenant_id=state.get("tenant_id"), content_key=content_key, classification=classification
+        )
+    return _apply_classification(state, classification, prompt=f"{system_prompt}\n\n{email_prompt}")
+
+
+def classify_and_draft_node(
+    state: imel_state.ImelState, *, llm=None, tools: imel_tools.ImelTools | None = None
+) -> Command[Literal["classify_intent", "route_by_intent", "__end__"]]:
+    """Fast path: classify and, for inquiries and feedback, draft with one model call.
+
+    The KB is looked up with the raw email first, so the fused prompt carries
+    the snippets the draft needs. A usable draft ends the run; any other
+    intent continues with the model's classification through
+    `route_by_intent` (the snippets are kept for `company_kb_lookup_node`).
+    A failed KB lookup is logged and the prompt goes without snippets; nothing
+    is kept, so `company_kb_lookup_node` looks the KB up again if reached.
+    Without a model, with a pre-seeded or cached classification, or when the
+    response is not valid JSON, the regular two-step flow runs instead.
+    """
+    if llm is None or state.get("classification"):
+        return Command(goto="classify_intent")
+    content_key = _classification_content_key(state, llm=llm, tools=tools)
+    if content_key is not None:
+        cached = tools.get_cached_classification(tenant_id=state.get("tenant_id"), content_key=content_key)
+        if cached:
+            return _fast_path_cached(state, cached)
+
+    snippets: list[imel_state.KBChunk] | None = []
+    if tools is not None:
+        try:
+            snippets = tools.lookup_company_kb(tenant_id=state.get("tenant_id"), query=state["email_content"]) or []
+        except Exception as exc:
+            logger.warning("Fast-path KB lookup failed for email %s: %s", state["email_id"], exc)
+            snippets = None
+    prompt, packed, packing = _fast_path_prompt(state, snippets or [])
+    try:
+        response = model_routing.task_model(llm, model_routing.TASK_DRAFTING).invoke(prompt)
+        parsed = _extract_json_object(_extract_text(response))
+    except Exception as exc:
+        logger.warning("Fused classify-and-draft failed for %s: %s", state["sender_email"], exc)
+        parsed = None
+    command, classification = _apply_fast_path(
+        state, parsed, snippets=snippets, packed=packed, packing=packing, prompt=prompt
+    )
+    if content_key is not None and classification is not None:
+        tools.cache_classification(
+            tenant_id=state.get("tenant_id"), content_key=content_key, classification=classification
+        )
+    return command
+
+
+async def aclassify_and_draft_node(
+    state: imel_state.ImelState, *, llm=None, tools: imel_tools.AsyncImelTools | None = None
+) -> Command[Literal["classify_intent", "route_by_intent", "__end__"]]:
+    """Async `classify_and_draft_node`: awaits tools and the model (`ainvoke`)."""
+    if llm is None or state.get("classification"):
+        return Command(goto="classify_intent")
+    content_key = _classification_content_key(state, llm=llm, tools=tools)
+    if content_key is not None:
+        cached = await tools.get_cached_classification(tenant_id=state.get("tenant_id"), content_key=content_key)
+        if cached:
+            return _fast_path_cached(state, cached)
+
+    snippets: list[imel_state.KBChunk] | None = []
+    if tools is not None:
+        try:
+            snippets = await tools.lookup_company_kb(tenant_id=state.get("tenant_id"), query=state["email_content"]) or []
+        except Exception as exc:
+            logger.warning("Fast-path KB lookup failed for email %s: %s", state["email_id"], exc)
+            snippets = None
+    prompt, packed, packing = _fast_path_prompt(state, snippets or [])
+    try:
+        response = await model_routing.task_model(llm, model_routing.TASK_DRAFTING).ainvoke(prompt)
+        parsed = _extract_json_object(_extract_text(response))
+    except Exception as exc:
+        logger.warning("Fused classify-and-draft failed for %s: %s", state["sender_email"], exc)
+        parsed = None
+    command, classification = _apply_fast_path(
+        state, parsed, snippets=snippets, packed=packed, packing=packing, prompt=prompt
+    )
+    if content_key is not None and classification is not None:
+        await tools.cache_classification(
+            tenant_id=state.get("tenant_id"), content_key=content_key, classification=classification
+        )
+    return command
 
-    state["classification"] = classification
-    logger.info("Classified email %s as: %s", state["email_id"], classification)
-    return state
+
+def classification_cache_key(email_content: str) -> str:
+    """Key under which a classification of `email_content` is cached.
+
+    Quoted reply history is dropped and whitespace and casing collapsed, so
+    templated emails and replies to the same thread map to one key. The
+    classification prompt is hashed in too: editing it retires old entries.
+    """
+
+    lines: list[str] = []
+    for line in email_content.splitlines():
+        if _QUOTED_REPLY_RE.match(line):
+            break
+        if not line.lstrip().startswith(">"):
+            lines.append(line)
+    normalized = " ".join(" ".join(lines).split()).lower() or " ".join(email_content.split()).lower()
+    digest = hashlib.sha256(imel_prompts.CLASSIFY_EMAIL_PROMPT.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalized.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def classify_emails_batch(
+    emails: typing.Sequence[typing.Mapping[str, str]],
+    *,
+    tenant_profile: imel_state.TenantProfile | None = None,
+    llm,
+) -> list[tuple[imel_state.EmailClassification, bool]]:
+    """Classify several emails of one tenant with a single model call.
+
+    `emails` are mappings with `email_content` and `sender_email`. Returns one
+    `(classification, from_model)` pair per email, in order; an email the
+    response does not classify (missing, malformed, or the whole response is
+    not a JSON array) gets `_fallback_classification` on its own. Errors of
+    the model call itself propagate, so callers can classify the emails one
+    by one instead.
+    """
+
+    if not emails:
+        return []
+    llm = model_routing.task_model(llm, model_routing.TASK_CLASSIFICATION)
+    response = llm.invoke(_batch_classification_prompt(emails, tenant_profile=tenant_profile))
+    return _parse_batch_classifications(response, emails)
+
+
+async def aclassify_emails_batch(
+    emails: typing.Sequence[typing.Mapping[str, str]],
+    *,
+    tenant_profile: imel_state.TenantProfile | None = None,
+    llm,
+) -> list[tuple[imel_state.EmailClassification, bool]]:
+    """Async `classify_emails_batch`: the model call is awaited with `ainvoke`."""
+
+    if not emails:
+        return []
+    llm = model_routing.task_model(llm, model_routing.TASK_CLASSIFICATION)
+    response = await llm.ainvoke(_batch_classification_prompt(emails, tenant_profile=tenant_profile))
+    return _parse_batch_classifications(response, emails)
+
+
+def prefetch_company_kb_node(state: imel_state.ImelState, *, tools: imel_tools.ImelTools) -> dict[str, typing.Any]:
+    """Speculatively fetch company knowledge for the raw email, alongside classification.
+
+    Most emails end up on the inquiry path, so the speculative graph variant
+    runs this in parallel with `classify_intent` and `company_kb_lookup_node`
+    reuses the result; routing elsewhere discards it. The query is the raw
+    email, because the classification is not known yet. A failed lookup is
+    logged and leaves `kb_prefetch` unset, so the regular lookup runs later.
+    """
+    try:
+        snippets = tools.lookup_company_kb(tenant_id=state.get("tenant_id"), query=state["email_content"]) or []
+    except Exception as exc:
+        logger.warning("Speculative KB lookup failed for email %s: %s", state["email_id"], exc)
+        return {"kb_prefetch": None}
+    return {"kb_prefetch": snippets}
+
+
+async def aprefetch_company_kb_node(
+    state: imel_state.ImelState, *, tools: imel_tools.AsyncImelTools
+) -> dict[str, typing.Any]:
+    """Async `prefetch_company_kb_node`."""
+    try:
+        snippets = await tools.lookup_company_kb(tenant_id=state.get("tenant_id"), query=state["email_content"]) or []
+    except Exception as exc:
+        logger.warning("Speculative KB lookup failed for email %s: %s", state["email_id"], exc)
+        return {"kb_prefetch": None}
+    return {"kb_prefetch": snippets}
 
 
 def company_kb_lookup_node(
     state: imel_state.ImelState, *, tools: imel_tools.ImelTools
 ) -> Command[Literal["draft_inquiry_response"]]:
     """Fetch relevant company knowledge for generic inquiries.
-    
+
+    Snippets are deduplicated and packed into the tenant's token budget before
+    they reach the drafting prompt (see `agents.shared.kb_packing`). Chunks
+    already fetched by `prefetch_company_kb_node` are used instead of a second
+    lookup.
+
     Returns:
         Command(goto="draft_inquiry_response"): Always proceeds to drafting.
     """
+    prefetched = state.get("kb_prefetch")
+    if prefetched is not None:
+        return _apply_kb_snippets(state, prefetched, prefetched=True)
+    snippets = tools.lookup_company_kb(tenant_id=state.get("tenant_id"), query=_kb_query(state)) or []
+    return _apply_kb_snippets(state, snippets)
+
+
+async def acompany_kb_lookup_node(
+    state: imel_state.ImelState, *, tools: imel_tools.AsyncImelTools
+) -> Command[Literal["draft_inquiry_response"]]:
+    """Async `company_kb_lookup_node`."""
+    prefetched = state.get("kb_prefetch")
+    if prefetched is not None:
+        return _apply_kb_snippets(state, prefetched, prefetched=True)
+    snippets = await tools.lookup_company_kb(tenant_id=state.get("tenant_id"), query=_kb_query(state)) or []
+    return _apply_kb_snippets(state, snippets)
+
+
+def draft_inquiry_response_node(
+    state: imel_state.ImelState, *, llm=None, stream_writer: StreamWriter | None = None
+) -> Command[Literal["__end__"]]:
+    """Draft a response for inquiries/general emails.
+
+    With a `stream_writer` (streamed runs, `stream_imel`) the model is
+    consumed token by token, and each piece is written to it as a
+    `{"event": "draft_delta", "delta": ...}` event, so the consumer sees the
+    reply as it is generated. Without one the model is called with `invoke`.
+    """
+    system_prompt, draft_prompt = _draft_prompts(state)
+
+    draft = _draft_reply(
+        system_prompt=system_prompt,
+        draft_prompt=draft_prompt,
+        classification=state.get("classification"),
+        llm=llm,
+        stream_writer=stream_writer,
+    )
+    return _apply_draft(state, draft, prompt=f"{system_prompt}\n\n{draft_prompt}")
+
+
+async def adraft_inquiry_response_node(
+    state: imel_state.ImelState, *, llm=None, stream_writer: StreamWriter | None = None
+) -> Command[Literal["__end__"]]:
+    """Async `draft_inquiry_response_node`: streams with `astream` for a `stream_writer`, else awaits `ainvoke`."""
+    system_prompt, draft_prompt = _draft_prompts(state)
+
+    draft = await _adraft_reply(
+        system_prompt=system_prompt,
+        draft_prompt=draft_prompt,
+        classification=state.get("classification"),
+        llm=llm,
+        stream_writer=stream_writer,
+    )
+    return _apply_draft(state, draft, prompt=f"{system_prompt}\n\n{draft_prompt}")
+
+
+def process_order_node(
+    state: imel_state.ImelState, *, tools: imel_tools.ImelTools
+) -> Command[Literal["draft_inquiry_response"]]:
+    """Log an order update request to be handled asynchronously."""
+    # Service-layer tool implementation owns DB transactions/outbox semantics.
+    tools.process_order_update(**_order_update_request(state))
+    return _apply_order_logged(state)
+
+
+async def aprocess_order_node(
+    state: imel_state.ImelState, *, tools: imel_tools.AsyncImelTools
+) -> Command[Literal["draft_inquiry_response"]]:
+    """Async `process_order_node`."""
+    await tools.process_order_update(**_order_update_request(state))
+    return _apply_order_logged(state)
+
+
+def create_ticket_and_handoff_to_kall_node(
+    state: imel_state.ImelState, *, tools: imel_tools.ImelTools
+) -> Command[Literal["__end__"]]:
+    """Create a ticket and route to Kall for follow-up.
+       Creating a ticket and handing off to Kall are atomic when the runtime executes the run inside a
+       unit of work (the `ai-suite` default): both writes share one transaction and commit together.
+       Both are triggered when a cancel order request arrives. Later, we shall create separate functions for:
+       1. Creating ticket (as a graph "node", logically different from the create ticket "tool",
+       2. Handing off (not just to call, but a general function to hand-off to any agent decided by LLM (another LLM node might be needed)
+    """
+    # 1. Persist Ticket (service layer owns DB write semantics).
+    ticket = tools.create_ticket(**_ticket_request(state))
+
+    # 2. Queue Handoff in Intercom Queue (service layer owns DB write semantics).
+    tools.create_agent_handoff(**_kall_handoff_request(state, ticket))
+
+    return _apply_kall_handoff(state, ticket)
+
+
+async def acreate_ticket_and_handoff_to_kall_node(
+    state: imel_state.ImelState, *, tools: imel_tools.AsyncImelTools
+) -> Command[Literal["__end__"]]:
+    """Async `create_ticket_and_handoff_to_kall_node` (same atomicity under the async unit of work)."""
+    ticket = await tools.create_ticket(**_ticket_request(state))
+    await tools.create_agent_handoff(**_kall_handoff_request(state, ticket))
+    return _apply_kall_handoff(state, ticket)
+
+
+def archive_node(state: imel_state.ImelState) -> Command[Literal["__end__"]]:
+    """Mark an email as not requiring a response (e.g. spam)."""
+    state["action"] = "archive"
+    logger.info("Archived email %s (no response needed)", state["email_id"])
+    return Command(
+        update={"action": "archive"},
+        goto="__end__"
+    )
+
+
+def route_by_intent_node(state: imel_state.ImelState, *, llm=None) -> Command[Literal["process_order", "create_ticket_and_handoff_to_kall", "archive", "company_kb_lookup"]]:
+    """Route the email based on classification using LangGraph Command."""
+    classification = state.get("classification")
+    if not classification:
+        raise ValueError("route_by_intent_node called without classification")
+
+    if classification.get("is_human_intervention_required"):
+        return _routed(state, "create_ticket_and_handoff_to_kall")
+
+    intent = classification["intent"]
+
+    if intent in {"order_or_account_details", "update_order"}:
+        return _routed(state, "process_order")
+
+    if intent in {"cancel_order", "complaint"}:
+         return _routed(state, "create_ticket_and_handoff_to_kall")
+
+    if intent == "spam":
+         return _routed(state, "archive")
+
+    # Everything else: use the company knowledge base and respond.
+    return _routed(state, "company_kb_lookup")
+
+
+# --- Shared node steps (used by the sync and async variants) ---
+
+def _classification_prompts(state: imel_state.ImelState) -> tuple[str, str]:
+    system_prompt = imel_policy.build_imel_system_prompt(tenant_profile=state.get("tenant_profile"))
+    email_prompt = imel_prompts.CLASSIFY_EMAIL_PROMPT.format(
+        email_content=state["email_content"],
+        sender_email=state["sender_email"],
+    )
+    return system_prompt, email_prompt
+
+
+def _batch_classification_prompt(
+    emails: typing.Sequence[typing.Mapping[str, str]], *, tenant_profile: imel_state.TenantProfile | None
+) -> str:
+    system_prompt = imel_policy.build_imel_system_prompt(tenant_profile=tenant_profile)
+    items = "\n".join(
+        imel_prompts.CLASSIFY_EMAILS_BATCH_ITEM.format(
+            index=index,
+            sender_email=email["sender_email"],
+            email_content=email["email_content"],
+        )
+        for index, email in enumerate(emails, start=1)
+    )
+    batch_prompt = imel_prompts.CLASSIFY_EMAILS_BATCH_PROMPT.format(count=len(emails), emails=items)
+    return f"{system_prompt}\n\n{batch_prompt}"
+
+
+def _parse_batch_classifications(
+    response: typing.Any, emails: typing.Sequence[typing.Mapping[str, str]]
+) -> list[tuple[imel_state.EmailClassification, bool]]:
+    """Scatter a batched classifier response back to its emails by `index`.
+
+    Items without a usable index are matched by position when the response
+    has exactly one item per email.
+    """
+
+    items = _extract_json_array(_extract_text(response)) or []
+    raw: dict[int, dict[str, typing.Any]] = {}
+    positional = len(items) == len(emails)
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        if isinstance(index, bool) or not isinstance(index, (int, str)) or not str(index).strip().isdigit():
+            index = position + 1 if positional else None
+        if index is not None and 1 <= int(index) <= len(emails):
+            raw.setdefault(int(index) - 1, item)
+
+    results: list[tuple[imel_state.EmailClassification, bool]] = []
+    for position, email in enumerate(emails):
+        item = raw.get(position)
+        if item is None:
+            logger.warning("Batched classification returned nothing usable for %s", email["sender_email"])
+            results.append((_fallback_classification(email_content=email["email_content"]), False))
+        else:
+            results.append((_normalize_classification(item, email_content=email["email_content"]), True))
+    return results
+
+
+def _classification_content_key(state: imel_state.ImelState, *, llm, tools) -> str | None:
+    # Only model results are cached; without a model the fallback classifier is already cheap.
+    if llm is None or tools is None or not state.get("tenant_id"):
+        return None
+    return classification_cache_key(state["email_content"])
+
+
+def _cached_classification(
+    state: imel_state.ImelState, cached: dict[str, typing.Any]
+) -> imel_state.EmailClassification:
+    # Re-normalize: a shared cache row may come from an older schema, and the copy keeps the cached entry untouched.
+    return _normalize_classification(cached, email_content=state["email_content"])
+
+
+def _apply_classification(
+    state: imel_state.ImelState,
+    classification: imel_state.EmailClassification,
+    *,
+    prompt: str | None,
+    source: str | None = None,
+) -> imel_state.ImelState:
+    """Store the classification; `prompt` is None when no model call was made for this run.
+
+    `source` ("cache" or "precomputed") then records where it came from.
+    """
+    state["classification"] = classification
+    if prompt is None:
+        state["run_metadata"] = {**(state.get("run_metadata") or {}), "classification_source": source}
+    else:
+        state["run_metadata"] = _with_prompt_tokens(state, "classify_intent", prompt)
+    logger.info("Classified email %s as: %s", state["email_id"], classification)
+    return state
+
+
+def _routed(state: imel_state.ImelState, goto: str) -> Command:
+    """Route to `goto`, discarding a speculative KB prefetch that path will not use."""
+    if goto == "company_kb_lookup" or state.get("kb_prefetch") is None:
+        return Command(goto=goto)
+    run_metadata = {**(state.get("run_metadata") or {}), "kb_prefetch": "discarded"}
+    return Command(update={"kb_prefetch": None, "run_metadata": run_metadata}, goto=goto)
+
+
+def _kb_query(state: imel_state.ImelState) -> str:
     classification = state.get("classification") or {}
-    query = " ".join(
+    return " ".join(
         [
             str(classification.get("topic", "")),
             str(classification.get("summary", "")),
@@ -90,62 +561,157 @@ def company_kb_lookup_node(
         ]
     ).strip()
 
-    snippets = tools.lookup_company_kb(tenant_id=state.get("tenant_id"), query=query) or []
-    
-    state["kb_snippets"] = snippets
-    logger.info("KB lookup returned %d snippet(s) for email %s", len(snippets), state["email_id"])
-    
-    return Command(
-        update={"kb_snippets": state["kb_snippets"]},
-        goto="draft_inquiry_response"
+
+def _pack_kb_snippets(
+    state: imel_state.ImelState, snippets: list[imel_state.KBChunk]
+) -> tuple[list[imel_state.KBChunk], kb_packing.KBPackingStats]:
+    profile = state.get("tenant_profile") or {}
+    budget = profile.get("kb_token_budget") or kb_packing.DEFAULT_KB_TOKEN_BUDGET
+    return kb_packing.pack_kb_snippets(snippets, token_budget=budget)
+
+
+def _apply_kb_snippets(
+    state: imel_state.ImelState, snippets: list[imel_state.KBChunk], *, prefetched: bool = False
+) -> Command[Literal["draft_inquiry_response"]]:
+    packed, packing = _pack_kb_snippets(state, snippets)
+    state["kb_snippets"] = packed
+    state["run_metadata"] = {**(state.get("run_metadata") or {}), "kb_packing": packing}
+    if prefetched:
+        state["run_metadata"]["kb_prefetch"] = "used"
+    logger.info(
+        "KB lookup returned %d snippet(s) for email %s; packed %d (%d/%d tokens)",
+        len(snippets),
+        state["email_id"],
+        len(packed),
+        packing["tokens"],
+        packing["budget"],
     )
 
+    update: dict[str, typing.Any] = {"kb_snippets": state["kb_snippets"], "run_metadata": state["run_metadata"]}
+    if prefetched:
+        update["kb_prefetch"] = None  # Consumed; the packed copy lives on in `kb_snippets`.
+    return Command(update=update, goto="draft_inquiry_response")
 
-def draft_inquiry_response_node(state: imel_state.ImelState, *, llm=None) -> Command[Literal["__end__"]]:
-    """Draft a response for inquiries/general emails."""
+
+def _draft_prompts(state: imel_state.ImelState) -> tuple[str, str]:
     system_prompt = imel_policy.build_imel_system_prompt(tenant_profile=state.get("tenant_profile"))
-    kb_chunks = state.get("kb_snippets") or []
-    kb_snippets = "\n\n".join([chunk.get("content", "") for chunk in kb_chunks if chunk.get("content")])
     draft_prompt = imel_prompts.INQUIRY_DRAFT_REPLY_PROMPT.format(
         email_content=state["email_content"],
-        kb_snippets=kb_snippets or "(none)",
+        kb_snippets=_kb_context(state.get("kb_snippets") or []),
     )
-    
-    draft = _draft_reply(
-        system_prompt=system_prompt,
-        draft_prompt=draft_prompt,
-        classification=state.get("classification"),
-        llm=llm,
+    return system_prompt, draft_prompt
+
+
+def _kb_context(kb_chunks: list[imel_state.KBChunk]) -> str:
+    kb_snippets = "\n\n".join([chunk.get("content", "") for chunk in kb_chunks if chunk.get("content")])
+    return kb_snippets or "(none)"
+
+
+def _fast_path_prompt(
+    state: imel_state.ImelState, snippets: list[imel_state.KBChunk]
+) -> tuple[str, list[imel_state.KBChunk], kb_packing.KBPackingStats]:
+    packed, packing = _pack_kb_snippets(state, snippets)
+    system_prompt = imel_policy.build_imel_system_prompt(tenant_profile=state.get("tenant_profile"))
+    fused_prompt = imel_prompts.CLASSIFY_AND_DRAFT_PROMPT.format(
+        email_content=state["email_content"],
+        sender_email=state["sender_email"],
+        kb_snippets=_kb_context(packed),
     )
-    
+    return f"{system_prompt}\n\n{fused_prompt}", packed, packing
+
+
+def _fast_path_cached(
+    state: imel_state.ImelState, cached: dict[str, typing.Any]
+) -> Command[Literal["route_by_intent"]]:
+    # A cached classification already saves the classification call; only the draft call remains.
+    _apply_classification(state, _cached_classification(state, cached), prompt=None, source="cache")
+    return Command(
+        update={"classification": state["classification"], "run_metadata": state["run_metadata"]},
+        goto="route_by_intent",
+    )
+
+
+def _apply_fast_path(
+    state: imel_state.ImelState,
+    parsed: dict[str, typing.Any] | None,
+    *,
+    snippets: list[imel_state.KBChunk] | None,
+    packed: list[imel_state.KBChunk],
+    packing: kb_packing.KBPackingStats,
+    prompt: str,
+) -> tuple[Command[Literal["classify_intent", "route_by_intent", "__end__"]], imel_state.EmailClassification | None]:
+    """Turn the fused response into the next step; also returns the model's classification, if any.
+
+    `snippets` is None when the KB lookup failed; `kb_prefetch` is then left
+    unset so `company_kb_lookup` retries it.
+    """
+
+    run_metadata = _with_prompt_tokens(state, "classify_and_draft", prompt)
+    # Reused if routing reaches `company_kb_lookup`.
+    prefetch = {"kb_prefetch": snippets} if snippets is not None else {}
+    if not parsed:
+        run_metadata["fast_path"] = "fallback"
+        return Command(update={**prefetch, "run_metadata": run_metadata}, goto="classify_intent"), None
+
+    classification = _normalize_classification(parsed, email_content=state["email_content"])
+    logger.info("Classified email %s as: %s", state["email_id"], classification)
+    draft = parsed.get("draft")
+    draft = draft.strip() if isinstance(draft, str) else ""
+    if (
+        draft
+        and classification["intent"] in FAST_PATH_INTENTS
+        and not classification["is_human_intervention_required"]
+    ):
+        run_metadata.update(fast_path="drafted", kb_packing=packing)
+        logger.info("Drafted response for email %s in the classification call (len=%d)", state["email_id"], len(draft))
+        update = {
+            "classification": classification,
+            "kb_snippets": packed,
+            "draft_response": draft,
+            "action": "respond",
+            "run_metadata": run_metadata,
+        }
+        return Command(update=update, goto="__end__"), classification
+
+    run_metadata["fast_path"] = "classified"
+    update = {"classification": classification, **prefetch, "run_metadata": run_metadata}
+    return Command(update=update, goto="route_by_intent"), classification
+
+
+def _apply_draft(state: imel_state.ImelState, draft: str, *, prompt: str) -> Command[Literal["__end__"]]:
     state["draft_response"] = draft
     state["action"] = "respond"
+    state["run_metadata"] = _with_prompt_tokens(state, "draft_inquiry_response", prompt)
     logger.info("Drafted response for email %s (len=%d)", state["email_id"], len(draft))
-    
+
     return Command(
-        update={"draft_response": draft, "action": "respond"},
+        update={"draft_response": draft, "action": "respond", "run_metadata": state["run_metadata"]},
         goto="__end__"
     )
 
 
-def process_order_node(
-    state: imel_state.ImelState, *, tools: imel_tools.ImelTools
-) -> Command[Literal["draft_inquiry_response"]]:
-    """Log an order update request to be handled asynchronously."""
+def _with_prompt_tokens(state: imel_state.ImelState, step: str, prompt: str) -> dict[str, typing.Any]:
+    """Run metadata with the estimated token count of `step`'s model prompt added."""
+
+    metadata = dict(state.get("run_metadata") or {})
+    metadata["prompt_tokens"] = {**metadata.get("prompt_tokens", {}), step: kb_packing.estimate_tokens(prompt)}
+    return metadata
+
+
+def _order_update_request(state: imel_state.ImelState) -> dict[str, typing.Any]:
     classification = state["classification"]
     if not classification:
         raise ValueError("process_order_node called without classification")
 
-    summary = str(classification.get("summary") or "")
-    
-    # Service-layer tool implementation owns DB transactions/outbox semantics.
-    tools.process_order_update(
-        tenant_id=state.get("tenant_id", "default"),
-        email_id=state["email_id"],
-        summary=summary,
-        details=classification
-    )
-    
+    return {
+        "tenant_id": state.get("tenant_id", "default"),
+        "email_id": state["email_id"],
+        "summary": str(classification.get("summary") or ""),
+        "details": classification,
+    }
+
+
+def _apply_order_logged(state: imel_state.ImelState) -> Command[Literal["draft_inquiry_response"]]:
     state["action"] = "process_order"
     logger.info("Logged order update event for email %s", state["email_id"])
     
@@ -156,15 +722,7 @@ def process_order_node(
     )
 
 
-def create_ticket_and_handoff_to_kall_node(
-    state: imel_state.ImelState, *, tools: imel_tools.ImelTools
-) -> Command[Literal["__end__"]]:
-    """Create a ticket and route to Kall for follow-up.
-       Creating a ticket and handing off to call happen transactionally (not by design, just by coincidence here),
-       both are triggered when a cancel order request arrives. Later, we shall create separate functions for:
-       1. Creating ticket (as a graph "node", logically different from the create ticket "tool",
-       2. Handing off (not just to call, but a general function to hand-off to any agent decided by LLM (another LLM node might be needed)
-    """
+def _ticket_request(state: imel_state.ImelState) -> dict[str, typing.Any]:
     classification = state["classification"]
     if not classification:
         raise ValueError("create_ticket_and_handoff_to_kall_node called without classification")
@@ -175,31 +733,33 @@ def create_ticket_and_handoff_to_kall_node(
         ticket_type = "complaint"
 
     summary = str(classification.get("summary") or "") or state["email_content"][:200]
-    
-    # 1. Persist Ticket (service layer owns DB write semantics).
-    ticket = tools.create_ticket(
-        ticket_type=ticket_type,
-        email_id=state["email_id"],
-        sender_email=state["sender_email"],
-        summary=summary,
-        raw_email=state["email_content"],
-        tenant_id=state.get("tenant_id", "default")
-    )
+    return {
+        "ticket_type": ticket_type,
+        "email_id": state["email_id"],
+        "sender_email": state["sender_email"],
+        "summary": summary,
+        "raw_email": state["email_content"],
+        "tenant_id": state.get("tenant_id", "default"),
+    }
 
-    # 2. Queue Handoff in Intercom Queue (service layer owns DB write semantics).
-    tools.create_agent_handoff(
-        tenant_id=state.get("tenant_id", "default"),
-        run_id=None, # In real app, pass current run_id
-        from_agent_id="imel",
-        to_agent_id="kall",
-        kind="handoff",
-        message=f"Please handle {ticket_type} ticket {ticket['ticket_id']}",
-        payload={
+
+def _kall_handoff_request(state: imel_state.ImelState, ticket: imel_state.Ticket) -> dict[str, typing.Any]:
+    return {
+        "tenant_id": state.get("tenant_id", "default"),
+        "run_id": None, # In real app, pass current run_id
+        "from_agent_id": "imel",
+        "to_agent_id": "kall",
+        "kind": "handoff",
+        "message": f"Please handle {ticket['ticket_type']} ticket {ticket['ticket_id']}",
+        "payload": {
             "ticket_id": ticket["ticket_id"],
-            "classification": classification
-        }
-    )
+            "sender_email": state["sender_email"],  # Lets Kall notify the customer when it resolves the ticket.
+            "classification": state["classification"]
+        },
+    }
+
 
+def _apply_kall_handoff(state: imel_state.ImelState, ticket: imel_state.Ticket) -> Command[Literal["__end__"]]:
     handoff: imel_state.AgentHandoff = {
         "target_agent": "kall",
         "instructions_prompt": imel_prompts.KALL_HANDOFF_INSTRUCTIONS,
@@ -208,7 +768,7 @@ def create_ticket_and_handoff_to_kall_node(
             "email_id": state["email_id"],
             "sender_email": state["sender_email"],
             "email_content": state["email_content"],
-            "classification": classification,
+            "classification": state["classification"],
             "tenant_id": state.get("tenant_id"),
         },
     }
@@ -224,40 +784,6 @@ def create_ticket_and_handoff_to_kall_node(
     )
 
 
-def archive_node(state: imel_state.ImelState) -> Command[Literal["__end__"]]:
-    """Mark an email as not requiring a response (e.g. spam)."""
-    state["action"] = "archive"
-    logger.info("Archived email %s (no response needed)", state["email_id"])
-    return Command(
-        update={"action": "archive"},
-        goto="__end__"
-    )
-
-
-def route_by_intent_node(state: imel_state.ImelState, *, llm=None) -> Command[Literal["process_order", "create_ticket_and_handoff_to_kall", "archive", "company_kb_lookup"]]:
-    """Route the email based on classification using LangGraph Command."""
-    classification = state.get("classification")
-    if not classification:
-        raise ValueError("route_by_intent_node called without classification")
-
-    if classification.get("is_human_intervention_required"):
-        return Command(goto="create_ticket_and_handoff_to_kall")
-
-    intent = classification["intent"]
-
-    if intent in {"order_or_account_details", "update_order"}:
-        return Command(goto="process_order")
-
-    if intent in {"cancel_order", "complaint"}:
-         return Command(goto="create_ticket_and_handoff_to_kall")
-
-    if intent == "spam":
-         return Command(goto="archive")
-
-    # Everything else: use the company knowledge base and respond.
-    return Command(goto="company_kb_lookup")
-
-
 def _extract_text(value: typing.Any) -> str:
     """Normalize provider responses into plain text."""
 
@@ -295,6 +821,33 @@ def _extract_json_object(text: str) -> dict[str, typing.Any] | None:
     return parsed if isinstance(parsed, dict) else None
 
 
+def _extract_json_array(text: str) -> list[typing.Any] | None:
+    """Extract and parse the first JSON array from free-form model output.
+
+    A top-level object wrapping a single array (`{"emails": [...]}`) is
+    unwrapped, since models often add one.
+    """
+
+    text = text.strip()
+    fenced = re.search(r"```(?:json)?\s*([\[{].*?[\]}])\s*```", text, flags=re.DOTALL | re.IGNORECASE)
+    if fenced:
+        text = fenced.group(1).strip()
+
+    start = min((i for i in (text.find("["), text.find("{")) if i != -1), default=-1)
+    end = max(text.rfind("]"), text.rfind("}"))
+    if start == -1 or end < start:
+        return None
+
+    try:
+        parsed = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return None
+    if isinstance(parsed, dict):
+        arrays = [value for value in parsed.values() if isinstance(value, list)]
+        parsed = arrays[0] if len(arrays) == 1 else None
+    return parsed if isinstance(parsed, list) else None
+
+
 def _fallback_classification(*, email_content: str) -> imel_state.EmailClassification:
     """Deterministic classifier used when no model is available or parsing fails."""
 
@@ -401,21 +954,57 @@ def _classify_email(
     email_content: str,
     sender_email: str,
     llm=None,
-) -> imel_state.EmailClassification:
-    """Return a schema-safe classification, with deterministic fallback."""
+) -> tuple[imel_state.EmailClassification, bool]:
+    """Return a schema-safe classification, with deterministic fallback.
+
+    The flag is True when the classification came from the model (and may be cached).
+    """
 
     if llm is None:
-        return _fallback_classification(email_content=email_content)
+        return _fallback_classification(email_content=email_content), False
 
+    llm = model_routing.task_model(llm, model_routing.TASK_CLASSIFICATION)
     try:
         response = llm.invoke(f"{system_prompt}\n\n{email_prompt}")
-        parsed = _extract_json_object(_extract_text(response))
-        if parsed:
-            return _normalize_classification(parsed, email_content=email_content)
+        return _parse_classification(response, email_content=email_content)
     except Exception as exc:
         logger.warning("LLM classification failed for %s: %s", sender_email, exc)
 
-    return _fallback_classification(email_content=email_content)
+    return _fallback_classification(email_content=email_content), False
+
+
+async def _aclassify_email(
+    *,
+    system_prompt: str,
+    email_prompt: str,
+    email_content: str,
+    sender_email: str,
+    llm=None,
+) -> tuple[imel_state.EmailClassification, bool]:
+    """Async `_classify_email`: the model call is awaited with `ainvoke`."""
+
+    if llm is None:
+        return _fallback_classification(email_content=email_content), False
+
+    llm = model_routing.task_model(llm, model_routing.TASK_CLASSIFICATION)
+    try:
+        response = await llm.ainvoke(f"{system_prompt}\n\n{email_prompt}")
+        return _parse_classification(response, email_content=email_content)
+    except Exception as exc:
+        logger.warning("LLM classification failed for %s: %s", sender_email, exc)
+
+    return _fallback_classification(email_content=email_content), False
+
+
+def _parse_classification(
+    response: typing.Any, *, email_content: str
+) -> tuple[imel_state.EmailClassification, bool]:
+    """Parse a classifier response, falling back when it holds no JSON object."""
+
+    parsed = _extract_json_object(_extract_text(response))
+    if parsed:
+        return _normalize_classification(parsed, email_content=email_content), True
+    return _fallback_classification(email_content=email_content), False
 
 
 def _fallback_draft(*, classification: imel_state.EmailClassification | None) -> str:
@@ -446,18 +1035,72 @@ def _draft_reply(
     draft_prompt: str,
     classification: imel_state.EmailClassification | None,
     llm=None,
+    stream_writer: StreamWriter | None = None,
+) -> str:
+    """Generate a reply draft with LLM when available, fallback otherwise.
+
+    The model is streamed only when `stream_writer` consumes the deltas;
+    otherwise one `invoke` call holds the model (and its limiter slot) no
+    longer than needed. Either way a routed model enforces its route deadline
+    (`model_routing`). Streamed deltas are previews: when the stream fails
+    part-way, the fallback draft in the node's update supersedes them.
+    """
+
+    if llm is None:
+        return _fallback_draft(classification=classification)
+
+    llm = model_routing.task_model(llm, model_routing.TASK_DRAFTING)
+    prompt = f"{system_prompt}\n\n{draft_prompt}"
+    try:
+        if stream_writer is not None:
+            parts: list[str] = []
+            for chunk in llm.stream(prompt):
+                _write_draft_delta(parts, chunk, stream_writer)
+            content = "".join(parts).strip()
+        else:
+            content = _extract_text(llm.invoke(prompt)).strip()
+        if content:
+            return content
+    except Exception as exc:
+        logger.warning("LLM drafting failed: %s", exc)
+
+    return _fallback_draft(classification=classification)
+
+
+async def _adraft_reply(
+    *,
+    system_prompt: str,
+    draft_prompt: str,
+    classification: imel_state.EmailClassification | None,
+    llm=None,
+    stream_writer: StreamWriter | None = None,
 ) -> str:
-    """Generate a reply draft with LLM when available, fallback otherwise."""
+    """Async `_draft_reply`: the model is streamed with `astream` for a `stream_writer`, else awaited with `ainvoke`."""
 
     if llm is None:
         return _fallback_draft(classification=classification)
 
+    llm = model_routing.task_model(llm, model_routing.TASK_DRAFTING)
+    prompt = f"{system_prompt}\n\n{draft_prompt}"
     try:
-        response = llm.invoke(f"{system_prompt}\n\n{draft_prompt}")
-        content = _extract_text(response).strip()
+        if stream_writer is not None:
+            parts: list[str] = []
+            async for chunk in llm.astream(prompt):
+                _write_draft_delta(parts, chunk, stream_writer)
+            content = "".join(parts).strip()
+        else:
+            content = _extract_text(await llm.ainvoke(prompt)).strip()
         if content:
             return content
     except Exception as exc:
         logger.warning("LLM drafting failed: %s", exc)
 
     return _fallback_draft(classification=classification)
+
+
+def _write_draft_delta(parts: list[str], chunk: typing.Any, stream_writer: StreamWriter) -> None:
+    delta = _extract_text(chunk)
+    if not delta:
+        return
+    parts.append(delta)
+    stream_writer({"event": "draft_delta", "delta": delta})
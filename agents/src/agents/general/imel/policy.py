@@ -3,8 +3,15 @@
 This file defines the non-overridable (Layer 0) rules and the default persona
 (Layer 1). Tenant customization is Layer 2 and should be loaded from your DB at
 runtime by the orchestrator.
+
+The rendered prompt is memoized per distinct tenant profile, so the classify and
+draft nodes (and every run for the same tenant) reuse one string instead of
+rebuilding it.
 """
 
+import dataclasses
+import functools
+
 from agents.shared.schemas import TenantProfile as ImelTenantProfile
 
 
@@ -90,6 +97,65 @@ def build_imel_system_prompt(*, tenant_profile: ImelTenantProfile | None = None)
         The full system prompt string, ending with a trailing newline.
     """
 
+    return _render_system_prompt(_profile_key(tenant_profile))
+
+
+@dataclasses.dataclass(frozen=True)
+class PromptCacheStats:
+    """Point-in-time counters of the rendered system prompt memo."""
+
+    hits: int
+    misses: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def system_prompt_cache_info() -> PromptCacheStats:
+    """Hit/miss counters of the rendered system prompt memo."""
+
+    info = _render_system_prompt.cache_info()
+    return PromptCacheStats(hits=info.hits, misses=info.misses, size=info.currsize)
+
+
+def _profile_key(tenant_profile: ImelTenantProfile | None) -> tuple:
+    """Hashable snapshot of the profile fields that shape the prompt.
+
+    Python caches a string's hash on the object, so keying on the (long)
+    brand kit text is cheap when the profile comes from the runtime's cache.
+    """
+
+    if not tenant_profile:
+        return ()
+    return (
+        tenant_profile.get("agent_display_name"),
+        tenant_profile.get("tone"),
+        tuple(tenant_profile.get("keywords") or ()),
+        tenant_profile.get("email_signature"),
+        tuple((tenant_profile.get("brand_kit") or {}).items()),
+        tenant_profile.get("brand_kit_text"),
+        tenant_profile.get("source_uri"),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _render_system_prompt(profile_key: tuple) -> str:
+    tenant_profile: ImelTenantProfile | None = None
+    if profile_key:
+        agent_display_name, tone, keywords, email_signature, brand_kit, brand_kit_text, source_uri = profile_key
+        tenant_profile = {
+            "agent_display_name": agent_display_name,
+            "tone": tone,
+            "keywords": list(keywords),
+            "email_signature": email_signature,
+            "brand_kit": dict(brand_kit),
+            "brand_kit_text": brand_kit_text,
+            "source_uri": source_uri,
+        }
+
     layer2 = _format_layer2_tenant_profile(tenant_profile)
     parts = [IMEL_LAYER0_CORE_POLICY.strip(), IMEL_LAYER1_DEFAULT_PERSONA.strip()]
     if layer2:
@@ -24,6 +24,27 @@ From:
 """
 
 
+# Batched variant: several emails of one tenant classified in one model call, so
+# the system prompt and instructions are paid once per batch instead of per email.
+CLASSIFY_EMAILS_BATCH_PROMPT = """Classify each of the {count} emails below.
+
+Return ONLY a valid JSON array with one object per email, in the same order.
+Each object must have the following keys:
+- index: the email's number as shown in its header
+- intent: one of ["inquiry","complaint","feedback","order_or_account_details","update_order","cancel_order","other","spam"]
+- urgency: one of ["low","medium","human_intervention_required"]
+- topic: short topic string
+- summary: 1-2 sentence summary
+- is_human_intervention_required: boolean
+
+{emails}
+"""
+
+CLASSIFY_EMAILS_BATCH_ITEM = """=== Email {index} (from {sender_email}) ===
+{email_content}
+"""
+
+
 INQUIRY_DRAFT_REPLY_PROMPT = """Draft a reply email.
 
 Constraints:
@@ -39,6 +60,34 @@ Knowledge base snippets (may be empty):
 """
 
 
+# Fast path: classification and, for inquiries/feedback, the reply in one model
+# call, so the system prompt and email are sent once instead of twice.
+CLASSIFY_AND_DRAFT_PROMPT = """Classify the email below and, if it is an inquiry or feedback, draft the reply.
+
+Return ONLY valid JSON with the following keys:
+- intent: one of ["inquiry","complaint","feedback","order_or_account_details","update_order","cancel_order","other","spam"]
+- urgency: one of ["low","medium","human_intervention_required"]
+- topic: short topic string
+- summary: 1-2 sentence summary
+- is_human_intervention_required: boolean
+- draft: the reply email if intent is "inquiry" or "feedback" and no human intervention is required, otherwise null
+
+Reply constraints:
+- Be concise and professional.
+- Do not invent facts; if needed info is missing, ask for it.
+- Use the knowledge base snippets if they are relevant; otherwise ignore them.
+
+Email content:
+{email_content}
+
+From:
+{sender_email}
+
+Knowledge base snippets (may be empty):
+{kb_snippets}
+"""
+
+
 # This is sent to the Order Manager agent (not Imel) so that only that agent is
 # responsible for touching orders/accounts/products data.
 ORDER_MANAGER_HANDOFF_INSTRUCTIONS = """You are the Order Manager agent.
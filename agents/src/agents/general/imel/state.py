@@ -5,8 +5,10 @@ rest of the agent can stay plain Python. The orchestrator owns persistence; the
 agent state is treated as an in-memory, request-scoped data structure.
 """
 
+import dataclasses
 import typing
 
+from agents.general.imel.tools import AsyncImelTools, ImelTools
 from agents.shared.schemas import KBChunk, TenantProfile, Ticket
 
 
@@ -63,6 +65,9 @@ class ImelState(typing.TypedDict):
 
     # Raw search/API results
     kb_snippets: list[KBChunk] | None  # List of KB chunks with provenance
+    # Speculative lookup on the raw email, made in parallel with classification
+    # (speculative graph variant only); consumed or discarded after routing.
+    kb_prefetch: typing.NotRequired[list[KBChunk] | None]
 
     # Tickets / handoffs (used for cancel/complaint + order/account flows)
     ticket: Ticket | None
@@ -72,3 +77,20 @@ class ImelState(typing.TypedDict):
     draft_response: str | None
     action: typing.Literal["respond", "handoff", "archive"] | None
     messages: list[str] | None
+
+    # Run-level observations (prompt token estimates, KB packing stats); the
+    # runtime stores them in `runs.metadata` when the run completes.
+    run_metadata: dict[str, typing.Any] | None
+
+
+@dataclasses.dataclass(frozen=True)
+class ImelContext:
+    """Per-invocation dependencies for the compiled Imel graph.
+
+    Passed as LangGraph runtime context (`graph.invoke(..., context=...)`) so
+    one compiled graph can serve every run; nodes read `runtime.context`.
+    """
+
+    tools: ImelTools | AsyncImelTools
+    llm: typing.Any = None  # A chat model, or a `model_routing.ModelRouter` picking one per task.
+    stream_draft: bool = False  # Set by `stream_imel`/`astream_imel`: draft deltas have a consumer.
@@ -63,3 +63,74 @@ class ImelTools(typing.Protocol):
         details: dict[str, typing.Any],
     ) -> None:
         """Emit an order-update request (typically via a transactional outbox)."""
+
+    def get_cached_classification(
+        self, *, tenant_id: str | None, content_key: str
+    ) -> dict[str, typing.Any] | None:
+        """Return a cached normalized classification for this content, or None."""
+
+    def cache_classification(
+        self, *, tenant_id: str | None, content_key: str, classification: dict[str, typing.Any]
+    ) -> None:
+        """Remember a model-produced classification for repeats of the same content."""
+
+
+class AsyncImelTools(typing.Protocol):
+    """Coroutine twin of `ImelTools` for graphs executed with `ainvoke`.
+
+    Same contract, method for method; implementations run on an async driver so
+    a single process can keep many runs in flight while they wait on I/O.
+    """
+
+    async def load_tenant_profile(self, *, tenant_id: str | None) -> TenantProfile | None:
+        """Load tenant brand/profile details, usually from a KB-backed store."""
+
+    async def lookup_company_kb(
+        self, *, tenant_id: str | None, query: str, top_k: int = 5
+    ) -> list[KBChunk]:
+        """Retrieve relevant tenant knowledge chunks for answering inquiries."""
+
+    async def create_ticket(
+        self,
+        *,
+        ticket_type: TicketType,
+        email_id: str,
+        sender_email: str,
+        summary: str,
+        raw_email: str,
+        tenant_id: str,
+    ) -> Ticket:
+        """Persist a ticket and return the agent-facing ticket shape."""
+
+    async def create_agent_handoff(
+        self,
+        *,
+        tenant_id: str,
+        run_id: str | None,
+        from_agent_id: str,
+        to_agent_id: str,
+        kind: str = "handoff",
+        message: str | None = None,
+        payload: dict[str, typing.Any] | None = None,
+    ) -> None:
+        """Queue an internal handoff/message for another agent."""
+
+    async def process_order_update(
+        self,
+        *,
+        tenant_id: str,
+        email_id: str,
+        summary: str,
+        details: dict[str, typing.Any],
+    ) -> None:
+        """Emit an order-update request (typically via a transactional outbox)."""
+
+    async def get_cached_classification(
+        self, *, tenant_id: str | None, content_key: str
+    ) -> dict[str, typing.Any] | None:
+        """Return a cached normalized classification for this content, or None."""
+
+    async def cache_classification(
+        self, *, tenant_id: str | None, content_key: str, classification: dict[str, typing.Any]
+    ) -> None:
+        """Remember a model-produced classification for repeats of the same content."""
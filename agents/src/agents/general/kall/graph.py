@@ -1,4 +1,10 @@
-"""Orchestration helpers for the Kall agent."""
+"""Orchestration helpers for the Kall agent.
+
+As with Imel, the graph is compiled once per process; `tools` and `llm` are
+passed per invocation as LangGraph runtime context (`KallContext`).
+`arun_kall` / `build_kall_async_langgraph` are the asyncio twins. Checkpointing
+and `resume=True` work as described in the Imel graph module.
+"""
 
 from __future__ import annotations
 
@@ -6,10 +12,12 @@ import functools
 import typing
 
 from langgraph.graph import END, START, StateGraph
+from langgraph.runtime import Runtime
 
 from agents.general.kall import nodes as kall_nodes
 from agents.general.kall import state as kall_state
 from agents.general.kall import tools as kall_tools
+from agents.shared import utils
 
 
 def run_kall(
@@ -20,6 +28,8 @@ def run_kall(
     tools: kall_tools.KallTools,
     run_id: str | None = None,
     llm=None,
+    graph=None,
+    resume: bool = False,
 ):
     """Run Kall by invoking the compiled LangGraph workflow.
 
@@ -30,29 +40,95 @@ def run_kall(
         tools: Runtime-injected Kall capability implementation.
         run_id: Optional runtime run identifier used as LangGraph thread id.
         llm: Reserved for future reasoning/summarization logic nodes.
+        graph: Optional compiled graph cached by the runtime; defaults to one compiled per process.
+        resume: Continue `run_id` from its last checkpoint (the graph must carry a checkpointer).
 
     Returns:
         Final Kall state for the run.
     """
 
-    _ = llm
-    initial_state = kall_nodes.init_kall_state(tenant_id=tenant_id, ticket_id=ticket_id, sender_email=sender_email)
-    graph = build_kall_langgraph(tools=tools)
+    initial_state = None
+    if not resume:
+        initial_state = kall_nodes.init_kall_state(tenant_id=tenant_id, ticket_id=ticket_id, sender_email=sender_email)
+    graph = graph or _default_graph()
+    config = {"configurable": {"thread_id": run_id or ticket_id}}
+    final_state = graph.invoke(
+        initial_state,
+        config=config,
+        context=kall_state.KallContext(tools=tools, llm=llm),
+        durability=utils.checkpoint_durability(graph),
+    )
+    return typing.cast(kall_state.KallState, final_state)
+
+
+async def arun_kall(
+    *,
+    ticket_id: str,
+    tenant_id: str,
+    sender_email: str | None = None,
+    tools: kall_tools.AsyncKallTools,
+    run_id: str | None = None,
+    llm=None,
+    graph=None,
+    resume: bool = False,
+):
+    """Async `run_kall` using `graph.ainvoke` and `AsyncKallTools`."""
+
+    initial_state = None
+    if not resume:
+        initial_state = kall_nodes.init_kall_state(tenant_id=tenant_id, ticket_id=ticket_id, sender_email=sender_email)
+    graph = graph or _default_async_graph()
     config = {"configurable": {"thread_id": run_id or ticket_id}}
-    final_state = graph.invoke(initial_state, config=config)
+    final_state = await graph.ainvoke(
+        initial_state,
+        config=config,
+        context=kall_state.KallContext(tools=tools, llm=llm),
+        durability=utils.checkpoint_durability(graph),
+    )
     return typing.cast(kall_state.KallState, final_state)
 
 
-def build_kall_langgraph(*, tools: kall_tools.KallTools):
+def build_kall_langgraph():
     """Build and compile the Kall LangGraph workflow."""
 
-    graph = StateGraph(kall_state.KallState)
+    return _compile(load_ticket=_load_ticket, resolve_ticket=_resolve_ticket)
+
+
+def build_kall_async_langgraph():
+    """Build and compile the Kall workflow with coroutine nodes (for `ainvoke`)."""
+
+    return _compile(load_ticket=_aload_ticket, resolve_ticket=_aresolve_ticket)
+
+
+def _compile(*, load_ticket: typing.Any, resolve_ticket: typing.Any):
+    graph = StateGraph(kall_state.KallState, context_schema=kall_state.KallContext)
 
     # Kall nodes are simple state transforms in the current version.
-    graph.add_node("load_ticket", functools.partial(kall_nodes.load_ticket_node, tools=tools))
-    graph.add_node("resolve_ticket", functools.partial(kall_nodes.resolve_ticket_node, tools=tools))
+    graph.add_node("load_ticket", load_ticket)
+    graph.add_node("resolve_ticket", resolve_ticket)
 
     graph.add_edge(START, "load_ticket")
     graph.add_edge("load_ticket", "resolve_ticket")
     graph.add_edge("resolve_ticket", END)
     return graph.compile()
+
+
+# Compiled once per process for direct callers; the runtime passes its own registry-cached graph.
+_default_graph = functools.cache(build_kall_langgraph)
+_default_async_graph = functools.cache(build_kall_async_langgraph)
+
+
+def _load_ticket(state: kall_state.KallState, runtime: Runtime[kall_state.KallContext]) -> kall_state.KallState:
+    return kall_nodes.load_ticket_node(state, tools=runtime.context.tools)
+
+
+def _resolve_ticket(state: kall_state.KallState, runtime: Runtime[kall_state.KallContext]) -> kall_state.KallState:
+    return kall_nodes.resolve_ticket_node(state, tools=runtime.context.tools)
+
+
+async def _aload_ticket(state: kall_state.KallState, runtime: Runtime[kall_state.KallContext]) -> kall_state.KallState:
+    return await kall_nodes.aload_ticket_node(state, tools=runtime.context.tools)
+
+
+async def _aresolve_ticket(state: kall_state.KallState, runtime: Runtime[kall_state.KallContext]) -> kall_state.KallState:
+    return await kall_nodes.aresolve_ticket_node(state, tools=runtime.context.tools)
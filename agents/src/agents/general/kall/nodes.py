@@ -7,9 +7,11 @@ minimal and deterministic so runtime wiring stays easy to verify.
 from __future__ import annotations
 
 import logging
+import typing
 
 from agents.general.kall import state as kall_state
 from agents.general.kall import tools as kall_tools
+from agents.shared.schemas import Ticket
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,52 @@ def load_ticket_node(state: kall_state.KallState, *, tools: kall_tools.KallTools
     """Load the target ticket from storage."""
 
     ticket = tools.get_ticket(ticket_id=state["ticket_id"], tenant_id=state["tenant_id"])
+    return _apply_loaded_ticket(state, ticket)
+
+
+async def aload_ticket_node(state: kall_state.KallState, *, tools: kall_tools.AsyncKallTools) -> kall_state.KallState:
+    """Async `load_ticket_node`."""
+
+    ticket = await tools.get_ticket(ticket_id=state["ticket_id"], tenant_id=state["tenant_id"])
+    return _apply_loaded_ticket(state, ticket)
+
+
+def resolve_ticket_node(state: kall_state.KallState, *, tools: kall_tools.KallTools) -> kall_state.KallState:
+    """Resolve the ticket and optionally prepare a customer-facing response."""
+
+    ticket = state.get("ticket")
+    if ticket is None:
+        return _apply_missing_ticket(state)
+
+    # Kall closes the ticket after resolution in this MVP flow.
+    tools.update_ticket_status(ticket_id=ticket["ticket_id"], tenant_id=state["tenant_id"], status="closed")
+    _apply_resolution(state, ticket)
+
+    # Keep inter-agent observability: notify Imel that Kall completed resolution.
+    tools.create_agent_handoff(**_resolved_notice(state, ticket))
+
+    logger.info("Kall resolved ticket=%s action=%s", ticket["ticket_id"], state["action"])
+    return state
+
+
+async def aresolve_ticket_node(state: kall_state.KallState, *, tools: kall_tools.AsyncKallTools) -> kall_state.KallState:
+    """Async `resolve_ticket_node`."""
+
+    ticket = state.get("ticket")
+    if ticket is None:
+        return _apply_missing_ticket(state)
+
+    await tools.update_ticket_status(ticket_id=ticket["ticket_id"], tenant_id=state["tenant_id"], status="closed")
+    _apply_resolution(state, ticket)
+    await tools.create_agent_handoff(**_resolved_notice(state, ticket))
+
+    logger.info("Kall resolved ticket=%s action=%s", ticket["ticket_id"], state["action"])
+    return state
+
+
+# --- Shared node steps (used by the sync and async variants) ---
+
+def _apply_loaded_ticket(state: kall_state.KallState, ticket: Ticket | None) -> kall_state.KallState:
     state["ticket"] = ticket
     if ticket is None:
         state["action"] = "no_ticket"
@@ -42,23 +90,18 @@ def load_ticket_node(state: kall_state.KallState, *, tools: kall_tools.KallTools
     return state
 
 
-def resolve_ticket_node(state: kall_state.KallState, *, tools: kall_tools.KallTools) -> kall_state.KallState:
-    """Resolve the ticket and optionally prepare a customer-facing response."""
-
-    ticket = state.get("ticket")
-    if ticket is None:
-        state["outbound_message"] = (
-            "We could not locate your support ticket yet. "
-            "Please reply with your original request details so we can help quickly."
-        )
-        # If sender exists we can still notify; otherwise leave as no_ticket.
-        if state.get("sender_email"):
-            state["action"] = "respond"
-        return state
+def _apply_missing_ticket(state: kall_state.KallState) -> kall_state.KallState:
+    state["outbound_message"] = (
+        "We could not locate your support ticket yet. "
+        "Please reply with your original request details so we can help quickly."
+    )
+    # If sender exists we can still notify; otherwise leave as no_ticket.
+    if state.get("sender_email"):
+        state["action"] = "respond"
+    return state
 
-    # Kall closes the ticket after resolution in this MVP flow.
-    tools.update_ticket_status(ticket_id=ticket["ticket_id"], tenant_id=state["tenant_id"], status="closed")
 
+def _apply_resolution(state: kall_state.KallState, ticket: Ticket) -> None:
     if ticket["ticket_type"] == "cancel_order":
         resolution_message = (
             "Your cancellation request has been processed and marked complete. "
@@ -74,16 +117,14 @@ def resolve_ticket_node(state: kall_state.KallState, *, tools: kall_tools.KallTo
     state["outbound_message"] = resolution_message
     state["action"] = "respond" if state.get("sender_email") else "resolved"
 
-    # Keep inter-agent observability: notify Imel that Kall completed resolution.
-    tools.create_agent_handoff(
-        tenant_id=state["tenant_id"],
-        run_id=None,
-        from_agent_id="kall",
-        to_agent_id="imel",
-        kind="message",
-        message=f"Resolved ticket {ticket['ticket_id']}",
-        payload={"ticket_id": ticket["ticket_id"], "status": "closed"},
-    )
 
-    logger.info("Kall resolved ticket=%s action=%s", ticket["ticket_id"], state["action"])
-    return state
+def _resolved_notice(state: kall_state.KallState, ticket: Ticket) -> dict[str, typing.Any]:
+    return {
+        "tenant_id": state["tenant_id"],
+        "run_id": None,
+        "from_agent_id": "kall",
+        "to_agent_id": "imel",
+        "kind": "message",
+        "message": f"Resolved ticket {ticket['ticket_id']}",
+        "payload": {"ticket_id": ticket["ticket_id"], "status": "closed"},
+    }
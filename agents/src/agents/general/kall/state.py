@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import dataclasses
 import typing
 
+from agents.general.kall.tools import AsyncKallTools, KallTools
 from agents.shared.schemas import Ticket
 
 
@@ -17,3 +19,11 @@ class KallState(typing.TypedDict):
     resolution_notes: str | None
     outbound_message: str | None
     action: typing.Literal["resolved", "respond", "no_ticket"] | None
+
+
+@dataclasses.dataclass(frozen=True)
+class KallContext:
+    """Per-invocation dependencies for the compiled Kall graph (LangGraph runtime context)."""
+
+    tools: KallTools | AsyncKallTools
+    llm: typing.Any = None
@@ -32,3 +32,26 @@ class KallTools(typing.Protocol):
         payload: dict[str, typing.Any] | None = None,
     ) -> None:
         """Send a cross-agent message via the intercom queue."""
+
+
+class AsyncKallTools(typing.Protocol):
+    """Coroutine twin of `KallTools` for graphs executed with `ainvoke`."""
+
+    async def get_ticket(self, *, ticket_id: str, tenant_id: str) -> Ticket | None:
+        """Load a ticket from storage in the agent-facing shape."""
+
+    async def update_ticket_status(self, *, ticket_id: str, tenant_id: str, status: TicketStatus) -> None:
+        """Persist a status transition for a ticket."""
+
+    async def create_agent_handoff(
+        self,
+        *,
+        tenant_id: str,
+        run_id: str | None,
+        from_agent_id: str,
+        to_agent_id: str,
+        kind: str = "message",
+        message: str | None = None,
+        payload: dict[str, typing.Any] | None = None,
+    ) -> None:
+        """Send a cross-agent message via the intercom queue."""
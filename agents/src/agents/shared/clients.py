@@ -1,18 +1,184 @@
 """
 This modules contains wrappers for external clients used by the agents, for example Shopify, Stripe, Notion, etc.
+
+Chat models are process-scoped: `get_chat_model(...)` returns the same client
+for the same (provider, model, temperature, timeout), so every run in a worker shares one
+pooled HTTP connection set instead of opening a fresh session per run. LangChain
+chat models are stateless between calls and their HTTP clients are thread-safe,
+so sharing them across worker threads is fine.
+
+Environment variables (read when a client is first built):
+- `OLLAMA_KEEP_ALIVE`: how long Ollama keeps the model loaded after a request
+  (default: "30m"; "-1" keeps it resident).
+- `OLLAMA_MAX_CONNECTIONS`: pooled HTTP connections per client (default: 16).
+
+Embeddings models (`get_embeddings_model(...)`) are cached the same way, per
+(provider, model).
+
+Which model a task uses is decided by `agents.shared.model_routing`; this
+module only builds and caches the clients. Each cached chat model is wrapped
+in `llm_limits.LimitedChatModel`, so every call is admitted by the provider's
+rate and concurrency limiter once one is configured (`llm_limits.configure`).
 """
 
-def get_chat_model(*, model: str = "gemma3:4b", temperature: float = 0.3):
-    """Create a chat model instance.
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import typing
+
+from agents.shared import llm_limits
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDER = "ollama"
+DEFAULT_MODEL = "gemma3:4b"
+DEFAULT_TEMPERATURE = 0.3
+
+_KEEPALIVE_EXPIRY_SECONDS = 300.0  # Idle pooled HTTP connections are closed after this long.
+
+_models: dict[tuple[str, str, float, float | None], typing.Any] = {}
+_embeddings: dict[tuple[str, str], typing.Any] = {}
+_models_lock = threading.Lock()
+
+
+def get_chat_model(
+    *,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    provider: str = DEFAULT_PROVIDER,
+    timeout: float | None = None,
+):
+    """Return the process-wide chat model for (provider, model, temperature, timeout).
+
+    The first call builds the client; later calls (from any thread) return the
+    same instance.
 
     Args:
         model: Model identifier to pass through to the provider client.
         temperature: Sampling temperature.
+        provider: Provider name; only "ollama" is wired today.
+        timeout: HTTP timeout in seconds for each request (None keeps the
+            client default).
+
+    Returns:
+        A LangChain chat model instance, behind the provider's call limiter.
+    """
+
+    key = (provider, model, float(temperature), float(timeout) if timeout is not None else None)
+    cached = _models.get(key)
+    if cached is not None:
+        return cached
+    with _models_lock:
+        cached = _models.get(key)
+        if cached is None:
+            cached = _models[key] = llm_limits.LimitedChatModel(
+                _build_chat_model(provider=provider, model=model, temperature=temperature, timeout=timeout),
+                provider=provider,
+                model=model,
+            )
+        return cached
+
+
+def get_embeddings_model(*, provider: str, model: str):
+    """Return the process-wide LangChain embeddings model for (provider, model).
+
+    Args:
+        provider: "openai" or "ollama".
+        model: Embeddings model identifier. Its output dimension must match the
+            `tenant_kb_chunks.embedding` column (1536).
 
     Returns:
-        A LangChain chat model instance.
+        A LangChain `Embeddings` instance.
+    """
+
+    key = (provider, model)
+    cached = _embeddings.get(key)
+    if cached is not None:
+        return cached
+    with _models_lock:
+        cached = _embeddings.get(key)
+        if cached is None:
+            cached = _embeddings[key] = _build_embeddings_model(provider=provider, model=model)
+        return cached
+
+
+def warm_up_chat_model(
+    *,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    provider: str = DEFAULT_PROVIDER,
+    timeout: float | None = None,
+) -> bool:
+    """Load the model on the provider side and open a pooled connection before real work arrives.
+
+    Sends a one-token request through the cached client. Returns False (and
+    logs) instead of raising, so a worker can still start while the provider is
+    briefly unavailable.
     """
 
+    llm = get_chat_model(model=model, temperature=temperature, provider=provider, timeout=timeout)
+    try:
+        llm.invoke("ping", options={"num_predict": 1})
+    except Exception:
+        logger.warning("Warm-up of %s model %s failed", provider, model, exc_info=True)
+        return False
+    logger.info("Warmed up %s model %s", provider, model)
+    return True
+
+
+def clear_chat_model_cache() -> None:
+    """Drop every cached client (tests, or after changing provider settings)."""
+
+    with _models_lock:
+        _models.clear()
+        _embeddings.clear()
+
+
+def _build_chat_model(*, provider: str, model: str, temperature: float, timeout: float | None = None):
+    if provider != "ollama":
+        raise ValueError(f"Unsupported chat model provider: {provider!r}")
+
+    import httpx
     import langchain_ollama
 
-    return langchain_ollama.ChatOllama(model=model, temperature=temperature)
\ No newline at end of file
+    max_connections = int(os.getenv("OLLAMA_MAX_CONNECTIONS") or 16)
+    # The sync and async clients each get their own pool; httpx reuses connections within it.
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    client_kwargs: dict[str, typing.Any] = {"limits": limits}
+    if timeout is not None:
+        client_kwargs["timeout"] = timeout
+    return langchain_ollama.ChatOllama(
+        model=model,
+        temperature=temperature,
+        keep_alive=_ollama_keep_alive(),
+        client_kwargs=client_kwargs,
+    )
+
+
+def _build_embeddings_model(*, provider: str, model: str):
+    if provider == "openai":
+        import langchain_openai
+
+        return langchain_openai.OpenAIEmbeddings(model=model)
+    if provider == "ollama":
+        import langchain_ollama
+
+        keep_alive = _ollama_keep_alive()
+        # OllamaEmbeddings only accepts seconds; durations like "30m" leave the server default.
+        return langchain_ollama.OllamaEmbeddings(
+            model=model, keep_alive=keep_alive if isinstance(keep_alive, int) else None
+        )
+    raise ValueError(f"Unsupported embeddings provider: {provider!r}")
+
+
+def _ollama_keep_alive() -> str | int:
+    keep_alive = os.getenv("OLLAMA_KEEP_ALIVE") or "30m"
+    if keep_alive.lstrip("-").isdigit():
+        return int(keep_alive)  # Ollama reads bare numbers as seconds (-1 = forever).
+    return keep_alive
@@ -0,0 +1,143 @@
+"""Token-budgeted packing of retrieved KB chunks into prompt context.
+
+Retrieval returns whole chunks, and a seeded brand kit chunk can be an entire
+markdown file, so joining every snippet into the drafting prompt makes prompt
+length (which dominates local-model latency) depend on whatever the KB holds.
+`pack_kb_snippets(...)` bounds it:
+
+- chunks are taken best score first (retrieval order when unscored),
+- near-duplicates are dropped: identical text after whitespace/case
+  normalization, text contained in an already packed chunk (or containing
+  it), or word-shingle overlap above `DUPLICATE_OVERLAP`,
+- chunks are added while they fit the token budget; one that does not fit is
+  skipped in favour of smaller, lower-ranked ones, and the best chunk is
+  truncated rather than dropped when it alone exceeds the budget.
+
+Token counts are estimates (`estimate_tokens`), not a model tokenizer: the
+agents package stays dependency-free, and the budget only needs to bound
+prompt size, not hit it exactly.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import typing
+
+from .schemas import KBChunk
+
+DEFAULT_KB_TOKEN_BUDGET = 1200
+DUPLICATE_OVERLAP = 0.8  # Jaccard similarity of word 3-shingles above which a chunk is a duplicate.
+
+_WORD_RE = re.compile(r"\w+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class KBPackingStats(typing.TypedDict):
+    """What `pack_kb_snippets` did; recorded in run metadata."""
+
+    candidates: int
+    packed: int
+    duplicates: int
+    over_budget: int
+    truncated: bool
+    tokens: int
+    budget: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of `text` for BPE-style tokenizers.
+
+    About four characters per token for English prose; text dense in short
+    words, numbers or punctuation is bounded below by its word count.
+    """
+
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / 4), len(_WORD_RE.findall(text)))
+
+
+def pack_kb_snippets(
+    chunks: typing.Sequence[KBChunk], *, token_budget: int = DEFAULT_KB_TOKEN_BUDGET
+) -> tuple[list[KBChunk], KBPackingStats]:
+    """Deduplicate `chunks` and keep the best ones that fit `token_budget`.
+
+    Returns the packed chunks (best first) and packing statistics.
+    """
+
+    ranked = sorted(
+        (chunk for chunk in chunks if (chunk.get("content") or "").strip()),
+        key=lambda chunk: -chunk["score"] if chunk.get("score") is not None else math.inf,
+    )
+    stats: KBPackingStats = {
+        "candidates": len(chunks),
+        "packed": 0,
+        "duplicates": 0,
+        "over_budget": 0,
+        "truncated": False,
+        "tokens": 0,
+        "budget": token_budget,
+    }
+
+    packed: list[KBChunk] = []
+    seen: list[tuple[str, frozenset[tuple[str, ...]]]] = []
+    for chunk in ranked:
+        normalized = _WHITESPACE_RE.sub(" ", chunk["content"]).strip().lower()
+        shingles = _shingles(normalized)
+        if any(_is_duplicate(normalized, shingles, other, other_shingles) for other, other_shingles in seen):
+            stats["duplicates"] += 1
+            continue
+        tokens = estimate_tokens(chunk["content"])
+        remaining = token_budget - stats["tokens"]
+        if tokens > remaining:
+            if packed or remaining <= 0:
+                stats["over_budget"] += 1
+                continue
+            chunk = {**chunk, "content": _truncate(chunk["content"], remaining)}
+            tokens = estimate_tokens(chunk["content"])
+            stats["truncated"] = True
+        packed.append(chunk)
+        seen.append((normalized, shingles))
+        stats["tokens"] += tokens
+
+    stats["packed"] = len(packed)
+    return packed, stats
+
+
+def _shingles(normalized: str) -> frozenset[tuple[str, ...]]:
+    words = _WORD_RE.findall(normalized)
+    if len(words) < 3:
+        return frozenset([tuple(words)]) if words else frozenset()
+    return frozenset(zip(words, words[1:], words[2:], strict=False))
+
+
+def _is_duplicate(
+    normalized: str,
+    shingles: frozenset[tuple[str, ...]],
+    other: str,
+    other_shingles: frozenset[tuple[str, ...]],
+) -> bool:
+    if normalized in other or other in normalized:
+        return True
+    if not shingles or not other_shingles:
+        return False
+    overlap = len(shingles & other_shingles) / len(shingles | other_shingles)
+    return overlap >= DUPLICATE_OVERLAP
+
+
+def _truncate(text: str, token_budget: int) -> str:
+    """Cut `text` to roughly `token_budget` tokens at a paragraph, line or word boundary."""
+
+    limit = token_budget * 4
+    while limit > 0:
+        cut = text[:limit]
+        for boundary in ("\n\n", "\n", " "):
+            position = cut.rfind(boundary)
+            if position > limit // 2:
+                cut = cut[:position]
+                break
+        cut = cut.rstrip()
+        if estimate_tokens(cut) <= token_budget:
+            return cut
+        limit = int(limit * 0.9)
+    return ""
@@ -0,0 +1,599 @@
+"""
+Admission control for chat model calls.
+
+Without it, a fleet of workers stampedes the model server: every run calls
+the model as soon as it is scheduled, latency climbs for everyone, calls hit
+their timeout, and Imel quietly drops to its keyword classification. An
+`LLMLimiter` sits in front of every call made through a client from
+`clients.get_chat_model` (`invoke`, `ainvoke`, `stream`, `astream`) and admits
+it in two steps:
+
+1. Rate: per-provider token buckets for requests per minute and tokens per
+   minute. A call reserves one request and its estimated tokens (prompt
+   characters / 4 + `expected_output_tokens`), waits until the buckets cover
+   the reservation, and is reconciled with the provider's reported usage when
+   it finishes.
+2. Concurrency: an AIMD limit on in-flight calls per (provider, model).
+   Completed calls feed back their latency per token. When the latency stays
+   within `latency_tolerance` times the best recent value, the limit grows by
+   about one call per window of completions. When the latency exceeds it, or
+   the call times out or is rejected with 429/503, the limit shrinks by
+   `backoff`, at most once per window. Throughput then plateaus near the
+   server's capacity instead of collapsing into timeouts.
+
+Waiting callers queue in FIFO order; sync callers block their thread and
+async callers await without blocking the event loop, and both share one
+limit. A call that cannot be admitted within `max_queue_seconds` raises
+`LLMQueueTimeoutError` (a `TimeoutError`, so routed models fall back) instead
+of queueing behind an overloaded server indefinitely. `metrics()` reports how
+long calls queued (rate and concurrency waits together), how many gave up, the
+current limits and how often the server pushed back.
+
+Limits are per process. For a quota shared by several worker processes,
+divide it between them; the adaptive limit needs no coordination, since every
+process observes the same server latency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import logging
+import math
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+_CHARS_PER_TOKEN = 4  # Rough estimate for reservations; reconciled with reported usage.
+_BASELINE_DRIFT = 0.01  # Share of a slower, uncontended sample the latency baseline moves up by.
+_RECENT_WAITS = 1024  # Queue times kept for percentiles.
+_OVERLOAD_STATUS_CODES = frozenset({429, 503})
+
+
+@dataclasses.dataclass(frozen=True)
+class LLMLimitConfig:
+    """Rate and concurrency limits for one provider.
+
+    - `requests_per_minute` / `tokens_per_minute`: token bucket rates (None: unlimited).
+    - `burst_seconds`: bucket capacity, in seconds of rate; a burst larger than
+      this is spread out instead of hitting the server at once.
+    - `max_concurrency` / `min_concurrency`: bounds of the in-flight limit per model.
+    - `initial_concurrency`: starting limit (default: `max_concurrency` // 2).
+    - `adaptive`: False pins the limit at `max_concurrency`.
+    - `latency_tolerance`: latency per token, as a multiple of the baseline,
+      above which the server counts as overloaded.
+    - `backoff`: multiplicative decrease applied on overload.
+    - `expected_output_tokens`: output tokens reserved per call before usage is known.
+    - `max_queue_seconds`: longest a call waits for admission (None: no bound).
+    """
+
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+    burst_seconds: float = 10.0
+    max_concurrency: int = 16
+    min_concurrency: int = 1
+    initial_concurrency: int | None = None
+    adaptive: bool = True
+    latency_tolerance: float = 2.0
+    backoff: float = 0.75
+    expected_output_tokens: int = 256
+    max_queue_seconds: float | None = 60.0
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.min_concurrency <= self.max_concurrency:
+            raise ValueError("LLM concurrency bounds must satisfy 1 <= min_concurrency <= max_concurrency")
+        if not 0 < self.backoff < 1:
+            raise ValueError("LLM concurrency backoff must be between 0 and 1")
+        if self.latency_tolerance <= 1:
+            raise ValueError("LLM latency_tolerance must be greater than 1")
+        if self.max_queue_seconds is not None and self.max_queue_seconds <= 0:
+            raise ValueError("LLM max_queue_seconds must be positive (or None for no bound)")
+
+
+class LLMQueueTimeoutError(TimeoutError):
+    """A call waited `max_queue_seconds` without being admitted; it never reached the model."""
+
+
+@dataclasses.dataclass(frozen=True)
+class LimiterMetrics:
+    """Point-in-time snapshot of one provider's limiter (counters cumulative since configuration)."""
+
+    calls: int
+    in_flight: int
+    waiting: int
+    queue_time_total: float
+    queue_time_max: float
+    queue_time_p50: float  # Over the most recent calls.
+    queue_time_p95: float
+    rate_wait_total: float  # Part of the queue time spent waiting for the token buckets.
+    queue_timeouts: int  # Calls that gave up after `max_queue_seconds` (not counted in `calls`).
+    overloads: int  # Calls that timed out, were rejected, or ran slower than the tolerance.
+    decreases: int  # Times an adaptive limit was cut.
+    concurrency_limits: dict[str, int]  # Current limit per model.
+
+    @property
+    def queue_time_avg(self) -> float:
+        return self.queue_time_total / self.calls if self.calls else 0.0
+
+    def format(self) -> str:
+        limits = " ".join(f"{model}={limit}" for model, limit in sorted(self.concurrency_limits.items()))
+        return (
+            f"calls={self.calls} in_flight={self.in_flight} waiting={self.waiting} "
+            f"queue_avg={self.queue_time_avg * 1000:.0f}ms p50={self.queue_time_p50 * 1000:.0f}ms "
+            f"p95={self.queue_time_p95 * 1000:.0f}ms max={self.queue_time_max * 1000:.0f}ms "
+            f"rate_wait={self.rate_wait_total:.1f}s queue_timeouts={self.queue_timeouts} "
+            f"overloads={self.overloads} decreases={self.decreases} "
+            f"limits[{limits}]"
+        )
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations instead of rejecting.
+
+    `reserve(amount)` always succeeds and returns how long the caller must
+    wait before using it; the balance may go negative, which makes later
+    reservations wait longer. That keeps callers in arrival order without a
+    queue of their own.
+    """
+
+    def __init__(
+        self,
+        *,
+        per_minute: float,
+        burst_seconds: float = 10.0,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        if per_minute <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self._rate = per_minute / 60.0
+        self._capacity = max(1.0, self._rate * burst_seconds)
+        self._clock = clock
+        self._tokens = self._capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens and return the seconds to wait until they are covered."""
+
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self._rate)
+
+    def adjust(self, amount: float) -> None:
+        """Return (positive) or take (negative) tokens after the fact, e.g. to reconcile an estimate."""
+
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._capacity, self._tokens + amount)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class _Waiter:
+    """A queued acquirer: a thread (`event`) or a coroutine (`future` on `loop`)."""
+
+    __slots__ = ("event", "loop", "future")
+
+    def __init__(
+        self,
+        *,
+        event: threading.Event | None = None,
+        loop: asyncio.AbstractEventLoop | None = None,
+        future: asyncio.Future[None] | None = None,
+    ):
+        self.event = event
+        self.loop = loop
+        self.future = future
+
+
+class AdaptiveConcurrencyLimit:
+    """FIFO limit on in-flight calls, adjusted by additive increase / multiplicative decrease."""
+
+    def __init__(
+        self,
+        config: LLMLimitConfig,
+        *,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self._config = config
+        self._clock = clock
+        initial = config.initial_concurrency or max(config.min_concurrency, config.max_concurrency // 2)
+        self._limit = float(config.max_concurrency if not config.adaptive else initial)
+        self._in_flight = 0
+        self._waiters: collections.deque[_Waiter] = collections.deque()
+        self._baseline: float | None = None  # Best recent latency per token.
+        self._last_decrease = -math.inf
+        self._lock = threading.Lock()
+        self.overloads = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Block the calling thread until a slot is free; False if `timeout` seconds passed first."""
+
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        if waiter.event.wait(timeout):
+            return True
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return False
+        return True  # Granted just as the wait timed out.
+
+    async def aacquire(self, timeout: float | None = None) -> bool:
+        """Wait for a free slot without blocking the event loop; False if `timeout` seconds passed first."""
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(timeout):
+                await self._granted(waiter)
+        except TimeoutError:
+            return False  # `_granted` already dequeued the waiter or gave its slot back.
+        return True
+
+    async def _granted(self, waiter: _Waiter) -> None:
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release_slot()  # Granted just before the cancellation landed.
+            raise
+
+    def release(
+        self, *, started_at: float, concurrent: int, latency: float, tokens: int, overloaded: bool
+    ) -> None:
+        """Free the caller's slot and feed its outcome (`concurrent`: calls in flight when it started) into the limit."""
+
+        with self._lock:
+            if self._config.adaptive:
+                self._observe(
+                    started_at=started_at, concurrent=concurrent, latency=latency, tokens=tokens, overloaded=overloaded
+                )
+            self._in_flight -= 1
+            self._grant()
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._grant()
+
+    def _observe(self, *, started_at: float, concurrent: int, latency: float, tokens: int, overloaded: bool) -> None:
+        config = self._config
+        sample = latency / max(tokens, 1)
+        if not overloaded:
+            if self._baseline is None or sample <= self._baseline:
+                self._baseline = sample
+            else:
+                overloaded = sample > config.latency_tolerance * self._baseline
+                if concurrent <= max(config.min_concurrency, self.limit // 2):
+                    # Drift up slowly, from lightly loaded calls only, so a lasting change (longer
+                    # prompts, slower hardware) becomes the new normal but sustained load does not.
+                    self._baseline += (sample - self._baseline) * _BASELINE_DRIFT
+        if overloaded:
+            self.overloads += 1
+            # One decrease per window: calls started before the last cut already saw the old limit.
+            if started_at >= self._last_decrease:
+                self._limit = max(float(config.min_concurrency), self._limit * config.backoff)
+                self._last_decrease = self._clock()
+                self.decreases += 1
+                logger.info("LLM concurrency limit lowered to %d (latency %.2fs)", self.limit, latency)
+        elif self._in_flight + len(self._waiters) >= self.limit:
+            # Grow only while the limit is what holds calls back.
+            self._limit = min(float(config.max_concurrency), self._limit + 1 / self._limit)
+
+    def _grant(self) -> None:
+        # Called with the lock held, after a release or a limit change.
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            self._in_flight += 1
+            if waiter.event is not None:
+                waiter.event.set()
+                continue
+            try:
+                waiter.loop.call_soon_threadsafe(self._resolve, waiter.future)
+            except RuntimeError:  # The waiter's event loop is closed; nobody will use the slot.
+                self._in_flight -= 1
+
+    def _resolve(self, future: asyncio.Future[None]) -> None:
+        # Runs on the waiter's event loop.
+        if future.cancelled():
+            self._release_slot()
+        else:
+            future.set_result(None)
+
+
+class LLMLimiter:
+    """One provider's token buckets and per-model concurrency limits."""
+
+    def __init__(self, config: LLMLimitConfig, *, clock: typing.Callable[[], float] = time.monotonic):
+        self.config = config
+        self._clock = clock
+        self._requests = (
+            TokenBucket(per_minute=config.requests_per_minute, burst_seconds=config.burst_seconds, clock=clock)
+            if config.requests_per_minute
+            else None
+        )
+        self._tokens = (
+            TokenBucket(per_minute=config.tokens_per_minute, burst_seconds=config.burst_seconds, clock=clock)
+            if config.tokens_per_minute
+            else None
+        )
+        self._limits: dict[str, AdaptiveConcurrencyLimit] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+        self._rate_wait_total = 0.0
+        self._queue_timeouts = 0
+        self._recent_waits: collections.deque[float] = collections.deque(maxlen=_RECENT_WAITS)
+
+    def concurrency(self, model: str) -> AdaptiveConcurrencyLimit:
+        with self._lock:
+            limit = self._limits.get(model)
+            if limit is None:
+                limit = self._limits[model] = AdaptiveConcurrencyLimit(self.config, clock=self._clock)
+            return limit
+
+    @contextlib.contextmanager
+    def call(self, *, model: str, input: typing.Any) -> typing.Iterator[_Call]:
+        """Admit one sync call: wait for the buckets, then for a slot of `model`."""
+
+        queued_at = self._clock()
+        estimate = self._estimate_tokens(input)
+        rate_wait = self._admit_rate(model, estimate)
+        if rate_wait > 0:
+            time.sleep(rate_wait)
+        limit = self.concurrency(model)
+        if not limit.acquire(self._slot_timeout(rate_wait)):
+            raise self._queue_timeout(model)
+        with self._run(limit, queued_at=queued_at, rate_wait=rate_wait, estimate=estimate) as call:
+            yield call
+
+    @contextlib.asynccontextmanager
+    async def acall(self, *, model: str, input: typing.Any) -> typing.AsyncIterator[_Call]:
+        """Async `call`: waits with `asyncio.sleep` and `aacquire`."""
+
+        queued_at = self._clock()
+        estimate = self._estimate_tokens(input)
+        rate_wait = self._admit_rate(model, estimate)
+        if rate_wait > 0:
+            await asyncio.sleep(rate_wait)
+        limit = self.concurrency(model)
+        if not await limit.aacquire(self._slot_timeout(rate_wait)):
+            raise self._queue_timeout(model)
+        with self._run(limit, queued_at=queued_at, rate_wait=rate_wait, estimate=estimate) as call:
+            yield call
+
+    def metrics(self) -> LimiterMetrics:
+        with self._lock:
+            limits = dict(self._limits)
+            waits = sorted(self._recent_waits)
+            return LimiterMetrics(
+                calls=self._calls,
+                in_flight=sum(limit.in_flight for limit in limits.values()),
+                waiting=sum(limit.waiting for limit in limits.values()),
+                queue_time_total=self._queue_time_total,
+                queue_time_max=self._queue_time_max,
+                queue_time_p50=_percentile(waits, 50),
+                queue_time_p95=_percentile(waits, 95),
+                rate_wait_total=self._rate_wait_total,
+                queue_timeouts=self._queue_timeouts,
+                overloads=sum(limit.overloads for limit in limits.values()),
+                decreases=sum(limit.decreases for limit in limits.values()),
+                concurrency_limits={model: limit.limit for model, limit in limits.items()},
+            )
+
+    @contextlib.contextmanager
+    def _run(
+        self, limit: AdaptiveConcurrencyLimit, *, queued_at: float, rate_wait: float, estimate: int
+    ) -> typing.Iterator[_Call]:
+        started_at = self._clock()
+        concurrent = limit.in_flight
+        self._record_wait(started_at - queued_at, rate_wait)
+        call = _Call()
+        overloaded = False
+        try:
+            yield call
+        except BaseException as exc:
+            overloaded = _is_overload(exc)
+            raise
+        finally:
+            latency = self._clock() - started_at
+            tokens = call.tokens or estimate
+            if self._tokens is not None and call.tokens:
+                self._tokens.adjust(estimate - call.tokens)
+            limit.release(
+                started_at=started_at, concurrent=concurrent, latency=latency, tokens=tokens, overloaded=overloaded
+            )
+
+    def _admit_rate(self, model: str, estimate: int) -> float:
+        """Reserve the call's rate budget; returns the wait, or raises when it exceeds `max_queue_seconds`."""
+
+        wait = self._reserve(estimate)
+        max_queue = self.config.max_queue_seconds
+        if max_queue is not None and wait > max_queue:
+            # Give the reservation back: the call will not be made.
+            if self._requests is not None:
+                self._requests.adjust(1)
+            if self._tokens is not None:
+                self._tokens.adjust(estimate)
+            raise self._queue_timeout(model)
+        return wait
+
+    def _slot_timeout(self, rate_wait: float) -> float | None:
+        max_queue = self.config.max_queue_seconds
+        return None if max_queue is None else max(0.0, max_queue - rate_wait)
+
+    def _queue_timeout(self, model: str) -> LLMQueueTimeoutError:
+        with self._lock:
+            self._queue_timeouts += 1
+        return LLMQueueTimeoutError(f"LLM call to {model} not admitted within {self.config.max_queue_seconds:g}s")
+
+    def _reserve(self, estimate: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = self._requests.reserve(1)
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.reserve(estimate))
+        return wait
+
+    def _record_wait(self, waited: float, rate_wait: float) -> None:
+        with self._lock:
+            self._calls += 1
+            self._queue_time_total += waited
+            self._queue_time_max = max(self._queue_time_max, waited)
+            self._rate_wait_total += rate_wait
+            self._recent_waits.append(waited)
+
+    def _estimate_tokens(self, input: typing.Any) -> int:
+        if isinstance(input, str):
+            chars = len(input)
+        elif isinstance(input, (list, tuple)):
+            chars = sum(len(str(getattr(message, "content", message))) for message in input)
+        else:
+            chars = len(str(input))
+        return chars // _CHARS_PER_TOKEN + self.config.expected_output_tokens
+
+
+class _Call:
+    """Handle of an admitted call; records the provider's reported token usage."""
+
+    __slots__ = ("tokens",)
+
+    def __init__(self) -> None:
+        self.tokens = 0
+
+    def record(self, message: typing.Any) -> typing.Any:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            self.tokens += int(usage.get("total_tokens") or 0)
+        return message
+
+
+class LimitedChatModel:
+    """Chat model wrapper that admits each call through its provider's limiter, when one is configured."""
+
+    def __init__(self, llm: typing.Any, *, provider: str, model: str):
+        self._llm = llm
+        self._provider = provider
+        self._model = model
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._llm, name)
+
+    def invoke(self, input: typing.Any, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        limiter = get_limiter(self._provider)
+        if limiter is None:
+            return self._llm.invoke(input, *args, **kwargs)
+        with limiter.call(model=self._model, input=input) as call:
+            return call.record(self._llm.invoke(input, *args, **kwargs))
+
+    async def ainvoke(self, input: typing.Any, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        limiter = get_limiter(self._provider)
+        if limiter is None:
+            return await self._llm.ainvoke(input, *args, **kwargs)
+        async with limiter.acall(model=self._model, input=input) as call:
+            return call.record(await self._llm.ainvoke(input, *args, **kwargs))
+
+    def stream(self, input: typing.Any, *args: typing.Any, **kwargs: typing.Any) -> typing.Iterator[typing.Any]:
+        limiter = get_limiter(self._provider)
+        if limiter is None:
+            yield from self._llm.stream(input, *args, **kwargs)
+            return
+        # The slot is held until the stream is exhausted or closed.
+        with limiter.call(model=self._model, input=input) as call:
+            for chunk in self._llm.stream(input, *args, **kwargs):
+                yield call.record(chunk)
+
+    async def astream(
+        self, input: typing.Any, *args: typing.Any, **kwargs: typing.Any
+    ) -> typing.AsyncIterator[typing.Any]:
+        limiter = get_limiter(self._provider)
+        if limiter is None:
+            async for chunk in self._llm.astream(input, *args, **kwargs):
+                yield chunk
+            return
+        async with limiter.acall(model=self._model, input=input) as call:
+            async for chunk in self._llm.astream(input, *args, **kwargs):
+                yield call.record(chunk)
+
+
+_limiters: dict[str, LLMLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def configure(provider: str, config: LLMLimitConfig | None) -> None:
+    """Install (or, with None, remove) the process-wide limiter of `provider`.
+
+    Takes effect for the next call of every cached client; counters start over.
+    """
+
+    with _limiters_lock:
+        if config is None:
+            _limiters.pop(provider, None)
+        else:
+            _limiters[provider] = LLMLimiter(config)
+
+
+def get_limiter(provider: str) -> LLMLimiter | None:
+    return _limiters.get(provider)
+
+
+def metrics() -> dict[str, LimiterMetrics]:
+    """Snapshot of every configured provider's limiter."""
+
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {provider: limiter.metrics() for provider, limiter in limiters.items()}
+
+
+def _is_overload(exc: BaseException) -> bool:
+    """Whether a failed call signals an overloaded server (timeout, 429, 503) rather than a bad request."""
+
+    if isinstance(exc, TimeoutError) or "timeout" in type(exc).__name__.lower():
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status in _OVERLOAD_STATUS_CODES
+
+
+def _percentile(ordered: typing.Sequence[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
@@ -0,0 +1,329 @@
+"""
+Per-task chat model routing.
+
+One model for every call wastes CPU on easy tasks (classification needs only a
+tiny model) and underserves hard ones (drafting quality matters, most of all
+on enterprise plans). A `ModelRouter` maps each task to a `ModelRoute`:
+
+- `model` is tried first, then each of `fallbacks` in order when a call errors
+  or exceeds the route's `timeout_seconds`, so a slow or unloaded large model
+  degrades to a smaller one instead of failing the node,
+- `temperature` and `timeout_seconds` apply to every model of the route.
+
+`timeout_seconds` is a deadline on each whole model attempt, for `invoke`,
+`ainvoke`, `stream` and `astream` alike, not only the HTTP client's per-read
+timeout: a model that keeps emitting tokens slowly never trips the latter.
+`ainvoke` and `astream` cancel the attempt at the deadline; `invoke` streams
+the reply, and it and `stream` close the underlying stream at the first chunk
+past the deadline (so a stalled sync stream still relies on the client
+timeout).
+
+Routes are resolved by the service from the tenant's plan and the
+`model_routes` override in `tenants.config` (`resolve_routes(...)`). Agents
+receive the router as their `llm` dependency and pick the task with
+`task_model(llm, TASK_...)`; a plain chat model passes through unchanged, so
+agents work the same with and without routing.
+
+Streaming falls back only before the first chunk: once part of a reply has been
+emitted, switching models would splice two different replies together, so a
+deadline that passes after that raises `TimeoutError` instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import time
+import typing
+
+from agents.shared import clients
+
+logger = logging.getLogger(__name__)
+
+TASK_CLASSIFICATION = "classification"
+TASK_DRAFTING = "drafting"
+TASK_SUMMARIZATION = "summarization"
+TASKS = (TASK_CLASSIFICATION, TASK_DRAFTING, TASK_SUMMARIZATION)
+
+
+@dataclasses.dataclass(frozen=True)
+class ModelRoute:
+    """The models (largest to smallest, as a rule), sampling and timeout used for one task."""
+
+    model: str
+    fallbacks: tuple[str, ...] = ()
+    temperature: float = clients.DEFAULT_TEMPERATURE
+    timeout_seconds: float | None = None  # Deadline per model attempt; None leaves the client default.
+    provider: str = clients.DEFAULT_PROVIDER
+
+    @property
+    def models(self) -> tuple[str, ...]:
+        return (self.model, *self.fallbacks)
+
+
+DEFAULT_ROUTES: dict[str, ModelRoute] = {
+    # Picking one of five intents: a tiny model is enough. The larger default
+    # model only answers when the tiny one is missing or stalls.
+    TASK_CLASSIFICATION: ModelRoute(
+        model="gemma3:1b", fallbacks=(clients.DEFAULT_MODEL,), temperature=0.0, timeout_seconds=30.0
+    ),
+    TASK_DRAFTING: ModelRoute(model=clients.DEFAULT_MODEL, fallbacks=("gemma3:1b",), timeout_seconds=120.0),
+    TASK_SUMMARIZATION: ModelRoute(model=clients.DEFAULT_MODEL, fallbacks=("gemma3:1b",), timeout_seconds=60.0),
+}
+
+# Routes that differ from `DEFAULT_ROUTES` by `tenants.config->>'plan'`.
+PLAN_ROUTES: dict[str, dict[str, ModelRoute]] = {
+    "enterprise": {
+        TASK_DRAFTING: ModelRoute(
+            model="gemma3:12b", fallbacks=(clients.DEFAULT_MODEL, "gemma3:1b"), timeout_seconds=180.0
+        ),
+    },
+}
+
+_ROUTE_KEYS = frozenset({"model", "fallbacks", "temperature", "timeout", "provider"})
+
+
+def parse_routes(
+    raw: typing.Mapping[str, typing.Any], *, base: typing.Mapping[str, ModelRoute] | None = None
+) -> dict[str, ModelRoute]:
+    """Apply a `{task: route}` override mapping (JSON-shaped) on top of `base`.
+
+    A route is either a model name or an object with any of `model`,
+    `fallbacks`, `temperature`, `timeout` (seconds) and `provider`; fields it
+    leaves out keep the base route's value. Setting `model` alone drops the
+    base fallbacks, since they were chosen for the base model.
+
+    Raises:
+        ValueError: On an unknown task or a malformed route.
+    """
+
+    routes = dict(base if base is not None else DEFAULT_ROUTES)
+    for task, spec in raw.items():
+        if task not in TASKS:
+            raise ValueError(f"Unknown model routing task {task!r}; expected one of {', '.join(TASKS)}")
+        if isinstance(spec, str):
+            spec = {"model": spec}
+        if not isinstance(spec, typing.Mapping) or not set(spec) <= _ROUTE_KEYS:
+            raise ValueError(f"Model route for {task!r} must be a model name or an object with {sorted(_ROUTE_KEYS)}")
+
+        current = routes.get(task)
+        model = spec.get("model", current.model if current else None)
+        if not isinstance(model, str) or not model.strip():
+            raise ValueError(f"Model route for {task!r} needs a model")
+        if "fallbacks" in spec:
+            fallbacks = spec["fallbacks"] or ()
+        elif current is not None and "model" not in spec:
+            fallbacks = current.fallbacks
+        else:
+            fallbacks = ()
+        if isinstance(fallbacks, str) or not all(isinstance(name, str) and name for name in fallbacks):
+            raise ValueError(f"Model route fallbacks for {task!r} must be a list of model names")
+        timeout = spec.get("timeout", current.timeout_seconds if current else None)
+        temperature = spec.get("temperature", current.temperature if current else clients.DEFAULT_TEMPERATURE)
+        try:
+            routes[task] = ModelRoute(
+                model=model.strip(),
+                fallbacks=tuple(fallbacks),
+                temperature=float(temperature),
+                timeout_seconds=float(timeout) if timeout is not None else None,
+                provider=str(spec.get("provider") or (current.provider if current else clients.DEFAULT_PROVIDER)),
+            )
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Invalid model route for {task!r}: {exc}") from exc
+    return routes
+
+
+def resolve_routes(
+    *,
+    plan: str | None = None,
+    overrides: typing.Mapping[str, typing.Any] | None = None,
+    base: typing.Mapping[str, ModelRoute] | None = None,
+) -> dict[str, ModelRoute]:
+    """Return the routes for a tenant: `base`, then the plan's routes, then its own overrides."""
+
+    routes = dict(base if base is not None else DEFAULT_ROUTES)
+    routes.update(PLAN_ROUTES.get((plan or "").strip().lower(), {}))
+    if overrides:
+        routes = parse_routes(overrides, base=routes)
+    return routes
+
+
+class RoutedChatModel:
+    """A chat-model-shaped wrapper that calls a route's models in order until one answers."""
+
+    def __init__(
+        self,
+        route: ModelRoute,
+        *,
+        factory: typing.Callable[..., typing.Any] = clients.get_chat_model,
+    ):
+        self.route = route
+        self._factory = factory
+
+    def _clients(self) -> typing.Iterator[tuple[str, typing.Any]]:
+        route = self.route
+        for model in route.models:
+            yield model, self._factory(
+                provider=route.provider,
+                model=model,
+                temperature=route.temperature,
+                timeout=route.timeout_seconds,
+            )
+
+    def _failed(self, model: str, exc: Exception) -> None:
+        logger.warning("Model %s failed (%s: %s); falling back to the next model", model, type(exc).__name__, exc)
+
+    def invoke(self, input: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        models = self.route.models
+        timeout = self.route.timeout_seconds
+        for position, (model, llm) in enumerate(self._clients()):
+            try:
+                if timeout is None:
+                    return llm.invoke(input, **kwargs)
+                return _invoke_within(llm, input, model=model, timeout=timeout, **kwargs)
+            except Exception as exc:
+                if position == len(models) - 1:
+                    raise
+                self._failed(model, exc)
+
+    async def ainvoke(self, input: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        models = self.route.models
+        timeout = self.route.timeout_seconds
+        for position, (model, llm) in enumerate(self._clients()):
+            try:
+                if timeout is None:
+                    return await llm.ainvoke(input, **kwargs)
+                deadline = asyncio.timeout(timeout)
+                try:
+                    async with deadline:
+                        return await llm.ainvoke(input, **kwargs)
+                except TimeoutError:
+                    if deadline.expired():
+                        raise TimeoutError(_deadline_message(model, timeout)) from None
+                    raise
+            except Exception as exc:
+                if position == len(models) - 1:
+                    raise
+                self._failed(model, exc)
+
+    def stream(self, input: typing.Any, **kwargs: typing.Any) -> typing.Iterator[typing.Any]:
+        models = self.route.models
+        timeout = self.route.timeout_seconds
+        for position, (model, llm) in enumerate(self._clients()):
+            started = False
+            try:
+                with contextlib.closing(_stream_within(llm, input, model=model, timeout=timeout, **kwargs)) as chunks:
+                    for chunk in chunks:
+                        started = True
+                        yield chunk
+                return
+            except Exception as exc:
+                if started or position == len(models) - 1:
+                    raise
+                self._failed(model, exc)
+
+    async def astream(self, input: typing.Any, **kwargs: typing.Any) -> typing.AsyncIterator[typing.Any]:
+        models = self.route.models
+        timeout = self.route.timeout_seconds
+        for position, (model, llm) in enumerate(self._clients()):
+            started = False
+            try:
+                stream = _astream_within(llm, input, model=model, timeout=timeout, **kwargs)
+                async with contextlib.aclosing(stream) as chunks:
+                    async for chunk in chunks:
+                        started = True
+                        yield chunk
+                return
+            except Exception as exc:
+                if started or position == len(models) - 1:
+                    raise
+                self._failed(model, exc)
+
+
+def _invoke_within(
+    llm: typing.Any, input: typing.Any, *, model: str, timeout: float, **kwargs: typing.Any
+) -> typing.Any:
+    """`llm.invoke` with a deadline: stream the reply and abort it once `timeout` seconds have passed."""
+
+    from langchain_core.messages import message_chunk_to_message
+
+    message = None
+    with contextlib.closing(_stream_within(llm, input, model=model, timeout=timeout, **kwargs)) as chunks:
+        for chunk in chunks:
+            message = chunk if message is None else message + chunk
+    return message_chunk_to_message(message)
+
+
+def _stream_within(
+    llm: typing.Any, input: typing.Any, *, model: str, timeout: float | None, **kwargs: typing.Any
+) -> typing.Iterator[typing.Any]:
+    """`llm.stream` that raises `TimeoutError` at the first chunk arriving after `timeout` seconds."""
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with contextlib.closing(llm.stream(input, **kwargs)) as chunks:  # Closing the stream aborts the request.
+        for chunk in chunks:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(_deadline_message(model, typing.cast(float, timeout)))
+            yield chunk
+
+
+async def _astream_within(
+    llm: typing.Any, input: typing.Any, *, model: str, timeout: float | None, **kwargs: typing.Any
+) -> typing.AsyncIterator[typing.Any]:
+    """`llm.astream` cancelled with `TimeoutError` once `timeout` seconds have passed.
+
+    Only the wait for the next chunk runs under the deadline, never the
+    caller's code between chunks, so the caller's task is not cancelled.
+    """
+
+    deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+    async with contextlib.aclosing(llm.astream(input, **kwargs)) as chunks:
+        iterator = aiter(chunks)
+        while True:
+            scope = asyncio.timeout_at(deadline)
+            try:
+                async with scope:
+                    chunk = await anext(iterator)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                if scope.expired():
+                    raise TimeoutError(_deadline_message(model, typing.cast(float, timeout))) from None
+                raise
+            yield chunk
+
+
+def _deadline_message(model: str, timeout: float) -> str:
+    return f"Model {model} did not finish within its {timeout:g}s deadline"
+
+
+class ModelRouter:
+    """Hands out the `RoutedChatModel` of each task."""
+
+    def __init__(
+        self,
+        routes: typing.Mapping[str, ModelRoute],
+        *,
+        factory: typing.Callable[..., typing.Any] = clients.get_chat_model,
+    ):
+        missing = [task for task in TASKS if task not in routes]
+        if missing:
+            raise ValueError(f"Model routes missing for: {', '.join(missing)}")
+        self.routes = dict(routes)
+        self._models = {task: RoutedChatModel(route, factory=factory) for task, route in self.routes.items()}
+
+    def for_task(self, task: str) -> RoutedChatModel:
+        try:
+            return self._models[task]
+        except KeyError:
+            raise ValueError(f"Unknown model routing task {task!r}") from None
+
+
+def task_model(llm: typing.Any, task: str) -> typing.Any:
+    """Return the model for `task` when `llm` is a `ModelRouter`, otherwise `llm` itself."""
+
+    if isinstance(llm, ModelRouter):
+        return llm.for_task(task)
+    return llm
@@ -70,3 +70,4 @@ class TenantProfile(typing.TypedDict):
     tone: typing.NotRequired[str]
     keywords: typing.NotRequired[list[str]]
     email_signature: typing.NotRequired[str]
+    kb_token_budget: typing.NotRequired[int]  # Token budget for KB snippets in the drafting prompt.
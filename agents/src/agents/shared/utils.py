@@ -11,6 +11,16 @@ def utc_now_iso() -> str:
 
     return datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
 
+def checkpoint_durability(graph: typing.Any) -> str | None:
+    """Durability to run a compiled LangGraph graph with.
+
+    With a checkpointer, every super-step is persisted before the next one
+    starts ("sync"). Without one there is nothing to persist, and LangGraph
+    rejects "sync", so the default is kept (None).
+    """
+
+    return "sync" if getattr(graph, "checkpointer", None) else None
+
 def safe_json_extract(text: str) -> dict[str, typing.Any]:
     """Best-effort JSON extraction from an LLM response.
 
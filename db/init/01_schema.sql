@@ -15,6 +15,7 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS vector;
 
 -- ─── Teardown (reverse FK dependency order) ───────────────────────────────────
+DROP TABLE IF EXISTS classification_cache;
 DROP TABLE IF EXISTS tenant_kb_chunks;
 DROP TABLE IF EXISTS activity_logs;
 DROP TABLE IF EXISTS agent_intercom_queue;
@@ -43,6 +44,22 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Queue tables (event_outbox, human_instructions_queue, agent_intercom_queue)
+-- announce inserts on a channel named after the table so runtime workers can
+-- block on LISTEN instead of polling. NOTIFY is transactional: listeners hear
+-- about a row only once the inserting transaction commits. Notifications are a
+-- latency hint, not a delivery guarantee; workers keep a slow safety poll.
+CREATE OR REPLACE FUNCTION notify_queue_insert()
+    RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify(
+        TG_TABLE_NAME,
+        json_build_object('tenant_id', NEW.tenant_id, 'id', NEW.id)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE TABLE tenants (
                          id          TEXT PRIMARY KEY,
                          name        TEXT NOT NULL,
@@ -66,6 +83,7 @@ CREATE TABLE runs (
     agent_id TEXT NOT NULL,                    -- e.g. "imel"
     status TEXT NOT NULL CHECK (status IN ('queued', 'running', 'completed', 'failed', 'sleeping')),
     input_payload JSONB NOT NULL,              -- What triggered this?
+    metadata JSONB NOT NULL DEFAULT '{}'::jsonb, -- Agent-reported observations (prompt token estimates, KB packing)
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -76,13 +94,21 @@ CREATE INDEX idx_runs_status ON runs(status); -- this might be replaced by the f
 
 -- ─── 3. AGENT STATE (Short-Term Memory) ───────────────────────────────────────
 -- This is where LangGraph checkpoints are saved.
--- It's a "Journal" of the agent's brain.
+-- It's a "Journal" of the agent's brain: one row per graph super-step, written
+-- by ai_suite.capabilities.checkpointer. Rows store only the state keys that
+-- changed in their step; the full state is the overlay of a row and its
+-- ancestors (graph_checkpoint->>'parent_id'). A failed or crashed run resumes
+-- from its last row instead of repeating completed LLM calls.
 CREATE TABLE agent_state (
-    run_id UUID PRIMARY KEY REFERENCES runs(id),
-    checkpoint_id INT NOT NULL,                -- Monotonically increasing step number
-    state_data JSONB NOT NULL,                 -- The full "ImelState" or "KallState"
-    node_name TEXT NOT NULL,                   -- Which step of the graph are we at?
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    run_id UUID NOT NULL REFERENCES runs(id),
+    checkpoint_id INT NOT NULL,                -- Monotonically increasing step number within the run
+    state_data JSONB NOT NULL,                 -- State keys written in this step only (diff), serializer-encoded
+    node_name TEXT NOT NULL,                   -- Node(s) scheduled next; '__end__' once the graph finished
+    graph_checkpoint JSONB,                    -- LangGraph bookkeeping (id, parent_id, channel versions); NULL for rows not written by the checkpointer
+    metadata JSONB NOT NULL DEFAULT '{}'::jsonb, -- LangGraph checkpoint metadata (source, step)
+    pending_writes JSONB NOT NULL DEFAULT '[]'::jsonb, -- Writes of tasks that finished after this checkpoint; cleared once the next checkpoint lands
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (run_id, checkpoint_id)
 );
 
 -- ─── 4. MESSAGES (Context) ────────────────────────────────────────────────────
@@ -149,6 +175,10 @@ CREATE INDEX idx_event_outbox_available ON event_outbox(available_at);
 CREATE UNIQUE INDEX idx_event_outbox_idempotency ON event_outbox(tenant_id, idempotency_key)
 WHERE idempotency_key IS NOT NULL;
 
+CREATE TRIGGER trg_event_outbox_notify
+    AFTER INSERT ON event_outbox
+    FOR EACH ROW EXECUTE FUNCTION notify_queue_insert();
+
 -- ─── 6. AUDIT LOGS (Sync to Warehouse) ────────────────────────────────────────
 -- A flattened log table purely for Airbyte to slurp up.
 CREATE TABLE activity_logs (
@@ -265,6 +295,11 @@ CREATE INDEX idx_hiq_expires ON human_instructions_queue(expires_at);
 CREATE UNIQUE INDEX idx_hiq_idempotency ON human_instructions_queue(tenant_id, idempotency_key)
 WHERE idempotency_key IS NOT NULL;
 
+-- Wake `ai-suite worker` processes (LISTEN human_instructions_queue)
+CREATE TRIGGER trg_hiq_notify
+    AFTER INSERT ON human_instructions_queue
+    FOR EACH ROW EXECUTE FUNCTION notify_queue_insert();
+
 -- ─── 8. AGENT INTER-COMMUNICATIONS QUEUE (Internal Messaging) ─────────────────
 -- For multi-agent coordination only; no external side effects.
 CREATE TABLE agent_intercom_queue (
@@ -296,6 +331,10 @@ CREATE INDEX idx_aiq_recipient ON agent_intercom_queue(tenant_id, to_agent_id, s
 CREATE INDEX idx_aiq_channel ON agent_intercom_queue(tenant_id, channel, created_at DESC);
 CREATE INDEX idx_aiq_expires ON agent_intercom_queue(expires_at);
 
+CREATE TRIGGER trg_aiq_notify
+    AFTER INSERT ON agent_intercom_queue
+    FOR EACH ROW EXECUTE FUNCTION notify_queue_insert();
+
 -- ─── 9. TENANT KB CHUNKS (Vector Store) ───────────────────────────────────────
 -- Stores company knowledge per tenant. If `vector` is unavailable in local
 -- dev, we keep the same table contract with a JSONB embedding fallback.
@@ -317,6 +356,7 @@ BEGIN
                 chunk_index INT NOT NULL,                     -- Chunk order within a doc
                 content TEXT NOT NULL,
                 embedding vector(1536) NOT NULL,              -- pgvector column for similarity search
+                content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', content)) STORED, -- Full-text side of hybrid search
                 metadata JSONB DEFAULT '{}'::jsonb,           -- Arbitrary ingest metadata (checksum, mime_type, tags, etc.)
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
                 updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
@@ -335,6 +375,7 @@ BEGIN
                 chunk_index INT NOT NULL,                     -- Chunk order within a doc
                 content TEXT NOT NULL,
                 embedding_json JSONB NOT NULL DEFAULT '[]'::jsonb, -- Local dev fallback without pgvector
+                content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', content)) STORED, -- Full-text side of hybrid search
                 metadata JSONB DEFAULT '{}'::jsonb,           -- Arbitrary ingest metadata (checksum, mime_type, tags, etc.)
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
                 updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
@@ -344,13 +385,64 @@ BEGIN
 
     EXECUTE 'CREATE INDEX idx_kb_chunks_tenant_doc ON tenant_kb_chunks(tenant_id, doc_id)';
     EXECUTE 'CREATE INDEX idx_kb_chunks_tenant_source ON tenant_kb_chunks(tenant_id, source_type)';
+    -- Lexical side of hybrid retrieval (`KBSearchConfig.hybrid`): exact terms such
+    -- as order numbers and SKUs that embeddings rank poorly.
+    EXECUTE 'CREATE INDEX idx_kb_chunks_content_tsv ON tenant_kb_chunks USING gin (content_tsv)';
 
     IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'vector') THEN
         -- Cosine distance is commonly used for normalized embeddings (e.g., OpenAI).
-        EXECUTE 'CREATE INDEX idx_kb_chunks_embedding ON tenant_kb_chunks USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)';
+        -- HNSW rather than ivfflat: it needs no training data (ivfflat lists are
+        -- fixed from the rows present at build time, and this table starts empty)
+        -- and keeps recall as tenants add chunks. Query-time recall is tuned with
+        -- `hnsw.ef_search` by the runtime (see `KBSearchConfig`).
+        EXECUTE 'CREATE INDEX idx_kb_chunks_embedding ON tenant_kb_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)';
     END IF;
 END $$;
 
+-- Runtime workers cache each tenant's profile (brand kit chunk) in process and
+-- LISTEN on this channel to drop a tenant's entry when its KB changes. The
+-- payload carries only the tenant id, so Postgres folds the per-row
+-- notifications of a bulk ingest into one per tenant per transaction.
+CREATE OR REPLACE FUNCTION notify_tenant_kb_change()
+    RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify(TG_TABLE_NAME, json_build_object('tenant_id', OLD.tenant_id)::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify(TG_TABLE_NAME, json_build_object('tenant_id', NEW.tenant_id)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_kb_chunks_notify
+    AFTER INSERT OR UPDATE OR DELETE ON tenant_kb_chunks
+    FOR EACH ROW EXECUTE FUNCTION notify_tenant_kb_change();
+
+-- The in-process `embedding_json` index refreshes rows whose updated_at changed.
+CREATE TRIGGER trg_kb_chunks_updated_at
+    BEFORE UPDATE ON tenant_kb_chunks
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- ─── 10. CLASSIFICATION CACHE (shared tier) ──────────────────────────────────
+-- Imel's email classifications keyed by a hash of the normalized email content
+-- (and the classification prompt), so repeats (spam waves, templated "where is
+-- my order" emails) skip the model on every worker. Written by the runtime when
+-- CLASSIFICATION_CACHE_SHARED is on; each write prunes a batch of expired rows.
+-- UNLOGGED: losing the cache on a crash only costs model calls, and skipping
+-- WAL keeps the write per classified email cheap.
+CREATE UNLOGGED TABLE classification_cache (
+    tenant_id TEXT NOT NULL REFERENCES tenants(id),
+    content_key TEXT NOT NULL,                 -- sha256 of the normalized content + prompt
+    classification JSONB NOT NULL,             -- Normalized EmailClassification
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (tenant_id, content_key)
+);
+
+CREATE INDEX idx_classification_cache_expires ON classification_cache(expires_at);
+
 -- 11. Users table for login management
 CREATE TABLE users (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -274,7 +274,7 @@ SELECT
     END AS node_name,
     r.updated_at AS created_at
 FROM runs r
-ON CONFLICT (run_id) DO NOTHING;
+ON CONFLICT (run_id, checkpoint_id) DO NOTHING;
 
 -- Messages: three turns per run for conversation-heavy data.
 INSERT INTO messages (
@@ -0,0 +1,366 @@
+"""LangGraph checkpointers backed by `agent_state`.
+
+Runs used to persist only their final state (`checkpoint_id=1`,
+`node_name="__end__"`), so a run that died after classifying repeated the
+classification LLM call from scratch. `AgentStateCheckpointer` (sync bundle)
+and `AsyncAgentStateCheckpointer` (asyncio bundle) implement LangGraph's
+`BaseCheckpointSaver` on top of `agent_state`, so the runtime checkpoints every
+super-step and can resume a run from its last one.
+
+Storage layout, one row per super-step keyed by `(run_id, checkpoint_id)`:
+
+- `state_data` holds only the channels (state keys) whose value changed in
+  that step, each encoded as `[serde type, base64 bytes]`. LangGraph reports
+  every channel a node wrote (`new_versions`), and our nodes return the whole
+  state, so values are also compared with the previous checkpoint of the same
+  checkpointer and unchanged ones are skipped. A full state is rebuilt by
+  overlaying the diffs along the parent chain, which also keeps forks
+  (`update_state` on an old checkpoint) correct.
+- `graph_checkpoint` holds LangGraph's bookkeeping without channel values
+  (checkpoint id, channel versions, versions seen) plus the parent id.
+- `node_name` records the node(s) scheduled next, `__end__` once finished.
+- `pending_writes` collects writes of tasks that completed after the row was
+  taken, so a crash mid-step only re-runs the unfinished tasks. They are
+  cleared once the next checkpoint (which contains them) is written.
+
+LangGraph's `thread_id` is the run id. Only root graphs are supported (our
+agents have no subgraphs); nested checkpoint namespaces are rejected.
+"""
+
+from __future__ import annotations
+
+import base64
+import typing
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from ai_suite.capabilities.postgres import PostgresCapabilities, StateCheckpoint
+
+if typing.TYPE_CHECKING:
+    from ai_suite.capabilities.postgres_async import AsyncPostgresCapabilities
+
+# Marker for a channel that was cleared in a step (it has a new version but no value).
+_EMPTY = ("empty", "")
+
+
+class _Baseline(typing.NamedTuple):
+    """Encoded channel values as of the last checkpoint this process wrote for a run."""
+
+    checkpoint_id: str
+    encoded: dict[str, list[str]]
+
+
+class AgentStateCheckpointer(BaseCheckpointSaver[int]):
+    """Synchronous checkpointer over `PostgresCapabilities.state`.
+
+    Cheap to create; the runtime makes one per run so the diff baseline
+    (`_baselines`) stays small.
+    """
+
+    def __init__(self, capabilities: PostgresCapabilities, *, serde: typing.Any = None):
+        super().__init__(serde=serde)
+        self._state = capabilities.state
+        self._baselines: dict[str, _Baseline] = {}
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        run_id = _run_id(config)
+        rows = self._state.load_checkpoints(run_id=run_id)
+        return _checkpoint_tuple(self.serde, run_id, rows, get_checkpoint_id(config))
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, typing.Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> typing.Iterator[CheckpointTuple]:
+        if config is None:
+            raise ValueError("agent_state checkpoints are listed per run; pass a config with thread_id.")
+        run_id = _run_id(config)
+        rows = self._state.load_checkpoints(run_id=run_id)
+        yield from _checkpoint_tuples(self.serde, run_id, rows, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        run_id = _run_id(config)
+        self._state.append_checkpoint(
+            run_id=run_id,
+            **_checkpoint_row(self.serde, self._baselines, run_id, config, checkpoint, metadata, new_versions),
+        )
+        return _checkpoint_config(run_id, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: typing.Sequence[tuple[str, typing.Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._state.append_pending_writes(
+            run_id=_run_id(config),
+            graph_checkpoint_id=config["configurable"]["checkpoint_id"],
+            writes=_encode_writes(self.serde, writes, task_id, task_path),
+        )
+
+
+class AsyncAgentStateCheckpointer(BaseCheckpointSaver[int]):
+    """Asyncio checkpointer over `AsyncPostgresCapabilities.state` (for `graph.ainvoke`)."""
+
+    def __init__(self, capabilities: AsyncPostgresCapabilities, *, serde: typing.Any = None):
+        super().__init__(serde=serde)
+        self._state = capabilities.state
+        self._baselines: dict[str, _Baseline] = {}
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        run_id = _run_id(config)
+        rows = await self._state.load_checkpoints(run_id=run_id)
+        return _checkpoint_tuple(self.serde, run_id, rows, get_checkpoint_id(config))
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, typing.Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> typing.AsyncIterator[CheckpointTuple]:
+        if config is None:
+            raise ValueError("agent_state checkpoints are listed per run; pass a config with thread_id.")
+        run_id = _run_id(config)
+        rows = await self._state.load_checkpoints(run_id=run_id)
+        for item in _checkpoint_tuples(self.serde, run_id, rows, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        run_id = _run_id(config)
+        await self._state.append_checkpoint(
+            run_id=run_id,
+            **_checkpoint_row(self.serde, self._baselines, run_id, config, checkpoint, metadata, new_versions),
+        )
+        return _checkpoint_config(run_id, checkpoint["id"])
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: typing.Sequence[tuple[str, typing.Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._state.append_pending_writes(
+            run_id=_run_id(config),
+            graph_checkpoint_id=config["configurable"]["checkpoint_id"],
+            writes=_encode_writes(self.serde, writes, task_id, task_path),
+        )
+
+
+# --- encoding shared by both checkpointers ------------------------------------
+
+
+def _run_id(config: RunnableConfig) -> str:
+    configurable = config.get("configurable") or {}
+    if configurable.get("checkpoint_ns"):
+        raise ValueError("agent_state checkpointing supports root graphs only (no subgraph namespaces).")
+    run_id = configurable.get("thread_id")
+    if not run_id:
+        raise ValueError("agent_state checkpointing requires configurable.thread_id set to the run id.")
+    return str(run_id)
+
+
+def _checkpoint_config(run_id: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": run_id, "checkpoint_ns": "", "checkpoint_id": checkpoint_id}}
+
+
+def _encode(serde: typing.Any, value: typing.Any) -> list[str]:
+    type_, data = serde.dumps_typed(value)
+    return [type_, base64.b64encode(data).decode("ascii")]
+
+
+def _decode(serde: typing.Any, encoded: typing.Sequence[str]) -> typing.Any:
+    type_, data = encoded
+    return serde.loads_typed((type_, base64.b64decode(data)))
+
+
+def _next_nodes(new_versions: ChannelVersions, values: dict[str, typing.Any]) -> str:
+    """Name the node(s) triggered by this step's writes.
+
+    Trigger channels (`branch:to:<node>`) also get a new version when they are
+    consumed; only the ones still holding a value point at the next step. Join
+    channels (`join:<a>+<b>:<node>`, from `add_edge([a, b], node)`) hold the
+    start nodes seen so far and trigger `node` once all of them have written.
+    """
+
+    nodes: set[str] = set()
+    for channel in new_versions:
+        if channel not in values:
+            continue
+        if channel == "__start__":
+            nodes.add(channel)
+        elif channel.startswith("branch:to:"):
+            nodes.add(channel.removeprefix("branch:to:"))
+        elif channel.startswith("join:"):
+            starts, _, node = channel.removeprefix("join:").rpartition(":")
+            if _join_ready(values[channel], starts.split("+")):
+                nodes.add(node)
+    return ",".join(sorted(nodes)) or "__end__"
+
+
+def _join_ready(value: typing.Any, starts: list[str]) -> bool:
+    # Deferred joins checkpoint `(seen, finished)`; plain joins checkpoint `seen`.
+    seen, finished = value if isinstance(value, tuple) else (value, True)
+    return finished and set(seen) == set(starts)
+
+
+def _checkpoint_row(
+    serde: typing.Any,
+    baselines: dict[str, _Baseline],
+    run_id: str,
+    config: RunnableConfig,
+    checkpoint: Checkpoint,
+    metadata: CheckpointMetadata,
+    new_versions: ChannelVersions,
+) -> dict[str, typing.Any]:
+    values = checkpoint["channel_values"]
+    parent_id = config["configurable"].get("checkpoint_id")
+    # Only diff against a baseline that is this checkpoint's parent; otherwise store every written channel.
+    baseline = baselines.get(run_id)
+    previous = baseline.encoded if baseline is not None and baseline.checkpoint_id == parent_id else {}
+
+    state_data: dict[str, list[str]] = {}
+    for channel in new_versions:
+        encoded = _encode(serde, values[channel]) if channel in values else list(_EMPTY)
+        if previous.get(channel) != encoded:
+            state_data[channel] = encoded
+
+    node_name = _next_nodes(new_versions, values)
+    if node_name == "__end__":
+        baselines.pop(run_id, None)
+    else:
+        baselines[run_id] = _Baseline(checkpoint["id"], {**previous, **state_data})
+
+    graph_checkpoint = {key: value for key, value in checkpoint.items() if key != "channel_values"}
+    graph_checkpoint["parent_id"] = parent_id
+    return {
+        "node_name": node_name,
+        "state_data": state_data,
+        "graph_checkpoint": graph_checkpoint,
+        "metadata": dict(get_checkpoint_metadata(config, metadata)),
+    }
+
+
+def _encode_writes(
+    serde: typing.Any, writes: typing.Sequence[tuple[str, typing.Any]], task_id: str, task_path: str
+) -> list[dict[str, typing.Any]]:
+    return [
+        {
+            "task_id": task_id,
+            "task_path": task_path,
+            "idx": WRITES_IDX_MAP.get(channel, idx),
+            "channel": channel,
+            "value": _encode(serde, value),
+        }
+        for idx, (channel, value) in enumerate(writes)
+    ]
+
+
+def _decode_writes(serde: typing.Any, writes: list[dict[str, typing.Any]]) -> list[tuple[str, str, typing.Any]]:
+    # Same rule as LangGraph's savers: regular writes keep the first copy, special (negative idx) writes the last.
+    kept: dict[tuple[str, int], dict[str, typing.Any]] = {}
+    for write in writes:
+        key = (write["task_id"], int(write["idx"]))
+        if key[1] >= 0 and key in kept:
+            continue
+        kept[key] = write
+    return [(w["task_id"], w["channel"], _decode(serde, w["value"])) for w in kept.values()]
+
+
+def _lineage(rows: list[StateCheckpoint], target: StateCheckpoint) -> list[StateCheckpoint]:
+    """Return `target` and its ancestors, root first."""
+
+    by_id = {row.graph_checkpoint["id"]: row for row in rows}
+    chain = [target]
+    parent_id = target.graph_checkpoint.get("parent_id")
+    while parent_id and parent_id in by_id:
+        chain.append(by_id[parent_id])
+        parent_id = by_id[parent_id].graph_checkpoint.get("parent_id")
+    return chain[::-1]
+
+
+def _build_tuple(serde: typing.Any, run_id: str, rows: list[StateCheckpoint], target: StateCheckpoint) -> CheckpointTuple:
+    encoded: dict[str, typing.Any] = {}
+    for row in _lineage(rows, target):
+        encoded.update(row.state_data)
+
+    bookkeeping = dict(target.graph_checkpoint)
+    parent_id = bookkeeping.pop("parent_id", None)
+    channel_values = {
+        channel: _decode(serde, encoded[channel])
+        for channel in bookkeeping.get("channel_versions", {})
+        if channel in encoded and tuple(encoded[channel]) != _EMPTY
+    }
+    return CheckpointTuple(
+        config=_checkpoint_config(run_id, bookkeeping["id"]),
+        checkpoint=typing.cast(Checkpoint, {**bookkeeping, "channel_values": channel_values}),
+        metadata=typing.cast(CheckpointMetadata, target.metadata),
+        parent_config=_checkpoint_config(run_id, parent_id) if parent_id else None,
+        pending_writes=_decode_writes(serde, target.pending_writes),
+    )
+
+
+def _checkpoint_tuple(
+    serde: typing.Any, run_id: str, rows: list[StateCheckpoint], checkpoint_id: str | None
+) -> CheckpointTuple | None:
+    if not rows:
+        return None
+    if checkpoint_id is None:
+        return _build_tuple(serde, run_id, rows, rows[-1])
+    for row in rows:
+        if row.graph_checkpoint["id"] == checkpoint_id:
+            return _build_tuple(serde, run_id, rows, row)
+    return None
+
+
+def _checkpoint_tuples(
+    serde: typing.Any,
+    run_id: str,
+    rows: list[StateCheckpoint],
+    *,
+    filter: dict[str, typing.Any] | None,
+    before: RunnableConfig | None,
+    limit: int | None,
+) -> typing.Iterator[CheckpointTuple]:
+    """Yield checkpoints newest first, honouring LangGraph's `list` filters."""
+
+    before_id = get_checkpoint_id(before) if before else None
+    emitted = 0
+    for row in reversed(rows):
+        if limit is not None and emitted >= limit:
+            return
+        # LangGraph checkpoint ids are time-ordered (uuid6), so string comparison orders them.
+        if before_id is not None and row.graph_checkpoint["id"] >= before_id:
+            continue
+        if filter and any(row.metadata.get(key) != value for key, value in filter.items()):
+            continue
+        emitted += 1
+        yield _build_tuple(serde, run_id, rows, row)
@@ -0,0 +1,94 @@
+"""Per-tenant cache of email classifications keyed by normalized content.
+
+Tenants get floods of near-identical emails (newsletters, spam waves, "where
+is my order" templates), and each one used to cost a classification model
+call. Imel derives a content key from the email (quoted replies stripped,
+whitespace and casing collapsed, hashed together with the classification
+prompt; see `agents.general.imel.nodes.classification_cache_key`) and asks its
+tools for a cached classification before calling the model.
+
+`ClassificationCache` is the in-process tier: an LRU + TTL map of
+`(tenant_id, content key) -> normalized classification`. With `shared=True`
+the Postgres tools also read and write the `classification_cache` table, so a
+repeat seen by one worker skips the model on every worker; the in-process tier
+then only saves the round trip. Only model output (after
+`_normalize_classification`) is cached; the deterministic fallback is cheap
+and is never stored.
+
+Cached classifications are shared between concurrent runs and must be treated
+as read-only.
+"""
+
+from __future__ import annotations
+
+import collections
+import threading
+import time
+import typing
+
+from ai_suite.capabilities.tenant_cache import CacheStats
+
+
+class ClassificationCache:
+    """Thread-safe LRU + TTL cache of classifications keyed by `(tenant_id, content_key)`."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 3600.0,
+        shared: bool = False,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self.shared = shared  # Also use the Postgres `classification_cache` table.
+        self._clock = clock
+        self._entries: collections.OrderedDict[tuple[str, str], tuple[float, dict[str, typing.Any]]] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self._ttl
+
+    def get(self, tenant_id: str, content_key: str) -> dict[str, typing.Any] | None:
+        key = (tenant_id, content_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, tenant_id: str, content_key: str, classification: dict[str, typing.Any]) -> None:
+        key = (tenant_id, content_key)
+        with self._lock:
+            self._entries[key] = (self._clock() + self._ttl, classification)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                invalidations=0,
+                size=len(self._entries),
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -8,6 +8,7 @@ action intentionally observable and harmless by printing a single line.
 from __future__ import annotations
 
 import logging
+import typing
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +18,15 @@ class FakeEmailSender:
 
     This intentionally does not perform real I/O; it just logs the action so the
     end-to-end agent flow is visible from the CLI.
+
+    `body` may also be an iterable of chunks (e.g. a streamed draft); it is
+    consumed as it arrives, as a provider with chunked uploads would.
     """
 
-    def send_email(self, *, email_id: str, to: str, subject: str, body: str) -> None:
+    def send_email(self, *, email_id: str, to: str, subject: str, body: str | typing.Iterable[str]) -> None:
+        if not isinstance(body, str):
+            chunks = list(body)
+            body = "".join(chunks)
+            logger.debug("Email %s body received in %d chunk(s)", email_id, len(chunks))
         logger.info("Email sent with response: %s", body)
 
@@ -0,0 +1,232 @@
+"""In-process vector index for the `embedding_json` KB schema.
+
+When pgvector cannot be installed, `tenant_kb_chunks` stores embeddings as
+`embedding_json JSONB` and the database cannot rank them. `KBVectorIndex`
+keeps, per tenant, a contiguous float32 matrix of L2-normalized embeddings, so
+a top-k cosine query is one matrix-vector product plus `np.argpartition`
+(about 0.4 ms per 1,000 chunks at 1536 dimensions; the product is memory-bound,
+so latency grows linearly with the tenant's KB).
+
+Refreshes are incremental. The refresh query sends back the `(id, updated_at)`
+pairs the index already holds, and Postgres returns full rows (content and
+embedding) only for chunks that are new or changed. Known chunks come back as
+bare ids, so deletions show up as missing ids. A tenant is refreshed on first
+use, after a `tenant_kb_chunks` notification marks it dirty (see
+`TenantCacheInvalidator`), and at least every `max_age_seconds` as a safety net.
+"""
+
+from __future__ import annotations
+
+import collections
+import dataclasses
+import datetime
+import logging
+import threading
+import time
+import typing
+
+import numpy as np
+
+from agents.shared.schemas import KBChunk
+
+logger = logging.getLogger(__name__)
+
+# Full rows only for chunks the index does not hold at the same `updated_at`.
+# Columns: id, updated_at, changed, content, metadata, source_uri, source_type, embedding_json.
+KB_INDEX_REFRESH_SQL = """
+    SELECT
+        c.id::text,
+        c.updated_at,
+        known.id IS NULL AS changed,
+        CASE WHEN known.id IS NULL THEN c.content END,
+        CASE WHEN known.id IS NULL THEN c.metadata END,
+        CASE WHEN known.id IS NULL THEN c.source_uri END,
+        CASE WHEN known.id IS NULL THEN c.source_type END,
+        CASE WHEN known.id IS NULL THEN c.embedding_json END
+    FROM tenant_kb_chunks c
+    LEFT JOIN unnest(%s::uuid[], %s::timestamptz[]) AS known(id, updated_at)
+        ON known.id = c.id AND known.updated_at = c.updated_at
+    WHERE c.tenant_id = %s
+    ORDER BY c.doc_id, c.chunk_index
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class _TenantSnapshot:
+    """Immutable per-tenant index state; searches read it without locking."""
+
+    ids: tuple[str, ...]
+    updated_at: tuple[datetime.datetime, ...]
+    chunks: tuple[KBChunk, ...]
+    vectors: tuple[np.ndarray | None, ...]  # Normalized rows, None when the stored embedding is unusable.
+    matrix: np.ndarray  # (searchable rows, dim) float32, C-contiguous.
+    rows: np.ndarray  # Matrix row -> position in `chunks`.
+    loaded_at: float
+
+
+class KBVectorIndex:
+    """Per-tenant cosine top-k over `embedding_json`, refreshed incrementally.
+
+    Thread-safe. Tenants beyond `max_tenants` are evicted least recently
+    used first.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_tenants: int = 256,
+        max_age_seconds: float = 300.0,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self._max_tenants = max_tenants
+        self._max_age = max_age_seconds
+        self._clock = clock
+        self._snapshots: collections.OrderedDict[str, _TenantSnapshot] = collections.OrderedDict()
+        self._dirty: set[str] = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def needs_refresh(self, tenant_id: str) -> bool:
+        with self._lock:
+            snapshot = self._snapshots.get(tenant_id)
+            return (
+                snapshot is None
+                or tenant_id in self._dirty
+                or self._clock() - snapshot.loaded_at >= self._max_age
+            )
+
+    def refresh_params(self, tenant_id: str) -> tuple[tuple[typing.Any, ...], int]:
+        """Return `(KB_INDEX_REFRESH_SQL params, generation)` for the tenant's current snapshot."""
+
+        with self._lock:
+            snapshot = self._snapshots.get(tenant_id)
+            generation = self._generation
+        ids = list(snapshot.ids) if snapshot else []
+        updated_at = list(snapshot.updated_at) if snapshot else []
+        return (ids, updated_at, tenant_id), generation
+
+    def apply_refresh(self, tenant_id: str, rows: typing.Sequence[typing.Sequence[typing.Any]], generation: int) -> None:
+        """Merge `KB_INDEX_REFRESH_SQL` rows into the tenant's snapshot.
+
+        A tenant marked dirty after `generation` stays dirty, so the change
+        that raced this refresh is picked up by the next lookup.
+        """
+
+        with self._lock:
+            base = self._snapshots.get(tenant_id)
+        known: dict[str, tuple[KBChunk, np.ndarray | None]] = {}
+        if base is not None:
+            known = {chunk_id: (base.chunks[i], base.vectors[i]) for i, chunk_id in enumerate(base.ids)}
+
+        ids: list[str] = []
+        updated_at: list[datetime.datetime] = []
+        chunks: list[KBChunk] = []
+        vectors: list[np.ndarray | None] = []
+        changed = 0
+        for chunk_id, row_updated_at, is_changed, content, metadata, source_uri, source_type, embedding in rows:
+            if is_changed:
+                metadata = metadata or {}
+                chunk: KBChunk = {
+                    "content": content,
+                    "metadata": metadata,
+                    "source_uri": source_uri or metadata.get("source_uri"),
+                    "source_type": source_type or metadata.get("source_type"),
+                }
+                vector = _normalized(embedding)
+                changed += 1
+            elif chunk_id in known:
+                chunk, vector = known[chunk_id]
+            else:
+                continue  # Cannot happen for a consistent base snapshot; skip rather than guess.
+            ids.append(chunk_id)
+            updated_at.append(row_updated_at)
+            chunks.append(chunk)
+            vectors.append(vector)
+
+        matrix, positions = _stack(vectors)
+        snapshot = _TenantSnapshot(
+            ids=tuple(ids),
+            updated_at=tuple(updated_at),
+            chunks=tuple(chunks),
+            vectors=tuple(vectors),
+            matrix=matrix,
+            rows=positions,
+            loaded_at=self._clock(),
+        )
+        with self._lock:
+            self._snapshots[tenant_id] = snapshot
+            self._snapshots.move_to_end(tenant_id)
+            if generation == self._generation:
+                self._dirty.discard(tenant_id)
+            while len(self._snapshots) > self._max_tenants:
+                evicted, _ = self._snapshots.popitem(last=False)
+                self._dirty.discard(evicted)
+        logger.debug(
+            "KB index for %s: %d chunk(s), %d reloaded, %d searchable",
+            tenant_id,
+            len(ids),
+            changed,
+            len(positions),
+        )
+
+    def search(self, tenant_id: str, query_vector: typing.Sequence[float], top_k: int) -> list[KBChunk]:
+        """Top-k chunks by cosine similarity, best first, with `score` set."""
+
+        with self._lock:
+            snapshot = self._snapshots.get(tenant_id)
+        if snapshot is None or top_k < 1 or not len(snapshot.rows):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape != (snapshot.matrix.shape[1],):
+            logger.warning(
+                "Query embedding has %d dimension(s), KB index for %s has %d",
+                query.size,
+                tenant_id,
+                snapshot.matrix.shape[1],
+            )
+            return []
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0:
+            return []
+        scores = snapshot.matrix @ (query / norm)
+        k = min(top_k, scores.shape[0])
+        best = np.argpartition(scores, -k)[-k:]
+        best = best[np.argsort(-scores[best])]
+        return [{**snapshot.chunks[snapshot.rows[i]], "score": float(scores[i])} for i in best]
+
+    def invalidate(self, tenant_id: str | None = None) -> None:
+        """Mark one tenant (or every tenant) for an incremental refresh on next use."""
+
+        with self._lock:
+            self._generation += 1
+            if tenant_id is None:
+                self._dirty.update(self._snapshots)
+            elif tenant_id in self._snapshots:
+                self._dirty.add(tenant_id)
+
+
+def _normalized(embedding: typing.Any) -> np.ndarray | None:
+    if not isinstance(embedding, list) or not embedding:
+        return None
+    try:
+        vector = np.asarray(embedding, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    norm = float(np.linalg.norm(vector))
+    if vector.ndim != 1 or norm == 0.0 or not np.isfinite(norm):
+        return None  # Placeholder zero vectors (dev seed) can never match.
+    return vector / norm
+
+
+def _stack(vectors: list[np.ndarray | None]) -> tuple[np.ndarray, np.ndarray]:
+    """Stack usable vectors of the majority dimension into one contiguous matrix."""
+
+    sizes = collections.Counter(v.shape[0] for v in vectors if v is not None)
+    if not sizes:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.intp)
+    dim = sizes.most_common(1)[0][0]
+    positions = [i for i, v in enumerate(vectors) if v is not None and v.shape[0] == dim]
+    if len(positions) < sum(sizes.values()):
+        logger.warning("Skipping %d KB embedding(s) whose dimension is not %d", sum(sizes.values()) - len(positions), dim)
+    matrix = np.ascontiguousarray(np.stack([vectors[i] for i in positions]), dtype=np.float32)
+    return matrix, np.asarray(positions, dtype=np.intp)
@@ -0,0 +1,114 @@
+"""Per-tenant chat model routers.
+
+`agents.shared.model_routing` picks a model per task (classification,
+drafting, summarization) from a set of routes. Which routes a tenant gets is
+tenant configuration: `tenants.config` holds its `plan` (enterprise tenants
+draft with a larger model) and an optional `model_routes` override, e.g.
+
+    {"plan": "growth",
+     "model_routes": {"drafting": {"model": "gemma3:12b", "fallbacks": ["gemma3:4b"], "timeout": 90}}}
+
+`TenantModelRouting` turns that configuration into a `ModelRouter` and keeps
+it per tenant for `ttl_seconds`, so a worker reads `tenants.config` once per
+tenant and TTL instead of once per run; configuration edits take effect within
+the TTL. A malformed override is logged and ignored (the plan's routes apply),
+so a bad edit cannot fail the tenant's runs. When `tenants.config` cannot be
+read, the plan-less routes are used for that run and nothing is cached.
+
+Routers are immutable and hand out the shared, process-wide chat model
+clients, so one router is safely used by concurrent runs.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import typing
+
+from agents.shared import model_routing
+from agents.shared.model_routing import ModelRoute, ModelRouter
+
+logger = logging.getLogger(__name__)
+
+MODEL_ROUTES_KEY = "model_routes"  # Key of the per-tenant override in `tenants.config`.
+
+
+class TenantModelRouting:
+    """Thread-safe TTL cache of `ModelRouter`s keyed by tenant."""
+
+    def __init__(
+        self,
+        *,
+        base_routes: typing.Mapping[str, ModelRoute] | None = None,
+        ttl_seconds: float = 300.0,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.base_routes = dict(base_routes if base_routes is not None else model_routing.DEFAULT_ROUTES)
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._routers: dict[str, tuple[float, ModelRouter]] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, tenant_id: str) -> ModelRouter | None:
+        """Return the tenant's router while it is fresh, else None."""
+
+        with self._lock:
+            entry = self._routers.get(tenant_id)
+            if entry is not None and entry[0] > self._clock():
+                return entry[1]
+            self._routers.pop(tenant_id, None)
+            return None
+
+    def build(self, tenant_id: str, config: typing.Mapping[str, typing.Any] | None) -> ModelRouter:
+        """Resolve the tenant's routes from its `tenants.config` (None: lookup failed) and cache the router."""
+
+        plan = None
+        overrides = None
+        if config is not None:
+            plan = config.get("plan") if isinstance(config.get("plan"), str) else None
+            overrides = config.get(MODEL_ROUTES_KEY)
+        try:
+            if overrides is not None and not isinstance(overrides, typing.Mapping):
+                raise ValueError(f"{MODEL_ROUTES_KEY} must be an object")
+            routes = model_routing.resolve_routes(plan=plan, overrides=overrides, base=self.base_routes)
+        except ValueError as exc:
+            logger.warning("Ignoring %s of tenant %s: %s", MODEL_ROUTES_KEY, tenant_id, exc)
+            routes = model_routing.resolve_routes(plan=plan, base=self.base_routes)
+
+        router = ModelRouter(routes)
+        if config is not None and self._ttl > 0:
+            with self._lock:
+                self._routers[tenant_id] = (self._clock() + self._ttl, router)
+        return router
+
+    def invalidate(self, tenant_id: str | None = None) -> None:
+        """Drop one tenant's router, or every router when `tenant_id` is None."""
+
+        with self._lock:
+            if tenant_id is None:
+                self._routers.clear()
+            else:
+                self._routers.pop(tenant_id, None)
+
+
+def chat_model_for(capabilities: typing.Any, tenant_id: str) -> typing.Any:
+    """Return the `llm` dependency for a run: the tenant's router, or the default chat model without routing."""
+
+    routing: TenantModelRouting | None = getattr(capabilities, "model_routing", None)
+    if routing is None:
+        from agents.shared import clients as shared_clients
+
+        return shared_clients.get_chat_model()
+    return routing.cached(tenant_id) or routing.build(tenant_id, capabilities.tenant_config(tenant_id))
+
+
+async def achat_model_for(capabilities: typing.Any, tenant_id: str) -> typing.Any:
+    """Async `chat_model_for`: `tenants.config` is read through the async bundle."""
+
+    routing: TenantModelRouting | None = getattr(capabilities, "model_routing", None)
+    if routing is None:
+        from agents.shared import clients as shared_clients
+
+        return shared_clients.get_chat_model()
+    return routing.cached(tenant_id) or routing.build(tenant_id, await capabilities.tenant_config(tenant_id))
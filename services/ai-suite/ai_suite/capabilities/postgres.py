@@ -9,82 +9,127 @@ by the runtime (`services/ai-suite`) rather than `agents/` so that:
 
 from __future__ import annotations
 
+import contextlib
+import contextvars
+import dataclasses
+import itertools
 import json
 import logging
+import threading
 import typing
 import uuid
 
-import psycopg2
-
 from agents.general.imel import tools as imel_tools
 from agents.general.kall import tools as kall_tools
 from agents.shared.schemas import KBChunk, TenantProfile, Ticket, TicketStatus, TicketType
+from ai_suite.capabilities.classification_cache import ClassificationCache
+from ai_suite.capabilities.kb_index import KB_INDEX_REFRESH_SQL, KBVectorIndex
+from ai_suite.capabilities.model_routing import TenantModelRouting
+from ai_suite.capabilities.postgres_listen import TENANT_KB_CHANNEL, QueueListener
+from ai_suite.capabilities.postgres_pool import ConnectionPool, PoolConfig, PoolMetrics
+from ai_suite.capabilities.postgres_sql import (
+    APPEND_CHECKPOINT_SQL,
+    APPEND_PENDING_WRITES_SQL,
+    COMPLETE_RUN_SQL,
+    CREATE_RUN_SQL,
+    ENQUEUE_ORDER_UPDATE_SQL,
+    GET_CACHED_CLASSIFICATION_SQL,
+    GET_TICKET_SQL,
+    INSERT_INTERCOM_SQL,
+    INSERT_TICKET_SQL,
+    KB_HYBRID_CHUNKS_SQL,
+    KB_SEARCH_SETTINGS_SQL,
+    KB_VECTOR_SUPPORT_SQL,
+    LOAD_CHECKPOINTS_SQL,
+    PUT_CACHED_CLASSIFICATION_SQL,
+    RECENT_KB_CHUNKS_SQL,
+    SET_RUN_STATUS_SQL,
+    TENANT_CONFIG_SQL,
+    TENANT_PROFILE_SQL,
+    UPDATE_TICKET_STATUS_SQL,
+    KBSearchConfig,
+    StateCheckpoint,
+    checkpoint_params,
+    intercom_params,
+    kb_chunk_from_hybrid_row,
+    kb_chunk_from_row,
+    kb_search_for_server,
+    kb_search_params,
+    new_ticket,
+    order_update_params,
+    state_checkpoint_from_row,
+    tenant_profile_from_row,
+    ticket_from_row,
+    vector_literal,
+)
+from ai_suite.capabilities.tenant_cache import TenantCacheInvalidator, TenantProfileCache
 
 logger = logging.getLogger(__name__)
 
 
-def _normalize_brand_kit(value: object) -> dict[str, str]:
-    """Normalize brand kit metadata into string values (defensive for authoring)."""
+class UnitOfWork:
+    """One connection and one open transaction shared by every write in a scope.
 
-    if not isinstance(value, dict):
-        return {}
-    normalized: dict[str, str] = {}
-    for key, raw in value.items():
-        if not key:
-            continue
-        try:
-            normalized[str(key)] = str(raw) if raw is not None else ""
-        except Exception:
-            continue
-    return {k: v for k, v in normalized.items() if k and v}
+    While a unit of work is active, `PostgresCapabilities._cursor()` reuses its
+    connection instead of checking out a new one, so repos and tools see each
+    other's uncommitted writes and everything commits (or rolls back) together.
+    Blocks whose errors the caller swallows (KB lookups, cache and tenant
+    lookups) ask for a savepoint so a failure does not poison the surrounding
+    transaction; other failures abort the run anyway, so they skip the extra
+    round trips.
+    """
+
+    def __init__(self, connection: typing.Any):
+        self.connection = connection
+        # Graph branches may run on executor threads; serialize statement blocks on the shared connection.
+        self._lock = threading.RLock()
+        self._savepoints = itertools.count(1)
+
+    @contextlib.contextmanager
+    def cursor(self, *, savepoint: bool = False) -> typing.Iterator[typing.Any]:
+        """Yield a cursor on the shared transaction, scoped by a savepoint if asked."""
 
+        with self._lock, self.connection.cursor() as cur:
+            if not savepoint:
+                yield cur
+                return
+            savepoint_name = f"uow_sp_{next(self._savepoints)}"
+            cur.execute(f"SAVEPOINT {savepoint_name}")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {savepoint_name}")
+                raise
+            cur.execute(f"RELEASE SAVEPOINT {savepoint_name}")
 
-def _normalize_keywords(value: object) -> list[str] | None:
-    """Normalize keywords metadata into a list of non-empty strings."""
+    def commit(self) -> None:
+        """Commit what has been written so far and keep the unit of work open."""
 
-    if value is None:
-        return None
-    if isinstance(value, list):
-        keywords = [str(v).strip() for v in value if v is not None]
-        keywords = [k for k in keywords if k]
-        return keywords or None
-    if isinstance(value, str):
-        keywords = [part.strip() for part in value.split(",")]
-        keywords = [k for k in keywords if k]
-        return keywords or None
-    return None
+        with self._lock:
+            self.connection.commit()
 
 
 class _RunsRepo:
     """Minimal repository for `runs` lifecycle management."""
 
-    def __init__(self, parent: "PostgresCapabilities"):
+    def __init__(self, parent: PostgresCapabilities):
         self._parent = parent
 
     def create_run(self, *, run_id: str, tenant_id: str, agent_id: str, input_payload: dict[str, typing.Any]) -> None:
-        conn = self._parent._conn()
-        try:
-            with conn, conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO runs (id, tenant_id, agent_id, status, input_payload)
-                    VALUES (%s, %s, %s, 'running', %s)
-                    """,
-                    (run_id, tenant_id, agent_id, json.dumps(input_payload)),
-                )
-        finally:
-            conn.close()
+        with self._parent._cursor() as cur:
+            cur.execute(CREATE_RUN_SQL, (run_id, tenant_id, agent_id, json.dumps(input_payload)))
 
-    def mark_completed(self, *, run_id: str) -> None:
-        conn = self._parent._conn()
-        try:
-            with conn, conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE runs SET status='completed', updated_at=NOW() WHERE id=%s",
-                    (run_id,),
-                )
-        finally:
-            conn.close()
+    def mark_completed(self, *, run_id: str, metadata: dict[str, typing.Any] | None = None) -> None:
+        """Mark a run completed, merging `metadata` (if any) into `runs.metadata`."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(COMPLETE_RUN_SQL, (json.dumps(metadata or {}), run_id))
+
+    def mark_running(self, *, run_id: str) -> None:
+        """Put an existing run back to `running` before resuming it from its checkpoints."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(SET_RUN_STATUS_SQL, ("running", run_id))
 
     def mark_failed(self, *, run_id: str) -> None:
         """Mark a run as failed.
@@ -93,38 +138,739 @@ class _RunsRepo:
         structured error payload for observability and replay tooling.
         """
 
-        conn = self._parent._conn()
-        try:
-            with conn, conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE runs SET status='failed', updated_at=NOW() WHERE id=%s",
-                    (run_id,),
-                )
-        finally:
-            conn.close()
+        with self._parent._cursor() as cur:
+            cur.execute(SET_RUN_STATUS_SQL, ("failed", run_id))
 
 
 class _StateRepo:
-    """Minimal checkpoint store writing to `agent_state`."""
+    """Checkpoint store writing to `agent_state` (see `ai_suite.capabilities.checkpointer`).
 
-    def __init__(self, parent: "PostgresCapabilities"):
+    Checkpoint writes are durable as soon as they return: inside a unit of work
+    they commit the transaction so far, so a step's tool writes and the
+    checkpoint recording them become visible together and survive a later
+    failure of the run.
+    """
+
+    def __init__(self, parent: PostgresCapabilities):
         self._parent = parent
 
-    def save_checkpoint(self, *, run_id: str, checkpoint_id: int, node_name: str, state_data: dict[str, typing.Any]) -> None:
-        conn = self._parent._conn()
-        try:
-            with conn, conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO agent_state (run_id, checkpoint_id, state_data, node_name)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (run_id)
-                    DO UPDATE SET checkpoint_id=EXCLUDED.checkpoint_id, state_data=EXCLUDED.state_data, node_name=EXCLUDED.node_name
-                    """,
-                    (run_id, checkpoint_id, json.dumps(state_data), node_name),
+    def append_checkpoint(
+        self,
+        *,
+        run_id: str,
+        node_name: str,
+        state_data: dict[str, typing.Any],
+        graph_checkpoint: dict[str, typing.Any],
+        metadata: dict[str, typing.Any],
+    ) -> int:
+        """Insert the run's next checkpoint row and return its `checkpoint_id`."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                APPEND_CHECKPOINT_SQL,
+                checkpoint_params(
+                    run_id=run_id,
+                    node_name=node_name,
+                    state_data=state_data,
+                    graph_checkpoint=graph_checkpoint,
+                    metadata=metadata,
+                ),
+            )
+            checkpoint_id = int(cur.fetchone()[0])
+        self._commit_progress()
+        return checkpoint_id
+
+    def append_pending_writes(
+        self, *, run_id: str, graph_checkpoint_id: str, writes: list[dict[str, typing.Any]]
+    ) -> None:
+        """Record writes of tasks that finished after `graph_checkpoint_id` was taken."""
+
+        if not writes:
+            return
+        with self._parent._cursor() as cur:
+            cur.execute(APPEND_PENDING_WRITES_SQL, (json.dumps(writes), run_id, graph_checkpoint_id))
+        self._commit_progress()
+
+    def load_checkpoints(self, *, run_id: str) -> list[StateCheckpoint]:
+        """Return every graph checkpoint of a run, oldest first."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(LOAD_CHECKPOINTS_SQL, (run_id,))
+            rows = cur.fetchall()
+        return [state_checkpoint_from_row(row) for row in rows]
+
+    def _commit_progress(self) -> None:
+        uow = self._parent.current_unit_of_work()
+        if uow is not None:
+            uow.commit()
+
+
+@dataclasses.dataclass(frozen=True)
+class ClaimedInstruction:
+    """A `human_instructions_queue` row leased to one worker."""
+
+    instruction_id: str
+    tenant_id: str
+    agent_id: str
+    instruction: str
+    payload: dict[str, typing.Any]
+    attempts: int
+    max_attempts: int
+    last_run_id: str | None
+
+
+class _InstructionsRepo:
+    """Lease-based consumer surface for `human_instructions_queue`.
+
+    Claims use `FOR UPDATE SKIP LOCKED` so any number of workers can poll the
+    same table without blocking each other or double-processing a row. A claim
+    is a lease: the owning worker must heartbeat before `lease_expires_at`, or
+    another worker may reclaim the row (counting it as a new attempt).
+    """
+
+    def __init__(self, parent: PostgresCapabilities):
+        self._parent = parent
+
+    def claim(
+        self,
+        *,
+        worker_id: str,
+        agent_ids: typing.Sequence[str],
+        limit: int,
+        lease_seconds: float,
+        tenant_id: str | None = None,
+    ) -> list[ClaimedInstruction]:
+        """Lease up to `limit` claimable instructions, highest priority first.
+
+        Claimable means queued (or failed and past its backoff), or leased by a
+        worker whose lease has expired. Rows that have used up `max_attempts`
+        are left for `reap()` to mark dead.
+        """
+
+        if limit <= 0 or not agent_ids:
+            return []
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                WITH claimable AS (
+                    SELECT id
+                    FROM human_instructions_queue
+                    WHERE (
+                            (status IN ('queued', 'failed') AND available_at <= NOW())
+                         OR (status IN ('acknowledged', 'in_progress') AND lease_expires_at < NOW())
+                          )
+                      AND attempts < max_attempts
+                      AND (expires_at IS NULL OR expires_at > NOW())
+                      AND COALESCE(assigned_agent_id, target_agent_id) = ANY(%(agent_ids)s)
+                      AND (%(tenant_id)s::text IS NULL OR tenant_id = %(tenant_id)s)
+                    ORDER BY
+                        CASE priority WHEN 'urgent' THEN 0 WHEN 'high' THEN 1 WHEN 'normal' THEN 2 ELSE 3 END,
+                        available_at,
+                        created_at
+                    LIMIT %(limit)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE human_instructions_queue q
+                SET status = 'acknowledged',
+                    attempts = q.attempts + 1,
+                    assigned_agent_id = COALESCE(q.assigned_agent_id, q.target_agent_id),
+                    assigned_by = COALESCE(q.assigned_by, 'system'),
+                    assigned_at = COALESCE(q.assigned_at, NOW()),
+                    locked_at = NOW(),
+                    locked_by = %(worker_id)s,
+                    lease_expires_at = NOW() + make_interval(secs => %(lease_seconds)s),
+                    acknowledged_at = NOW(),
+                    acknowledged_by = %(worker_id)s,
+                    updated_at = NOW()
+                FROM claimable
+                WHERE q.id = claimable.id
+                RETURNING q.id, q.tenant_id, q.assigned_agent_id, q.instruction, q.payload,
+                          q.attempts, q.max_attempts, q.last_run_id
+                """,
+                {
+                    "agent_ids": list(agent_ids),
+                    "tenant_id": tenant_id,
+                    "limit": limit,
+                    "worker_id": worker_id,
+                    "lease_seconds": float(lease_seconds),
+                },
+            )
+            rows = cur.fetchall()
+
+        return [
+            ClaimedInstruction(
+                instruction_id=str(row[0]),
+                tenant_id=str(row[1]),
+                agent_id=str(row[2]),
+                instruction=str(row[3] or ""),
+                payload=dict(row[4] or {}),
+                attempts=int(row[5]),
+                max_attempts=int(row[6]),
+                last_run_id=str(row[7]) if row[7] else None,
+            )
+            for row in rows
+        ]
+
+    def mark_in_progress(self, *, instruction_id: str, worker_id: str) -> bool:
+        """Move a leased instruction to `in_progress`. Returns False if the lease was lost."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE human_instructions_queue
+                SET status = 'in_progress', updated_at = NOW()
+                WHERE id = %s AND locked_by = %s
+                """,
+                (instruction_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+    def heartbeat(self, *, instruction_ids: typing.Sequence[str], worker_id: str, lease_seconds: float) -> set[str]:
+        """Extend the leases this worker still holds; return the ids still owned."""
+
+        if not instruction_ids:
+            return set()
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE human_instructions_queue
+                SET lease_expires_at = NOW() + make_interval(secs => %s), updated_at = NOW()
+                WHERE id = ANY(%s::uuid[])
+                  AND locked_by = %s
+                  AND status IN ('acknowledged', 'in_progress')
+                RETURNING id
+                """,
+                (float(lease_seconds), list(instruction_ids), worker_id),
+            )
+            return {str(row[0]) for row in cur.fetchall()}
+
+    def complete(
+        self,
+        *,
+        instruction_id: str,
+        worker_id: str,
+        run_id: str | None,
+        agent_response: str,
+        result_payload: dict[str, typing.Any],
+    ) -> bool:
+        """Mark an instruction completed and release its lease."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE human_instructions_queue
+                SET status = 'completed',
+                    completed_at = NOW(),
+                    completed_by = %s,
+                    last_run_id = COALESCE((SELECT id FROM runs WHERE id = %s::uuid), last_run_id),
+                    agent_response = %s,
+                    result_payload = %s,
+                    last_error = NULL,
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                WHERE id = %s AND locked_by = %s
+                """,
+                (worker_id, run_id, agent_response, json.dumps(result_payload), instruction_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+    def fail(
+        self,
+        *,
+        instruction_id: str,
+        worker_id: str,
+        run_id: str | None,
+        error: str,
+        retry_in_seconds: float,
+        permanent: bool = False,
+    ) -> str | None:
+        """Record a failed attempt and release the lease.
+
+        The row goes back to `failed` with `available_at` pushed out by the
+        backoff, or to `dead` once `max_attempts` is used up (or the error is
+        `permanent`). Returns the new status, or None if the lease was lost.
+        """
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE human_instructions_queue
+                SET status = CASE
+                        WHEN %(permanent)s OR attempts >= max_attempts THEN 'dead'
+                        ELSE 'failed'
+                    END,
+                    available_at = NOW() + make_interval(secs => %(retry_in)s),
+                    last_error = %(error)s,
+                    last_run_id = COALESCE((SELECT id FROM runs WHERE id = %(run_id)s::uuid), last_run_id),
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                WHERE id = %(instruction_id)s AND locked_by = %(worker_id)s
+                RETURNING status
+                """,
+                {
+                    "permanent": permanent,
+                    "retry_in": float(retry_in_seconds),
+                    "error": error[:4000],
+                    "run_id": run_id,
+                    "instruction_id": instruction_id,
+                    "worker_id": worker_id,
+                },
+            )
+            row = cur.fetchone()
+            return str(row[0]) if row else None
+
+    def resumable_run(self, *, instruction_id: str, tenant_id: str) -> str | None:
+        """Return the latest failed, checkpointed run of an instruction, if any.
+
+        Only `failed` runs qualify: their worker marked them after the
+        execution ended. A run still `running` may belong to a worker that lost
+        its lease but keeps executing (the heartbeat cannot stop it), so
+        resuming it would interleave two executions on one `run_id`; the
+        caller starts a fresh run instead. Runs are matched on the
+        `instruction_id` the worker puts into every run's input payload.
+        """
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                SELECT r.id
+                FROM runs r
+                WHERE r.tenant_id = %s
+                  AND r.input_payload->>'instruction_id' = %s
+                  AND r.status = 'failed'
+                  AND EXISTS (SELECT 1 FROM agent_state s WHERE s.run_id = r.id)
+                ORDER BY r.created_at DESC
+                LIMIT 1
+                """,
+                (tenant_id, instruction_id),
+            )
+            row = cur.fetchone()
+            return str(row[0]) if row else None
+
+    def reap(self) -> tuple[int, int]:
+        """Expire overdue instructions and bury abandoned leases with no attempts left.
+
+        Returns `(expired, dead)` row counts.
+        """
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE human_instructions_queue
+                SET status = 'expired', updated_at = NOW()
+                WHERE status IN ('queued', 'failed')
+                  AND expires_at IS NOT NULL
+                  AND expires_at <= NOW()
+                """
+            )
+            expired = cur.rowcount
+            cur.execute(
+                """
+                UPDATE human_instructions_queue
+                SET status = 'dead',
+                    last_error = COALESCE(last_error, 'lease expired after final attempt'),
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                WHERE status IN ('acknowledged', 'in_progress')
+                  AND lease_expires_at < NOW()
+                  AND attempts >= max_attempts
+                """
+            )
+            dead = cur.rowcount
+        return expired, dead
+
+
+@dataclasses.dataclass(frozen=True)
+class OutboxEvent:
+    """An `event_outbox` row claimed for delivery."""
+
+    event_id: str
+    tenant_id: str
+    run_id: str | None
+    event_type: str
+    payload: dict[str, typing.Any]
+    idempotency_key: str | None
+    attempts: int
+
+
+class _OutboxRepo:
+    """Batch consumer surface for the transactional `event_outbox`.
+
+    Producers insert rows inside their own transaction; this repo claims them in
+    batches with `FOR UPDATE SKIP LOCKED` and settles a whole batch with one
+    UPDATE per outcome, so throughput is bounded by handlers, not round trips.
+    """
+
+    def __init__(self, parent: PostgresCapabilities):
+        self._parent = parent
+
+    def claim(
+        self,
+        *,
+        worker_id: str,
+        event_types: typing.Sequence[str],
+        limit: int,
+        max_attempts: int,
+        lock_timeout_seconds: float,
+    ) -> list[OutboxEvent]:
+        """Mark up to `limit` deliverable events `processing` and return them.
+
+        Deliverable means queued, failed and past its backoff, or stuck in
+        `processing` longer than `lock_timeout_seconds` (the dispatcher died).
+        Only event types with a registered handler are claimed.
+        """
+
+        if limit <= 0 or not event_types:
+            return []
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                WITH claimable AS (
+                    SELECT id
+                    FROM event_outbox
+                    WHERE event_type = ANY(%(event_types)s)
+                      AND attempts < %(max_attempts)s
+                      AND (
+                            (status IN ('queued', 'failed') AND available_at <= NOW())
+                         OR (status = 'processing' AND locked_at < NOW() - make_interval(secs => %(lock_timeout)s))
+                          )
+                    ORDER BY available_at
+                    LIMIT %(limit)s
+                    FOR UPDATE SKIP LOCKED
                 )
-        finally:
-            conn.close()
+                UPDATE event_outbox e
+                SET status = 'processing',
+                    attempts = e.attempts + 1,
+                    locked_at = NOW(),
+                    locked_by = %(worker_id)s,
+                    updated_at = NOW()
+                FROM claimable
+                WHERE e.id = claimable.id
+                RETURNING e.id, e.tenant_id, e.run_id, e.event_type, e.payload, e.idempotency_key, e.attempts
+                """,
+                {
+                    "event_types": list(event_types),
+                    "max_attempts": max_attempts,
+                    "lock_timeout": float(lock_timeout_seconds),
+                    "limit": limit,
+                    "worker_id": worker_id,
+                },
+            )
+            rows = cur.fetchall()
+
+        return [
+            OutboxEvent(
+                event_id=str(row[0]),
+                tenant_id=str(row[1]),
+                run_id=str(row[2]) if row[2] else None,
+                event_type=str(row[3]),
+                payload=dict(row[4] or {}),
+                idempotency_key=str(row[5]) if row[5] else None,
+                attempts=int(row[6]),
+            )
+            for row in rows
+        ]
+
+    def mark_succeeded(self, *, event_ids: typing.Sequence[str], worker_id: str) -> int:
+        """Settle a batch of delivered events in one statement."""
+
+        if not event_ids:
+            return 0
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE event_outbox
+                SET status = 'succeeded',
+                    processed_at = NOW(),
+                    last_error = NULL,
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    updated_at = NOW()
+                WHERE id = ANY(%s::uuid[]) AND locked_by = %s
+                """,
+                (list(event_ids), worker_id),
+            )
+            return cur.rowcount
+
+    def mark_failed(
+        self,
+        *,
+        failures: typing.Sequence[tuple[str, str, float, bool]],
+        worker_id: str,
+        max_attempts: int,
+    ) -> dict[str, str]:
+        """Settle failed deliveries in one statement.
+
+        `failures` holds `(event_id, error, retry_in_seconds, permanent)` tuples.
+        Rows go to `dead` when permanent or out of attempts, otherwise to
+        `failed` with `available_at` pushed out by the backoff. Returns the new
+        status per event id.
+        """
+
+        if not failures:
+            return {}
+        ids, errors, delays, permanent = zip(*failures, strict=True)
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE event_outbox e
+                SET status = CASE WHEN f.permanent OR e.attempts >= %(max_attempts)s THEN 'dead' ELSE 'failed' END,
+                    last_error = f.error,
+                    available_at = NOW() + make_interval(secs => f.retry_in),
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    updated_at = NOW()
+                FROM unnest(%(ids)s::uuid[], %(errors)s::text[], %(delays)s::float8[], %(permanent)s::bool[])
+                     AS f(id, error, retry_in, permanent)
+                WHERE e.id = f.id AND e.locked_by = %(worker_id)s
+                RETURNING e.id, e.status
+                """,
+                {
+                    "ids": list(ids),
+                    "errors": [error[:4000] for error in errors],
+                    "delays": [float(delay) for delay in delays],
+                    "permanent": list(permanent),
+                    "worker_id": worker_id,
+                    "max_attempts": max_attempts,
+                },
+            )
+            return {str(row[0]): str(row[1]) for row in cur.fetchall()}
+
+    def reap(self, *, max_attempts: int, lock_timeout_seconds: float) -> int:
+        """Bury events abandoned in `processing` after their final attempt."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE event_outbox
+                SET status = 'dead',
+                    last_error = COALESCE(last_error, 'dispatcher lock expired after final attempt'),
+                    locked_at = NULL,
+                    locked_by = NULL,
+                    updated_at = NOW()
+                WHERE status = 'processing'
+                  AND attempts >= %s
+                  AND locked_at < NOW() - make_interval(secs => %s)
+                """,
+                (max_attempts, float(lock_timeout_seconds)),
+            )
+            return cur.rowcount
+
+
+@dataclasses.dataclass(frozen=True)
+class IntercomMessage:
+    """An `agent_intercom_queue` row delivered to a consuming agent."""
+
+    message_id: str
+    tenant_id: str
+    run_id: str | None
+    from_agent_id: str
+    to_agent_id: str
+    kind: str
+    message: str
+    payload: dict[str, typing.Any]
+    reply_to: str | None
+
+
+class _IntercomRepo:
+    """Recipient-side consumer surface for `agent_intercom_queue`.
+
+    Messages move `queued` → `delivered` when claimed and `delivered` →
+    `consumed` once the recipient agent has run. Claims are scoped to one tenant
+    and a set of recipients so they walk `idx_aiq_recipient`
+    (tenant_id, to_agent_id, status). A message left `delivered` longer than
+    `redeliver_after_seconds` (its consumer died or hit a transient error) is
+    claimable again, so delivery is at-least-once. Consumers `heartbeat` the
+    messages they are still running so slow runs are not redelivered.
+    """
+
+    def __init__(self, parent: PostgresCapabilities):
+        self._parent = parent
+
+    def pending_tenants(
+        self,
+        *,
+        to_agent_ids: typing.Sequence[str],
+        redeliver_after_seconds: float,
+        tenant_id: str | None = None,
+    ) -> list[str]:
+        """Return enabled tenants with at least one claimable message for `to_agent_ids`."""
+
+        if not to_agent_ids:
+            return []
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                SELECT t.id
+                FROM tenants t
+                WHERE COALESCE(t.enabled, TRUE)
+                  AND (%(tenant_id)s::text IS NULL OR t.id = %(tenant_id)s)
+                  AND EXISTS (
+                        SELECT 1
+                        FROM agent_intercom_queue q
+                        WHERE q.tenant_id = t.id
+                          AND q.to_agent_id = ANY(%(agent_ids)s)
+                          AND (
+                                q.status = 'queued'
+                             OR (q.status = 'delivered'
+                                 AND q.delivered_at < NOW() - make_interval(secs => %(redeliver_after)s))
+                              )
+                          AND (q.expires_at IS NULL OR q.expires_at > NOW())
+                      )
+                ORDER BY t.id
+                """,
+                {
+                    "agent_ids": list(to_agent_ids),
+                    "tenant_id": tenant_id,
+                    "redeliver_after": float(redeliver_after_seconds),
+                },
+            )
+            return [str(row[0]) for row in cur.fetchall()]
+
+    def claim(
+        self,
+        *,
+        tenant_id: str,
+        to_agent_ids: typing.Sequence[str],
+        limit: int,
+        redeliver_after_seconds: float,
+    ) -> list[IntercomMessage]:
+        """Mark up to `limit` of one tenant's messages `delivered` and return them.
+
+        The whole batch is claimed in a single transaction, highest priority
+        first, with `FOR UPDATE SKIP LOCKED` so concurrent consumers split the
+        backlog instead of queueing behind each other.
+        """
+
+        if limit <= 0 or not to_agent_ids:
+            return []
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                WITH claimable AS (
+                    SELECT id
+                    FROM agent_intercom_queue
+                    WHERE tenant_id = %(tenant_id)s
+                      AND to_agent_id = ANY(%(agent_ids)s)
+                      AND (
+                            status = 'queued'
+                         OR (status = 'delivered'
+                             AND delivered_at < NOW() - make_interval(secs => %(redeliver_after)s))
+                          )
+                      AND (expires_at IS NULL OR expires_at > NOW())
+                    ORDER BY
+                        CASE priority WHEN 'urgent' THEN 0 WHEN 'high' THEN 1 WHEN 'normal' THEN 2 ELSE 3 END,
+                        created_at
+                    LIMIT %(limit)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE agent_intercom_queue q
+                SET status = 'delivered',
+                    delivered_at = NOW(),
+                    updated_at = NOW()
+                FROM claimable
+                WHERE q.id = claimable.id
+                RETURNING q.id, q.tenant_id, q.run_id, q.from_agent_id, q.to_agent_id, q.kind,
+                          q.message, q.payload, q.reply_to
+                """,
+                {
+                    "tenant_id": tenant_id,
+                    "agent_ids": list(to_agent_ids),
+                    "limit": limit,
+                    "redeliver_after": float(redeliver_after_seconds),
+                },
+            )
+            rows = cur.fetchall()
+
+        return [
+            IntercomMessage(
+                message_id=str(row[0]),
+                tenant_id=str(row[1]),
+                run_id=str(row[2]) if row[2] else None,
+                from_agent_id=str(row[3]),
+                to_agent_id=str(row[4]),
+                kind=str(row[5]),
+                message=str(row[6] or ""),
+                payload=dict(row[7] or {}),
+                reply_to=str(row[8]) if row[8] else None,
+            )
+            for row in rows
+        ]
+
+    def heartbeat(self, *, message_ids: typing.Sequence[str]) -> set[str]:
+        """Restart the redelivery clock of in-flight messages; returns the ids still `delivered`."""
+
+        if not message_ids:
+            return set()
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE agent_intercom_queue
+                SET delivered_at = NOW(), updated_at = NOW()
+                WHERE id = ANY(%s::uuid[]) AND status = 'delivered'
+                RETURNING id
+                """,
+                (list(message_ids),),
+            )
+            return {str(row[0]) for row in cur.fetchall()}
+
+    def mark_consumed(self, *, message_ids: typing.Sequence[str], consumer_id: str) -> int:
+        """Settle a batch of handled messages in one statement."""
+
+        if not message_ids:
+            return 0
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE agent_intercom_queue
+                SET status = 'consumed',
+                    consumed_at = NOW(),
+                    consumed_by = %s,
+                    updated_at = NOW()
+                WHERE id = ANY(%s::uuid[]) AND status = 'delivered'
+                """,
+                (consumer_id, list(message_ids)),
+            )
+            return cur.rowcount
+
+    def mark_failed(self, *, message_ids: typing.Sequence[str], consumer_id: str) -> int:
+        """Take messages the recipient can never handle out of circulation."""
+
+        if not message_ids:
+            return 0
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE agent_intercom_queue
+                SET status = 'failed',
+                    consumed_by = %s,
+                    updated_at = NOW()
+                WHERE id = ANY(%s::uuid[]) AND status = 'delivered'
+                """,
+                (consumer_id, list(message_ids)),
+            )
+            return cur.rowcount
+
+    def reap(self) -> int:
+        """Expire undelivered or unconsumed messages past `expires_at`."""
+
+        with self._parent._cursor() as cur:
+            cur.execute(
+                """
+                UPDATE agent_intercom_queue
+                SET status = 'expired', updated_at = NOW()
+                WHERE status IN ('queued', 'delivered')
+                  AND expires_at IS NOT NULL
+                  AND expires_at <= NOW()
+                """
+            )
+            return cur.rowcount
 
 
 class PostgresCapabilities:
@@ -135,19 +881,174 @@ class PostgresCapabilities:
     via methods and small repos so they can be composed per-agent.
     """
 
-    def __init__(self, *, database_url: str):
+    def __init__(
+        self,
+        *,
+        database_url: str,
+        pool: ConnectionPool | None = None,
+        pool_config: PoolConfig | None = None,
+        tenant_cache: TenantProfileCache | None = None,
+        embeddings: typing.Any = None,
+        kb_search: KBSearchConfig | None = None,
+        kb_index: KBVectorIndex | None = None,
+        classification_cache: ClassificationCache | None = None,
+        model_routing: TenantModelRouting | None = None,
+    ):
         self._database_url = database_url
+        # A caller-provided pool may be shared by several bundles; only close pools we created.
+        self._owns_pool = pool is None
+        self._pool = pool or ConnectionPool(database_url=database_url, config=pool_config)
+        self.tenant_cache = tenant_cache
+        self._tenant_cache_invalidator: TenantCacheInvalidator | None = None
+        # LangChain `Embeddings` used to embed KB queries; None keeps recency-only retrieval.
+        self.embeddings = embeddings
+        self.kb_search = kb_search or KBSearchConfig()
+        # Used only on the `embedding_json` schema; stays empty with pgvector.
+        self.kb_index = kb_index or KBVectorIndex()
+        self._kb_has_vector: bool | None = None
+        # None disables classification caching (every email goes to the model).
+        self.classification_cache = classification_cache
+        # None runs every task on the default chat model (see `model_routing.chat_model_for`).
+        self.model_routing = model_routing
+        self._active_uow: contextvars.ContextVar[UnitOfWork | None] = contextvars.ContextVar(
+            f"postgres_uow_{id(self)}", default=None
+        )
         self.runs = _RunsRepo(self)
         self.state = _StateRepo(self)
+        self.instructions = _InstructionsRepo(self)
+        self.outbox = _OutboxRepo(self)
+        self.intercom = _IntercomRepo(self)
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return self._pool
+
+    def pool_metrics(self) -> PoolMetrics:
+        """Return checkout/wait/size metrics for the underlying connection pool."""
+
+        return self._pool.metrics()
+
+    def tenant_config(self, tenant_id: str) -> dict[str, typing.Any] | None:
+        """Return the tenant's `tenants.config` ({} for an unknown tenant, None when the lookup fails)."""
 
-    def _conn(self):
-        """Create a new connection.
+        try:
+            with self._cursor(savepoint=True) as cur:
+                cur.execute(TENANT_CONFIG_SQL, (tenant_id,))
+                row = cur.fetchone()
+        except Exception as exc:
+            logger.info("Tenant config lookup failed for %s: %s", tenant_id, exc)
+            return None
+        return dict(row[0] or {}) if row else {}
+
+    def listen(self, *channels: str) -> QueueListener:
+        """Open a dedicated LISTEN connection for queue insert notifications."""
 
-        For production you would use pooling and a unit-of-work abstraction.
-        For this refactor we keep it simple and explicit.
+        return QueueListener(database_url=self._database_url, channels=channels)
+
+    def watch_tenant_cache(self) -> None:
+        """Invalidate cached tenant KB state as soon as `tenant_kb_chunks` changes (until `close()`).
+
+        Covers the tenant profile cache and the `embedding_json` vector index.
+        Long-running consumers call this once; without it, both only refresh
+        when their TTL / max age expires.
         """
 
-        return psycopg2.connect(self._database_url)
+        if self._tenant_cache_invalidator is not None:
+            return
+        caches = [cache for cache in (self.tenant_cache, self.kb_index) if cache is not None]
+        self._tenant_cache_invalidator = TenantCacheInvalidator(
+            caches=caches, listener=self.listen(TENANT_KB_CHANNEL)
+        )
+        self._tenant_cache_invalidator.start()
+
+    def close(self) -> None:
+        """Release pooled connections owned by this bundle."""
+
+        if self._tenant_cache_invalidator is not None:
+            self._tenant_cache_invalidator.stop()
+            self._tenant_cache_invalidator = None
+        if self._owns_pool:
+            self._pool.close()
+
+    @contextlib.contextmanager
+    def unit_of_work(self) -> typing.Iterator[UnitOfWork]:
+        """Run every write in the `with` block on one connection and commit once.
+
+        Nested calls join the outer unit of work. On error the whole transaction
+        rolls back; the exception propagates to the caller.
+        """
+
+        current = self._active_uow.get()
+        if current is not None:
+            yield current
+            return
+
+        with self._pool.connection() as conn:
+            uow = UnitOfWork(conn)
+            token = self._active_uow.set(uow)
+            try:
+                with conn:
+                    yield uow
+            finally:
+                self._active_uow.reset(token)
+
+    def current_unit_of_work(self) -> UnitOfWork | None:
+        """Return the unit of work active in this context, if any."""
+
+        return self._active_uow.get()
+
+    @contextlib.contextmanager
+    def _cursor(self, *, savepoint: bool = False) -> typing.Iterator[typing.Any]:
+        """Yield a cursor inside a transaction on a pooled connection.
+
+        Outside a unit of work the transaction commits when the block exits
+        cleanly and rolls back on error; the connection then goes back to the
+        pool instead of being closed. Inside a unit of work the block joins the
+        shared transaction and nothing is committed until the unit of work ends.
+        Pass `savepoint=True` for blocks whose errors the caller catches and
+        swallows, so a failure there leaves the unit of work usable.
+        """
+
+        uow = self._active_uow.get()
+        if uow is not None:
+            with uow.cursor(savepoint=savepoint) as cur:
+                yield cur
+            return
+
+        with self._pool.connection() as conn, conn, conn.cursor() as cur:
+            yield cur
+
+    def _kb_backend(self) -> typing.Literal["pgvector", "index", "recency"]:
+        """How `lookup_company_kb` ranks chunks for this bundle.
+
+        Without an embeddings model there is nothing to rank by. Otherwise the
+        schema decides: the pgvector column is searched in SQL, `embedding_json`
+        through the in-process `kb_index`. The column check runs once per
+        bundle (the schema picks the column at creation time), together with
+        the pgvector version check of `kb_search`.
+        """
+
+        if self.embeddings is None:
+            return "recency"
+        if self._kb_has_vector is None:
+            with self._cursor(savepoint=True) as cur:
+                cur.execute(KB_VECTOR_SUPPORT_SQL)
+                has_vector, pgvector_version = cur.fetchone()
+            self._kb_has_vector = bool(has_vector)
+            if self._kb_has_vector:
+                self.kb_search = kb_search_for_server(self.kb_search, pgvector_version)
+            else:
+                logger.info("tenant_kb_chunks has no pgvector column; KB lookups use the in-process index.")
+        return "pgvector" if self._kb_has_vector else "index"
+
+    def _refresh_kb_index(self, tenant_id: str) -> None:
+        if not self.kb_index.needs_refresh(tenant_id):
+            return
+        params, generation = self.kb_index.refresh_params(tenant_id)
+        with self._cursor(savepoint=True) as cur:
+            cur.execute(KB_INDEX_REFRESH_SQL, params)
+            rows = cur.fetchall()
+        self.kb_index.apply_refresh(tenant_id, rows, generation)
 
     def _create_agent_handoff(
         self,
@@ -162,65 +1063,32 @@ class PostgresCapabilities:
     ) -> None:
         """Queue an inter-agent message/handoff in the shared intercom table."""
 
-        conn = self._conn()
         try:
-            with conn, conn.cursor() as cur:
+            with self._cursor() as cur:
                 cur.execute(
-                    """
-                    INSERT INTO agent_intercom_queue
-                    (tenant_id, run_id, from_agent_id, to_agent_id, kind, message, payload, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, 'queued')
-                    """,
-                    (
-                        tenant_id,
-                        run_id,
-                        from_agent_id,
-                        to_agent_id,
-                        kind,
-                        message or "",
-                        json.dumps(payload or {}),
+                    INSERT_INTERCOM_SQL,
+                    intercom_params(
+                        tenant_id=tenant_id,
+                        run_id=run_id,
+                        from_agent_id=from_agent_id,
+                        to_agent_id=to_agent_id,
+                        kind=kind,
+                        message=message,
+                        payload=payload,
                     ),
                 )
         except Exception as exc:
             logger.error("Failed to queue handoff: %s", exc)
             raise
-        finally:
-            conn.close()
 
     def _get_ticket(self, *, ticket_id: str, tenant_id: str) -> Ticket | None:
         """Load a ticket row and map DB status to the agent-facing `Ticket` schema."""
 
-        conn = self._conn()
-        try:
-            with conn, conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT id, ticket_type, status, email_id, sender_email, summary, raw_email
-                    FROM tickets
-                    WHERE id = %s AND tenant_id = %s
-                    LIMIT 1
-                    """,
-                    (ticket_id, tenant_id),
-                )
-                row = cur.fetchone()
-        finally:
-            conn.close()
-
-        if not row:
-            return None
+        with self._cursor() as cur:
+            cur.execute(GET_TICKET_SQL, (ticket_id, tenant_id))
+            row = cur.fetchone()
 
-        db_status = str(row[2] or "").lower()
-        # The database supports intermediate statuses; agent-facing schema keeps a smaller contract.
-        mapped_status: TicketStatus = "closed" if db_status in {"closed", "resolved"} else "open"
-        return {
-            "ticket_id": str(row[0]),
-            "ticket_type": typing.cast(TicketType, str(row[1])),
-            "status": mapped_status,
-            "email_id": str(row[3] or ""),
-            "sender_email": str(row[4] or ""),
-            "summary": str(row[5] or ""),
-            "raw_email": str(row[6] or ""),
-        }
+        return ticket_from_row(row) if row else None
 
     def _update_ticket_status(self, *, ticket_id: str, tenant_id: str, status: TicketStatus) -> None:
         """Persist a ticket status transition.
@@ -228,19 +1096,8 @@ class PostgresCapabilities:
         Agent-facing `closed` maps to DB status `closed`; `open` maps to `open`.
         """
 
-        conn = self._conn()
-        try:
-            with conn, conn.cursor() as cur:
-                cur.execute(
-                    """
-                    UPDATE tickets
-                    SET status = %s, updated_at = NOW()
-                    WHERE id = %s AND tenant_id = %s
-                    """,
-                    (status, ticket_id, tenant_id),
-                )
-        finally:
-            conn.close()
+        with self._cursor() as cur:
+            cur.execute(UPDATE_TICKET_STATUS_SQL, (status, ticket_id, tenant_id))
 
     # --- Imel tool implementation (implements the agent contract) ---
     def imel_tools(self) -> imel_tools.ImelTools:
@@ -258,93 +1115,53 @@ class PostgresCapabilities:
             def load_tenant_profile(self, *, tenant_id: str | None) -> TenantProfile | None:
                 if not tenant_id:
                     return None
-                conn = parent._conn()
+                cache = parent.tenant_cache
+                if cache is not None:
+                    found, cached = cache.get(tenant_id)
+                    if found:
+                        return cached
+                    generation = cache.generation
                 try:
-                    with conn, conn.cursor() as cur:
-                        cur.execute(
-                            """
-                            SELECT content, metadata, source_uri
-                            FROM tenant_kb_chunks
-                            WHERE tenant_id = %s
-                              AND (source_type = 'brand_kit' OR metadata->>'kind' = 'brand_kit')
-                            ORDER BY updated_at DESC
-                            LIMIT 1
-                            """,
-                            (tenant_id,),
-                        )
+                    with parent._cursor(savepoint=True) as cur:
+                        cur.execute(TENANT_PROFILE_SQL, (tenant_id,))
                         row = cur.fetchone()
                 except Exception as exc:
                     logger.info("Tenant profile lookup failed for %s: %s", tenant_id, exc)
-                    return None
-                finally:
-                    conn.close()
-
-                if not row:
-                    return None
-
-                content, metadata, source_uri = row
-                metadata = metadata or {}
-                profile: TenantProfile = {
-                    "brand_kit_text": content or "",
-                    "brand_kit": _normalize_brand_kit(metadata.get("brand_kit")),
-                    "source_uri": str(source_uri or metadata.get("source_uri", "") or ""),
-                }
-
-                agent_display_name = metadata.get("agent_display_name")
-                if isinstance(agent_display_name, str) and agent_display_name.strip():
-                    profile["agent_display_name"] = agent_display_name.strip()
-
-                tone = metadata.get("tone")
-                if isinstance(tone, str) and tone.strip():
-                    profile["tone"] = tone.strip()
-
-                email_signature = metadata.get("email_signature")
-                if isinstance(email_signature, str) and email_signature.strip():
-                    profile["email_signature"] = email_signature.strip()
-
-                keywords = _normalize_keywords(metadata.get("keywords"))
-                if keywords:
-                    profile["keywords"] = keywords
+                    return None  # Not cached: the next run retries the lookup.
 
+                profile = tenant_profile_from_row(row) if row else None
+                if cache is not None:
+                    cache.put(tenant_id, profile, generation=generation)
                 return profile
 
             def lookup_company_kb(self, *, tenant_id: str | None, query: str, top_k: int = 5) -> list[KBChunk]:
-                # Placeholder implementation: without real embeddings, similarity search is not meaningful.
-                # We return the most recent chunks so inquiries still get some context in dev.
                 if not tenant_id:
                     return []
-                conn = parent._conn()
                 try:
-                    with conn, conn.cursor() as cur:
-                        cur.execute(
-                            """
-                            SELECT content, metadata, source_uri, source_type
-                            FROM tenant_kb_chunks
-                            WHERE tenant_id = %s
-                            ORDER BY updated_at DESC
-                            LIMIT %s
-                            """,
-                            (tenant_id, top_k),
+                    backend = parent._kb_backend() if query.strip() else "recency"
+                    if backend == "index":
+                        parent._refresh_kb_index(tenant_id)
+                        return parent.kb_index.search(tenant_id, parent.embeddings.embed_query(query), top_k)
+                    if backend == "pgvector":
+                        vector = vector_literal(parent.embeddings.embed_query(query))
+                        sql, params = kb_search_params(
+                            parent.kb_search, tenant_id=tenant_id, query=query, vector=vector, top_k=top_k
                         )
-                        rows = cur.fetchall()
+                        with parent._cursor(savepoint=True) as cur:
+                            cur.execute(KB_SEARCH_SETTINGS_SQL, parent.kb_search.settings())
+                            cur.execute(sql, params)
+                            rows = cur.fetchall()
+                        if sql is KB_HYBRID_CHUNKS_SQL:
+                            return [kb_chunk_from_hybrid_row(row) for row in rows]
+                    else:
+                        with parent._cursor(savepoint=True) as cur:
+                            cur.execute(RECENT_KB_CHUNKS_SQL, (tenant_id, top_k))
+                            rows = cur.fetchall()
                 except Exception as exc:
                     logger.info("KB lookup failed for %s: %s", tenant_id, exc)
                     return []
-                finally:
-                    conn.close()
-
-                snippets: list[KBChunk] = []
-                for content, metadata, source_uri, source_type in rows:
-                    metadata = metadata or {}
-                    snippets.append(
-                        {
-                            "content": content,
-                            "metadata": metadata,
-                            "source_uri": source_uri or metadata.get("source_uri"),
-                            "source_type": source_type or metadata.get("source_type"),
-                        }
-                    )
-                return snippets
+
+                return [kb_chunk_from_row(row) for row in rows]
 
             def create_ticket(
                 self,
@@ -356,16 +1173,11 @@ class PostgresCapabilities:
                 raw_email: str,
                 tenant_id: str,
             ) -> Ticket:
-                conn = parent._conn()
                 ticket_id = str(uuid.uuid4())
                 try:
-                    with conn, conn.cursor() as cur:
+                    with parent._cursor() as cur:
                         cur.execute(
-                            """
-                            INSERT INTO tickets (id, tenant_id, email_id, ticket_type, status, sender_email, summary, raw_email)
-                            VALUES (%s, %s, %s, %s, 'open', %s, %s, %s)
-                            RETURNING id
-                            """,
+                            INSERT_TICKET_SQL,
                             (ticket_id, tenant_id, email_id, ticket_type, sender_email, summary, raw_email),
                         )
                         row = cur.fetchone()
@@ -374,17 +1186,14 @@ class PostgresCapabilities:
                 except Exception as exc:
                     logger.error("Failed to insert ticket: %s", exc)
                     raise
-                finally:
-                    conn.close()
-                return {
-                    "ticket_id": ticket_id,
-                    "ticket_type": ticket_type,
-                    "status": "open",
-                    "email_id": email_id,
-                    "sender_email": sender_email,
-                    "summary": summary,
-                    "raw_email": raw_email,
-                }
+                return new_ticket(
+                    ticket_id=ticket_id,
+                    ticket_type=ticket_type,
+                    email_id=email_id,
+                    sender_email=sender_email,
+                    summary=summary,
+                    raw_email=raw_email,
+                )
 
             def create_agent_handoff(
                 self,
@@ -415,22 +1224,57 @@ class PostgresCapabilities:
                 summary: str,
                 details: dict[str, typing.Any],
             ) -> None:
-                conn = parent._conn()
-                payload = {"email_id": email_id, "summary": summary, "details": details}
                 try:
-                    with conn, conn.cursor() as cur:
+                    with parent._cursor() as cur:
                         cur.execute(
-                            """
-                            INSERT INTO event_outbox (tenant_id, event_type, payload, status)
-                            VALUES (%s, 'update_order', %s, 'queued')
-                            """,
-                            (tenant_id, json.dumps(payload)),
+                            ENQUEUE_ORDER_UPDATE_SQL,
+                            order_update_params(
+                                tenant_id=tenant_id, email_id=email_id, summary=summary, details=details
+                            ),
                         )
                 except Exception as exc:
                     logger.error("Failed to write outbox event: %s", exc)
                     raise
-                finally:
-                    conn.close()
+
+            def get_cached_classification(
+                self, *, tenant_id: str | None, content_key: str
+            ) -> dict[str, typing.Any] | None:
+                cache = parent.classification_cache
+                if not tenant_id or cache is None:
+                    return None
+                cached = cache.get(tenant_id, content_key)
+                if cached is not None or not cache.shared:
+                    return cached
+                try:
+                    with parent._cursor(savepoint=True) as cur:
+                        cur.execute(GET_CACHED_CLASSIFICATION_SQL, (tenant_id, content_key))
+                        row = cur.fetchone()
+                except Exception as exc:
+                    logger.info("Classification cache lookup failed for %s: %s", tenant_id, exc)
+                    return None
+                if row is None:
+                    return None
+                cache.put(tenant_id, content_key, row[0])
+                return row[0]
+
+            def cache_classification(
+                self, *, tenant_id: str | None, content_key: str, classification: dict[str, typing.Any]
+            ) -> None:
+                cache = parent.classification_cache
+                if not tenant_id or cache is None:
+                    return
+                cache.put(tenant_id, content_key, classification)
+                if not cache.shared:
+                    return
+                try:
+                    with parent._cursor(savepoint=True) as cur:
+                        cur.execute(
+                            PUT_CACHED_CLASSIFICATION_SQL,
+                            (tenant_id, content_key, json.dumps(classification), cache.ttl_seconds),
+                        )
+                except Exception as exc:
+                    # A missed cache write only costs a model call on the next repeat.
+                    logger.info("Classification cache write failed for %s: %s", tenant_id, exc)
 
         return typing.cast(imel_tools.ImelTools, _ImelToolsImpl())
 
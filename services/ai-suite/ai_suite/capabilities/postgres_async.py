@@ -0,0 +1,638 @@
+"""Asyncio Postgres capability bundle (psycopg 3).
+
+`PostgresCapabilities` is synchronous psycopg2: a run blocks its thread while
+it waits on the database, and `llm.invoke` blocks it for far longer. This
+module is the asyncio twin used by `arun_agent_once`: the same repos and agent
+tool contracts (`AsyncImelTools`, `AsyncKallTools`) on top of psycopg's
+`AsyncConnectionPool`, so one event loop can keep hundreds of runs in flight
+while they wait on the model.
+
+SQL statements and row mappers come from `postgres_sql.py`, shared with
+`postgres.py`; only the driver calls differ. Transactions follow the sync unit
+of work with one difference: the async unit of work does not pin a connection
+for the whole run. A run spends most of its time awaiting the model, and
+holding a pooled connection (and an open transaction) through that wait would
+cap concurrent runs at the pool size. A connection is checked out by the first write and handed back by
+`commit()`, which checkpoint writes call after every task. Read-only
+statement blocks use a short pooled transaction of their own unless the unit
+of work already holds a connection. Each task's writes are therefore still
+committed together with its checkpoint.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import json
+import logging
+import typing
+import uuid
+
+import psycopg_pool
+
+from agents.general.imel import tools as imel_tools
+from agents.general.kall import tools as kall_tools
+from agents.shared.schemas import KBChunk, TenantProfile, Ticket, TicketStatus, TicketType
+from ai_suite.capabilities.classification_cache import ClassificationCache
+from ai_suite.capabilities.kb_index import KB_INDEX_REFRESH_SQL, KBVectorIndex
+from ai_suite.capabilities.model_routing import TenantModelRouting
+from ai_suite.capabilities.postgres_pool import PoolConfig
+from ai_suite.capabilities.postgres_sql import (
+    APPEND_CHECKPOINT_SQL,
+    APPEND_PENDING_WRITES_SQL,
+    COMPLETE_RUN_SQL,
+    CREATE_RUN_SQL,
+    ENQUEUE_ORDER_UPDATE_SQL,
+    GET_CACHED_CLASSIFICATION_SQL,
+    GET_TICKET_SQL,
+    INSERT_INTERCOM_SQL,
+    INSERT_TICKET_SQL,
+    KB_HYBRID_CHUNKS_SQL,
+    KB_SEARCH_SETTINGS_SQL,
+    KB_VECTOR_SUPPORT_SQL,
+    LOAD_CHECKPOINTS_SQL,
+    PUT_CACHED_CLASSIFICATION_SQL,
+    RECENT_KB_CHUNKS_SQL,
+    SET_RUN_STATUS_SQL,
+    TENANT_CONFIG_SQL,
+    TENANT_PROFILE_SQL,
+    UPDATE_TICKET_STATUS_SQL,
+    KBSearchConfig,
+    StateCheckpoint,
+    checkpoint_params,
+    intercom_params,
+    kb_chunk_from_hybrid_row,
+    kb_chunk_from_row,
+    kb_search_for_server,
+    kb_search_params,
+    new_ticket,
+    order_update_params,
+    state_checkpoint_from_row,
+    tenant_profile_from_row,
+    ticket_from_row,
+    vector_literal,
+)
+from ai_suite.capabilities.tenant_cache import TenantProfileCache
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncUnitOfWork:
+    """The writes of a run, committed in steps, each step on a briefly held pooled connection.
+
+    `connection` is None until a write needs it and again after each
+    `commit()`, so a run awaiting the model holds no connection. Statement
+    blocks are serialized with a lock because LangGraph may run parallel
+    branches of the same run as concurrent tasks on this connection.
+    """
+
+    def __init__(self, pool: psycopg_pool.AsyncConnectionPool):
+        self._pool = pool
+        self.connection: typing.Any = None
+        self._lock = asyncio.Lock()
+        self._savepoints = itertools.count(1)
+
+    @contextlib.asynccontextmanager
+    async def cursor(
+        self, *, read_only: bool = False, savepoint: bool = False
+    ) -> typing.AsyncIterator[typing.Any]:
+        """Yield a cursor on the current step's transaction, scoped by a savepoint if asked.
+
+        With `read_only=True` and no write pending, the cursor runs on a short
+        pooled transaction instead, so a read does not check out a connection
+        that would then be held until the next commit.
+        """
+
+        await self._lock.acquire()
+        if read_only and self.connection is None:
+            self._lock.release()
+            async with self._pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+                yield cur
+            return
+
+        try:
+            if self.connection is None:
+                self.connection = await self._pool.getconn()
+            async with self.connection.cursor() as cur:
+                if not savepoint:
+                    yield cur
+                    return
+                savepoint_name = f"uow_sp_{next(self._savepoints)}"
+                await cur.execute(f"SAVEPOINT {savepoint_name}")
+                try:
+                    yield cur
+                except BaseException:
+                    await cur.execute(f"ROLLBACK TO SAVEPOINT {savepoint_name}")
+                    raise
+                await cur.execute(f"RELEASE SAVEPOINT {savepoint_name}")
+        finally:
+            self._lock.release()
+
+    async def commit(self) -> None:
+        """Commit what has been written so far and return the connection to the pool."""
+
+        async with self._lock:
+            await self._release(commit=True)
+
+    async def rollback(self) -> None:
+        """Discard the uncommitted writes and return the connection to the pool."""
+
+        async with self._lock:
+            await self._release(commit=False)
+
+    async def _release(self, *, commit: bool) -> None:
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        try:
+            if commit:
+                await connection.commit()
+            else:
+                await connection.rollback()
+        finally:
+            await self._pool.putconn(connection)
+
+
+class _AsyncRunsRepo:
+    """Async `runs` lifecycle management."""
+
+    def __init__(self, parent: AsyncPostgresCapabilities):
+        self._parent = parent
+
+    async def create_run(
+        self, *, run_id: str, tenant_id: str, agent_id: str, input_payload: dict[str, typing.Any]
+    ) -> None:
+        async with self._parent._cursor() as cur:
+            await cur.execute(CREATE_RUN_SQL, (run_id, tenant_id, agent_id, json.dumps(input_payload)))
+
+    async def mark_completed(self, *, run_id: str, metadata: dict[str, typing.Any] | None = None) -> None:
+        async with self._parent._cursor() as cur:
+            await cur.execute(COMPLETE_RUN_SQL, (json.dumps(metadata or {}), run_id))
+
+    async def mark_running(self, *, run_id: str) -> None:
+        async with self._parent._cursor() as cur:
+            await cur.execute(SET_RUN_STATUS_SQL, ("running", run_id))
+
+    async def mark_failed(self, *, run_id: str) -> None:
+        async with self._parent._cursor() as cur:
+            await cur.execute(SET_RUN_STATUS_SQL, ("failed", run_id))
+
+
+class _AsyncStateRepo:
+    """Async checkpoint store writing to `agent_state`; same durability rules as `_StateRepo`."""
+
+    def __init__(self, parent: AsyncPostgresCapabilities):
+        self._parent = parent
+
+    async def append_checkpoint(
+        self,
+        *,
+        run_id: str,
+        node_name: str,
+        state_data: dict[str, typing.Any],
+        graph_checkpoint: dict[str, typing.Any],
+        metadata: dict[str, typing.Any],
+    ) -> int:
+        async with self._parent._cursor() as cur:
+            await cur.execute(
+                APPEND_CHECKPOINT_SQL,
+                checkpoint_params(
+                    run_id=run_id,
+                    node_name=node_name,
+                    state_data=state_data,
+                    graph_checkpoint=graph_checkpoint,
+                    metadata=metadata,
+                ),
+            )
+            row = await cur.fetchone()
+        await self._commit_progress()
+        return int(row[0])
+
+    async def append_pending_writes(
+        self, *, run_id: str, graph_checkpoint_id: str, writes: list[dict[str, typing.Any]]
+    ) -> None:
+        if not writes:
+            return
+        async with self._parent._cursor() as cur:
+            await cur.execute(APPEND_PENDING_WRITES_SQL, (json.dumps(writes), run_id, graph_checkpoint_id))
+        await self._commit_progress()
+
+    async def load_checkpoints(self, *, run_id: str) -> list[StateCheckpoint]:
+        async with self._parent._cursor(read_only=True) as cur:
+            await cur.execute(LOAD_CHECKPOINTS_SQL, (run_id,))
+            rows = await cur.fetchall()
+        return [state_checkpoint_from_row(row) for row in rows]
+
+    async def _commit_progress(self) -> None:
+        uow = self._parent.current_unit_of_work()
+        if uow is not None:
+            await uow.commit()
+
+
+class AsyncPostgresCapabilities:
+    """Asyncio capability bundle backed by a psycopg 3 `AsyncConnectionPool`.
+
+    The pool is opened lazily by `open()` (or `async with`), because psycopg
+    pools must be opened inside a running event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        database_url: str,
+        pool: psycopg_pool.AsyncConnectionPool | None = None,
+        pool_config: PoolConfig | None = None,
+        tenant_cache: TenantProfileCache | None = None,
+        embeddings: typing.Any = None,
+        kb_search: KBSearchConfig | None = None,
+        kb_index: KBVectorIndex | None = None,
+        classification_cache: ClassificationCache | None = None,
+        model_routing: TenantModelRouting | None = None,
+    ):
+        config = pool_config or PoolConfig()
+        self._database_url = database_url
+        self._owns_pool = pool is None
+        self._pool = pool or psycopg_pool.AsyncConnectionPool(
+            conninfo=database_url,
+            min_size=config.min_size,
+            max_size=config.max_size,
+            timeout=config.timeout,
+            max_lifetime=config.max_lifetime,
+            max_idle=config.max_idle,
+            check=psycopg_pool.AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        self._active_uow: contextvars.ContextVar[AsyncUnitOfWork | None] = contextvars.ContextVar(
+            f"postgres_async_uow_{id(self)}", default=None
+        )
+        # Thread-safe, so one cache can be shared with (and invalidated by) a sync bundle's watcher.
+        self.tenant_cache = tenant_cache
+        self.embeddings = embeddings  # LangChain `Embeddings`; queries are embedded with `aembed_query`.
+        self.kb_search = kb_search or KBSearchConfig()
+        self.kb_index = kb_index or KBVectorIndex()
+        self._kb_has_vector: bool | None = None
+        self.classification_cache = classification_cache
+        self.model_routing = model_routing
+        self.runs = _AsyncRunsRepo(self)
+        self.state = _AsyncStateRepo(self)
+
+    @property
+    def pool(self) -> psycopg_pool.AsyncConnectionPool:
+        return self._pool
+
+    def pool_stats(self) -> dict[str, int]:
+        """Return psycopg pool counters (size, waiting, requests, wait time, ...)."""
+
+        return self._pool.get_stats()
+
+    async def tenant_config(self, tenant_id: str) -> dict[str, typing.Any] | None:
+        """Async `PostgresCapabilities.tenant_config`."""
+
+        try:
+            async with self._cursor(read_only=True, savepoint=True) as cur:
+                await cur.execute(TENANT_CONFIG_SQL, (tenant_id,))
+                row = await cur.fetchone()
+        except Exception as exc:
+            logger.info("Tenant config lookup failed for %s: %s", tenant_id, exc)
+            return None
+        return dict(row[0] or {}) if row else {}
+
+    async def open(self) -> None:
+        if self._owns_pool:
+            await self._pool.open()
+
+    async def close(self) -> None:
+        """Release pooled connections owned by this bundle."""
+
+        if self._owns_pool:
+            await self._pool.close()
+
+    async def __aenter__(self) -> AsyncPostgresCapabilities:
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info: typing.Any) -> None:
+        await self.close()
+
+    @contextlib.asynccontextmanager
+    async def unit_of_work(self) -> typing.AsyncIterator[AsyncUnitOfWork]:
+        """Group the writes of the `async with` block; commit them on clean exit, roll back if it raised.
+
+        Same contract as `PostgresCapabilities.unit_of_work()` (nested calls
+        join the outer unit of work), except that no connection is held while
+        the block has no uncommitted writes; see `AsyncUnitOfWork`.
+        """
+
+        existing = self._active_uow.get()
+        if existing is not None:
+            yield existing
+            return
+
+        uow = AsyncUnitOfWork(self._pool)
+        token = self._active_uow.set(uow)
+        try:
+            yield uow
+        except BaseException:
+            await uow.rollback()
+            raise
+        else:
+            await uow.commit()
+        finally:
+            self._active_uow.reset(token)
+
+    def current_unit_of_work(self) -> AsyncUnitOfWork | None:
+        return self._active_uow.get()
+
+    @contextlib.asynccontextmanager
+    async def _cursor(
+        self, *, read_only: bool = False, savepoint: bool = False
+    ) -> typing.AsyncIterator[typing.Any]:
+        """Yield a cursor in the active unit of work, or in a short pooled transaction.
+
+        Pass `read_only=True` for blocks that only read, so they do not make
+        the unit of work check out a connection (see `AsyncUnitOfWork.cursor`),
+        and `savepoint=True` for blocks whose errors the caller swallows, as in
+        `PostgresCapabilities._cursor`.
+        """
+
+        uow = self._active_uow.get()
+        if uow is not None:
+            async with uow.cursor(read_only=read_only, savepoint=savepoint) as cur:
+                yield cur
+            return
+
+        async with self._pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+            yield cur
+
+    async def _kb_backend(self) -> typing.Literal["pgvector", "index", "recency"]:
+        """Async `PostgresCapabilities._kb_backend`."""
+
+        if self.embeddings is None:
+            return "recency"
+        if self._kb_has_vector is None:
+            async with self._cursor(read_only=True, savepoint=True) as cur:
+                await cur.execute(KB_VECTOR_SUPPORT_SQL)
+                has_vector, pgvector_version = await cur.fetchone()
+            self._kb_has_vector = bool(has_vector)
+            if self._kb_has_vector:
+                self.kb_search = kb_search_for_server(self.kb_search, pgvector_version)
+            else:
+                logger.info("tenant_kb_chunks has no pgvector column; KB lookups use the in-process index.")
+        return "pgvector" if self._kb_has_vector else "index"
+
+    async def _refresh_kb_index(self, tenant_id: str) -> None:
+        if not self.kb_index.needs_refresh(tenant_id):
+            return
+        params, generation = self.kb_index.refresh_params(tenant_id)
+        async with self._cursor(read_only=True, savepoint=True) as cur:
+            await cur.execute(KB_INDEX_REFRESH_SQL, params)
+            rows = await cur.fetchall()
+        self.kb_index.apply_refresh(tenant_id, rows, generation)
+
+    async def _create_agent_handoff(
+        self,
+        *,
+        tenant_id: str,
+        run_id: str | None,
+        from_agent_id: str,
+        to_agent_id: str,
+        kind: str = "handoff",
+        message: str | None = None,
+        payload: dict[str, typing.Any] | None = None,
+    ) -> None:
+        try:
+            async with self._cursor() as cur:
+                await cur.execute(
+                    INSERT_INTERCOM_SQL,
+                    intercom_params(
+                        tenant_id=tenant_id,
+                        run_id=run_id,
+                        from_agent_id=from_agent_id,
+                        to_agent_id=to_agent_id,
+                        kind=kind,
+                        message=message,
+                        payload=payload,
+                    ),
+                )
+        except Exception as exc:
+            logger.error("Failed to queue handoff: %s", exc)
+            raise
+
+    async def _get_ticket(self, *, ticket_id: str, tenant_id: str) -> Ticket | None:
+        async with self._cursor(read_only=True) as cur:
+            await cur.execute(GET_TICKET_SQL, (ticket_id, tenant_id))
+            row = await cur.fetchone()
+        return ticket_from_row(row) if row else None
+
+    async def _update_ticket_status(self, *, ticket_id: str, tenant_id: str, status: TicketStatus) -> None:
+        async with self._cursor() as cur:
+            await cur.execute(UPDATE_TICKET_STATUS_SQL, (status, ticket_id, tenant_id))
+
+    # --- Imel tool implementation (implements the async agent contract) ---
+    def imel_tools(self) -> imel_tools.AsyncImelTools:
+        """Return an object implementing `agents.general.imel.tools.AsyncImelTools`."""
+
+        parent = self
+
+        class _AsyncImelToolsImpl:
+            async def load_tenant_profile(self, *, tenant_id: str | None) -> TenantProfile | None:
+                if not tenant_id:
+                    return None
+                cache = parent.tenant_cache
+                if cache is not None:
+                    found, cached = cache.get(tenant_id)
+                    if found:
+                        return cached
+                    generation = cache.generation
+                try:
+                    async with parent._cursor(read_only=True, savepoint=True) as cur:
+                        await cur.execute(TENANT_PROFILE_SQL, (tenant_id,))
+                        row = await cur.fetchone()
+                except Exception as exc:
+                    logger.info("Tenant profile lookup failed for %s: %s", tenant_id, exc)
+                    return None
+                profile = tenant_profile_from_row(row) if row else None
+                if cache is not None:
+                    cache.put(tenant_id, profile, generation=generation)
+                return profile
+
+            async def lookup_company_kb(self, *, tenant_id: str | None, query: str, top_k: int = 5) -> list[KBChunk]:
+                if not tenant_id:
+                    return []
+                try:
+                    backend = await parent._kb_backend() if query.strip() else "recency"
+                    if backend == "index":
+                        await parent._refresh_kb_index(tenant_id)
+                        vector = await parent.embeddings.aembed_query(query)
+                        return parent.kb_index.search(tenant_id, vector, top_k)
+                    if backend == "pgvector":
+                        vector = vector_literal(await parent.embeddings.aembed_query(query))
+                        sql, params = kb_search_params(
+                            parent.kb_search, tenant_id=tenant_id, query=query, vector=vector, top_k=top_k
+                        )
+                        async with parent._cursor(read_only=True, savepoint=True) as cur:
+                            await cur.execute(KB_SEARCH_SETTINGS_SQL, parent.kb_search.settings())
+                            await cur.execute(sql, params)
+                            rows = await cur.fetchall()
+                        if sql is KB_HYBRID_CHUNKS_SQL:
+                            return [kb_chunk_from_hybrid_row(row) for row in rows]
+                    else:
+                        async with parent._cursor(read_only=True, savepoint=True) as cur:
+                            await cur.execute(RECENT_KB_CHUNKS_SQL, (tenant_id, top_k))
+                            rows = await cur.fetchall()
+                except Exception as exc:
+                    logger.info("KB lookup failed for %s: %s", tenant_id, exc)
+                    return []
+                return [kb_chunk_from_row(row) for row in rows]
+
+            async def create_ticket(
+                self,
+                *,
+                ticket_type: TicketType,
+                email_id: str,
+                sender_email: str,
+                summary: str,
+                raw_email: str,
+                tenant_id: str,
+            ) -> Ticket:
+                ticket_id = str(uuid.uuid4())
+                try:
+                    async with parent._cursor() as cur:
+                        await cur.execute(
+                            INSERT_TICKET_SQL,
+                            (ticket_id, tenant_id, email_id, ticket_type, sender_email, summary, raw_email),
+                        )
+                        row = await cur.fetchone()
+                        if row:
+                            ticket_id = str(row[0])
+                except Exception as exc:
+                    logger.error("Failed to insert ticket: %s", exc)
+                    raise
+                return new_ticket(
+                    ticket_id=ticket_id,
+                    ticket_type=ticket_type,
+                    email_id=email_id,
+                    sender_email=sender_email,
+                    summary=summary,
+                    raw_email=raw_email,
+                )
+
+            async def create_agent_handoff(
+                self,
+                *,
+                tenant_id: str,
+                run_id: str | None,
+                from_agent_id: str,
+                to_agent_id: str,
+                kind: str = "handoff",
+                message: str | None = None,
+                payload: dict[str, typing.Any] | None = None,
+            ) -> None:
+                await parent._create_agent_handoff(
+                    tenant_id=tenant_id,
+                    run_id=run_id,
+                    from_agent_id=from_agent_id,
+                    to_agent_id=to_agent_id,
+                    kind=kind,
+                    message=message,
+                    payload=payload,
+                )
+
+            async def process_order_update(
+                self,
+                *,
+                tenant_id: str,
+                email_id: str,
+                summary: str,
+                details: dict[str, typing.Any],
+            ) -> None:
+                try:
+                    async with parent._cursor() as cur:
+                        await cur.execute(
+                            ENQUEUE_ORDER_UPDATE_SQL,
+                            order_update_params(
+                                tenant_id=tenant_id, email_id=email_id, summary=summary, details=details
+                            ),
+                        )
+                except Exception as exc:
+                    logger.error("Failed to write outbox event: %s", exc)
+                    raise
+
+            async def get_cached_classification(
+                self, *, tenant_id: str | None, content_key: str
+            ) -> dict[str, typing.Any] | None:
+                cache = parent.classification_cache
+                if not tenant_id or cache is None:
+                    return None
+                cached = cache.get(tenant_id, content_key)
+                if cached is not None or not cache.shared:
+                    return cached
+                try:
+                    async with parent._cursor(read_only=True, savepoint=True) as cur:
+                        await cur.execute(GET_CACHED_CLASSIFICATION_SQL, (tenant_id, content_key))
+                        row = await cur.fetchone()
+                except Exception as exc:
+                    logger.info("Classification cache lookup failed for %s: %s", tenant_id, exc)
+                    return None
+                if row is None:
+                    return None
+                cache.put(tenant_id, content_key, row[0])
+                return row[0]
+
+            async def cache_classification(
+                self, *, tenant_id: str | None, content_key: str, classification: dict[str, typing.Any]
+            ) -> None:
+                cache = parent.classification_cache
+                if not tenant_id or cache is None:
+                    return
+                cache.put(tenant_id, content_key, classification)
+                if not cache.shared:
+                    return
+                try:
+                    async with parent._cursor(savepoint=True) as cur:
+                        await cur.execute(
+                            PUT_CACHED_CLASSIFICATION_SQL,
+                            (tenant_id, content_key, json.dumps(classification), cache.ttl_seconds),
+                        )
+                except Exception as exc:
+                    logger.info("Classification cache write failed for %s: %s", tenant_id, exc)
+
+        return typing.cast(imel_tools.AsyncImelTools, _AsyncImelToolsImpl())
+
+    # --- Kall tool implementation (implements the async agent contract) ---
+    def kall_tools(self) -> kall_tools.AsyncKallTools:
+        """Return an object implementing `agents.general.kall.tools.AsyncKallTools`."""
+
+        parent = self
+
+        class _AsyncKallToolsImpl:
+            async def get_ticket(self, *, ticket_id: str, tenant_id: str) -> Ticket | None:
+                return await parent._get_ticket(ticket_id=ticket_id, tenant_id=tenant_id)
+
+            async def update_ticket_status(self, *, ticket_id: str, tenant_id: str, status: TicketStatus) -> None:
+                await parent._update_ticket_status(ticket_id=ticket_id, tenant_id=tenant_id, status=status)
+
+            async def create_agent_handoff(
+                self,
+                *,
+                tenant_id: str,
+                run_id: str | None,
+                from_agent_id: str,
+                to_agent_id: str,
+                kind: str = "message",
+                message: str | None = None,
+                payload: dict[str, typing.Any] | None = None,
+            ) -> None:
+                await parent._create_agent_handoff(
+                    tenant_id=tenant_id,
+                    run_id=run_id,
+                    from_agent_id=from_agent_id,
+                    to_agent_id=to_agent_id,
+                    kind=kind,
+                    message=message,
+                    payload=payload,
+                )
+
+        return typing.cast(kall_tools.AsyncKallTools, _AsyncKallToolsImpl())
@@ -0,0 +1,203 @@
+"""LISTEN/NOTIFY wakeups for queue consumers.
+
+Queue tables fire `pg_notify(<table name>, '{"tenant_id": ..., "id": ...}')`
+from an AFTER INSERT trigger (see `db/init/01_schema.sql`). A consumer holds one
+dedicated autocommit connection that LISTENs on those channels and blocks on its
+socket, so an idle worker costs no queries and new work is picked up within
+milliseconds. Consumers still run a slow safety poll: notifications are not
+durable (they are lost while a listener is disconnected) and retries scheduled
+via `available_at` never emit one.
+
+The LISTEN connection is deliberately not taken from the pool: it is held for
+the lifetime of the consumer and must stay in autocommit mode.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import json
+import logging
+import os
+import select
+import threading
+import time
+import typing
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+# Channel names match the queue table names (`TG_TABLE_NAME` in `notify_queue_insert()`).
+INSTRUCTIONS_CHANNEL = "human_instructions_queue"
+OUTBOX_CHANNEL = "event_outbox"
+INTERCOM_CHANNEL = "agent_intercom_queue"
+# Not a queue: `notify_tenant_kb_change()` announces brand kit / KB edits for cache invalidation.
+TENANT_KB_CHANNEL = "tenant_kb_chunks"
+
+
+@dataclasses.dataclass(frozen=True)
+class QueueNotification:
+    """One decoded NOTIFY from a queue insert trigger."""
+
+    channel: str
+    tenant_id: str | None
+    row_id: str | None
+
+
+class QueueListener:
+    """Blocks until a queue channel is notified, the timeout passes, or `interrupt()` is called."""
+
+    def __init__(self, *, database_url: str, channels: typing.Sequence[str], reconnect_delay: float = 1.0):
+        if not channels:
+            raise ValueError("QueueListener needs at least one channel.")
+        self._database_url = database_url
+        self._channels = tuple(channels)
+        self._reconnect_delay = reconnect_delay
+        self._conn: typing.Any = None
+        self._lock = threading.Lock()
+        # Self-pipe so other threads (stop signals, freed worker slots) can wake a blocked `wait()`.
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._closed = False
+        # Keeps `interrupt()` from writing to the pipe while `close()` closes it. Reentrant because
+        # `interrupt()` may run in a signal handler on a thread that is inside `close()`.
+        self._wake_lock = threading.RLock()
+
+    @property
+    def channels(self) -> tuple[str, ...]:
+        return self._channels
+
+    def wait(self, timeout: float) -> list[QueueNotification]:
+        """Wait up to `timeout` seconds and return the notifications received.
+
+        An empty list means the wait timed out or was interrupted. After a
+        (re)connect a synthetic notification is returned so the caller runs a
+        catch-up claim for anything inserted while no one was listening.
+        """
+
+        if self._closed:
+            return []
+        reconnected = False
+        if self._conn is None or self._conn.closed:
+            if not self._connect():
+                # Degrade to plain polling until the database is reachable again.
+                self._sleep(min(timeout, max(self._reconnect_delay, 0.0)))
+                return []
+            reconnected = True
+
+        notifications = self._drain()
+        if notifications or reconnected:
+            return notifications or [QueueNotification(channel="*", tenant_id=None, row_id=None)]
+
+        try:
+            ready, _, _ = select.select([self._conn, self._wake_r], [], [], max(timeout, 0.0))
+        except (OSError, ValueError) as exc:
+            logger.warning("LISTEN wait failed: %s", exc)
+            self._disconnect()
+            return []
+        if self._wake_r in ready:
+            self._clear_interrupts()
+        if self._conn in ready:
+            return self._drain()
+        return []
+
+    def interrupt(self) -> None:
+        """Wake a thread blocked in `wait()` (safe to call from any thread or signal handler).
+
+        A no-op once the listener is closed.
+        """
+
+        with self._wake_lock:
+            if self._closed:
+                return
+            # BlockingIOError: pipe already full, a wakeup is pending anyway.
+            with contextlib.suppress(BlockingIOError, OSError):
+                os.write(self._wake_w, b"\0")
+
+    def close(self) -> None:
+        with self._wake_lock:
+            if self._closed:
+                return
+            self.interrupt()
+            self._closed = True
+            for fd in (self._wake_r, self._wake_w):
+                with contextlib.suppress(OSError):
+                    os.close(fd)
+        self._disconnect()
+
+    # --- internals ---------------------------------------------------------
+
+    def _connect(self) -> bool:
+        try:
+            conn = psycopg2.connect(self._database_url)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                for channel in self._channels:
+                    cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+        except Exception as exc:
+            logger.warning("Could not LISTEN on %s: %s", ", ".join(self._channels), exc)
+            return False
+        self._conn = conn
+        logger.info("Listening for queue notifications on %s", ", ".join(self._channels))
+        return True
+
+    def _drain(self) -> list[QueueNotification]:
+        try:
+            self._conn.poll()
+        except Exception as exc:
+            logger.warning("LISTEN connection lost: %s", exc)
+            self._disconnect()
+            return []
+        notifications: list[QueueNotification] = []
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            notifications.append(_decode(notify.channel, notify.payload))
+        if notifications:
+            logger.debug("Queue notifications: %s", notifications)
+        return notifications
+
+    def _disconnect(self) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            with contextlib.suppress(Exception):
+                conn.close()
+
+    def _sleep(self, seconds: float) -> None:
+        """Interruptible sleep used while the LISTEN connection is down."""
+
+        deadline = time.monotonic() + seconds
+        remaining = seconds
+        while remaining > 0:
+            ready, _, _ = select.select([self._wake_r], [], [], remaining)
+            if ready:
+                self._clear_interrupts()
+                return
+            remaining = deadline - time.monotonic()
+
+    def _clear_interrupts(self) -> None:
+        try:
+            while os.read(self._wake_r, 1024):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+
+def _decode(channel: str, payload: str) -> QueueNotification:
+    try:
+        data = json.loads(payload) if payload else {}
+    except json.JSONDecodeError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    tenant_id = data.get("tenant_id")
+    row_id = data.get("id")
+    return QueueNotification(
+        channel=channel,
+        tenant_id=str(tenant_id) if tenant_id else None,
+        row_id=str(row_id) if row_id else None,
+    )
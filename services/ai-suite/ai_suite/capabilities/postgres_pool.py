@@ -0,0 +1,309 @@
+"""Bounded, thread-safe Postgres connection pool.
+
+`psycopg2.pool.ThreadedConnectionPool` hands out connections but does not know
+whether they are still healthy, how old they are, or how long callers waited
+for them. The runtime needs all three: a worker that runs for days must recycle
+connections (server restarts, PgBouncer rotation), must not hold idle sockets
+against `max_connections`, and must expose enough metrics to size the pool.
+
+The pool is owned by a capability bundle (`PostgresCapabilities`) and shared by
+every repo/tool surface hanging off it.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import logging
+import threading
+import time
+import typing
+
+import psycopg2
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+class PoolClosedError(RuntimeError):
+    """Raised when checking out from a pool that has been closed."""
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolConfig:
+    """Sizing and recycling knobs for `ConnectionPool`.
+
+    - `min_size`: connections kept open even when idle (opened lazily).
+    - `max_size`: hard upper bound on open connections (in use + idle).
+    - `timeout`: seconds a caller waits for a free connection before `PoolTimeoutError`.
+    - `max_lifetime`: seconds after which a connection is closed instead of reused.
+    - `max_idle`: seconds an idle connection above `min_size` may sit before eviction.
+    - `health_check_after`: idle seconds after which a checkout runs `SELECT 1` first.
+    """
+
+    min_size: int = 0
+    max_size: int = 10
+    timeout: float = 30.0
+    max_lifetime: float = 30 * 60.0
+    max_idle: float = 5 * 60.0
+    health_check_after: float = 30.0
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolMetrics:
+    """Point-in-time snapshot of pool counters (cumulative since pool creation)."""
+
+    size: int
+    idle: int
+    in_use: int
+    waiting: int
+    checkouts: int
+    wait_time_total: float
+    wait_time_max: float
+    timeouts: int
+    connections_opened: int
+    connections_closed: int
+    health_check_failures: int
+
+    @property
+    def wait_time_avg(self) -> float:
+        return self.wait_time_total / self.checkouts if self.checkouts else 0.0
+
+
+@dataclasses.dataclass
+class _PooledConnection:
+    conn: typing.Any
+    created_at: float
+    last_used_at: float
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections with health checks and recycling.
+
+    Use `connection()` as a context manager; the connection is returned to the
+    pool on exit. Transaction control stays with the caller (`with conn:`), but
+    the pool rolls back anything left open so a connection is never handed out
+    mid-transaction.
+    """
+
+    def __init__(self, *, database_url: str, config: PoolConfig | None = None):
+        self._database_url = database_url
+        self._config = config or PoolConfig()
+        if self._config.max_size < 1:
+            raise ValueError("Pool max_size must be at least 1.")
+        if self._config.min_size > self._config.max_size:
+            raise ValueError("Pool min_size cannot exceed max_size.")
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: list[_PooledConnection] = []  # LIFO: hot connections are reused first
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._closed_count = 0
+        self._health_check_failures = 0
+
+    @property
+    def config(self) -> PoolConfig:
+        return self._config
+
+    @contextlib.contextmanager
+    def connection(self) -> typing.Iterator[typing.Any]:
+        """Check out a connection for the duration of the `with` block."""
+
+        pooled = self._checkout()
+        try:
+            yield pooled.conn
+        finally:
+            self._checkin(pooled)
+
+    def metrics(self) -> PoolMetrics:
+        """Return a consistent snapshot of pool size and counters."""
+
+        with self._cond:
+            return PoolMetrics(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                waiting=self._waiting,
+                checkouts=self._checkouts,
+                wait_time_total=self._wait_time_total,
+                wait_time_max=self._wait_time_max,
+                timeouts=self._timeouts,
+                connections_opened=self._opened,
+                connections_closed=self._closed_count,
+                health_check_failures=self._health_check_failures,
+            )
+
+    def close(self) -> None:
+        """Close idle connections and refuse new checkouts.
+
+        Connections currently checked out are closed when they are returned.
+        """
+
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._closed_count += len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_conn(pooled)
+
+    # --- internals ---------------------------------------------------------
+
+    def _checkout(self) -> _PooledConnection:
+        started = time.monotonic()
+        deadline = started + self._config.timeout
+        while True:
+            pooled, must_open = self._reserve(deadline)
+            if must_open:
+                try:
+                    pooled = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(typing.cast(_PooledConnection, pooled)):
+                self._discard(typing.cast(_PooledConnection, pooled))
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._checkouts += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+            return typing.cast(_PooledConnection, pooled)
+
+    def _reserve(self, deadline: float) -> tuple[_PooledConnection | None, bool]:
+        """Take an idle connection or a slot to open a new one, waiting if needed.
+
+        Returns `(pooled, False)` for an idle connection or `(None, True)` when
+        the caller owns a freshly reserved slot and must open the connection.
+        """
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosedError("Connection pool is closed.")
+                self._evict_idle_locked()
+                if self._idle:
+                    return self._idle.pop(), False
+                if self._size < self._config.max_size:
+                    self._size += 1
+                    return None, True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No Postgres connection available within {self._config.timeout:.1f}s "
+                        f"(max_size={self._config.max_size})."
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def _checkin(self, pooled: _PooledConnection) -> None:
+        conn = pooled.conn
+        reusable = not conn.closed
+        if reusable:
+            status = conn.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                reusable = False
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                # The caller left a transaction open (or aborted); never leak it to the next borrower.
+                try:
+                    conn.rollback()
+                except Exception:
+                    reusable = False
+
+        now = time.monotonic()
+        if reusable and now - pooled.created_at >= self._config.max_lifetime:
+            reusable = False
+
+        with self._cond:
+            if reusable and not self._closed:
+                pooled.last_used_at = now
+                self._idle.append(pooled)
+                self._cond.notify()
+                return
+        self._discard(pooled)
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        conn = pooled.conn
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - pooled.created_at >= self._config.max_lifetime:
+            return False
+        if now - pooled.last_used_at < self._config.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as exc:
+            logger.info("Discarding unhealthy pooled connection: %s", exc)
+            with self._cond:
+                self._health_check_failures += 1
+            return False
+
+    def _evict_idle_locked(self) -> None:
+        """Close idle connections past `max_idle`/`max_lifetime` (caller holds the lock)."""
+
+        now = time.monotonic()
+        keep: list[_PooledConnection] = []
+        evict: list[_PooledConnection] = []
+        # Oldest-idle first so the hottest connections survive above `min_size`.
+        for pooled in sorted(self._idle, key=lambda p: p.last_used_at):
+            expired = now - pooled.created_at >= self._config.max_lifetime
+            stale = now - pooled.last_used_at >= self._config.max_idle
+            remaining = self._size - len(evict)
+            if expired or (stale and remaining > self._config.min_size):
+                evict.append(pooled)
+            else:
+                keep.append(pooled)
+        if not evict:
+            return
+        self._idle = keep
+        self._size -= len(evict)
+        self._closed_count += len(evict)
+        for pooled in evict:
+            # Closing a socket is cheap and non-blocking; doing it under the lock keeps accounting exact.
+            self._close_conn(pooled)
+
+    def _open(self) -> _PooledConnection:
+        conn = psycopg2.connect(self._database_url)
+        now = time.monotonic()
+        with self._cond:
+            self._opened += 1
+        return _PooledConnection(conn=conn, created_at=now, last_used_at=now)
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        self._close_conn(pooled)
+        with self._cond:
+            self._size -= 1
+            self._closed_count += 1
+            self._cond.notify()
+
+    def _close_conn(self, pooled: _PooledConnection) -> None:
+        # Callers count the close in `_closed_count` under the lock.
+        try:
+            if not pooled.conn.closed:
+                pooled.conn.close()
+        except Exception as exc:  # pragma: no cover - best effort
+            logger.debug("Error closing pooled connection: %s", exc)
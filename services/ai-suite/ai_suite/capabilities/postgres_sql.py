@@ -0,0 +1,504 @@
+"""SQL statements and row mappers shared by the Postgres capability bundles.
+
+`PostgresCapabilities` (psycopg2, `postgres.py`) and `AsyncPostgresCapabilities`
+(psycopg 3, `postgres_async.py`) run the same statements: both drivers use the
+`%s` placeholder style, so each statement is written once here and the sync and
+async tool implementations cannot drift apart. Only the driver calls differ
+between the bundles.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import re
+import typing
+
+from agents.shared.schemas import KBChunk, TenantProfile, Ticket, TicketStatus, TicketType
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_brand_kit(value: object) -> dict[str, str]:
+    """Normalize brand kit metadata into string values (defensive for authoring)."""
+
+    if not isinstance(value, dict):
+        return {}
+    normalized: dict[str, str] = {}
+    for key, raw in value.items():
+        if not key:
+            continue
+        try:
+            normalized[str(key)] = str(raw) if raw is not None else ""
+        except Exception:
+            continue
+    return {k: v for k, v in normalized.items() if k and v}
+
+
+def _normalize_keywords(value: object) -> list[str] | None:
+    """Normalize keywords metadata into a list of non-empty strings."""
+
+    if value is None:
+        return None
+    if isinstance(value, list):
+        keywords = [str(v).strip() for v in value if v is not None]
+        keywords = [k for k in keywords if k]
+        return keywords or None
+    if isinstance(value, str):
+        keywords = [part.strip() for part in value.split(",")]
+        keywords = [k for k in keywords if k]
+        return keywords or None
+    return None
+
+
+CREATE_RUN_SQL = """
+    INSERT INTO runs (id, tenant_id, agent_id, status, input_payload)
+    VALUES (%s, %s, %s, 'running', %s)
+"""
+
+SET_RUN_STATUS_SQL = "UPDATE runs SET status=%s, updated_at=NOW() WHERE id=%s"
+
+# Agent-reported run metadata (e.g. prompt token estimates) is merged into the row on completion.
+COMPLETE_RUN_SQL = """
+    UPDATE runs
+    SET status = 'completed', metadata = metadata || %s::jsonb, updated_at = NOW()
+    WHERE id = %s
+"""
+
+# Checkpoint ids are allocated per run as MAX + 1; a run has a single writer, and the
+# (run_id, checkpoint_id) primary key rejects the impossible concurrent duplicate.
+# The parent's pending writes are folded into the new row, so they are cleared.
+APPEND_CHECKPOINT_SQL = """
+    WITH settled AS (
+        UPDATE agent_state
+        SET pending_writes = '[]'::jsonb
+        WHERE run_id = %(run_id)s::uuid
+          AND graph_checkpoint->>'id' = %(parent_id)s
+          AND pending_writes <> '[]'::jsonb
+    )
+    INSERT INTO agent_state (run_id, checkpoint_id, state_data, node_name, graph_checkpoint, metadata)
+    SELECT %(run_id)s::uuid, COALESCE(MAX(checkpoint_id), 0) + 1, %(state_data)s::jsonb,
+           %(node_name)s, %(graph_checkpoint)s::jsonb, %(metadata)s::jsonb
+    FROM agent_state
+    WHERE run_id = %(run_id)s::uuid
+    RETURNING checkpoint_id
+"""
+
+APPEND_PENDING_WRITES_SQL = """
+    UPDATE agent_state
+    SET pending_writes = pending_writes || %s::jsonb
+    WHERE run_id = %s AND graph_checkpoint->>'id' = %s
+"""
+
+LOAD_CHECKPOINTS_SQL = """
+    SELECT checkpoint_id, node_name, state_data, graph_checkpoint, metadata, pending_writes
+    FROM agent_state
+    WHERE run_id = %s AND graph_checkpoint IS NOT NULL
+    ORDER BY checkpoint_id
+"""
+
+INSERT_INTERCOM_SQL = """
+    INSERT INTO agent_intercom_queue
+    (tenant_id, run_id, from_agent_id, to_agent_id, kind, message, payload, status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, 'queued')
+"""
+
+GET_TICKET_SQL = """
+    SELECT id, ticket_type, status, email_id, sender_email, summary, raw_email
+    FROM tickets
+    WHERE id = %s AND tenant_id = %s
+    LIMIT 1
+"""
+
+UPDATE_TICKET_STATUS_SQL = """
+    UPDATE tickets
+    SET status = %s, updated_at = NOW()
+    WHERE id = %s AND tenant_id = %s
+"""
+
+INSERT_TICKET_SQL = """
+    INSERT INTO tickets (id, tenant_id, email_id, ticket_type, status, sender_email, summary, raw_email)
+    VALUES (%s, %s, %s, %s, 'open', %s, %s, %s)
+    RETURNING id
+"""
+
+TENANT_CONFIG_SQL = """
+    SELECT config
+    FROM tenants
+    WHERE id = %s
+"""
+
+TENANT_PROFILE_SQL = """
+    SELECT content, metadata, source_uri
+    FROM tenant_kb_chunks
+    WHERE tenant_id = %s
+      AND (source_type = 'brand_kit' OR metadata->>'kind' = 'brand_kit')
+    ORDER BY updated_at DESC
+    LIMIT 1
+"""
+
+# Fallback retrieval when no embeddings model is configured (or the query is
+# empty): similarity search is not possible, so inquiries get the most recent
+# chunks as context instead.
+RECENT_KB_CHUNKS_SQL = """
+    SELECT content, metadata, source_uri, source_type
+    FROM tenant_kb_chunks
+    WHERE tenant_id = %s
+    ORDER BY updated_at DESC
+    LIMIT %s
+"""
+
+KB_VECTOR_SUPPORT_SQL = """
+    SELECT
+        EXISTS (
+            SELECT 1
+            FROM information_schema.columns
+            WHERE table_name = 'tenant_kb_chunks'
+              AND column_name = 'embedding'
+              AND table_schema = ANY (current_schemas(false))
+        ),
+        (SELECT extversion FROM pg_extension WHERE extname = 'vector')
+"""
+
+# Transaction-local index tuning, applied in one round trip before the search.
+KB_SEARCH_SETTINGS_SQL = """
+    SELECT set_config(name, value, true)
+    FROM unnest(%s::text[], %s::text[]) AS settings(name, value)
+"""
+
+# Top-k by cosine distance, served by the HNSW index (`idx_kb_chunks_embedding`).
+# Ordering by the `distance` alias keeps the `embedding <=> const` pathkey the
+# index provides, and sends the query vector once. The tenant filter is applied
+# to index candidates; `hnsw.iterative_scan` keeps scanning until `top_k`
+# tenant rows are found instead of returning short on a shared index.
+_KB_NEAREST_CHUNKS_SQL = """
+    SELECT content, metadata, source_uri, source_type, embedding <=> %s::vector AS distance
+    FROM tenant_kb_chunks
+    WHERE tenant_id = %s
+    ORDER BY distance
+    LIMIT %s
+"""
+
+# Hybrid retrieval (`KBSearchConfig.hybrid`): the HNSW vector candidates and the
+# GIN-indexed full-text candidates (`content_tsv`, ranked by `ts_rank_cd` with
+# length normalization) are fused with reciprocal rank fusion,
+# score = sum(1 / (rrf_k + rank)), in one round trip. Exact terms such as order
+# numbers and SKUs that embeddings rank poorly still surface through the lexical
+# side. Params: vector, tenant_id, candidates, tsquery, tenant_id, candidates,
+# rrf_k, rrf_k, top_k.
+KB_HYBRID_CHUNKS_SQL = """
+    WITH semantic AS (
+        SELECT id, row_number() OVER (ORDER BY distance) AS rank
+        FROM (
+            SELECT id, embedding <=> %s::vector AS distance
+            FROM tenant_kb_chunks
+            WHERE tenant_id = %s
+            ORDER BY distance
+            LIMIT %s
+        ) nearest
+    ),
+    lexical AS (
+        SELECT id, row_number() OVER (ORDER BY ts_rank_cd(content_tsv, terms, 1) DESC) AS rank
+        FROM tenant_kb_chunks, to_tsquery('english', %s) AS terms
+        WHERE tenant_id = %s AND content_tsv @@ terms
+        ORDER BY rank
+        LIMIT %s
+    ),
+    fused AS (
+        SELECT
+            coalesce(semantic.id, lexical.id) AS id,
+            coalesce(1.0 / (%s + semantic.rank), 0) + coalesce(1.0 / (%s + lexical.rank), 0) AS score
+        FROM semantic
+        FULL OUTER JOIN lexical ON lexical.id = semantic.id
+    )
+    SELECT c.content, c.metadata, c.source_uri, c.source_type, fused.score
+    FROM fused
+    JOIN tenant_kb_chunks c ON c.id = fused.id
+    ORDER BY fused.score DESC
+    LIMIT %s
+"""
+
+_TSQUERY_TERM_RE = re.compile(r"\w+")
+_TSQUERY_MAX_TERMS = 64
+
+# Shared tier of the classification cache (`ClassificationCache.shared`).
+GET_CACHED_CLASSIFICATION_SQL = """
+    SELECT classification
+    FROM classification_cache
+    WHERE tenant_id = %s AND content_key = %s AND expires_at > NOW()
+"""
+
+# Each write also removes a bounded batch of expired rows, so the table needs no
+# separate cleanup job.
+PUT_CACHED_CLASSIFICATION_SQL = """
+    WITH pruned AS (
+        DELETE FROM classification_cache
+        WHERE ctid IN (SELECT ctid FROM classification_cache WHERE expires_at <= NOW() LIMIT 100)
+    )
+    INSERT INTO classification_cache (tenant_id, content_key, classification, expires_at)
+    VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+    ON CONFLICT (tenant_id, content_key)
+    DO UPDATE SET classification = EXCLUDED.classification, expires_at = EXCLUDED.expires_at
+"""
+
+# One order update per source email: a retried run must not enqueue it twice.
+ENQUEUE_ORDER_UPDATE_SQL = """
+    INSERT INTO event_outbox (tenant_id, event_type, payload, status, idempotency_key)
+    VALUES (%s, 'update_order', %s, 'queued', %s)
+    ON CONFLICT (tenant_id, idempotency_key) WHERE idempotency_key IS NOT NULL
+    DO NOTHING
+"""
+
+
+def intercom_params(
+    *,
+    tenant_id: str,
+    run_id: str | None,
+    from_agent_id: str,
+    to_agent_id: str,
+    kind: str,
+    message: str | None,
+    payload: dict[str, typing.Any] | None,
+) -> tuple[typing.Any, ...]:
+    return (tenant_id, run_id, from_agent_id, to_agent_id, kind, message or "", json.dumps(payload or {}))
+
+
+def order_update_params(
+    *, tenant_id: str, email_id: str, summary: str, details: dict[str, typing.Any]
+) -> tuple[typing.Any, ...]:
+    payload = {"email_id": email_id, "summary": summary, "details": details}
+    return (tenant_id, json.dumps(payload), f"update_order:{email_id}")
+
+
+def ticket_from_row(row: typing.Sequence[typing.Any]) -> Ticket:
+    """Map a `GET_TICKET_SQL` row to the agent-facing `Ticket` schema."""
+
+    db_status = str(row[2] or "").lower()
+    # The database supports intermediate statuses; agent-facing schema keeps a smaller contract.
+    mapped_status: TicketStatus = "closed" if db_status in {"closed", "resolved"} else "open"
+    return {
+        "ticket_id": str(row[0]),
+        "ticket_type": typing.cast(TicketType, str(row[1])),
+        "status": mapped_status,
+        "email_id": str(row[3] or ""),
+        "sender_email": str(row[4] or ""),
+        "summary": str(row[5] or ""),
+        "raw_email": str(row[6] or ""),
+    }
+
+
+def new_ticket(
+    *,
+    ticket_id: str,
+    ticket_type: TicketType,
+    email_id: str,
+    sender_email: str,
+    summary: str,
+    raw_email: str,
+) -> Ticket:
+    return {
+        "ticket_id": ticket_id,
+        "ticket_type": ticket_type,
+        "status": "open",
+        "email_id": email_id,
+        "sender_email": sender_email,
+        "summary": summary,
+        "raw_email": raw_email,
+    }
+
+
+def tenant_profile_from_row(row: typing.Sequence[typing.Any]) -> TenantProfile:
+    """Map a `TENANT_PROFILE_SQL` row (brand kit chunk) to a `TenantProfile`."""
+
+    content, metadata, source_uri = row
+    metadata = metadata or {}
+    profile: TenantProfile = {
+        "brand_kit_text": content or "",
+        "brand_kit": _normalize_brand_kit(metadata.get("brand_kit")),
+        "source_uri": str(source_uri or metadata.get("source_uri", "") or ""),
+    }
+
+    agent_display_name = metadata.get("agent_display_name")
+    if isinstance(agent_display_name, str) and agent_display_name.strip():
+        profile["agent_display_name"] = agent_display_name.strip()
+
+    tone = metadata.get("tone")
+    if isinstance(tone, str) and tone.strip():
+        profile["tone"] = tone.strip()
+
+    email_signature = metadata.get("email_signature")
+    if isinstance(email_signature, str) and email_signature.strip():
+        profile["email_signature"] = email_signature.strip()
+
+    keywords = _normalize_keywords(metadata.get("keywords"))
+    if keywords:
+        profile["keywords"] = keywords
+
+    kb_token_budget = metadata.get("kb_token_budget")
+    if isinstance(kb_token_budget, int) and not isinstance(kb_token_budget, bool) and kb_token_budget > 0:
+        profile["kb_token_budget"] = kb_token_budget
+
+    return profile
+
+
+@dataclasses.dataclass(frozen=True)
+class StateCheckpoint:
+    """One `agent_state` row written by the graph checkpointer.
+
+    `state_data` holds only the state keys written in that super-step, encoded
+    by the checkpointer; the full state is the overlay of the row's ancestors.
+    """
+
+    checkpoint_id: int
+    node_name: str
+    state_data: dict[str, typing.Any]
+    graph_checkpoint: dict[str, typing.Any]
+    metadata: dict[str, typing.Any]
+    pending_writes: list[dict[str, typing.Any]]
+
+
+def checkpoint_params(
+    *,
+    run_id: str,
+    node_name: str,
+    state_data: dict[str, typing.Any],
+    graph_checkpoint: dict[str, typing.Any],
+    metadata: dict[str, typing.Any],
+) -> dict[str, typing.Any]:
+    return {
+        "run_id": run_id,
+        "parent_id": graph_checkpoint.get("parent_id"),
+        "node_name": node_name,
+        "state_data": json.dumps(state_data),
+        "graph_checkpoint": json.dumps(graph_checkpoint),
+        "metadata": json.dumps(metadata, default=str),
+    }
+
+
+def state_checkpoint_from_row(row: typing.Sequence[typing.Any]) -> StateCheckpoint:
+    checkpoint_id, node_name, state_data, graph_checkpoint, metadata, pending_writes = row
+    return StateCheckpoint(
+        checkpoint_id=int(checkpoint_id),
+        node_name=node_name,
+        state_data=state_data or {},
+        graph_checkpoint=graph_checkpoint or {},
+        metadata=metadata or {},
+        pending_writes=pending_writes or [],
+    )
+
+
+def kb_chunk_from_row(row: typing.Sequence[typing.Any]) -> KBChunk:
+    """Map a KB row; a fifth `distance` column (cosine) becomes `score` (cosine similarity)."""
+
+    content, metadata, source_uri, source_type = row[:4]
+    metadata = metadata or {}
+    chunk: KBChunk = {
+        "content": content,
+        "metadata": metadata,
+        "source_uri": source_uri or metadata.get("source_uri"),
+        "source_type": source_type or metadata.get("source_type"),
+    }
+    if len(row) > 4 and row[4] is not None:
+        chunk["score"] = 1.0 - float(row[4])
+    return chunk
+
+
+def kb_chunk_from_hybrid_row(row: typing.Sequence[typing.Any]) -> KBChunk:
+    """Map a `KB_HYBRID_CHUNKS_SQL` row; `score` is the fused RRF score."""
+
+    chunk = kb_chunk_from_row(row[:4])
+    chunk["score"] = float(row[4])
+    return chunk
+
+
+@dataclasses.dataclass(frozen=True)
+class KBSearchConfig:
+    """pgvector HNSW tuning for `lookup_company_kb`.
+
+    `ef_search` is the candidate list size per query: higher improves recall
+    at the cost of latency (pgvector default: 40). `iterative_scan`
+    (pgvector >= 0.8: "relaxed_order" or "strict_order"; None leaves the
+    server setting) lets the tenant-filtered scan continue past `ef_search`
+    candidates when too few belong to the tenant. On an older pgvector the
+    setting would fail every search, so bundles drop it with a warning
+    (`kb_search_for_server`).
+
+    With `hybrid`, full-text candidates are fused in as well (see
+    `KB_HYBRID_CHUNKS_SQL`); queries without any word terms fall back to the
+    vector search.
+    """
+
+    ef_search: int = 100
+    iterative_scan: str | None = "relaxed_order"
+    # Hybrid lexical + vector retrieval (`KB_HYBRID_CHUNKS_SQL`).
+    hybrid: bool = False
+    hybrid_candidates: int = 40  # Candidates taken from each side before fusion.
+    rrf_k: int = 60  # RRF damping constant; 60 is the value from the original RRF paper.
+
+    def settings(self) -> tuple[list[str], list[str]]:
+        """`(names, values)` arrays for `KB_SEARCH_SETTINGS_SQL`."""
+
+        names, values = ["hnsw.ef_search"], [str(self.ef_search)]
+        if self.iterative_scan:
+            names.append("hnsw.iterative_scan")
+            values.append(self.iterative_scan)
+        return names, values
+
+
+def kb_search_for_server(config: KBSearchConfig, pgvector_version: str | None) -> KBSearchConfig:
+    """Drop `iterative_scan` when the installed pgvector predates it (0.8), with a warning."""
+
+    if not config.iterative_scan:
+        return config
+    version = tuple(int(part) for part in re.findall(r"\d+", pgvector_version or "")[:2])
+    if version >= (0, 8):
+        return config
+    logger.warning(
+        "pgvector %s does not support hnsw.iterative_scan (needs 0.8+); KB searches run without it. "
+        "Set KB_HNSW_ITERATIVE_SCAN=off to silence this warning.",
+        pgvector_version or "(not installed)",
+    )
+    return dataclasses.replace(config, iterative_scan=None)
+
+
+def kb_search_params(
+    config: KBSearchConfig, *, tenant_id: str, query: str, vector: str, top_k: int
+) -> tuple[str, tuple[typing.Any, ...]]:
+    """Pick the vector-only or hybrid search statement and build its parameters."""
+
+    terms = _tsquery_terms(query) if config.hybrid else None
+    if not terms:
+        return _KB_NEAREST_CHUNKS_SQL, (vector, tenant_id, top_k)
+    candidates = max(config.hybrid_candidates, top_k)
+    return KB_HYBRID_CHUNKS_SQL, (
+        vector,
+        tenant_id,
+        candidates,
+        terms,
+        tenant_id,
+        candidates,
+        config.rrf_k,
+        config.rrf_k,
+        top_k,
+    )
+
+
+def _tsquery_terms(query: str) -> str | None:
+    """OR the query's words into a `to_tsquery` string.
+
+    `websearch_to_tsquery` would AND every word of an email together and
+    match nothing; any shared term should count, with `ts_rank_cd` rewarding
+    chunks that share more. Quoting keeps each word a single lexeme.
+    """
+
+    terms = dict.fromkeys(term.lower() for term in _TSQUERY_TERM_RE.findall(query))
+    if not terms:
+        return None
+    return " | ".join(f"'{term}'" for term in list(terms)[:_TSQUERY_MAX_TERMS])
+
+
+def vector_literal(values: typing.Sequence[float]) -> str:
+    """Render an embedding as a pgvector text literal (`[x,y,...]`)."""
+
+    return "[" + ",".join(repr(float(v)) for v in values) + "]"
@@ -0,0 +1,177 @@
+"""In-process cache of tenant profiles (brand kit, tone, signature).
+
+Every Imel run starts by loading the tenant's brand kit chunk from
+`tenant_kb_chunks`, although it only changes when the tenant edits their brand
+kit. `TenantProfileCache` keeps the mapped `TenantProfile` per tenant with LRU
+eviction and a TTL, so a busy worker pays one query per tenant per TTL instead
+of one per run.
+
+Freshness comes from the database: `tenant_kb_chunks` fires
+`pg_notify('tenant_kb_chunks', '{"tenant_id": ...}')` on every insert, update
+and delete (see `db/init/01_schema.sql`), and `TenantCacheInvalidator` drops
+that tenant's entry as soon as the change commits. The TTL only bounds
+staleness while the LISTEN connection is down; after it reconnects the whole
+cache is dropped, because notifications sent in the meantime are lost.
+
+Cached profiles are shared between concurrent runs and must be treated as
+read-only.
+"""
+
+from __future__ import annotations
+
+import collections
+import dataclasses
+import logging
+import threading
+import time
+import typing
+
+from agents.shared.schemas import TenantProfile
+from ai_suite.capabilities.postgres_listen import QueueListener
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheStats:
+    """Point-in-time counters of a `TenantProfileCache`."""
+
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TenantProfileCache:
+    """Thread-safe LRU + TTL cache of `TenantProfile | None` keyed by tenant id.
+
+    "No brand kit" (`None`) is cached like any other value, so tenants without
+    one do not query on every run either.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._entries: collections.OrderedDict[str, tuple[float, TenantProfile | None]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a load that started before one must not be stored.
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Token to read before loading from the database and pass back to `put`."""
+
+        return self._generation
+
+    def get(self, tenant_id: str) -> tuple[bool, TenantProfile | None]:
+        """Return `(found, profile)`; expired entries count as misses."""
+
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(tenant_id)
+                self._hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[tenant_id]
+            self._misses += 1
+            return False, None
+
+    def put(self, tenant_id: str, profile: TenantProfile | None, *, generation: int | None = None) -> None:
+        """Store a freshly loaded profile, unless the cache was invalidated since `generation`."""
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[tenant_id] = (self._clock() + self._ttl, profile)
+            self._entries.move_to_end(tenant_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, tenant_id: str | None = None) -> None:
+        """Drop one tenant's entry, or every entry when `tenant_id` is None."""
+
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            if tenant_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(tenant_id, None)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                invalidations=self._invalidations,
+                size=len(self._entries),
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Invalidatable(typing.Protocol):
+    def invalidate(self, tenant_id: str | None = None) -> None: ...
+
+
+class TenantCacheInvalidator:
+    """Background thread applying `tenant_kb_chunks` notifications to per-tenant caches.
+
+    Used for the `TenantProfileCache` and the `embedding_json` `KBVectorIndex`.
+    """
+
+    def __init__(
+        self, *, caches: typing.Sequence[Invalidatable], listener: QueueListener, idle_timeout: float = 30.0
+    ):
+        self._caches = tuple(caches)
+        self._listener = listener
+        self._idle_timeout = idle_timeout
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="ai-suite-tenant-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._listener.interrupt()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self._listener.close()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            for notification in self._listener.wait(self._idle_timeout):
+                # The synthetic "*" notification follows a (re)connect: changes may have been missed.
+                tenant_id = None if notification.channel == "*" else notification.tenant_id
+                if tenant_id is not None:
+                    logger.debug("Tenant %s KB changed; invalidating cached KB state", tenant_id)
+                for cache in self._caches:
+                    cache.invalidate(tenant_id)
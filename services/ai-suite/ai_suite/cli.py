@@ -3,7 +3,12 @@
 This CLI is intentionally minimal:
 
 - `seed-db` resets the dev database using the canonical SQL file in `db/`.
+- `ingest-kb` chunks, embeds and bulk-loads KB documents for a tenant.
 - `run-imel` runs the Imel agent end-to-end on a single email payload.
+- `run-agent --batch file.jsonl` runs a JSONL file of payloads on a worker pool.
+- `worker` is the long-running consumer of `human_instructions_queue`.
+- `dispatch-outbox` drains `event_outbox` into per-event-type handlers.
+- `consume-intercom` runs the recipient agent for queued inter-agent handoffs.
 
 As additional agents are introduced, add symmetrical commands like `run-kall`,
 or a generic `run-agent --agent-id ...`.
@@ -12,15 +17,31 @@ or a generic `run-agent --agent-id ...`.
 from __future__ import annotations
 
 import argparse
+import dataclasses
 import json
 import logging
+import signal
 import sys
 import typing
 
-from ai_suite.config import load_settings
+from ai_suite.capabilities.postgres import PostgresCapabilities
+from ai_suite.capabilities.tenant_cache import TenantProfileCache
+from ai_suite.config import Settings, load_settings
+from ai_suite.persistence.ingest import IngestConfig, ingest_kb
 from ai_suite.persistence.seed import seed_database
-from ai_suite.runtime.registry import get_agent
-from ai_suite.runtime.runner import run_agent_once
+from ai_suite.runtime.batch import BatchConfig, run_batch
+from ai_suite.runtime.intercom import ConsumerConfig, IntercomConsumer
+from ai_suite.runtime.outbox import DispatcherConfig, OutboxDispatcher, default_handlers
+from ai_suite.runtime.registry import (
+    AgentSpec,
+    get_agent,
+    registered_agent_ids,
+    select_graph_variant,
+)
+from ai_suite.runtime.runner import run_agent_once, stream_agent_once
+from ai_suite.runtime.worker import InstructionWorker, WorkerConfig
+
+logger = logging.getLogger(__name__)
 
 
 def _read_stdin() -> str:
@@ -43,6 +64,119 @@ def _parse_input_json(value: str) -> dict[str, typing.Any]:
     return typing.cast(dict[str, typing.Any], data)
 
 
+def _build_capabilities(
+    settings: Settings, *, min_pool_size: int = 1, tenant_cache: bool = False
+) -> PostgresCapabilities:
+    """Create the Postgres capability bundle with pool sizing from settings.
+
+    `min_pool_size` raises the pool's upper bound for callers that know how
+    many connections they will hold concurrently (e.g. a worker's executions
+    plus its heartbeat and claim loop). `tenant_cache` enables the tenant
+    profile cache for long-running consumers; call `watch_tenant_cache()` on
+    the bundle to invalidate it on KB changes rather than by TTL alone.
+    """
+
+    if not settings.database_url:
+        raise SystemExit("DATABASE_URL/AGENTS_DB_URL is required to run agents.")
+    pool_config = settings.pool_config()
+    if pool_config.max_size < min_pool_size:
+        pool_config = dataclasses.replace(pool_config, max_size=min_pool_size)
+    cache = None
+    if tenant_cache and settings.tenant_cache_ttl > 0:
+        cache = TenantProfileCache(
+            max_entries=settings.tenant_cache_max_entries, ttl_seconds=settings.tenant_cache_ttl
+        )
+    return PostgresCapabilities(
+        database_url=settings.database_url,
+        pool_config=pool_config,
+        tenant_cache=cache,
+        **settings.capability_options(),
+    )
+
+
+def _close_capabilities(capabilities: PostgresCapabilities) -> None:
+    if capabilities.tenant_cache is not None:
+        stats = capabilities.tenant_cache.stats()
+        logger.info(
+            "Tenant profile cache: hits=%d misses=%d (%.0f%%) evictions=%d invalidations=%d",
+            stats.hits,
+            stats.misses,
+            stats.hit_rate * 100,
+            stats.evictions,
+            stats.invalidations,
+        )
+    if capabilities.classification_cache is not None:
+        stats = capabilities.classification_cache.stats()
+        logger.info(
+            "Classification cache: hits=%d misses=%d (%.0f%%) evictions=%d",
+            stats.hits,
+            stats.misses,
+            stats.hit_rate * 100,
+            stats.evictions,
+        )
+    _log_prompt_cache()
+    _log_llm_limits()
+    capabilities.close()
+
+
+def _log_prompt_cache() -> None:
+    """Log the counters of Imel's rendered system prompt memo, if any prompt was built."""
+
+    from agents.general.imel import policy
+
+    stats = policy.system_prompt_cache_info()
+    if stats.hits or stats.misses:
+        logger.info(
+            "Imel system prompt cache: hits=%d misses=%d (%.0f%%) size=%d",
+            stats.hits,
+            stats.misses,
+            stats.hit_rate * 100,
+            stats.size,
+        )
+
+
+def _log_llm_limits() -> None:
+    """Log queue times and adaptive limits of the LLM call limiters that saw calls in this process."""
+
+    from agents.shared import llm_limits
+
+    for provider, metrics in llm_limits.metrics().items():
+        if metrics.calls:
+            logger.info("LLM limiter (%s): %s", provider, metrics.format())
+
+
+def _warm_up_llm(args: argparse.Namespace, capabilities: PostgresCapabilities) -> None:
+    """Build the shared chat model(s) and load them on the provider before the consumer starts.
+
+    With model routing, the first model of every default route is warmed;
+    plan and tenant-specific models load on first use.
+    """
+
+    if not (args.use_llm and args.warmup):
+        return
+    from agents.shared import clients as shared_clients
+
+    if capabilities.model_routing is None:
+        shared_clients.warm_up_chat_model()
+        return
+    routes = capabilities.model_routing.base_routes.values()
+    for provider, model, temperature, timeout in sorted(
+        {(route.provider, route.model, route.temperature, route.timeout_seconds) for route in routes}, key=str
+    ):
+        shared_clients.warm_up_chat_model(model=model, temperature=temperature, provider=provider, timeout=timeout)
+
+
+def _install_stop_handlers(stop: typing.Callable[[], None]) -> None:
+    """Route SIGINT/SIGTERM to a graceful stop (finish in-flight work, claim nothing new)."""
+
+    def _handler(signum: int, _frame: typing.Any) -> None:
+        logging.getLogger(__name__).info("Received %s; shutting down gracefully", signal.Signals(signum).name)
+        stop()
+
+    signal.signal(signal.SIGINT, _handler)
+    signal.signal(signal.SIGTERM, _handler)
+
+
 def build_parser() -> argparse.ArgumentParser:
     """Build the top-level CLI parser with subcommands."""
 
@@ -69,6 +203,27 @@ def build_parser() -> argparse.ArgumentParser:
         help="Path to the psql schema SQL file (default: db/01_schema.sql).",
     )
 
+    ingest = sub.add_parser(
+        "ingest-kb",
+        help="Chunk, embed and bulk-load documents into tenant_kb_chunks (needs KB_EMBEDDINGS_PROVIDER).",
+    )
+    ingest.add_argument("paths", nargs="+", help="Files or directories to ingest.")
+    ingest.add_argument("--tenant-id", required=True, help="Tenant the documents belong to.")
+    ingest.add_argument(
+        "--source-type",
+        default="file",
+        choices=["file", "manual_entry", "brand_kit", "faq", "policy", "run_note", "other"],
+        help="tenant_kb_chunks.source_type for every chunk (default: file).",
+    )
+    ingest.add_argument(
+        "--max-chunk-chars",
+        type=int,
+        default=2000,
+        help="Upper bound on chunk size in characters (default: 2000).",
+    )
+    ingest.add_argument("--batch-size", type=int, default=128, help="Texts per embedding call (default: 128).")
+    ingest.add_argument("--concurrency", type=int, default=4, help="Embedding calls in flight (default: 4).")
+
     run_agent = sub.add_parser("run-agent", help="Run any registered agent using a JSON payload.")
     run_agent.add_argument("--agent-id", required=True, help="Registered agent id (e.g., imel, kall).")
     run_agent.add_argument("--tenant-id", default="tenant_001", help="Tenant id for the run.")
@@ -82,6 +237,35 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Use the configured LLM for agents that support it.",
     )
+    run_agent.add_argument(
+        "--batch",
+        default=None,
+        metavar="FILE.jsonl",
+        help="Run every JSON payload line of FILE.jsonl instead of a single payload.",
+    )
+    run_agent.add_argument(
+        "--output",
+        default=None,
+        help="Result JSONL path for --batch (default: <batch file>.results.jsonl).",
+    )
+    run_agent.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Parallel runs for --batch (default: 4).",
+    )
+    run_agent.add_argument(
+        "--executor",
+        choices=("thread", "process"),
+        default="thread",
+        help="Pool type for --batch (default: thread).",
+    )
+    run_agent.add_argument(
+        "--classify-batch-size",
+        type=int,
+        default=1,
+        help="With --use-llm, classify up to N Imel emails of a tenant in one model call (thread executor; default: 1, off).",
+    )
 
     imel = sub.add_parser("run-imel", help="Run the Imel agent (email convenience wrapper).")
     imel.add_argument("--tenant-id", default="tenant_001", help="Tenant id for the run.")
@@ -96,6 +280,11 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Use the configured LLM (requires LangChain + Ollama/OpenAI).",
     )
+    imel.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print node events and the draft as it is generated.",
+    )
 
     kall = sub.add_parser("run-kall", help="Run the Kall agent (ticket convenience wrapper).")
     kall.add_argument("--tenant-id", default="tenant_001", help="Tenant id for the run.")
@@ -111,6 +300,112 @@ def build_parser() -> argparse.ArgumentParser:
         help="Use the configured LLM for agents that support it.",
     )
 
+    worker = sub.add_parser("worker", help="Consume human_instructions_queue and run the assigned agents.")
+    worker.add_argument("--concurrency", type=int, default=4, help="Concurrent agent executions (default: 4).")
+    worker.add_argument("--batch-size", type=int, default=8, help="Max instructions claimed per query (default: 8).")
+    worker.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=120.0,
+        help="Lease length; heartbeats extend it every third of this (default: 120).",
+    )
+    worker.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="Seconds to sleep when the queue is empty and --no-listen is set (default: 2).",
+    )
+    worker.add_argument(
+        "--no-listen",
+        action="store_true",
+        help="Poll instead of waiting on LISTEN human_instructions_queue.",
+    )
+    worker.add_argument("--tenant-id", default=None, help="Only claim instructions for this tenant.")
+    worker.add_argument(
+        "--use-llm",
+        action="store_true",
+        help="Use the configured LLM for agents that support it.",
+    )
+    worker.add_argument(
+        "--warmup",
+        action="store_true",
+        help="With --use-llm, load the model before consuming so the first run does not pay the cold start.",
+    )
+    worker.add_argument(
+        "--classify-batch-size",
+        type=int,
+        default=1,
+        help="With --use-llm, classify up to N claimed Imel emails of a tenant in one model call (default: 1, off).",
+    )
+
+    outbox = sub.add_parser("dispatch-outbox", help="Deliver event_outbox rows to registered handlers.")
+    outbox.add_argument("--concurrency", type=int, default=16, help="Concurrent handler calls (default: 16).")
+    outbox.add_argument("--batch-size", type=int, default=100, help="Events claimed per cycle (default: 100).")
+    outbox.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds to sleep when the outbox is drained and --no-listen is set (default: 1).",
+    )
+    outbox.add_argument(
+        "--no-listen",
+        action="store_true",
+        help="Poll instead of waiting on LISTEN event_outbox.",
+    )
+    outbox.add_argument(
+        "--max-attempts",
+        type=int,
+        default=10,
+        help="Delivery attempts before an event is marked dead (default: 10).",
+    )
+
+    intercom = sub.add_parser(
+        "consume-intercom",
+        help="Run the recipient agent for queued agent_intercom_queue handoffs (e.g. Imel → Kall).",
+    )
+    intercom.add_argument(
+        "--agent-id",
+        action="append",
+        choices=registered_agent_ids(),
+        default=None,
+        help="Recipient agent to consume for; repeatable (default: every registered agent).",
+    )
+    intercom.add_argument("--concurrency", type=int, default=4, help="Concurrent agent executions (default: 4).")
+    intercom.add_argument(
+        "--batch-size",
+        type=int,
+        default=16,
+        help="Messages claimed per tenant per cycle (default: 16).",
+    )
+    intercom.add_argument(
+        "--redeliver-after",
+        type=float,
+        default=600.0,
+        help="Seconds before a delivered but unconsumed message is claimable again (default: 600).",
+    )
+    intercom.add_argument(
+        "--poll-interval",
+        type=float,
+        default=2.0,
+        help="Seconds to sleep when no messages are pending and --no-listen is set (default: 2).",
+    )
+    intercom.add_argument(
+        "--no-listen",
+        action="store_true",
+        help="Poll instead of waiting on LISTEN agent_intercom_queue.",
+    )
+    intercom.add_argument("--tenant-id", default=None, help="Only consume messages for this tenant.")
+    intercom.add_argument(
+        "--use-llm",
+        action="store_true",
+        help="Use the configured LLM for agents that support it.",
+    )
+    intercom.add_argument(
+        "--warmup",
+        action="store_true",
+        help="With --use-llm, load the model before consuming so the first run does not pay the cold start.",
+    )
+
     return parser
 
 
@@ -121,6 +416,11 @@ def main(argv: list[str] | None = None) -> int:
     settings = load_settings()
 
     logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.INFO), format="%(message)s")
+    if settings.imel_fast_path:
+        select_graph_variant("imel", "fast_path")
+    elif settings.imel_speculative_kb:
+        select_graph_variant("imel", "speculative_kb")
+    settings.apply_llm_limits()
 
     if args.cmd == "seed-db":
         seed_database(
@@ -133,6 +433,195 @@ def main(argv: list[str] | None = None) -> int:
         )
         return 0
 
+    if args.cmd == "ingest-kb":
+        return _ingest_command(args, settings)
+
+    if args.cmd == "worker":
+        if args.concurrency < 1:
+            raise SystemExit("--concurrency must be at least 1.")
+        # Each execution holds at most one connection (its unit of work); +2 for heartbeat and claims.
+        capabilities = _build_capabilities(settings, min_pool_size=args.concurrency + 2, tenant_cache=True)
+        if not args.no_listen:
+            capabilities.watch_tenant_cache()
+        _warm_up_llm(args, capabilities)
+        instruction_worker = InstructionWorker(
+            capabilities=capabilities,
+            config=WorkerConfig(
+                concurrency=args.concurrency,
+                batch_size=args.batch_size,
+                lease_seconds=args.lease_seconds,
+                poll_interval=args.poll_interval,
+                listen=not args.no_listen,
+                tenant_id=args.tenant_id,
+                use_llm=args.use_llm,
+                classify_batch_size=args.classify_batch_size,
+            ),
+        )
+        _install_stop_handlers(instruction_worker.stop)
+        try:
+            instruction_worker.run()
+        finally:
+            _close_capabilities(capabilities)
+        return 0
+
+    if args.cmd == "dispatch-outbox":
+        if args.concurrency < 1:
+            raise SystemExit("--concurrency must be at least 1.")
+        # Handlers do not touch the pool; claims and settles run one at a time on the dispatch loop.
+        capabilities = _build_capabilities(settings, min_pool_size=2)
+        dispatcher = OutboxDispatcher(
+            capabilities=capabilities,
+            handlers=default_handlers(),
+            config=DispatcherConfig(
+                concurrency=args.concurrency,
+                batch_size=args.batch_size,
+                poll_interval=args.poll_interval,
+                listen=not args.no_listen,
+                max_attempts=args.max_attempts,
+            ),
+        )
+        _install_stop_handlers(dispatcher.stop)
+        try:
+            dispatcher.run()
+        finally:
+            capabilities.close()
+        return 0
+
+    if args.cmd == "consume-intercom":
+        if args.concurrency < 1:
+            raise SystemExit("--concurrency must be at least 1.")
+        capabilities = _build_capabilities(settings, min_pool_size=args.concurrency + 2, tenant_cache=True)
+        if not args.no_listen:
+            capabilities.watch_tenant_cache()
+        _warm_up_llm(args, capabilities)
+        consumer = IntercomConsumer(
+            capabilities=capabilities,
+            config=ConsumerConfig(
+                concurrency=args.concurrency,
+                batch_size=args.batch_size,
+                redeliver_after=args.redeliver_after,
+                poll_interval=args.poll_interval,
+                listen=not args.no_listen,
+                agent_ids=tuple(args.agent_id) if args.agent_id else None,
+                tenant_id=args.tenant_id,
+                use_llm=args.use_llm,
+            ),
+        )
+        _install_stop_handlers(consumer.stop)
+        try:
+            consumer.run()
+        finally:
+            _close_capabilities(capabilities)
+        return 0
+
+    if args.cmd == "run-agent" and args.batch:
+        return _run_batch_command(args, settings)
+
+    if args.cmd in {"run-agent", "run-imel", "run-kall"}:
+        capabilities = _build_capabilities(settings)
+        try:
+            return _run_command(args, settings, capabilities)
+        finally:
+            capabilities.close()
+
+    raise SystemExit(f"Unknown command: {args.cmd!r}")
+
+
+def _ingest_command(args: argparse.Namespace, settings: Settings) -> int:
+    """Execute `ingest-kb` and print the summary."""
+
+    if args.concurrency < 1 or args.batch_size < 1:
+        raise SystemExit("--concurrency and --batch-size must be at least 1.")
+    if not settings.database_url:
+        raise SystemExit("DATABASE_URL/AGENTS_DB_URL is required to ingest KB documents.")
+    if not settings.kb_embeddings_provider:
+        raise SystemExit("KB_EMBEDDINGS_PROVIDER must be set to embed KB documents.")
+
+    from agents.shared import clients as shared_clients
+
+    summary = ingest_kb(
+        tenant_id=args.tenant_id,
+        paths=args.paths,
+        database_url=settings.database_url,
+        embeddings=shared_clients.get_embeddings_model(
+            provider=settings.kb_embeddings_provider, model=settings.kb_embeddings_model
+        ),
+        config=IngestConfig(
+            source_type=args.source_type,
+            max_chunk_chars=args.max_chunk_chars,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            embedding_model=f"{settings.kb_embeddings_provider}:{settings.kb_embeddings_model}",
+        ),
+    )
+
+    print("\n=== INGEST SUMMARY ===")
+    print(json.dumps(summary.as_dict(), indent=2))
+    return 0
+
+
+def _run_batch_command(args: argparse.Namespace, settings: Settings) -> int:
+    """Execute `run-agent --batch` and print the summary. Exits non-zero if any line failed."""
+
+    if args.input_json is not None:
+        raise SystemExit("--batch and --input-json are mutually exclusive.")
+    if args.concurrency < 1:
+        raise SystemExit("--concurrency must be at least 1.")
+    if not settings.database_url:
+        raise SystemExit("DATABASE_URL/AGENTS_DB_URL is required to run agents.")
+
+    output_path = args.output or f"{args.batch.removesuffix('.jsonl')}.results.jsonl"
+    summary = run_batch(
+        agent_id=args.agent_id,
+        tenant_id=args.tenant_id,
+        input_path=args.batch,
+        output_path=output_path,
+        database_url=settings.database_url,
+        pool_config=settings.pool_config(),
+        capability_options=settings.capability_options,
+        config=BatchConfig(
+            concurrency=args.concurrency,
+            executor=args.executor,
+            use_llm=args.use_llm,
+            classify_batch_size=args.classify_batch_size,
+        ),
+    )
+
+    _log_llm_limits()  # Thread mode only; process-pool children keep their own limiters.
+    print("\n=== BATCH SUMMARY ===")
+    print(json.dumps({**summary.as_dict(), "output": output_path}, indent=2))
+    return 1 if summary.failed else 0
+
+
+def _stream_run(
+    agent: AgentSpec,
+    *,
+    args: argparse.Namespace,
+    input_payload: dict[str, typing.Any],
+    capabilities: PostgresCapabilities,
+) -> dict[str, typing.Any]:
+    """Run with `stream_agent_once`, echoing node events and draft deltas to stdout."""
+
+    final_state: dict[str, typing.Any] = {}
+    for event in stream_agent_once(
+        agent=agent,
+        tenant_id=args.tenant_id,
+        input_payload=input_payload,
+        use_llm=args.use_llm,
+        capabilities=capabilities,
+    ):
+        if event["event"] == "draft":
+            print(event["delta"], end="", flush=True)
+        elif event["event"] == "node":
+            print(f"\n[{event['node']}]", flush=True)
+        elif event["event"] == "completed":
+            final_state = event["final_state"]
+    return final_state
+
+
+def _run_command(args: argparse.Namespace, settings: Settings, capabilities: PostgresCapabilities) -> int:
+    """Execute one of the single-run agent commands against a shared capability bundle."""
+
     if args.cmd == "run-agent": # the only mandatory part to run agents. "run-imel" and "run-kall" are just convenience shortcuts.
         payload_raw = args.input_json if args.input_json is not None else _read_stdin()
         if not payload_raw.strip():
@@ -145,6 +634,7 @@ def main(argv: list[str] | None = None) -> int:
             input_payload=_parse_input_json(payload_raw),
             database_url=settings.database_url,
             use_llm=args.use_llm,
+            capabilities=capabilities,
         )
 
         print("\n=== FINAL STATE ===")
@@ -157,16 +647,18 @@ def main(argv: list[str] | None = None) -> int:
             raise SystemExit("Provide an email body via --email or stdin.")
 
         agent = get_agent("imel")
-        final_state = run_agent_once(
-            agent=agent,
-            tenant_id=args.tenant_id,
-            input_payload={
-                "sender_email": args.sender,
-                "email_content": email_content,
-            },
-            database_url=settings.database_url,
-            use_llm=args.use_llm,
-        )
+        input_payload = {"sender_email": args.sender, "email_content": email_content}
+        if args.stream:
+            final_state = _stream_run(agent, args=args, input_payload=input_payload, capabilities=capabilities)
+        else:
+            final_state = run_agent_once(
+                agent=agent,
+                tenant_id=args.tenant_id,
+                input_payload=input_payload,
+                database_url=settings.database_url,
+                use_llm=args.use_llm,
+                capabilities=capabilities,
+            )
 
         print("\n=== FINAL STATE ===")
         print(json.dumps(final_state, indent=2, default=str))
@@ -183,6 +675,7 @@ def main(argv: list[str] | None = None) -> int:
             },
             database_url=settings.database_url,
             use_llm=args.use_llm,
+            capabilities=capabilities,
         )
 
         print("\n=== FINAL STATE ===")
@@ -7,7 +7,9 @@ environment-dependent (local dev, CI, Docker, production).
 from __future__ import annotations
 
 import dataclasses
+import json
 import os
+import typing
 from dotenv import load_dotenv
 
 load_dotenv(verbose=True)   # Remove in production: Should be handled by docker/K8s
@@ -22,6 +24,194 @@ class Settings:
     psql_path: str
     log_level: str
 
+    # Postgres connection pool (see `ai_suite.capabilities.postgres_pool.PoolConfig`)
+    pg_pool_min_size: int = 0
+    pg_pool_max_size: int = 10
+    pg_pool_timeout: float = 30.0
+    pg_pool_max_lifetime: float = 1800.0
+    pg_pool_max_idle: float = 300.0
+
+    # Tenant profile cache for long-running consumers (see `ai_suite.capabilities.tenant_cache`)
+    tenant_cache_ttl: float = 300.0
+    tenant_cache_max_entries: int = 1024
+
+    # KB retrieval: query embeddings and pgvector HNSW tuning (see `KBSearchConfig`)
+    kb_embeddings_provider: str | None = None
+    kb_embeddings_model: str = "text-embedding-3-small"
+    kb_hnsw_ef_search: int = 100
+    kb_hnsw_iterative_scan: str | None = "relaxed_order"
+    kb_hybrid_search: bool = False
+    kb_hybrid_candidates: int = 40
+    kb_rrf_k: int = 60
+
+    # Imel classification cache (see `ai_suite.capabilities.classification_cache`)
+    classification_cache_ttl: float = 3600.0
+    classification_cache_max_entries: int = 10_000
+    classification_cache_shared: bool = False
+
+    # Imel graph variants: KB retrieval in parallel with classification, or
+    # one fused classify-and-draft call (takes precedence)
+    imel_speculative_kb: bool = False
+    imel_fast_path: bool = False
+
+    # Per-task model routing (see `ai_suite.capabilities.model_routing`); routers are
+    # cached per tenant for `tenant_cache_ttl`
+    llm_routing: bool = False
+    llm_routes: str | None = None  # JSON `{task: route}` overrides of the default routes
+
+    # Per-process limits on chat model calls (see `agents.shared.llm_limits`); with all
+    # three at 0 calls are not limited
+    llm_requests_per_minute: float = 0.0
+    llm_tokens_per_minute: float = 0.0
+    llm_max_concurrency: int = 0
+    llm_min_concurrency: int = 1
+    llm_adaptive_concurrency: bool = True
+    llm_latency_tolerance: float = 2.0
+    llm_max_queue_seconds: float = 60.0  # 0: calls wait for admission indefinitely
+
+    def pool_config(self):
+        """Build the connection pool configuration from these settings."""
+
+        # Imported lazily so loading settings never requires the Postgres driver.
+        from ai_suite.capabilities.postgres_pool import PoolConfig
+
+        return PoolConfig(
+            min_size=self.pg_pool_min_size,
+            max_size=self.pg_pool_max_size,
+            timeout=self.pg_pool_timeout,
+            max_lifetime=self.pg_pool_max_lifetime,
+            max_idle=self.pg_pool_max_idle,
+        )
+
+    def llm_limit_config(self):
+        """Build the chat model call limits from these settings (None: unlimited)."""
+
+        if not (self.llm_requests_per_minute or self.llm_tokens_per_minute or self.llm_max_concurrency):
+            return None
+        from agents.shared.llm_limits import LLMLimitConfig
+
+        max_concurrency = self.llm_max_concurrency or LLMLimitConfig.max_concurrency
+        return LLMLimitConfig(
+            requests_per_minute=self.llm_requests_per_minute or None,
+            tokens_per_minute=self.llm_tokens_per_minute or None,
+            max_concurrency=max_concurrency,
+            min_concurrency=min(self.llm_min_concurrency, max_concurrency),
+            adaptive=self.llm_adaptive_concurrency,
+            latency_tolerance=self.llm_latency_tolerance,
+            max_queue_seconds=self.llm_max_queue_seconds or None,
+        )
+
+    def apply_llm_limits(self) -> None:
+        """Install (or remove) this process's limiter for the default chat model provider."""
+
+        from agents.shared import clients as shared_clients
+        from agents.shared import llm_limits
+
+        llm_limits.configure(shared_clients.DEFAULT_PROVIDER, self.llm_limit_config())
+
+    def capability_options(self) -> dict[str, typing.Any]:
+        """KB retrieval, classification cache and model routing keyword arguments for `PostgresCapabilities` / `AsyncPostgresCapabilities`.
+
+        A bound method of these (frozen, picklable) settings, so process-pool
+        children can build the same options themselves.
+        """
+
+        from ai_suite.capabilities.classification_cache import ClassificationCache
+        from ai_suite.capabilities.model_routing import TenantModelRouting
+        from ai_suite.capabilities.postgres import KBSearchConfig
+
+        embeddings = None
+        if self.kb_embeddings_provider:
+            from agents.shared import clients as shared_clients
+
+            embeddings = shared_clients.get_embeddings_model(
+                provider=self.kb_embeddings_provider, model=self.kb_embeddings_model
+            )
+        return {
+            "embeddings": embeddings,
+            "kb_search": KBSearchConfig(
+                ef_search=self.kb_hnsw_ef_search,
+                iterative_scan=self.kb_hnsw_iterative_scan,
+                hybrid=self.kb_hybrid_search,
+                hybrid_candidates=self.kb_hybrid_candidates,
+                rrf_k=self.kb_rrf_k,
+            ),
+            "classification_cache": (
+                ClassificationCache(
+                    max_entries=self.classification_cache_max_entries,
+                    ttl_seconds=self.classification_cache_ttl,
+                    shared=self.classification_cache_shared,
+                )
+                if self.classification_cache_ttl > 0
+                else None
+            ),
+            "model_routing": (
+                TenantModelRouting(base_routes=_parse_llm_routes(self.llm_routes), ttl_seconds=self.tenant_cache_ttl)
+                if self.llm_routing
+                else None
+            ),
+        }
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return int(raw)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be an integer, got {raw!r}") from exc
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return float(raw)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a number, got {raw!r}") from exc
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    value = raw.strip().lower()
+    if value in {"1", "true", "yes", "on"}:
+        return True
+    if value in {"0", "false", "no", "off"}:
+        return False
+    raise ValueError(f"{name} must be a boolean, got {raw!r}")
+
+
+def _iterative_scan(raw: str | None) -> str | None:
+    if raw is None or not raw.strip():
+        return "relaxed_order"
+    value = raw.strip().lower()
+    if value == "off":
+        return None
+    if value not in {"relaxed_order", "strict_order"}:
+        raise ValueError(f"KB_HNSW_ITERATIVE_SCAN must be relaxed_order, strict_order or off, got {raw!r}")
+    return value
+
+
+def _parse_llm_routes(raw: str | None):
+    from agents.shared import model_routing
+
+    if raw is None or not raw.strip():
+        return dict(model_routing.DEFAULT_ROUTES)
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"LLM_ROUTES must be a JSON object, got {raw!r}") from exc
+    if not isinstance(overrides, dict):
+        raise ValueError(f"LLM_ROUTES must be a JSON object, got {raw!r}")
+    try:
+        return model_routing.parse_routes(overrides)
+    except ValueError as exc:
+        raise ValueError(f"LLM_ROUTES: {exc}") from exc
+
 
 def load_settings() -> Settings:
     """Load runtime settings from environment variables.
@@ -34,6 +224,54 @@ def load_settings() -> Settings:
       runtime for all DML operations.
     - `PSQL_PATH`: Optional override for the `psql` binary location.
     - `LOG_LEVEL`: Python logging level (default: INFO).
+    - `PG_POOL_MIN_SIZE` / `PG_POOL_MAX_SIZE`: connection pool bounds (default: 0 / 10).
+    - `PG_POOL_TIMEOUT`: seconds to wait for a free pooled connection (default: 30).
+    - `PG_POOL_MAX_LIFETIME` / `PG_POOL_MAX_IDLE`: connection recycling in seconds
+      (default: 1800 / 300).
+    - `TENANT_CACHE_TTL`: seconds a worker may serve a cached tenant profile
+      (default: 300; 0 disables the cache).
+    - `TENANT_CACHE_MAX_ENTRIES`: tenants kept in the profile cache (default: 1024).
+    - `KB_EMBEDDINGS_PROVIDER` / `KB_EMBEDDINGS_MODEL`: embeddings used for KB
+      similarity search ("openai" / "ollama"; default: unset, which keeps
+      recency-only retrieval / "text-embedding-3-small").
+    - `KB_HNSW_EF_SEARCH`: pgvector HNSW candidate list size per query (default: 100).
+    - `KB_HNSW_ITERATIVE_SCAN`: "relaxed_order", "strict_order" or "off"
+      (pgvector >= 0.8; on older versions it is dropped with a warning;
+      default: relaxed_order).
+    - `KB_HYBRID_SEARCH`: fuse full-text and vector candidates with reciprocal
+      rank fusion (pgvector schema only; default: false).
+    - `KB_HYBRID_CANDIDATES` / `KB_RRF_K`: candidates per side before fusion and
+      the RRF constant (default: 40 / 60).
+    - `CLASSIFICATION_CACHE_TTL`: seconds a classification of repeated email
+      content is reused instead of calling the model (default: 3600; 0 disables).
+    - `CLASSIFICATION_CACHE_MAX_ENTRIES`: in-process entries (default: 10000).
+    - `CLASSIFICATION_CACHE_SHARED`: also share classifications between
+      workers through the `classification_cache` table (default: false).
+    - `IMEL_SPECULATIVE_KB`: run Imel on the graph variant that starts the KB
+      lookup in parallel with classification (default: false).
+    - `IMEL_FAST_PATH`: run Imel on the graph variant that classifies and
+      drafts inquiries/feedback with one model call; takes precedence over
+      `IMEL_SPECULATIVE_KB` (default: false).
+    - `LLM_ROUTING`: pick the chat model per task (classification, drafting,
+      summarization) from routes resolved per tenant: the defaults, the
+      tenant's `plan`, then `model_routes` in `tenants.config` (default: false,
+      every call uses the default model).
+    - `LLM_ROUTES`: JSON overrides of the default routes, e.g.
+      `{"classification": "gemma3:1b", "drafting": {"model": "gemma3:12b",
+      "fallbacks": ["gemma3:4b"], "timeout": 120}}` (default: unset).
+    - `LLM_REQUESTS_PER_MINUTE` / `LLM_TOKENS_PER_MINUTE`: token bucket rates for
+      chat model calls, per process (default: 0, unlimited).
+    - `LLM_MAX_CONCURRENCY` / `LLM_MIN_CONCURRENCY`: bounds of the in-flight
+      chat model calls per model and process (default: 0 / 1; with the rates and
+      `LLM_MAX_CONCURRENCY` all 0 calls are not limited, otherwise the maximum
+      defaults to 16).
+    - `LLM_ADAPTIVE_CONCURRENCY`: adjust the in-flight limit between those bounds
+      from observed latency, AIMD-style (default: true).
+    - `LLM_LATENCY_TOLERANCE`: latency per token, as a multiple of the recent
+      best, above which the model server counts as overloaded (default: 2.0).
+    - `LLM_MAX_QUEUE_SECONDS`: longest a chat model call waits for admission
+      before it fails with a timeout, so routing falls back (default: 60; 0 waits
+      indefinitely).
     """
 
     database_url = os.getenv("AGENTS_DB_URL") or os.getenv("DATABASE_URL")
@@ -45,10 +283,40 @@ def load_settings() -> Settings:
     admin_db_url = os.getenv("ADMIN_DB_URL") or database_url
     psql_path = os.getenv("PSQL_PATH") or "psql"
     log_level = os.getenv("LOG_LEVEL") or "INFO"
+    llm_routes = os.getenv("LLM_ROUTES") or None
+    _parse_llm_routes(llm_routes)  # Fail at start-up, not on the first run.
     return Settings(
         admin_db_url=admin_db_url,
         database_url=database_url,
         psql_path=psql_path,
         log_level=log_level,
+        pg_pool_min_size=_env_int("PG_POOL_MIN_SIZE", 0),
+        pg_pool_max_size=_env_int("PG_POOL_MAX_SIZE", 10),
+        pg_pool_timeout=_env_float("PG_POOL_TIMEOUT", 30.0),
+        pg_pool_max_lifetime=_env_float("PG_POOL_MAX_LIFETIME", 1800.0),
+        pg_pool_max_idle=_env_float("PG_POOL_MAX_IDLE", 300.0),
+        tenant_cache_ttl=_env_float("TENANT_CACHE_TTL", 300.0),
+        tenant_cache_max_entries=_env_int("TENANT_CACHE_MAX_ENTRIES", 1024),
+        kb_embeddings_provider=os.getenv("KB_EMBEDDINGS_PROVIDER") or None,
+        kb_embeddings_model=os.getenv("KB_EMBEDDINGS_MODEL") or "text-embedding-3-small",
+        kb_hnsw_ef_search=_env_int("KB_HNSW_EF_SEARCH", 100),
+        kb_hnsw_iterative_scan=_iterative_scan(os.getenv("KB_HNSW_ITERATIVE_SCAN")),
+        kb_hybrid_search=_env_bool("KB_HYBRID_SEARCH", False),
+        kb_hybrid_candidates=_env_int("KB_HYBRID_CANDIDATES", 40),
+        kb_rrf_k=_env_int("KB_RRF_K", 60),
+        classification_cache_ttl=_env_float("CLASSIFICATION_CACHE_TTL", 3600.0),
+        classification_cache_max_entries=_env_int("CLASSIFICATION_CACHE_MAX_ENTRIES", 10_000),
+        classification_cache_shared=_env_bool("CLASSIFICATION_CACHE_SHARED", False),
+        imel_speculative_kb=_env_bool("IMEL_SPECULATIVE_KB", False),
+        imel_fast_path=_env_bool("IMEL_FAST_PATH", False),
+        llm_routing=_env_bool("LLM_ROUTING", False),
+        llm_routes=llm_routes,
+        llm_requests_per_minute=_env_float("LLM_REQUESTS_PER_MINUTE", 0.0),
+        llm_tokens_per_minute=_env_float("LLM_TOKENS_PER_MINUTE", 0.0),
+        llm_max_concurrency=_env_int("LLM_MAX_CONCURRENCY", 0),
+        llm_min_concurrency=_env_int("LLM_MIN_CONCURRENCY", 1),
+        llm_adaptive_concurrency=_env_bool("LLM_ADAPTIVE_CONCURRENCY", True),
+        llm_latency_tolerance=_env_float("LLM_LATENCY_TOLERANCE", 2.0),
+        llm_max_queue_seconds=_env_float("LLM_MAX_QUEUE_SECONDS", 60.0),
     )
 
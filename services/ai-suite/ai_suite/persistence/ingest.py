@@ -0,0 +1,519 @@
+"""KB ingestion: chunk documents, embed them in batches and bulk-load them.
+
+`ingest_kb(...)` (CLI: `ai-suite ingest-kb`) replaces the dev-only seed path,
+which stored one whole markdown file with a zero placeholder vector:
+
+- files are walked once and each becomes a document (`doc_id` = path relative
+  to the ingest root, so re-ingesting the same tree addresses the same rows),
+- documents are split into heading-aware chunks: sections never straddle a
+  heading boundary mid-text, small sections are packed together up to
+  `max_chunk_chars`, and oversized sections are split at paragraphs with
+  their heading repeated so each chunk keeps its context,
+- each chunk is diffed against the document's stored chunks by content hash
+  (`metadata.content_hash`, plus `metadata.embedding_model`): unchanged chunks
+  keep their row and embedding, and only new or changed text is embedded,
+- chunks to embed are sent `batch_size` at a time (`embed_documents`), with at
+  most `concurrency` embedding calls in flight,
+- each document is then written in its own transaction: vanished chunks are
+  deleted, kept chunks that moved get their new position and metadata, and
+  new chunks stream in through a binary `COPY`. Untouched rows keep their
+  `updated_at` and fire no change notification.
+
+Readers therefore never see a half-updated document, and a failure only loses
+the documents not yet written. A nightly re-ingest of mostly unchanged content
+costs one hash query and no embedding calls. Binary COPY with per-row writes is
+a psycopg 3 feature, so this module uses psycopg 3 even though the sync runtime
+otherwise runs on psycopg2.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import hashlib
+import json
+import logging
+import pathlib
+import re
+import time
+import typing
+
+import numpy as np
+import psycopg
+
+from ai_suite.capabilities.postgres_sql import KB_VECTOR_SUPPORT_SQL
+
+logger = logging.getLogger(__name__)
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+_STORED_CHUNKS_SQL = """
+    SELECT doc_id, id::text, chunk_index, source_uri, source_type, metadata
+    FROM tenant_kb_chunks
+    WHERE tenant_id = %s AND doc_id = ANY(%s)
+"""
+
+_DELETE_CHUNKS_SQL = "DELETE FROM tenant_kb_chunks WHERE tenant_id = %s AND id = ANY(%s::uuid[])"
+
+# Kept chunks that moved (or whose headings changed) get their new position and metadata.
+_UPDATE_KEPT_CHUNKS_SQL = """
+    UPDATE tenant_kb_chunks AS c
+    SET chunk_index = u.chunk_index, source_uri = u.source_uri, source_type = u.source_type,
+        metadata = u.metadata::jsonb
+    FROM unnest(%s::uuid[], %s::int[], %s::text[], %s::text[], %s::text[])
+        AS u(id, chunk_index, source_uri, source_type, metadata)
+    WHERE c.tenant_id = %s AND c.id = u.id
+"""
+
+_COPY_COLUMNS = "tenant_id, doc_id, source_uri, source_type, chunk_index, content, {embedding}, metadata"
+_COPY_SQL = "COPY tenant_kb_chunks ({columns}) FROM STDIN (FORMAT BINARY)"
+
+
+@dataclasses.dataclass(frozen=True)
+class IngestConfig:
+    """Tuning knobs for `ingest_kb`."""
+
+    source_type: str = "file"
+    extensions: tuple[str, ...] = (".md", ".markdown", ".txt")
+    max_chunk_chars: int = 2000  # Roughly 500 tokens for English prose.
+    batch_size: int = 128  # Texts per embedding call.
+    concurrency: int = 4  # Embedding calls in flight.
+    embedding_model: str = ""  # Stored per chunk; a different model re-embeds everything.
+
+
+@dataclasses.dataclass(frozen=True)
+class KBDocument:
+    doc_id: str
+    source_uri: str
+    text: str
+
+
+@dataclasses.dataclass(frozen=True)
+class KBChunkRow:
+    """One chunk ready for embedding and COPY."""
+
+    doc_id: str
+    source_uri: str
+    chunk_index: int
+    content: str
+    headings: tuple[str, ...]
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.content.encode("utf-8")).hexdigest()
+
+
+class _StoredChunk(typing.NamedTuple):
+    id: str
+    chunk_index: int
+    source_uri: str | None
+    source_type: str | None
+    metadata: dict[str, typing.Any]
+
+
+@dataclasses.dataclass
+class _DocumentPlan:
+    """What one document's transaction has to do."""
+
+    document: KBDocument
+    kept: int = 0  # Stored chunks whose text (and embedding) is reused.
+    moved: list[tuple[str, KBChunkRow]] = dataclasses.field(default_factory=list)  # (row id, chunk) to rewrite
+    new: list[KBChunkRow] = dataclasses.field(default_factory=list)
+    vanished: list[str] = dataclasses.field(default_factory=list)  # Row ids no longer produced by the document.
+    vectors: dict[int, np.ndarray] = dataclasses.field(default_factory=dict)  # chunk_index -> embedding
+
+
+@dataclasses.dataclass
+class IngestSummary:
+    documents: int = 0
+    documents_unchanged: int = 0
+    chunks: int = 0
+    chunks_embedded: int = 0
+    chunks_kept: int = 0
+    chunks_deleted: int = 0
+    embedding_calls: int = 0
+    embed_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, typing.Any]:
+        return {
+            "documents": self.documents,
+            "documents_unchanged": self.documents_unchanged,
+            "chunks": self.chunks,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_kept": self.chunks_kept,
+            "chunks_deleted": self.chunks_deleted,
+            "embedding_calls": self.embedding_calls,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+        }
+
+
+def iter_documents(paths: typing.Sequence[str], *, extensions: typing.Sequence[str]) -> list[KBDocument]:
+    """Collect the files under `paths` (files or directories) as documents.
+
+    A file given directly gets its file name as `doc_id`; files found under a
+    directory get their path relative to that directory.
+    """
+
+    suffixes = {ext.lower() for ext in extensions}
+    documents: list[KBDocument] = []
+    for raw in paths:
+        root = pathlib.Path(raw)
+        if root.is_file():
+            files = [(root, root.name)]
+        elif root.is_dir():
+            files = [
+                (path, path.relative_to(root).as_posix())
+                for path in sorted(root.rglob("*"))
+                if path.is_file() and path.suffix.lower() in suffixes
+            ]
+        else:
+            raise FileNotFoundError(f"KB path not found: {raw}")
+        for path, doc_id in files:
+            text = path.read_text(encoding="utf-8")
+            if text.strip():
+                documents.append(KBDocument(doc_id=doc_id, source_uri=str(path.resolve()), text=text))
+    return documents
+
+
+def chunk_markdown(text: str, *, max_chars: int) -> list[tuple[tuple[str, ...], str]]:
+    """Split markdown into `(heading path, chunk text)` pairs of at most ~`max_chars`.
+
+    Headings inside fenced code blocks are ignored. Plain text without headings
+    is treated as one section.
+    """
+
+    sections: list[tuple[tuple[str, ...], str]] = []
+    path: list[tuple[int, str]] = []
+    lines: list[str] = []
+    in_fence = False
+
+    def flush() -> None:
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append((tuple(title for _, title in path), body))
+        lines.clear()
+
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING_RE.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, heading.group(2)))
+        lines.append(line)
+    flush()
+
+    chunks: list[tuple[tuple[str, ...], str]] = []
+    pending_headings: tuple[str, ...] = ()
+    pending: list[str] = []
+    pending_size = 0
+    for headings, body in sections:
+        for piece in _split_section(body, max_chars=max_chars):
+            if pending and pending_size + len(piece) + 2 > max_chars:
+                chunks.append((pending_headings, "\n\n".join(pending)))
+                pending, pending_size = [], 0
+            if not pending:
+                pending_headings = headings
+            pending.append(piece)
+            pending_size += len(piece) + 2
+    if pending:
+        chunks.append((pending_headings, "\n\n".join(pending)))
+    return chunks
+
+
+def ingest_kb(
+    *,
+    tenant_id: str,
+    paths: typing.Sequence[str],
+    database_url: str,
+    embeddings: typing.Any,
+    config: IngestConfig | None = None,
+) -> IngestSummary:
+    """Chunk, embed and load every document under `paths` for `tenant_id`.
+
+    `embeddings` is a LangChain `Embeddings` (`embed_documents`). Documents
+    are diffed against their stored chunks and written one transaction each.
+    """
+
+    config = config or IngestConfig()
+    if config.batch_size < 1 or config.concurrency < 1:
+        raise ValueError("batch_size and concurrency must be >= 1")
+    started = time.perf_counter()
+    summary = IngestSummary()
+
+    documents = iter_documents(paths, extensions=config.extensions)
+    summary.documents = len(documents)
+    if not documents:
+        logger.warning("No documents found under %s", ", ".join(paths))
+        return summary
+
+    # Autocommit, so each `conn.transaction()` below is a real per-document transaction.
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(KB_VECTOR_SUPPORT_SQL)
+            has_vector = bool(cur.fetchone()[0])
+            cur.execute(_STORED_CHUNKS_SQL, (tenant_id, [doc.doc_id for doc in documents]))
+            stored_rows = cur.fetchall()
+        if has_vector:
+            from pgvector.psycopg import register_vector
+
+            register_vector(conn)
+
+        stored: dict[str, list[_StoredChunk]] = {}
+        for doc_id, *row in stored_rows:
+            stored.setdefault(doc_id, []).append(_StoredChunk(*row))
+
+        window: list[_DocumentPlan] = []
+        window_texts = 0
+        window_limit = 2 * config.batch_size * config.concurrency  # Enough to keep every embedding slot busy.
+        for document in documents:
+            plan = _plan_document(document, stored.get(document.doc_id, []), config=config)
+            summary.chunks += plan.kept + len(plan.new)
+            if not plan.new and not plan.vanished and not plan.moved:
+                summary.documents_unchanged += 1
+                summary.chunks_kept += plan.kept
+                continue
+            window.append(plan)
+            window_texts += len(plan.new)
+            if window_texts >= window_limit:
+                _flush_window(
+                    conn, tenant_id, window, has_vector=has_vector, config=config, embeddings=embeddings, summary=summary
+                )
+                window, window_texts = [], 0
+        if window:
+            _flush_window(
+                conn, tenant_id, window, has_vector=has_vector, config=config, embeddings=embeddings, summary=summary
+            )
+
+    summary.wall_seconds = time.perf_counter() - started
+    logger.info(
+        "Ingested %d document(s) for %s in %.1fs: %d chunk(s) embedded, %d kept, %d deleted, "
+        "%d document(s) unchanged (%d embedding call(s), %.1fs embedding)",
+        summary.documents,
+        tenant_id,
+        summary.wall_seconds,
+        summary.chunks_embedded,
+        summary.chunks_kept,
+        summary.chunks_deleted,
+        summary.documents_unchanged,
+        summary.embedding_calls,
+        summary.embed_seconds,
+    )
+    return summary
+
+
+def _plan_document(
+    document: KBDocument,
+    stored: typing.Sequence[_StoredChunk],
+    *,
+    config: IngestConfig,
+) -> _DocumentPlan:
+    """Match the document's chunks to stored rows by content hash, wherever they now sit.
+
+    Rows ingested before hashes were stored (or with another embedding model)
+    never match, so they are replaced once and reused from then on.
+    """
+
+    available: dict[str, list[_StoredChunk]] = {}
+    for row in sorted(stored, key=lambda row: row.chunk_index, reverse=True):
+        content_hash = row.metadata.get("content_hash") if row.metadata else None
+        if content_hash and row.metadata.get("embedding_model", "") == config.embedding_model:
+            available.setdefault(content_hash, []).append(row)
+
+    plan = _DocumentPlan(document=document)
+    kept_ids: set[str] = set()
+    for chunk in _iter_chunks([document], config=config):
+        candidates = available.get(chunk.content_hash)
+        if not candidates:
+            plan.new.append(chunk)
+            continue
+        row = candidates.pop()  # Lowest position first, so repeated text keeps its order.
+        kept_ids.add(row.id)
+        plan.kept += 1
+        if (row.chunk_index, row.source_uri, row.source_type, row.metadata) != (
+            chunk.chunk_index,
+            chunk.source_uri,
+            config.source_type,
+            _chunk_metadata(chunk, config=config),
+        ):
+            plan.moved.append((row.id, chunk))
+    plan.vanished = [row.id for row in stored if row.id not in kept_ids]
+    return plan
+
+
+def _flush_window(
+    conn: psycopg.Connection,
+    tenant_id: str,
+    plans: list[_DocumentPlan],
+    *,
+    has_vector: bool,
+    config: IngestConfig,
+    embeddings: typing.Any,
+    summary: IngestSummary,
+) -> None:
+    """Embed the new chunks of `plans` together, then write each document in its own transaction."""
+
+    by_doc = {plan.document.doc_id: plan for plan in plans}
+    chunks = [chunk for plan in plans for chunk in plan.new]
+    for batch, vectors in _embed_batches(chunks, embeddings=embeddings, config=config, summary=summary):
+        for chunk, vector in zip(batch, vectors, strict=True):
+            by_doc[chunk.doc_id].vectors[chunk.chunk_index] = vector
+
+    for plan in plans:
+        _write_document(conn, tenant_id, plan, has_vector=has_vector, config=config)
+        summary.chunks_embedded += len(plan.new)
+        summary.chunks_kept += plan.kept
+        summary.chunks_deleted += len(plan.vanished)
+
+
+def _write_document(
+    conn: psycopg.Connection,
+    tenant_id: str,
+    plan: _DocumentPlan,
+    *,
+    has_vector: bool,
+    config: IngestConfig,
+) -> None:
+    with conn.transaction(), conn.cursor() as cur:
+        if plan.vanished:
+            cur.execute(_DELETE_CHUNKS_SQL, (tenant_id, plan.vanished))
+        if plan.moved:
+            cur.execute(
+                _UPDATE_KEPT_CHUNKS_SQL,
+                (
+                    [row_id for row_id, _ in plan.moved],
+                    [chunk.chunk_index for _, chunk in plan.moved],
+                    [chunk.source_uri for _, chunk in plan.moved],
+                    [config.source_type] * len(plan.moved),
+                    [json.dumps(_chunk_metadata(chunk, config=config)) for _, chunk in plan.moved],
+                    tenant_id,
+                ),
+            )
+        if not plan.new:
+            return
+        columns = _COPY_COLUMNS.format(embedding="embedding" if has_vector else "embedding_json")
+        with cur.copy(_COPY_SQL.format(columns=columns)) as copy:
+            copy.set_types(
+                ["text", "text", "text", "text", "int4", "text", "vector" if has_vector else "jsonb", "jsonb"]
+            )
+            for chunk in plan.new:
+                vector = plan.vectors[chunk.chunk_index]
+                copy.write_row(
+                    (
+                        tenant_id,
+                        chunk.doc_id,
+                        chunk.source_uri,
+                        config.source_type,
+                        chunk.chunk_index,
+                        chunk.content,
+                        vector if has_vector else vector.tolist(),
+                        _chunk_metadata(chunk, config=config),
+                    )
+                )
+
+
+def _split_section(body: str, *, max_chars: int) -> list[str]:
+    """Split one section at paragraph (then line, then hard) boundaries, repeating its heading."""
+
+    if len(body) <= max_chars:
+        return [body]
+    first_line, _, _ = body.partition("\n")
+    heading = first_line if _HEADING_RE.match(first_line) else ""
+    pieces: list[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", body):
+        for part in _hard_wrap(paragraph.strip(), max_chars=max_chars - len(heading) - 2):
+            candidate = f"{current}\n\n{part}" if current else part
+            if current and len(candidate) > max_chars:
+                pieces.append(current)
+                candidate = f"{heading}\n\n{part}" if heading and part != heading else part
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _hard_wrap(text: str, *, max_chars: int) -> list[str]:
+    if len(text) <= max_chars:
+        return [text] if text else []
+    max_chars = max(max_chars, 1)
+    return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def _iter_chunks(documents: typing.Sequence[KBDocument], *, config: IngestConfig) -> typing.Iterator[KBChunkRow]:
+    for document in documents:
+        for chunk_index, (headings, content) in enumerate(
+            chunk_markdown(document.text, max_chars=config.max_chunk_chars)
+        ):
+            yield KBChunkRow(
+                doc_id=document.doc_id,
+                source_uri=document.source_uri,
+                chunk_index=chunk_index,
+                content=content,
+                headings=headings,
+            )
+
+
+def _embed_batches(
+    chunks: typing.Iterable[KBChunkRow],
+    *,
+    embeddings: typing.Any,
+    config: IngestConfig,
+    summary: IngestSummary,
+) -> typing.Iterator[tuple[list[KBChunkRow], np.ndarray]]:
+    """Yield `(batch, float32 vectors)` as embedding calls finish (not in input order).
+
+    At most `concurrency` calls run and at most `2 × concurrency` batches are
+    held, so memory stays bounded for arbitrarily large trees.
+    """
+
+    def embed(batch: list[KBChunkRow]) -> tuple[list[KBChunkRow], np.ndarray, float]:
+        call_started = time.perf_counter()
+        vectors = embeddings.embed_documents([chunk.content for chunk in batch])
+        return batch, np.asarray(vectors, dtype=np.float32), time.perf_counter() - call_started
+
+    pending: set[concurrent.futures.Future[tuple[list[KBChunkRow], np.ndarray, float]]] = set()
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=config.concurrency, thread_name_prefix="ai-suite-embed"
+    ) as executor:
+
+        def completed(return_when: str) -> typing.Iterator[tuple[list[KBChunkRow], np.ndarray]]:
+            nonlocal pending
+            done, pending = concurrent.futures.wait(pending, return_when=return_when)
+            for future in done:
+                batch, vectors, seconds = future.result()
+                if vectors.shape[0] != len(batch):
+                    raise RuntimeError(f"Embeddings returned {vectors.shape[0]} vector(s) for {len(batch)} text(s)")
+                summary.embedding_calls += 1
+                summary.embed_seconds += seconds
+                yield batch, vectors
+
+        batch: list[KBChunkRow] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= config.batch_size:
+                pending.add(executor.submit(embed, batch))
+                batch = []
+                if len(pending) >= 2 * config.concurrency:
+                    yield from completed(concurrent.futures.FIRST_COMPLETED)
+        if batch:
+            pending.add(executor.submit(embed, batch))
+        while pending:
+            yield from completed(concurrent.futures.FIRST_COMPLETED)
+
+
+def _chunk_metadata(chunk: KBChunkRow, *, config: IngestConfig) -> dict[str, typing.Any]:
+    metadata: dict[str, typing.Any] = {
+        "source_uri": chunk.source_uri,
+        "content_hash": chunk.content_hash,
+        "embedding_model": config.embedding_model,
+    }
+    if chunk.headings:
+        metadata["headings"] = list(chunk.headings)
+    return metadata
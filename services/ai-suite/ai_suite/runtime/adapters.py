@@ -17,10 +17,16 @@ import typing
 import uuid
 
 from ai_suite.capabilities.email import FakeEmailSender
-from ai_suite.capabilities.postgres import PostgresCapabilities
+from ai_suite.capabilities.postgres import IntercomMessage, PostgresCapabilities
+
+if typing.TYPE_CHECKING:
+    from ai_suite.capabilities.postgres_async import AsyncPostgresCapabilities
 
 logger = logging.getLogger(__name__)
 
+# Intercom kinds that keep an agent informed but never trigger a run on their own.
+_INFORMATIONAL_INTERCOM_KINDS = frozenset({"message", "thought", "signal"})
+
 
 class AgentRuntimeAdapter(typing.Protocol):
     """Contract for plugging heterogeneous agents into a generic runner.
@@ -34,16 +40,29 @@ class AgentRuntimeAdapter(typing.Protocol):
     def validate_payload(self, payload: dict[str, typing.Any]) -> dict[str, typing.Any]:
         """Validate and normalize an incoming trigger payload."""
 
+    def payload_from_intercom(self, message: IntercomMessage) -> dict[str, typing.Any] | None:
+        """Map an intercom message addressed to this agent onto a trigger payload.
+
+        Return None for informational messages that need no run (the consumer
+        acknowledges them as consumed). Raise `ValueError` for messages the
+        agent cannot act on; the consumer marks those failed instead of
+        retrying them.
+        """
+
     def build_run_kwargs(
         self,
         *,
         tenant_id: str,
         run_id: str,
         payload: dict[str, typing.Any],
-        capabilities: PostgresCapabilities,
+        capabilities: PostgresCapabilities | AsyncPostgresCapabilities,
         llm: typing.Any,
     ) -> dict[str, typing.Any]:
-        """Translate normalized payload into keyword args for the agent runner."""
+        """Translate normalized payload into keyword args for the agent runner.
+
+        The same mapping serves the sync and asyncio runners: the async bundle
+        hands out the async tool implementations under the same method names.
+        """
 
     def handle_post_run(
         self,
@@ -67,11 +86,22 @@ class ImelRuntimeAdapter(AgentRuntimeAdapter):
         if not email_content:
             raise ValueError("Imel payload requires `email_content`.")
         email_id = str(payload.get("email_id") or str(uuid.uuid4()))
-        return {
+        validated = {
             "email_id": email_id,
             "sender_email": sender_email,
             "email_content": email_content,
         }
+        # Set by batched classification (see `runtime.classify_batch`); the run skips its own model call.
+        if isinstance(payload.get("classification"), dict):
+            validated["classification"] = payload["classification"]
+        return validated
+
+    def payload_from_intercom(self, message: IntercomMessage) -> dict[str, typing.Any] | None:
+        # Imel is triggered by inbound email only; peers (e.g. Kall's "resolved ticket")
+        # only keep it informed, so those notices are acknowledged without a run.
+        if message.kind in _INFORMATIONAL_INTERCOM_KINDS:
+            return None
+        raise ValueError(f"Imel does not accept intercom {message.kind!r} messages.")
 
     def build_run_kwargs(
         self,
@@ -79,7 +109,7 @@ class ImelRuntimeAdapter(AgentRuntimeAdapter):
         tenant_id: str,
         run_id: str,
         payload: dict[str, typing.Any],
-        capabilities: PostgresCapabilities,
+        capabilities: PostgresCapabilities | AsyncPostgresCapabilities,
         llm: typing.Any,
     ) -> dict[str, typing.Any]:
         return {
@@ -90,6 +120,7 @@ class ImelRuntimeAdapter(AgentRuntimeAdapter):
             "tools": capabilities.imel_tools(),
             "run_id": run_id,
             "llm": llm,
+            "classification": payload.get("classification"),
         }
 
     def handle_post_run(
@@ -123,13 +154,24 @@ class KallRuntimeAdapter(AgentRuntimeAdapter):
         sender_email = str(sender_email_raw).strip() if sender_email_raw else None
         return {"ticket_id": ticket_id, "sender_email": sender_email}
 
+    def payload_from_intercom(self, message: IntercomMessage) -> dict[str, typing.Any] | None:
+        # Imel's `create_ticket_and_handoff_to_kall_node` queues `{"ticket_id", "sender_email", ...}`.
+        if message.kind in _INFORMATIONAL_INTERCOM_KINDS:
+            return None
+        if message.kind != "handoff":
+            raise ValueError(f"Kall only consumes handoffs, got {message.kind!r}.")
+        return {
+            "ticket_id": message.payload.get("ticket_id"),
+            "sender_email": message.payload.get("sender_email"),
+        }
+
     def build_run_kwargs(
         self,
         *,
         tenant_id: str,
         run_id: str,
         payload: dict[str, typing.Any],
-        capabilities: PostgresCapabilities,
+        capabilities: PostgresCapabilities | AsyncPostgresCapabilities,
         llm: typing.Any,
     ) -> dict[str, typing.Any]:
         return {
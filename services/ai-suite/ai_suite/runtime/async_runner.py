@@ -0,0 +1,191 @@
+"""Asyncio agent runner.
+
+`arun_agent_once(...)` is the coroutine twin of `run_agent_once(...)`: same
+adapter contract, same run lifecycle (`runs` row committed up front, one unit
+of work for the rest), but tools, checkpoints and the model are awaited. A run
+spends nearly all of its wall time waiting on the LLM, so one event loop with a
+shared `AsyncPostgresCapabilities` bundle can keep hundreds of runs in flight
+where the thread-pool worker holds one thread per run. The async unit of work
+holds a pooled connection only between a task's first write and its checkpoint,
+never across a model call, so in-flight runs are not capped by the pool size.
+
+This is a library entry point for asyncio hosts; the `ai-suite` CLI commands
+(`worker`, `consume-intercom`, `run-*`) still use the thread-pool runner.
+
+Fairness is the caller's problem once concurrency is cheap: a single noisy
+tenant could otherwise occupy every slot. `TenantConcurrencyLimiter` caps
+in-flight runs per tenant (and optionally overall); pass one shared limiter to
+every `arun_agent_once` call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import typing
+import uuid
+
+from ai_suite.capabilities.checkpointer import AsyncAgentStateCheckpointer
+from ai_suite.capabilities.email import FakeEmailSender
+from ai_suite.capabilities.model_routing import achat_model_for
+from ai_suite.capabilities.postgres_async import AsyncPostgresCapabilities
+from ai_suite.runtime.registry import AgentSpec, get_compiled_graph, import_attr
+from ai_suite.runtime.runner import load_adapter
+
+logger = logging.getLogger(__name__)
+
+
+class TenantConcurrencyLimiter:
+    """Per-tenant (and optional global) cap on concurrently running coroutines.
+
+    Semaphores are created on first use and dropped once a tenant has no
+    running or waiting runs, so memory tracks active tenants only. Must be
+    used from a single event loop.
+    """
+
+    def __init__(self, *, per_tenant: int, total: int | None = None):
+        if per_tenant < 1:
+            raise ValueError("per_tenant must be >= 1")
+        self._per_tenant = per_tenant
+        self._total = asyncio.Semaphore(total) if total else None
+        self._slots: dict[str, tuple[asyncio.Semaphore, int]] = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant_id: str) -> typing.AsyncIterator[None]:
+        """Hold one of `tenant_id`'s slots (and a global slot) for the `async with` block."""
+
+        semaphore, users = self._slots.get(tenant_id, (None, 0))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._per_tenant)
+        self._slots[tenant_id] = (semaphore, users + 1)
+        try:
+            # Tenant slot first: a throttled tenant must not sit on global capacity while it waits.
+            async with semaphore:
+                if self._total is None:
+                    yield
+                else:
+                    async with self._total:
+                        yield
+        finally:
+            semaphore, users = self._slots[tenant_id]
+            if users <= 1:
+                del self._slots[tenant_id]
+            else:
+                self._slots[tenant_id] = (semaphore, users - 1)
+
+    def waiting_or_running(self, tenant_id: str | None = None) -> int:
+        """Runs holding or waiting for a slot, for one tenant or across all tenants."""
+
+        if tenant_id is not None:
+            return self._slots.get(tenant_id, (None, 0))[1]
+        return sum(users for _, users in self._slots.values())
+
+
+async def arun_agent_once(
+    *,
+    agent: AgentSpec,
+    tenant_id: str,
+    input_payload: dict[str, typing.Any],
+    database_url: str | None = None,
+    use_llm: bool = False,
+    capabilities: AsyncPostgresCapabilities | None = None,
+    unit_of_work: bool = True,
+    run_id: str | None = None,
+    limiter: TenantConcurrencyLimiter | None = None,
+    resume: bool = False,
+) -> dict[str, typing.Any]:
+    """Run one agent on one trigger payload on the event loop.
+
+    Mirrors `run_agent_once`; see it for the transaction, checkpoint and
+    `resume` semantics. Callers running many payloads concurrently should pass
+    a shared, opened `capabilities` bundle and a shared `limiter`; the run
+    holds its tenant slot from run creation until post-run effects finish.
+    """
+
+    if capabilities is None:
+        if not database_url:
+            raise RuntimeError("DATABASE_URL/AGENTS_DB_URL is required to run the orchestrator demo.")
+        async with AsyncPostgresCapabilities(database_url=database_url) as owned:
+            return await arun_agent_once(
+                agent=agent,
+                tenant_id=tenant_id,
+                input_payload=input_payload,
+                database_url=database_url,
+                use_llm=use_llm,
+                capabilities=owned,
+                unit_of_work=unit_of_work,
+                run_id=run_id,
+                limiter=limiter,
+                resume=resume,
+            )
+
+    if agent.async_runner_import is None:
+        raise ValueError(f"Agent {agent.agent_id!r} has no async runner")
+
+    run_fn = import_attr(agent.async_runner_import)  # The arun_<agent> coroutine in graph.py
+    adapter = load_adapter(agent)
+    normalized_payload = adapter.validate_payload(input_payload)
+
+    slot = limiter.slot(tenant_id) if limiter is not None else contextlib.nullcontext()
+    async with slot:
+        if resume:
+            if not run_id:
+                raise ValueError("resume=True requires the run_id to resume.")
+            await capabilities.runs.mark_running(run_id=run_id)
+        else:
+            run_id = run_id or str(uuid.uuid4())
+            await capabilities.runs.create_run(
+                run_id=run_id,
+                tenant_id=tenant_id,
+                agent_id=agent.agent_id,
+                input_payload=input_payload,
+            )
+
+        llm = None
+        if use_llm:
+            llm = await achat_model_for(capabilities, tenant_id)
+
+        logger.info(
+            "%s agent=%s tenant=%s run_id=%s (async)",
+            "Resuming" if resume else "Running",
+            agent.agent_id,
+            tenant_id,
+            run_id,
+        )
+        transaction = capabilities.unit_of_work() if unit_of_work else contextlib.nullcontext()
+        try:
+            async with transaction:
+                final_state = await run_fn(
+                    **adapter.build_run_kwargs(
+                        tenant_id=tenant_id,
+                        run_id=run_id,
+                        payload=normalized_payload,
+                        capabilities=capabilities,
+                        llm=llm,
+                    ),
+                    graph=get_compiled_graph(
+                        agent, asynchronous=True, checkpointer=AsyncAgentStateCheckpointer(capabilities)
+                    ),
+                    resume=resume,
+                )
+                await capabilities.runs.mark_completed(run_id=run_id, metadata=final_state.get("run_metadata"))
+        except Exception:
+            await capabilities.runs.mark_failed(run_id=run_id)
+            raise
+
+        email_sender = FakeEmailSender()
+        adapter.handle_post_run(
+            tenant_id=tenant_id,
+            payload=normalized_payload,
+            final_state=typing.cast(dict[str, typing.Any], final_state),
+            email_sender=email_sender,
+        )
+
+    logger.info(
+        "Completed run_id=%s agent=%s action=%s",
+        run_id,
+        agent.agent_id,
+        final_state.get("action"),
+    )
+    return typing.cast(dict[str, typing.Any], final_state)
@@ -0,0 +1,302 @@
+"""Batch execution of a JSONL file of trigger payloads.
+
+Backfills (e.g. replaying a newly onboarded tenant's historic mailbox) used to
+be one `ai-suite run-agent` process per payload, paying interpreter start-up,
+graph compilation and connection set-up thousands of times. `run_batch(...)`
+runs a whole file in one process:
+
+- the input is streamed line by line; at most `max_pending` payloads are read
+  ahead of the executor, so memory stays flat for arbitrarily large files,
+- runs fan out over a thread pool sharing one pooled `PostgresCapabilities`
+  bundle, or over a process pool (one bundle per child) when CPU-bound work in
+  the graph makes the GIL the bottleneck,
+- with `classify_batch_size` > 1 (thread mode), consecutive Imel payloads of
+  a tenant are classified with one model call (see
+  `ai_suite.runtime.classify_batch`),
+- every run writes one JSON result line to the output file as it completes
+  (completion order; `line` points back at the input),
+- the returned `BatchSummary` reports throughput, latency percentiles and
+  failures.
+
+Each input line is a payload object for the agent's adapter. An optional
+top-level `tenant_id` key overrides the batch tenant for that line and is not
+passed on to the adapter.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import json
+import logging
+import math
+import time
+import typing
+import uuid
+
+from ai_suite.capabilities.postgres import PostgresCapabilities
+from ai_suite.capabilities.postgres_pool import PoolConfig
+from ai_suite.runtime.classify_batch import BatchSlot, plan_classification_batches
+from ai_suite.runtime.registry import get_agent
+from ai_suite.runtime.runner import run_agent_once
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class BatchConfig:
+    """Tuning knobs for `run_batch`."""
+
+    concurrency: int = 4
+    executor: typing.Literal["thread", "process"] = "thread"
+    max_pending: int | None = None  # Payloads read ahead of the executor; defaults to 2 × concurrency.
+    use_llm: bool = False
+    classify_batch_size: int = 1  # Imel payloads per tenant classified in one model call (thread mode); 1 disables.
+
+
+@dataclasses.dataclass
+class BatchSummary:
+    """Aggregate outcome of a batch run."""
+
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    wall_seconds: float = 0.0
+    latencies: list[float] = dataclasses.field(default_factory=list)  # Seconds, successful and failed runs.
+
+    @property
+    def throughput(self) -> float:
+        """Runs finished per second of wall time."""
+
+        return self.total / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile of run latency in seconds (0.0 when empty)."""
+
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def as_dict(self) -> dict[str, typing.Any]:
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "throughput_per_s": round(self.throughput, 3),
+            "latency_ms": {
+                "p50": round(self.percentile(50) * 1000, 1),
+                "p95": round(self.percentile(95) * 1000, 1),
+                "p99": round(self.percentile(99) * 1000, 1),
+            },
+        }
+
+    def format(self) -> str:
+        return (
+            f"{self.total} run(s) in {self.wall_seconds:.1f}s ({self.throughput:.2f}/s): "
+            f"succeeded={self.succeeded} failed={self.failed} "
+            f"p50={self.percentile(50) * 1000:.0f}ms p95={self.percentile(95) * 1000:.0f}ms "
+            f"p99={self.percentile(99) * 1000:.0f}ms"
+        )
+
+
+def iter_payloads(
+    path: str,
+) -> typing.Iterator[tuple[int, dict[str, typing.Any] | None, str | None]]:
+    """Yield `(line_number, payload, error)` for each non-blank line of a JSONL file.
+
+    Malformed lines yield `payload=None` and an error message instead of
+    aborting the batch.
+    """
+
+    with open(path, encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(data, dict):
+                yield line_number, None, "Payload must be a JSON object."
+                continue
+            yield line_number, typing.cast(dict[str, typing.Any], data), None
+
+
+def run_batch(
+    *,
+    agent_id: str,
+    tenant_id: str,
+    input_path: str,
+    output_path: str,
+    database_url: str,
+    capabilities: PostgresCapabilities | None = None,
+    pool_config: PoolConfig | None = None,
+    capability_options: typing.Callable[[], dict[str, typing.Any]] | None = None,
+    config: BatchConfig | None = None,
+) -> BatchSummary:
+    """Run every payload in `input_path` and write one result line per run to `output_path`.
+
+    Thread mode uses `capabilities` when given (size its pool to at least
+    `concurrency`), otherwise a bundle owned by this call. Process mode opens
+    one small bundle per child process from `database_url`/`pool_config`.
+    Bundles created here get the extra keyword arguments returned by
+    `capability_options` (e.g. `Settings.capability_options`); in process
+    mode it is called in each child, so it must be picklable.
+    """
+
+    config = config or BatchConfig()
+    if config.concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+    get_agent(agent_id)  # Fail fast on an unknown agent before reading the file.
+    max_pending = config.max_pending or 2 * config.concurrency
+
+    owned: PostgresCapabilities | None = None
+    executor: concurrent.futures.Executor
+    if config.executor == "process":
+        child_pool = dataclasses.replace(pool_config or PoolConfig(), min_size=0, max_size=2)
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=config.concurrency,
+            initializer=_init_process,
+            initargs=(database_url, child_pool, capability_options),
+        )
+    else:
+        if capabilities is None:
+            sized = dataclasses.replace(pool_config or PoolConfig(), max_size=config.concurrency + 1)
+            options = capability_options() if capability_options is not None else {}
+            capabilities = owned = PostgresCapabilities(database_url=database_url, pool_config=sized, **options)
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.concurrency, thread_name_prefix="ai-suite-batch"
+        )
+
+    # Batched classification shares one lazily made model call between runs, so it needs threads.
+    classify_batch_size = config.classify_batch_size if config.use_llm and config.executor == "thread" else 1
+    summary = BatchSummary()
+    started = time.perf_counter()
+    pending: set[concurrent.futures.Future[dict[str, typing.Any]]] = set()
+    try:
+        with executor, open(output_path, "w", encoding="utf-8") as out:
+
+            def drain(return_when: str) -> None:
+                nonlocal pending
+                done, pending = concurrent.futures.wait(pending, return_when=return_when)
+                for future in done:
+                    _record(summary, out, future.result())
+
+            def submit(group: list[tuple[int, str, dict[str, typing.Any]]]) -> None:
+                slots: dict[typing.Hashable, BatchSlot] = {}
+                if len(group) > 1:
+                    slots = plan_classification_batches(
+                        ((line, run_tenant, agent_id, payload) for line, run_tenant, payload in group),
+                        capabilities=capabilities,
+                        max_batch_size=classify_batch_size,
+                    )
+                for line_number, run_tenant, payload in group:
+                    args = (agent_id, run_tenant, payload, line_number, config.use_llm)
+                    if config.executor == "process":
+                        pending.add(executor.submit(_execute_in_process, *args))
+                    else:
+                        pending.add(executor.submit(_execute, *args, capabilities, slots.get(line_number)))
+                group.clear()
+                while len(pending) >= max_pending:
+                    drain(concurrent.futures.FIRST_COMPLETED)
+
+            group: list[tuple[int, str, dict[str, typing.Any]]] = []
+            for line_number, payload, error in iter_payloads(input_path):
+                if payload is None:
+                    _record(summary, out, _invalid_result(line_number, tenant_id, error or "Invalid payload."))
+                    continue
+                group.append((line_number, str(payload.pop("tenant_id", None) or tenant_id), payload))
+                if len(group) >= classify_batch_size:
+                    submit(group)
+            if group:
+                submit(group)
+            if pending:
+                drain(concurrent.futures.ALL_COMPLETED)
+    finally:
+        summary.wall_seconds = time.perf_counter() - started
+        if owned is not None:
+            owned.close()
+
+    logger.info("Batch %s: %s", input_path, summary.format())
+    return summary
+
+
+def _execute(
+    agent_id: str,
+    tenant_id: str,
+    payload: dict[str, typing.Any],
+    line_number: int,
+    use_llm: bool,
+    capabilities: PostgresCapabilities,
+    slot: BatchSlot | None = None,
+) -> dict[str, typing.Any]:
+    """Run one payload and return its result line; never raises, so one bad line cannot stop the batch."""
+
+    run_id = str(uuid.uuid4())
+    result: dict[str, typing.Any] = {"line": line_number, "tenant_id": tenant_id, "run_id": run_id}
+    started = time.perf_counter()
+    try:
+        if slot is not None:
+            payload = slot.apply(payload)
+        final_state = run_agent_once(
+            agent=get_agent(agent_id),
+            tenant_id=tenant_id,
+            input_payload=payload,
+            database_url=None,
+            use_llm=use_llm,
+            capabilities=capabilities,
+            run_id=run_id,
+        )
+    except Exception as exc:
+        result.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+    else:
+        result.update(
+            status="completed",
+            action=final_state.get("action"),
+            final_state=json.loads(json.dumps(final_state, default=str)),
+        )
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+# --- process-pool plumbing: one capability bundle per child process ------------
+
+_process_capabilities: PostgresCapabilities | None = None
+
+
+def _init_process(
+    database_url: str,
+    pool_config: PoolConfig,
+    capability_options: typing.Callable[[], dict[str, typing.Any]] | None,
+) -> None:
+    global _process_capabilities
+    options = capability_options() if capability_options is not None else {}
+    _process_capabilities = PostgresCapabilities(database_url=database_url, pool_config=pool_config, **options)
+
+
+def _execute_in_process(
+    agent_id: str, tenant_id: str, payload: dict[str, typing.Any], line_number: int, use_llm: bool
+) -> dict[str, typing.Any]:
+    if _process_capabilities is None:
+        raise RuntimeError("Batch child process was not initialised")
+    return _execute(agent_id, tenant_id, payload, line_number, use_llm, _process_capabilities)
+
+
+def _invalid_result(line_number: int, tenant_id: str, error: str) -> dict[str, typing.Any]:
+    return {"line": line_number, "tenant_id": tenant_id, "run_id": None, "status": "invalid", "error": error}
+
+
+def _record(summary: BatchSummary, out: typing.TextIO, result: dict[str, typing.Any]) -> None:
+    summary.total += 1
+    if result["status"] == "completed":
+        summary.succeeded += 1
+    else:
+        summary.failed += 1
+        logger.warning("Batch line %s %s: %s", result["line"], result["status"], result.get("error"))
+    if "latency_ms" in result:
+        summary.latencies.append(result["latency_ms"] / 1000)
+    out.write(json.dumps(result, default=str) + "\n")
@@ -0,0 +1,174 @@
+"""Batched classification of queued Imel emails.
+
+Every Imel run starts with its own classification model call, and for a queue
+of short emails that call is mostly fixed overhead: the system prompt (brand
+kit, tone, policies) and the instructions are resent for every email. When a
+queue consumer holds several emails of the same tenant at once (a claimed
+instruction batch, a JSONL backfill), `plan_classification_batches(...)`
+groups them and the whole group is classified with one call
+(`imel_nodes.classify_emails_batch`). Each run's payload then carries its
+`classification`, which the Imel graph keeps instead of calling the model
+again; drafting and the rest of the run are unchanged.
+
+The batch call is lazy: the first run of a group to start makes it, under a
+lock, and the others wait for it and take their result by position. So a
+group costs one model call no matter which of its runs is scheduled first,
+and a run that never starts (lost lease, stop) costs nothing extra.
+
+- Emails whose content the tenant already has in the classification cache are
+  left out of the batch; their runs hit the cache on their own.
+- Fresh model results are written to the classification cache, like the
+  per-run classifier does.
+- An email the batched response does not classify gets the deterministic
+  fallback classification. If the batch call itself fails, every run of the
+  group classifies on its own as before.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import threading
+import typing
+
+from agents.general.imel import nodes as imel_nodes
+from agents.general.imel.state import EmailClassification
+from ai_suite.capabilities.model_routing import chat_model_for
+from ai_suite.capabilities.postgres import PostgresCapabilities
+
+logger = logging.getLogger(__name__)
+
+IMEL_AGENT_ID = "imel"
+
+
+class ClassificationBatch:
+    """One tenant's emails, classified together by the first run that asks."""
+
+    def __init__(
+        self,
+        *,
+        tenant_id: str,
+        emails: typing.Sequence[typing.Mapping[str, str]],
+        capabilities: PostgresCapabilities,
+        llm: typing.Any = None,
+    ):
+        self._tenant_id = tenant_id
+        self._emails = list(emails)
+        self._capabilities = capabilities
+        self._llm = llm
+        self._results: list[EmailClassification | None] | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    def classification(self, index: int) -> EmailClassification | None:
+        """Return email `index`'s classification, or None when its run should classify on its own."""
+
+        with self._lock:
+            if self._results is None:
+                self._results = self._classify()
+        return self._results[index]
+
+    def _classify(self) -> list[EmailClassification | None]:
+        tools = self._capabilities.imel_tools()
+        results: list[EmailClassification | None] = [None] * len(self._emails)
+        pending: list[tuple[int, str]] = []
+        for index, email in enumerate(self._emails):
+            content_key = imel_nodes.classification_cache_key(email["email_content"])
+            if not tools.get_cached_classification(tenant_id=self._tenant_id, content_key=content_key):
+                pending.append((index, content_key))
+        if len(pending) < 2:
+            return results  # Nothing to amortize; the runs classify (or hit the cache) on their own.
+
+        llm = self._llm if self._llm is not None else chat_model_for(self._capabilities, self._tenant_id)
+        try:
+            classified = imel_nodes.classify_emails_batch(
+                [self._emails[index] for index, _ in pending],
+                tenant_profile=tools.load_tenant_profile(tenant_id=self._tenant_id),
+                llm=llm,
+            )
+        except Exception as exc:
+            logger.warning(
+                "Batched classification of %d email(s) for tenant %s failed; classifying them one by one: %s",
+                len(pending),
+                self._tenant_id,
+                exc,
+            )
+            return results
+
+        from_model_count = 0
+        for (index, content_key), (classification, from_model) in zip(pending, classified, strict=True):
+            results[index] = classification
+            if from_model:
+                from_model_count += 1
+                tools.cache_classification(
+                    tenant_id=self._tenant_id, content_key=content_key, classification=classification
+                )
+        logger.info(
+            "Classified %d email(s) for tenant %s in one call (%d parsed, %d fallback)",
+            len(pending),
+            self._tenant_id,
+            from_model_count,
+            len(pending) - from_model_count,
+        )
+        return results
+
+
+@dataclasses.dataclass(frozen=True)
+class BatchSlot:
+    """One run's position in a `ClassificationBatch`."""
+
+    batch: ClassificationBatch
+    index: int
+
+    def apply(self, payload: dict[str, typing.Any]) -> dict[str, typing.Any]:
+        """Return `payload` with the batched `classification` added when there is one."""
+
+        classification = self.batch.classification(self.index)
+        if classification is None:
+            return payload
+        return {**payload, "classification": classification}
+
+
+def plan_classification_batches(
+    items: typing.Iterable[tuple[typing.Hashable, str, str, typing.Mapping[str, typing.Any]]],
+    *,
+    capabilities: PostgresCapabilities,
+    max_batch_size: int,
+    llm: typing.Any = None,
+) -> dict[typing.Hashable, BatchSlot]:
+    """Group `(key, tenant_id, agent_id, payload)` items into per-tenant classification batches.
+
+    Only Imel payloads with an email and no classification yet take part;
+    groups are cut at `max_batch_size` and a group of one is not batched.
+    Returns the slot of every batched item by `key`.
+    """
+
+    if max_batch_size < 2:
+        return {}
+    by_tenant: dict[str, list[tuple[typing.Hashable, dict[str, str]]]] = {}
+    for key, tenant_id, agent_id, payload in items:
+        if agent_id != IMEL_AGENT_ID or payload.get("classification"):
+            continue
+        sender_email = str(payload.get("sender_email") or "").strip()
+        email_content = str(payload.get("email_content") or "").strip()
+        if sender_email and email_content:
+            email = {"sender_email": sender_email, "email_content": email_content}
+            by_tenant.setdefault(tenant_id, []).append((key, email))
+
+    slots: dict[typing.Hashable, BatchSlot] = {}
+    for tenant_id, members in by_tenant.items():
+        for start in range(0, len(members), max_batch_size):
+            group = members[start : start + max_batch_size]
+            if len(group) < 2:
+                continue
+            batch = ClassificationBatch(
+                tenant_id=tenant_id,
+                emails=[email for _, email in group],
+                capabilities=capabilities,
+                llm=llm,
+            )
+            for index, (key, _) in enumerate(group):
+                slots[key] = BatchSlot(batch=batch, index=index)
+    return slots
@@ -0,0 +1,288 @@
+"""Consumer that executes agents addressed through `agent_intercom_queue`.
+
+Agents hand work to each other by queueing intercom rows (Imel's complaint and
+cancellation path queues a `handoff` to Kall). This consumer closes the loop:
+it claims queued messages per recipient, maps each one onto a trigger payload
+through the recipient's adapter (`payload_from_intercom`) and runs the agent via
+`get_agent(to_agent_id)` and `run_agent_once`, exactly as a CLI trigger would.
+Informational messages (the adapter returns None) are acknowledged without a run.
+
+Per cycle the consumer finds tenants with claimable messages and claims each
+tenant's batch in one transaction (walking `idx_aiq_recipient`), never more than
+the free slots of its bounded thread pool. Every tenant's messages run on that
+one pool, and each message is settled as soon as its own run finishes, so a slow
+Kall run holds one slot instead of stalling the other tenants. While a message
+runs, a heartbeat restarts its redelivery clock, so a run longer than
+`redeliver_after` is not claimed and run a second time. Messages the recipient
+rejects are marked `failed`; transient failures stay `delivered` and are
+redelivered once `redeliver_after` passes, until the row expires. Between
+cycles the consumer sleeps on LISTEN `agent_intercom_queue` and only revisits
+the tenants named in the notifications (a freed slot triggers a full rescan).
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import logging
+import threading
+import time
+
+from ai_suite.capabilities.postgres import IntercomMessage, PostgresCapabilities
+from ai_suite.capabilities.postgres_listen import INTERCOM_CHANNEL, QueueListener
+from ai_suite.runtime.registry import get_agent, registered_agent_ids
+from ai_suite.runtime.runner import load_adapter, run_agent_once
+from ai_suite.runtime.worker import worker_identity
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class ConsumerConfig:
+    """Tuning knobs for `IntercomConsumer`."""
+
+    concurrency: int = 4
+    batch_size: int = 16  # Messages claimed per tenant per cycle.
+    redeliver_after: float = 10 * 60.0
+    poll_interval: float = 2.0  # Idle sleep when not listening.
+    listen: bool = True
+    safety_poll_interval: float = 30.0  # Idle sleep while listening; catches redeliveries and missed NOTIFYs.
+    reap_interval: float = 60.0
+    agent_ids: tuple[str, ...] | None = None  # Recipients to consume for; defaults to every registered agent.
+    tenant_id: str | None = None
+    use_llm: bool = False
+
+
+class IntercomConsumer:
+    """Claim → run recipient agent → settle loop over `agent_intercom_queue`."""
+
+    def __init__(
+        self,
+        *,
+        capabilities: PostgresCapabilities,
+        config: ConsumerConfig | None = None,
+        worker_id: str | None = None,
+    ):
+        self._capabilities = capabilities
+        self._config = config or ConsumerConfig()
+        self._worker_id = worker_id or worker_identity()
+        self._agent_ids = self._config.agent_ids or registered_agent_ids()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._drained = threading.Event()
+        self._listener: QueueListener | None = None
+        self._inflight: dict[str, concurrent.futures.Future[None]] = {}
+        self._inflight_lock = threading.Lock()
+
+    def stop(self) -> None:
+        """Stop claiming new messages; in-flight runs are allowed to finish."""
+
+        self._stop.set()
+        self._signal_loop()
+
+    def run(self) -> None:
+        """Consume until `stop()` is called, then drain in-flight runs."""
+
+        config = self._config
+        logger.info(
+            "Intercom consumer %s starting (agents=%s concurrency=%d batch=%d)",
+            self._worker_id,
+            list(self._agent_ids),
+            config.concurrency,
+            config.batch_size,
+        )
+        if config.listen:
+            self._listener = self._capabilities.listen(INTERCOM_CHANNEL)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="ai-suite-intercom-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            self._loop()
+        finally:
+            self._drained.set()
+            heartbeat.join(timeout=1.0)
+            if self._listener is not None:
+                self._listener.close()
+                self._listener = None
+
+    def _loop(self) -> None:
+        config = self._config
+        next_reap = 0.0
+        tenant_ids: set[str] | None = None  # None means "scan every tenant with pending messages".
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.concurrency, thread_name_prefix="ai-suite-intercom"
+        ) as executor:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now >= next_reap:
+                    self._reap()
+                    next_reap = now + config.reap_interval
+                try:
+                    saturated = self.consume_once(executor, tenant_ids=tenant_ids)
+                except Exception as exc:
+                    logger.error("Intercom consume cycle failed: %s", exc)
+                    saturated = False
+                # A full tenant batch means more is waiting: rescan straight away while slots remain.
+                if saturated and self._inflight_count() < config.concurrency:
+                    tenant_ids = None
+                    continue
+                if self._stop.is_set():
+                    break
+                tenant_ids = self._wait_for_work()
+            logger.info(
+                "Intercom consumer %s stopping; waiting for %d in-flight run(s)", self._worker_id, self._inflight_count()
+            )
+
+    def consume_once(self, executor: concurrent.futures.Executor, *, tenant_ids: set[str] | None = None) -> bool:
+        """Claim one batch per tenant, up to the free slots, and submit it to `executor`.
+
+        Returns without waiting for the runs; each message is settled when its
+        own run finishes. Returns True when a tenant's batch came back full or
+        tenants were left unclaimed because every slot was busy.
+        """
+
+        config = self._config
+        free = config.concurrency - self._inflight_count()
+        if free <= 0:
+            return False  # Nothing to claim into; a finished run wakes the loop for a rescan.
+        if tenant_ids is None:
+            tenants = self._capabilities.intercom.pending_tenants(
+                to_agent_ids=self._agent_ids,
+                redeliver_after_seconds=config.redeliver_after,
+                tenant_id=config.tenant_id,
+            )
+        else:
+            tenants = sorted(t for t in tenant_ids if config.tenant_id is None or t == config.tenant_id)
+
+        saturated = False
+        for tenant_id in tenants:
+            if self._stop.is_set():
+                break
+            if free <= 0:
+                saturated = True
+                break
+            limit = min(config.batch_size, free)
+            messages = self._capabilities.intercom.claim(
+                tenant_id=tenant_id,
+                to_agent_ids=self._agent_ids,
+                limit=limit,
+                redeliver_after_seconds=config.redeliver_after,
+            )
+            if not messages:
+                continue
+            logger.info("Claimed %d intercom message(s) for tenant %s", len(messages), tenant_id)
+            saturated = saturated or len(messages) == limit
+            free -= len(messages)
+            for message in messages:
+                future = executor.submit(self._handle, message)
+                with self._inflight_lock:
+                    self._inflight[message.message_id] = future
+                future.add_done_callback(lambda _f, message_id=message.message_id: self._done(message_id))
+        return saturated
+
+    def _handle(self, message: IntercomMessage) -> None:
+        """Run one message and settle it straight away."""
+
+        error = self._execute(message)
+        intercom = self._capabilities.intercom
+        if error is None:
+            intercom.mark_consumed(message_ids=[message.message_id], consumer_id=self._worker_id)
+            return
+        reason, permanent = error
+        if permanent:
+            logger.error("Intercom message %s rejected by %s: %s", message.message_id, message.to_agent_id, reason)
+            intercom.mark_failed(message_ids=[message.message_id], consumer_id=self._worker_id)
+        else:
+            # Left `delivered`; claimable again once `redeliver_after` passes.
+            logger.warning("Intercom message %s failed (%s); will be redelivered", message.message_id, reason)
+
+    def _execute(self, message: IntercomMessage) -> tuple[str, bool] | None:
+        """Run the recipient agent; return None on success or `(error, permanent)` on failure."""
+
+        try:
+            agent = get_agent(message.to_agent_id)
+            adapter = load_adapter(agent)
+            payload = adapter.payload_from_intercom(message)
+            if payload is not None:
+                adapter.validate_payload(payload)
+        except (KeyError, ValueError) as exc:
+            # Unknown recipient or a message its adapter rejects: redelivery cannot help.
+            return f"{type(exc).__name__}: {exc}", True
+        if payload is None:
+            logger.info("Acknowledged intercom %s %s→%s", message.kind, message.from_agent_id, message.to_agent_id)
+            return None
+
+        logger.info(
+            "Consuming intercom %s %s→%s tenant=%s",
+            message.kind,
+            message.from_agent_id,
+            message.to_agent_id,
+            message.tenant_id,
+        )
+        try:
+            run_agent_once(
+                agent=agent,
+                tenant_id=message.tenant_id,
+                input_payload=payload,
+                database_url=None,
+                use_llm=self._config.use_llm,
+                capabilities=self._capabilities,
+            )
+        except Exception as exc:
+            return f"{type(exc).__name__}: {exc}", False
+        return None
+
+    def _wait_for_work(self) -> set[str] | None:
+        """Sleep until notified, a slot frees up or `stop()`; return the notified tenants, or None for a full rescan."""
+
+        if self._listener is None:
+            self._wake.wait(self._config.poll_interval)
+            self._wake.clear()
+            return None
+        notifications = self._listener.wait(self._config.safety_poll_interval)
+        if not notifications:
+            return None  # Safety poll (or interrupt): rescan everything.
+        if any(n.tenant_id is None for n in notifications):
+            return None  # Reconnect catch-up or an undecodable payload.
+        return {n.tenant_id for n in notifications if n.tenant_id is not None}
+
+    def _reap(self) -> None:
+        try:
+            expired = self._capabilities.intercom.reap()
+        except Exception as exc:
+            logger.warning("Intercom reaper failed: %s", exc)
+            return
+        if expired:
+            logger.info("Expired %d intercom message(s)", expired)
+
+    def _heartbeat_loop(self) -> None:
+        # Keeps running after `stop()` until the executor has drained, so slow runs are not redelivered.
+        interval = max(1.0, self._config.redeliver_after / 3)
+        while not self._drained.wait(interval):
+            with self._inflight_lock:
+                ids = list(self._inflight)
+            if not ids:
+                continue
+            try:
+                held = self._capabilities.intercom.heartbeat(message_ids=ids)
+            except Exception as exc:
+                logger.warning("Intercom heartbeat failed: %s", exc)
+                continue
+            for lost in set(ids) - held:
+                logger.warning("Intercom message %s is no longer delivered to this consumer", lost)
+
+    def _done(self, message_id: str) -> None:
+        with self._inflight_lock:
+            future = self._inflight.pop(message_id, None)
+        if future is not None and future.exception() is not None:
+            logger.error("Intercom message %s crashed the executor: %s", message_id, future.exception())
+        self._signal_loop()
+
+    def _signal_loop(self) -> None:
+        self._wake.set()
+        listener = self._listener
+        if listener is not None:
+            listener.interrupt()
+
+    def _inflight_count(self) -> int:
+        with self._inflight_lock:
+            return len(self._inflight)
@@ -0,0 +1,232 @@
+"""Batched `event_outbox` dispatcher.
+
+Agents never perform external side effects inline; tools write an outbox row
+in the same transaction as the business change (see `process_order_update`).
+This dispatcher is the other half of that pattern: it drains the outbox off the
+request path and routes each event to the handler registered for its
+`event_type`.
+
+Per cycle the dispatcher issues one claim query, fans the batch out over a
+bounded thread pool, and settles the results with one UPDATE for successes and
+one for failures. Failed events back off exponentially on `available_at` and
+go `dead` after `max_attempts`. Between batches the dispatcher sleeps on a
+LISTEN socket for `event_outbox` inserts, with a slow safety poll.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import logging
+import threading
+import time
+import typing
+
+from ai_suite.capabilities.email import FakeEmailSender
+from ai_suite.capabilities.postgres import OutboxEvent, PostgresCapabilities
+from ai_suite.capabilities.postgres_listen import OUTBOX_CHANNEL, QueueListener
+from ai_suite.runtime.worker import backoff_seconds, worker_identity
+
+logger = logging.getLogger(__name__)
+
+OutboxHandler = typing.Callable[[OutboxEvent], None]
+
+
+class PermanentEventError(Exception):
+    """Raised by a handler when retrying the event can never succeed (e.g. bad payload)."""
+
+
+@dataclasses.dataclass(frozen=True)
+class DispatcherConfig:
+    """Tuning knobs for `OutboxDispatcher`."""
+
+    concurrency: int = 16
+    batch_size: int = 100
+    poll_interval: float = 1.0  # Idle sleep when not listening.
+    listen: bool = True
+    safety_poll_interval: float = 30.0  # Idle sleep while listening; catches retries and missed NOTIFYs.
+    max_attempts: int = 10  # Mirrors the schema comment: outbox retries longer than human instructions.
+    lock_timeout: float = 5 * 60.0
+    backoff_base: float = 5.0
+    backoff_max: float = 60 * 60.0
+    reap_interval: float = 60.0
+
+
+class OutboxDispatcher:
+    """Claim → dispatch → settle loop over `event_outbox`."""
+
+    def __init__(
+        self,
+        *,
+        capabilities: PostgresCapabilities,
+        handlers: typing.Mapping[str, OutboxHandler] | None = None,
+        config: DispatcherConfig | None = None,
+        worker_id: str | None = None,
+    ):
+        self._capabilities = capabilities
+        self._handlers: dict[str, OutboxHandler] = dict(handlers or {})
+        self._config = config or DispatcherConfig()
+        self._worker_id = worker_id or worker_identity()
+        self._stop = threading.Event()
+        self._listener: QueueListener | None = None
+
+    def register(self, event_type: str, handler: OutboxHandler) -> None:
+        """Route `event_type` rows to `handler`. Unregistered types are never claimed."""
+
+        self._handlers[event_type] = handler
+
+    def stop(self) -> None:
+        """Finish the current batch and exit `run()`."""
+
+        self._stop.set()
+        listener = self._listener
+        if listener is not None:
+            listener.interrupt()
+
+    def run(self) -> None:
+        """Dispatch until `stop()` is called."""
+
+        config = self._config
+        logger.info(
+            "Outbox dispatcher %s starting (event_types=%s concurrency=%d batch=%d)",
+            self._worker_id,
+            sorted(self._handlers),
+            config.concurrency,
+            config.batch_size,
+        )
+        if config.listen:
+            self._listener = self._capabilities.listen(OUTBOX_CHANNEL)
+        try:
+            self._loop()
+        finally:
+            if self._listener is not None:
+                self._listener.close()
+                self._listener = None
+
+    def _loop(self) -> None:
+        config = self._config
+        next_reap = 0.0
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.concurrency, thread_name_prefix="ai-suite-outbox"
+        ) as executor:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now >= next_reap:
+                    self._reap()
+                    next_reap = now + config.reap_interval
+                try:
+                    processed = self.dispatch_once(executor)
+                except Exception as exc:
+                    logger.error("Outbox dispatch cycle failed: %s", exc)
+                    processed = 0
+                # Keep draining while batches come back full; otherwise sleep until notified.
+                if processed < config.batch_size and not self._stop.is_set():
+                    if self._listener is not None:
+                        self._listener.wait(config.safety_poll_interval)
+                    else:
+                        self._stop.wait(config.poll_interval)
+
+    def dispatch_once(self, executor: concurrent.futures.Executor) -> int:
+        """Claim one batch, run its handlers, settle results. Returns the batch size."""
+
+        config = self._config
+        events = self._capabilities.outbox.claim(
+            worker_id=self._worker_id,
+            event_types=list(self._handlers),
+            limit=config.batch_size,
+            max_attempts=config.max_attempts,
+            lock_timeout_seconds=config.lock_timeout,
+        )
+        if not events:
+            return 0
+
+        futures = {executor.submit(self._handle, event): event for event in events}
+        succeeded: list[str] = []
+        failures: list[tuple[str, str, float, bool]] = []
+        for future in concurrent.futures.as_completed(futures):
+            event = futures[future]
+            error = future.result()
+            if error is None:
+                succeeded.append(event.event_id)
+                continue
+            message, permanent = error
+            delay = backoff_seconds(event.attempts, base=config.backoff_base, cap=config.backoff_max)
+            failures.append((event.event_id, message, delay, permanent))
+
+        self._capabilities.outbox.mark_succeeded(event_ids=succeeded, worker_id=self._worker_id)
+        statuses = self._capabilities.outbox.mark_failed(
+            failures=failures, worker_id=self._worker_id, max_attempts=config.max_attempts
+        )
+        dead = [event_id for event_id, status in statuses.items() if status == "dead"]
+        if dead:
+            logger.error("Outbox events moved to dead: %s", ", ".join(dead))
+        logger.info(
+            "Outbox batch: claimed=%d succeeded=%d failed=%d dead=%d",
+            len(events),
+            len(succeeded),
+            len(failures) - len(dead),
+            len(dead),
+        )
+        return len(events)
+
+    def _handle(self, event: OutboxEvent) -> tuple[str, bool] | None:
+        """Run the handler; return None on success or `(error, permanent)` on failure."""
+
+        handler = self._handlers.get(event.event_type)
+        if handler is None:
+            # Only registered types are claimed, but handlers can be unregistered between claim and dispatch.
+            return f"no handler registered for event_type={event.event_type!r}", False
+        try:
+            handler(event)
+        except PermanentEventError as exc:
+            return f"{type(exc).__name__}: {exc}", True
+        except Exception as exc:
+            logger.warning("Outbox handler %s failed for event %s: %s", event.event_type, event.event_id, exc)
+            return f"{type(exc).__name__}: {exc}", False
+        return None
+
+    def _reap(self) -> None:
+        try:
+            dead = self._capabilities.outbox.reap(
+                max_attempts=self._config.max_attempts, lock_timeout_seconds=self._config.lock_timeout
+            )
+        except Exception as exc:
+            logger.warning("Outbox reaper failed: %s", exc)
+            return
+        if dead:
+            logger.error("Outbox reaper moved %d abandoned event(s) to dead", dead)
+
+
+def default_handlers(*, email_sender: FakeEmailSender | None = None) -> dict[str, OutboxHandler]:
+    """Handlers for the event types the runtime currently emits.
+
+    These are dev stand-ins in the same spirit as `FakeEmailSender`: they make
+    the delivery observable without touching real external systems.
+    """
+
+    sender = email_sender or FakeEmailSender()
+
+    def _update_order(event: OutboxEvent) -> None:
+        email_id = event.payload.get("email_id")
+        if not email_id:
+            raise PermanentEventError("update_order payload requires `email_id`")
+        logger.info(
+            "Order update requested tenant=%s email_id=%s summary=%s",
+            event.tenant_id,
+            email_id,
+            event.payload.get("summary", ""),
+        )
+
+    def _send_email(event: OutboxEvent) -> None:
+        payload = event.payload
+        missing = [key for key in ("to", "body") if not payload.get(key)]
+        if missing:
+            raise PermanentEventError(f"send_email payload missing {', '.join(missing)}")
+        sender.send_email(
+            email_id=str(payload.get("email_id") or event.idempotency_key or event.event_id),
+            to=str(payload["to"]),
+            subject=str(payload.get("subject") or ""),
+            body=str(payload["body"]),
+        )
+
+    return {"update_order": _update_order, "send_email": _send_email}
@@ -6,11 +6,23 @@ agent graph entrypoints and the tool contract they require.
 This keeps the runtime symmetric as the number of agents grows: adding an agent
 is a new `agents.general.<name>` package plus one registry entry here.
 Think of it as configuration/lookup/metadata, not a level in architecture.
+
+The registry also owns the process-wide cache of compiled graphs
+(`get_compiled_graph`), keyed by agent id and version, so long-lived workers
+compile each workflow once instead of once per run. Agents that ship an
+asyncio twin (`async_runner_import` / `async_graph_import`) get a separately
+cached coroutine graph for `ai_suite.runtime.async_runner`.
+
+Agents can also register alternative graphs (`graph_variants`, e.g. Imel's
+speculative KB prefetch); `select_graph_variant` switches the process to one
+at start-up, before any graph is compiled.
 """
 
 from __future__ import annotations
 
 import dataclasses
+import importlib
+import threading
 import typing
 
 
@@ -21,22 +33,124 @@ class AgentSpec:
     agent_id: str
     runner_import: str
     adapter_import: str
+    graph_import: str  # Zero-argument builder returning the compiled LangGraph workflow.
+    version: str = "1"  # Bump when the graph topology changes; part of the compiled-graph cache key.
+    async_runner_import: str | None = None  # `arun_<agent>` coroutine; None if the agent is sync-only.
+    async_graph_import: str | None = None  # Builder for the coroutine-node graph used with `ainvoke`.
+    stream_runner_import: str | None = None  # `stream_<agent>` event generator; None if the agent cannot stream.
+    # Alternative `(graph_import, async_graph_import)` builders by name, for `select_graph_variant`.
+    graph_variants: typing.Mapping[str, tuple[str, str | None]] = dataclasses.field(default_factory=dict)
+
+
+# Keep this explicit for now; evolve to dynamic discovery once we have more agents.
+_AGENTS: dict[str, AgentSpec] = {
+    "imel": AgentSpec(
+        agent_id="imel",
+        runner_import="agents.general.imel.graph:run_imel",
+        adapter_import="ai_suite.runtime.adapters:ImelRuntimeAdapter",
+        graph_import="agents.general.imel.graph:build_imel_langgraph",
+        async_runner_import="agents.general.imel.graph:arun_imel",
+        async_graph_import="agents.general.imel.graph:build_imel_async_langgraph",
+        stream_runner_import="agents.general.imel.graph:stream_imel",
+        graph_variants={
+            "speculative_kb": (
+                "agents.general.imel.graph:build_imel_speculative_langgraph",
+                "agents.general.imel.graph:build_imel_speculative_async_langgraph",
+            ),
+            "fast_path": (
+                "agents.general.imel.graph:build_imel_fast_path_langgraph",
+                "agents.general.imel.graph:build_imel_fast_path_async_langgraph",
+            ),
+        },
+    ),
+    "kall": AgentSpec(
+        agent_id="kall",
+        runner_import="agents.general.kall.graph:run_kall",
+        adapter_import="ai_suite.runtime.adapters:KallRuntimeAdapter",
+        graph_import="agents.general.kall.graph:build_kall_langgraph",
+        async_runner_import="agents.general.kall.graph:arun_kall",
+        async_graph_import="agents.general.kall.graph:build_kall_async_langgraph",
+    ),
+}
+
+_compiled_graphs: dict[tuple[str, str, bool], typing.Any] = {}
+_compiled_graphs_lock = threading.Lock()
 
 
 def get_agent(agent_id: str) -> AgentSpec:
     """Return an AgentSpec for a known agent id."""
 
-    # Keep this explicit for now; evolve to dynamic discovery once we have more agents.
-    if agent_id == "imel":
-        return AgentSpec(
-            agent_id="imel",
-            runner_import="agents.general.imel.graph:run_imel",
-            adapter_import="ai_suite.runtime.adapters:ImelRuntimeAdapter",
-        )
-    if agent_id == "kall":
-        return AgentSpec(
-            agent_id="kall",
-            runner_import="agents.general.kall.graph:run_kall",
-            adapter_import="ai_suite.runtime.adapters:KallRuntimeAdapter",
-        )
-    raise KeyError(f"Unknown agent_id: {agent_id!r}")
+    try:
+        return _AGENTS[agent_id]
+    except KeyError:
+        raise KeyError(f"Unknown agent_id: {agent_id!r}") from None
+
+
+def select_graph_variant(agent_id: str, variant: str) -> AgentSpec:
+    """Run every later execution of `agent_id` in this process on graph `variant`.
+
+    The variant name becomes part of the spec version, so compiled graphs of
+    the default topology are never served for it. A later call replaces an
+    earlier selection.
+    """
+
+    spec = get_agent(agent_id)
+    try:
+        graph_import, async_graph_import = spec.graph_variants[variant]
+    except KeyError:
+        raise ValueError(f"Agent {agent_id!r} has no graph variant {variant!r}") from None
+    if spec.graph_import == graph_import:
+        return spec
+    selected = dataclasses.replace(
+        spec,
+        graph_import=graph_import,
+        async_graph_import=async_graph_import,
+        version=f"{spec.version.split('+', 1)[0]}+{variant}",
+    )
+    _AGENTS[agent_id] = selected
+    return selected
+
+
+def registered_agent_ids() -> tuple[str, ...]:
+    """Return the ids of every agent the runtime can execute."""
+
+    return tuple(_AGENTS)
+
+
+def import_attr(path: str) -> typing.Any:
+    """Import an attribute from a `module:attr` string (the `*_import` fields of `AgentSpec`)."""
+
+    module_name, attr = path.split(":", 1)
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def get_compiled_graph(
+    agent: AgentSpec, *, asynchronous: bool = False, checkpointer: typing.Any = None
+) -> typing.Any:
+    """Return the compiled graph for `agent`, compiling it on first use.
+
+    Compiled graphs are stateless (dependencies arrive per invocation as
+    runtime context), so one instance is shared by every run in the process.
+    `asynchronous=True` returns the coroutine-node variant for `ainvoke`.
+    With a `checkpointer`, a shallow copy of the cached graph bound to it is
+    returned; copying is far cheaper than compiling, and keeps checkpointers
+    (which hold a capability bundle) out of the process-wide cache.
+    """
+
+    builder_import = agent.graph_import
+    if asynchronous:
+        if agent.async_graph_import is None:
+            raise ValueError(f"Agent {agent.agent_id!r} has no async graph")
+        builder_import = agent.async_graph_import
+
+    key = (agent.agent_id, agent.version, asynchronous)
+    graph = _compiled_graphs.get(key)
+    if graph is None:
+        with _compiled_graphs_lock:
+            graph = _compiled_graphs.get(key)
+            if graph is None:
+                graph = import_attr(builder_import)()
+                _compiled_graphs[key] = graph
+    if checkpointer is not None:
+        return graph.copy({"checkpointer": checkpointer})
+    return graph
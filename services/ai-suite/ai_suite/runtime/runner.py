@@ -1,33 +1,34 @@
 """Agent execution runner (single-run, CLI-friendly).
 
 This module intentionally provides a *minimal* execution surface:
-`run_agent_once(...)` runs exactly one agent on one payload.
+`run_agent_once(...)` runs exactly one agent on one payload, and
+`stream_agent_once(...)` does the same while yielding node events and partial
+drafts.
 
-In production, this evolves into a worker loop that consumes triggers, persists
-checkpoints, and dispatches outbox events.
+Queue consumers (see `ai_suite.runtime.worker` and `ai_suite.runtime.intercom`)
+call it once per claimed trigger, passing a shared capability bundle so runs reuse pooled connections.
 """
 
 from __future__ import annotations
 
-import importlib
-import json
+import contextlib
 import logging
 import typing
 import uuid
 
+from ai_suite.capabilities.checkpointer import AgentStateCheckpointer
 from ai_suite.capabilities.email import FakeEmailSender
+from ai_suite.capabilities.model_routing import chat_model_for
 from ai_suite.capabilities.postgres import PostgresCapabilities
-from ai_suite.runtime.registry import AgentSpec
+from ai_suite.runtime.registry import AgentSpec, get_compiled_graph, import_attr
 
 logger = logging.getLogger(__name__)
 
 
-def _import_attr(path: str):
-    """Import an attribute from a `module:attr` string."""
+def load_adapter(agent: AgentSpec) -> typing.Any:
+    """Instantiate the `AgentRuntimeAdapter` registered for `agent`."""
 
-    module_name, attr = path.split(":", 1)
-    mod = importlib.import_module(module_name)
-    return getattr(mod, attr)
+    return import_attr(agent.adapter_import)()
 
 
 def run_agent_once(
@@ -37,69 +38,233 @@ def run_agent_once(
     input_payload: dict[str, typing.Any],
     database_url: str | None,
     use_llm: bool = False,
+    capabilities: PostgresCapabilities | None = None,
+    unit_of_work: bool = True,
+    run_id: str | None = None,
+    resume: bool = False,
 ) -> dict[str, typing.Any]:
     """Run one agent on one trigger payload and execute service-owned side effects.
 
     This runner is symmetric across agents: each agent provides an adapter that
     validates payload, maps kwargs to its graph runner, and handles post-run effects.
-    """
 
-    if not database_url:
-        raise RuntimeError("DATABASE_URL/AGENTS_DB_URL is required to run the orchestrator demo.")
+    Long-lived callers should pass a shared `capabilities` bundle so runs reuse
+    its connection pool; otherwise a bundle is created and closed for this run.
 
-    capabilities = PostgresCapabilities(database_url=database_url)
-    email_sender = FakeEmailSender()
+    With `unit_of_work=True` (the default) the `runs` row is committed up front
+    so in-flight runs stay visible, and the rest of the run shares one
+    transaction. The graph checkpoints every super-step into `agent_state`,
+    and each checkpoint commits that transaction so far, so a step's tool
+    writes and its checkpoint land together. A failure rolls back only the
+    unfinished step and marks the run failed in a separate transaction.
 
-    # Create a run row for auditability. This is the core unit of work the runtime owns.
-    run_id = str(uuid.uuid4())
-    capabilities.runs.create_run(
-        run_id=run_id,
+    Queue consumers pass a pre-generated `run_id` so they can link the run to
+    the work item that triggered it. `resume=True` continues an existing,
+    checkpointed `run_id` from its last checkpoint instead of starting over;
+    the payload is still required for tool wiring and post-run effects.
+    """
+
+    if capabilities is None:
+        if not database_url:
+            raise RuntimeError("DATABASE_URL/AGENTS_DB_URL is required to run the orchestrator demo.")
+        owned = PostgresCapabilities(database_url=database_url)
+        try:
+            return run_agent_once(
+                agent=agent,
+                tenant_id=tenant_id,
+                input_payload=input_payload,
+                database_url=database_url,
+                use_llm=use_llm,
+                capabilities=owned,
+                unit_of_work=unit_of_work,
+                run_id=run_id,
+                resume=resume,
+            )
+        finally:
+            owned.close()
+
+    run_fn = import_attr(agent.runner_import)  # The run_<agent> function in graph.py
+    adapter, normalized_payload, run_id, llm = _start_run(
+        agent=agent,
         tenant_id=tenant_id,
-        agent_id=agent.agent_id,
         input_payload=input_payload,
+        use_llm=use_llm,
+        capabilities=capabilities,
+        run_id=run_id,
+        resume=resume,
     )
+    transaction = capabilities.unit_of_work() if unit_of_work else contextlib.nullcontext()
+    try:
+        with transaction:
+            final_state = run_fn(
+                **adapter.build_run_kwargs(
+                    tenant_id=tenant_id,
+                    run_id=run_id,
+                    payload=normalized_payload,
+                    capabilities=capabilities,
+                    llm=llm,
+                ),
+                graph=get_compiled_graph(agent, checkpointer=AgentStateCheckpointer(capabilities)),
+                resume=resume,
+            )
+            capabilities.runs.mark_completed(run_id=run_id, metadata=final_state.get("run_metadata"))
+    except Exception:
+        capabilities.runs.mark_failed(run_id=run_id)
+        raise
 
-    llm = None
-    if use_llm:
-        # Provider wiring belongs to the service. The agent accepts a model dependency when present.
-        from agents.shared import clients as shared_clients
+    _finish_run(
+        agent=agent,
+        adapter=adapter,
+        tenant_id=tenant_id,
+        payload=normalized_payload,
+        run_id=run_id,
+        final_state=final_state,
+    )
+    return typing.cast(dict[str, typing.Any], final_state)
 
-        llm = shared_clients.get_chat_model()
 
-    run_fn = _import_attr(agent.runner_import)  # The run_<agent> function in graph.py
-    adapter = _import_attr(agent.adapter_import)()  # The AgentRuntimeAdapter object in adapters.py
-    normalized_payload = adapter.validate_payload(input_payload)
+def stream_agent_once(
+    *,
+    agent: AgentSpec,
+    tenant_id: str,
+    input_payload: dict[str, typing.Any],
+    capabilities: PostgresCapabilities,
+    use_llm: bool = False,
+    unit_of_work: bool = True,
+    run_id: str | None = None,
+    resume: bool = False,
+) -> typing.Iterator[dict[str, typing.Any]]:
+    """Run one agent like `run_agent_once`, yielding events while the graph runs.
+
+    For previews (a UI, a human-approval queue) that should see the reply as
+    it is generated rather than when the run completes. Events are dicts
+    with an "event" key and the `run_id`:
+
+    - `node`: a node finished (`node`, `update`),
+    - `draft`: the model produced more of the draft (`delta`, and `draft`, the
+      partial draft so far); a later `node` update carrying `draft_response`
+      supersedes the partial draft,
+    - `completed`: last, after the run is recorded and post-run effects ran
+      (`final_state`).
+
+    The unit of work stays open while the generator is suspended, so consume
+    it from the thread that started it, without interleaving other database
+    work. Closing the generator early fails the run.
+    """
 
-    logger.info("Running agent=%s tenant=%s run_id=%s", agent.agent_id, tenant_id, run_id)
+    if agent.stream_runner_import is None:
+        raise ValueError(f"Agent {agent.agent_id!r} has no streaming runner")
+
+    stream_fn = import_attr(agent.stream_runner_import)  # The stream_<agent> generator in graph.py
+    adapter, normalized_payload, run_id, llm = _start_run(
+        agent=agent,
+        tenant_id=tenant_id,
+        input_payload=input_payload,
+        use_llm=use_llm,
+        capabilities=capabilities,
+        run_id=run_id,
+        resume=resume,
+    )
+    final_state: dict[str, typing.Any] = {}
+    draft = ""
+    transaction = capabilities.unit_of_work() if unit_of_work else contextlib.nullcontext()
     try:
-        final_state = run_fn(
-            **adapter.build_run_kwargs(
-                tenant_id=tenant_id,
-                run_id=run_id,
-                payload=normalized_payload,
-                capabilities=capabilities,
-                llm=llm,
+        with transaction:
+            events = stream_fn(
+                **adapter.build_run_kwargs(
+                    tenant_id=tenant_id,
+                    run_id=run_id,
+                    payload=normalized_payload,
+                    capabilities=capabilities,
+                    llm=llm,
+                ),
+                graph=get_compiled_graph(agent, checkpointer=AgentStateCheckpointer(capabilities)),
+                resume=resume,
             )
-        )
+            for event in events:
+                if event["event"] == "final":
+                    final_state = event["state"]
+                elif event["event"] == "draft_delta":
+                    draft += event["delta"]
+                    yield {"event": "draft", "run_id": run_id, "delta": event["delta"], "draft": draft}
+                else:
+                    if isinstance(event.get("update"), dict) and "draft_response" in event["update"]:
+                        draft = ""
+                    yield {**event, "run_id": run_id}
+            capabilities.runs.mark_completed(run_id=run_id, metadata=final_state.get("run_metadata"))
+    except (Exception, GeneratorExit):
+        capabilities.runs.mark_failed(run_id=run_id)
+        raise
+
+    _finish_run(
+        agent=agent,
+        adapter=adapter,
+        tenant_id=tenant_id,
+        payload=normalized_payload,
+        run_id=run_id,
+        final_state=final_state,
+    )
+    yield {"event": "completed", "run_id": run_id, "final_state": final_state}
+
 
-        # Persist the final state as a single checkpoint. In a full runtime we'd checkpoint per node.
-        capabilities.state.save_checkpoint(
+def _start_run(
+    *,
+    agent: AgentSpec,
+    tenant_id: str,
+    input_payload: dict[str, typing.Any],
+    use_llm: bool,
+    capabilities: PostgresCapabilities,
+    run_id: str | None,
+    resume: bool,
+) -> tuple[typing.Any, dict[str, typing.Any], str, typing.Any]:
+    """Validate the payload, record the run and build the model; returns `(adapter, payload, run_id, llm)`."""
+
+    adapter = load_adapter(agent)  # The AgentRuntimeAdapter object in adapters.py
+    # Validate before creating the run row so a malformed payload never leaves a run stuck in `running`.
+    normalized_payload = adapter.validate_payload(input_payload)
+
+    # Create a run row for auditability. This is the core unit of work the runtime owns.
+    # It commits on its own so in-flight runs are visible before the graph finishes.
+    if resume:
+        if not run_id:
+            raise ValueError("resume=True requires the run_id to resume.")
+        capabilities.runs.mark_running(run_id=run_id)
+    else:
+        run_id = run_id or str(uuid.uuid4())
+        capabilities.runs.create_run(
             run_id=run_id,
-            checkpoint_id=1,
-            node_name="__end__",
-            state_data=json.loads(json.dumps(final_state, default=str)),
+            tenant_id=tenant_id,
+            agent_id=agent.agent_id,
+            input_payload=input_payload,
         )
-        capabilities.runs.mark_completed(run_id=run_id)
-    except Exception:
-        capabilities.runs.mark_failed(run_id=run_id)
-        raise
 
+    llm = None
+    if use_llm:
+        # Provider wiring belongs to the service. The agent accepts a model dependency when present;
+        # with model routing it is the tenant's router, which picks a model per task.
+        llm = chat_model_for(capabilities, tenant_id)
+
+    logger.info(
+        "%s agent=%s tenant=%s run_id=%s", "Resuming" if resume else "Running", agent.agent_id, tenant_id, run_id
+    )
+    return adapter, normalized_payload, run_id, llm
+
+
+def _finish_run(
+    *,
+    agent: AgentSpec,
+    adapter: typing.Any,
+    tenant_id: str,
+    payload: dict[str, typing.Any],
+    run_id: str,
+    final_state: typing.Mapping[str, typing.Any],
+) -> None:
     # Let agent adapters own post-run external effects.
     adapter.handle_post_run(
         tenant_id=tenant_id,
-        payload=normalized_payload,
+        payload=payload,
         final_state=typing.cast(dict[str, typing.Any], final_state),
-        email_sender=email_sender,
+        email_sender=FakeEmailSender(),
     )
 
     logger.info(
@@ -108,4 +273,3 @@ def run_agent_once(
         agent.agent_id,
         final_state.get("action"),
     )
-    return typing.cast(dict[str, typing.Any], final_state)
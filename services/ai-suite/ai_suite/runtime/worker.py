@@ -0,0 +1,346 @@
+"""Long-running worker that executes `human_instructions_queue` items.
+
+`run_agent_once(...)` is the unit of execution; this module is the loop around
+it. One worker process:
+
+- claims batches of instructions with `FOR UPDATE SKIP LOCKED` leases,
+- runs up to `concurrency` agent executions at once on a thread pool, sharing
+  one pooled `PostgresCapabilities` bundle,
+- heartbeats the leases of in-flight items so slow LLM calls are not reclaimed,
+- records success, or failure with exponential backoff on `available_at` until
+  `max_attempts` is used up and the row goes `dead`,
+- optionally classifies the claimed emails of one tenant with a single model
+  call (`classify_batch_size`, see `ai_suite.runtime.classify_batch`),
+- resumes a retried instruction's failed run from its last `agent_state`
+  checkpoint instead of starting over (a run left `running` by a crashed or
+  lease-less worker is not resumed; the retry starts a fresh run),
+- sleeps on a LISTEN socket between claims, so new instructions are picked up
+  within milliseconds while an idle worker issues no claim queries (a slow
+  safety poll still covers missed notifications and backoff retries).
+
+Many worker processes can poll the same table safely; the lease columns are
+the only coordination they need.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import typing
+import uuid
+
+from ai_suite.capabilities.postgres import ClaimedInstruction, PostgresCapabilities
+from ai_suite.capabilities.postgres_listen import INSTRUCTIONS_CHANNEL, QueueListener
+from ai_suite.runtime.classify_batch import BatchSlot, plan_classification_batches
+from ai_suite.runtime.registry import get_agent, registered_agent_ids
+from ai_suite.runtime.runner import load_adapter, run_agent_once
+
+logger = logging.getLogger(__name__)
+
+
+def worker_identity() -> str:
+    """Return the `locked_by` identity for this process (`ai-suite:<host>:<pid>`)."""
+
+    return f"ai-suite:{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff_seconds(attempt: int, *, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given (1-based) attempt number."""
+
+    ceiling = min(cap, base * (2 ** max(0, attempt - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+@dataclasses.dataclass(frozen=True)
+class WorkerConfig:
+    """Tuning knobs for `InstructionWorker`."""
+
+    concurrency: int = 4
+    batch_size: int = 8
+    lease_seconds: float = 120.0
+    poll_interval: float = 2.0  # Idle sleep when not listening.
+    listen: bool = True
+    safety_poll_interval: float = 30.0  # Idle sleep while listening; catches retries and missed NOTIFYs.
+    backoff_base: float = 15.0
+    backoff_max: float = 15 * 60.0
+    reap_interval: float = 60.0
+    tenant_id: str | None = None
+    use_llm: bool = False
+    classify_batch_size: int = 1  # Imel emails per tenant classified in one model call; 1 disables batching.
+
+
+class InstructionWorker:
+    """Claim-execute-acknowledge loop for human→agent instructions."""
+
+    def __init__(
+        self,
+        *,
+        capabilities: PostgresCapabilities,
+        config: WorkerConfig | None = None,
+        worker_id: str | None = None,
+    ):
+        self._capabilities = capabilities
+        self._config = config or WorkerConfig()
+        self._worker_id = worker_id or worker_identity()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._drained = threading.Event()
+        self._listener: QueueListener | None = None
+        self._inflight: dict[str, concurrent.futures.Future[None]] = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    def stop(self) -> None:
+        """Stop claiming new work; in-flight executions are allowed to finish."""
+
+        self._stop.set()
+        self._signal_loop()
+
+    def run(self) -> None:
+        """Run until `stop()` is called, then drain in-flight executions."""
+
+        config = self._config
+        logger.info(
+            "Worker %s starting (concurrency=%d batch=%d lease=%.0fs)",
+            self._worker_id,
+            config.concurrency,
+            config.batch_size,
+            config.lease_seconds,
+        )
+        if config.listen:
+            self._listener = self._capabilities.listen(INSTRUCTIONS_CHANNEL)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="ai-suite-heartbeat", daemon=True)
+        heartbeat.start()
+        next_reap = 0.0
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.concurrency, thread_name_prefix="ai-suite-run"
+        ) as executor:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now >= next_reap:
+                    self._reap()
+                    next_reap = now + config.reap_interval
+
+                free = config.concurrency - self._inflight_count()
+                limit = min(config.batch_size, free)
+                claimed: list[ClaimedInstruction] = []
+                if limit > 0:
+                    try:
+                        claimed = self._capabilities.instructions.claim(
+                            worker_id=self._worker_id,
+                            agent_ids=registered_agent_ids(),
+                            limit=limit,
+                            lease_seconds=config.lease_seconds,
+                            tenant_id=config.tenant_id,
+                        )
+                    except Exception as exc:
+                        logger.error("Instruction claim failed: %s", exc)
+
+                slots = self._classification_slots(claimed)
+                for item in claimed:
+                    future = executor.submit(self._execute, item, slots.get(item.instruction_id))
+                    with self._inflight_lock:
+                        self._inflight[item.instruction_id] = future
+                    future.add_done_callback(lambda _f, item_id=item.instruction_id: self._done(item_id))
+
+                # A full batch means more work is probably waiting; claim again while slots remain.
+                if claimed and len(claimed) == limit and free > limit:
+                    continue
+                self._wait_for_work()
+
+            logger.info("Worker %s stopping; waiting for %d in-flight run(s)", self._worker_id, self._inflight_count())
+        self._drained.set()
+        heartbeat.join(timeout=1.0)
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    # --- internals ---------------------------------------------------------
+
+    def _execute(self, item: ClaimedInstruction, slot: BatchSlot | None = None) -> None:
+        config = self._config
+        if not self._capabilities.instructions.mark_in_progress(
+            instruction_id=item.instruction_id, worker_id=self._worker_id
+        ):
+            logger.warning("Lost lease on instruction %s before start; skipping", item.instruction_id)
+            return
+        resume_run_id = self._resumable_run(item)
+        run_id = resume_run_id or str(uuid.uuid4())
+
+        logger.info(
+            "Executing instruction=%s agent=%s tenant=%s attempt=%d/%d",
+            item.instruction_id,
+            item.agent_id,
+            item.tenant_id,
+            item.attempts,
+            item.max_attempts,
+        )
+        input_payload = _input_payload(item)
+        try:
+            agent = get_agent(item.agent_id)
+            load_adapter(agent).validate_payload(input_payload)
+        except (KeyError, ValueError) as exc:
+            # Unknown agent or a payload the adapter rejects: retrying cannot help.
+            self._fail(item, run_id=run_id, error=f"{type(exc).__name__}: {exc}", permanent=True)
+            return
+        try:
+            if slot is not None and resume_run_id is None:
+                input_payload = slot.apply(input_payload)
+            final_state = run_agent_once(
+                agent=agent,
+                tenant_id=item.tenant_id,
+                input_payload=input_payload,
+                database_url=None,
+                use_llm=config.use_llm,
+                capabilities=self._capabilities,
+                run_id=run_id,
+                resume=resume_run_id is not None,
+            )
+        except Exception as exc:
+            self._fail(item, run_id=run_id, error=f"{type(exc).__name__}: {exc}", permanent=False)
+            return
+
+        completed = self._capabilities.instructions.complete(
+            instruction_id=item.instruction_id,
+            worker_id=self._worker_id,
+            run_id=run_id,
+            agent_response=_agent_response(item.agent_id, final_state),
+            result_payload=json.loads(json.dumps(final_state, default=str)),
+        )
+        if not completed:
+            logger.warning("Instruction %s finished after its lease was lost", item.instruction_id)
+
+    def _classification_slots(self, claimed: list[ClaimedInstruction]) -> dict[str, BatchSlot]:
+        """Batch the classification of claimed first attempts (retries may resume a checkpoint)."""
+
+        config = self._config
+        if not config.use_llm or config.classify_batch_size < 2 or len(claimed) < 2:
+            return {}
+        return plan_classification_batches(
+            (
+                (item.instruction_id, item.tenant_id, item.agent_id, item.payload)
+                for item in claimed
+                if item.attempts <= 1
+            ),
+            capabilities=self._capabilities,
+            max_batch_size=config.classify_batch_size,
+        )
+
+    def _resumable_run(self, item: ClaimedInstruction) -> str | None:
+        """Return the earlier failed run to resume for a retried instruction, if it left checkpoints."""
+
+        if item.attempts <= 1:
+            return None
+        try:
+            run_id = self._capabilities.instructions.resumable_run(
+                instruction_id=item.instruction_id, tenant_id=item.tenant_id
+            )
+        except Exception as exc:
+            logger.warning("Could not look up a resumable run for instruction %s: %s", item.instruction_id, exc)
+            return None
+        if run_id is not None:
+            logger.info("Instruction %s resumes run %s from its last checkpoint", item.instruction_id, run_id)
+        return run_id
+
+    def _fail(self, item: ClaimedInstruction, *, run_id: str, error: str, permanent: bool) -> None:
+        delay = backoff_seconds(item.attempts, base=self._config.backoff_base, cap=self._config.backoff_max)
+        try:
+            status = self._capabilities.instructions.fail(
+                instruction_id=item.instruction_id,
+                worker_id=self._worker_id,
+                run_id=run_id,
+                error=error,
+                retry_in_seconds=delay,
+                permanent=permanent,
+            )
+        except Exception as exc:
+            # The lease will expire and another worker will pick the row up again.
+            logger.error("Could not record failure for instruction %s: %s", item.instruction_id, exc)
+            return
+        if status == "dead":
+            logger.error("Instruction %s is dead after %d attempt(s): %s", item.instruction_id, item.attempts, error)
+        elif status == "failed":
+            logger.warning("Instruction %s failed (%s); retrying in %.0fs", item.instruction_id, error, delay)
+
+    def _heartbeat_loop(self) -> None:
+        # Keeps running after `stop()` until the executor has drained, so slow runs keep their leases.
+        interval = max(1.0, self._config.lease_seconds / 3)
+        while not self._drained.wait(interval):
+            with self._inflight_lock:
+                ids = list(self._inflight)
+            if not ids:
+                continue
+            try:
+                held = self._capabilities.instructions.heartbeat(
+                    instruction_ids=ids, worker_id=self._worker_id, lease_seconds=self._config.lease_seconds
+                )
+            except Exception as exc:
+                logger.warning("Lease heartbeat failed: %s", exc)
+                continue
+            for lost in set(ids) - held:
+                logger.warning("Lease on instruction %s was lost", lost)
+
+    def _reap(self) -> None:
+        try:
+            expired, dead = self._capabilities.instructions.reap()
+        except Exception as exc:
+            logger.warning("Instruction reaper failed: %s", exc)
+            return
+        if expired or dead:
+            logger.info("Reaped instructions: expired=%d dead=%d", expired, dead)
+
+    def _done(self, instruction_id: str) -> None:
+        with self._inflight_lock:
+            future = self._inflight.pop(instruction_id, None)
+        if future is not None and future.exception() is not None:
+            logger.error("Instruction %s crashed the executor: %s", instruction_id, future.exception())
+        self._signal_loop()
+
+    def _wait_for_work(self) -> None:
+        """Block until a NOTIFY, a freed slot, `stop()`, or the poll interval elapses."""
+
+        if self._listener is not None:
+            self._listener.wait(self._config.safety_poll_interval)
+            return
+        self._wake.wait(self._config.poll_interval)
+        self._wake.clear()
+
+    def _signal_loop(self) -> None:
+        self._wake.set()
+        listener = self._listener
+        if listener is not None:
+            listener.interrupt()
+
+    def _inflight_count(self) -> int:
+        with self._inflight_lock:
+            return len(self._inflight)
+
+
+def _input_payload(item: ClaimedInstruction) -> dict[str, typing.Any]:
+    """Map an instruction row onto the trigger payload the agent adapter validates."""
+
+    payload = dict(item.payload)
+    payload.setdefault("instruction", item.instruction)
+    payload.setdefault("instruction_id", item.instruction_id)
+    return payload
+
+
+def _agent_response(agent_id: str, final_state: dict[str, typing.Any]) -> str:
+    """Short human-readable result for the dashboard."""
+
+    action = final_state.get("action") or "none"
+    detail = final_state.get("draft_response") or final_state.get("outbound_message") or ""
+    summary = f"{agent_id} finished with action={action}"
+    return f"{summary}: {str(detail)[:500]}" if detail else summary
+